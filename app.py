@@ -6,6 +6,7 @@
 
 import os
 import tempfile
+import threading
 import time
 from flask import Flask
 
@@ -58,6 +59,14 @@ def create_app(config_name=None):
     # 兼容旧引用
     app.tracker = app.trading_service
     
+    # 命令行：全量重建日收益表（回填/修复），用法 `flask --app app rebuild-daily-returns`
+    @app.cli.command('rebuild-daily-returns')
+    def rebuild_daily_returns_command():
+        """按交易明细全量重建 strategy_daily_returns"""
+        import click
+        count = app.trading_service.daily_returns.rebuild_all()
+        click.echo(f"已重建日收益记录 {count} 行")
+
     # 全局错误处理
     @app.errorhandler(404)
     def page_not_found(error):
@@ -70,11 +79,43 @@ def create_app(config_name=None):
     return app
 
 
-# 为了兼容性，创建全局app实例，并导出全局 tracker 引用
-app = create_app()
-tracker = app.trading_service  # 保持向后兼容
+# 全局 app / tracker 改为首次访问时创建（PEP 562 模块级 __getattr__）：
+# 仅导入本模块（如 `from app import create_app`）不再构建应用、初始化数据库。
+_default_app = None
+_default_app_lock = threading.Lock()
 
 
-if __name__ == '__main__':
+def get_app():
+    """返回进程内共享的默认应用实例（首次调用时创建）"""
+    global _default_app
+    if _default_app is None:
+        with _default_app_lock:
+            if _default_app is None:
+                _default_app = create_app()
+    return _default_app
+
+
+def __getattr__(name):
+    # 为了兼容性，保留 `from app import app, tracker` 的用法
+    if name == 'app':
+        return get_app()
+    if name == 'tracker':
+        return get_app().trading_service  # 保持向后兼容
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run_server(application=None):
+    """启动开发服务器；开启 WARMUP_ON_START 时在服务开始监听后后台预热科学计算模块"""
     from config import Config
-    app.run(debug=app.config.get('DEBUG', True), host=Config.HOST, port=Config.PORT)
+    application = application or get_app()
+    debug = application.config.get('DEBUG', True)
+    # 调试模式下重载器的父进程不处理请求，只在实际服务进程中预热
+    if application.config.get('WARMUP_ON_START') and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        from utils.warmup import start_warmup
+        start_warmup(delay=application.config.get('WARMUP_DELAY_SECONDS', 0),
+                     wait_for=(Config.HOST, Config.PORT))
+    application.run(debug=debug, host=Config.HOST, port=Config.PORT)
+
+
+if __name__ == '__main__':
+    run_server()
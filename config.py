@@ -36,6 +36,18 @@ class Config:
     DEFAULT_PAGE_SIZE = 50
     MAX_PAGE_SIZE = 200
     
+    # 启动预热：服务开始监听后在后台线程预先导入 numpy 与风险指标内核（APP_WARMUP=1 开启）
+    WARMUP_ON_START = os.environ.get('APP_WARMUP', '').strip().lower() in ('1', 'true', 'yes', 'on')
+    WARMUP_DELAY_SECONDS = float(os.environ.get('APP_WARMUP_DELAY', 0))
+
+    # 数据源 HTTP 客户端：设置目录后启用磁盘响应缓存（TTL 秒内直接复用，过期后条件请求重新验证）；
+    # 模式 live（默认）| replay（只读缓存、不访问网络，用于离线基准与回放）
+    PROVIDER_HTTP_CACHE_DIR = os.environ.get('PROVIDER_HTTP_CACHE_DIR') or None
+    PROVIDER_HTTP_CACHE_TTL = float(os.environ.get('PROVIDER_HTTP_CACHE_TTL', 3600))
+    PROVIDER_HTTP_MODE = os.environ.get('PROVIDER_HTTP_MODE', 'live')
+    # 中观行情数据源：yfinance（默认，真实数据）| synthetic（确定性合成数据，离线压测/基准）
+    MESO_MARKET_PROVIDER = os.environ.get('MESO_MARKET_PROVIDER', 'yfinance')
+
     # 时间格式配置
     DATE_FORMAT = '%Y-%m-%d'
     DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
@@ -60,6 +72,8 @@ class TestingConfig(Config):
     DB_PATH = ':memory:'
     MACRO_DB_PATH = ':memory:'
     MESO_DB_PATH = ':memory:'
+    WARMUP_ON_START = False
+    PROVIDER_HTTP_CACHE_DIR = None
 
 # 配置字典
 config = {
@@ -4,10 +4,17 @@
 宏观观察 - API 路由（MVP）
 """
 
-from flask import Blueprint, request, jsonify, current_app
+import hashlib
+import json
+from datetime import datetime, timezone
 
-from services.macro_service import MacroService
+from flask import Blueprint, Response, request, jsonify, current_app
+
+from services.macro_service import MacroService, filter_snapshot
 from utils.decorators import handle_errors
+from utils.timeseries import (
+    ARROW_MIMETYPE, columns_to_arrow_ipc, parse_sampling_args, parse_series_format, stack_columns,
+)
 
 
 api_macro_bp = Blueprint('api_macro', __name__, url_prefix='/api/macro')
@@ -20,7 +27,7 @@ def snapshot():
     Query:
       - view: value|zscore|percentile|trend（默认 value）
       - date: 截止日期
-      - window: 分析窗口：6m/1y/3y/5y/10y
+      - window: 分析窗口：6m/1y/3y/5y/10y；未指定时以最新一期横截面为参照，响应中 window 为 latest
       - economies: 逗号分隔经济体过滤
       - indicators: 逗号分隔指标过滤
     """
@@ -29,19 +36,27 @@ def snapshot():
     window = request.args.get('window')
     nocache = request.args.get('nocache', 'false').lower() in ('1','true','yes')
     svc = MacroService(current_app.db_service)
-    snap = svc.get_snapshot(view=view, date=date, window=window, nocache=nocache)
+    entry = svc.get_snapshot_entry(view=view, date=date, window=window, nocache=nocache)
     economies = request.args.get('economies')
     indicators = request.args.get('indicators')
-    if economies:
-        ecos = [e.strip().upper() for e in economies.split(',') if e.strip()]
-        snap['economies'] = [e for e in snap['economies'] if e in ecos]
-        snap['ranking'] = [r for r in snap['ranking'] if r['economy'] in snap['economies']]
-        snap['matrix'] = {e: snap['matrix'][e] for e in snap['economies'] if e in snap['matrix']}
-    if indicators:
-        inds = [i.strip() for i in indicators.split(',') if i.strip()]
-        for e, row in snap['matrix'].items():
-            row['by_indicator'] = {k: v for k, v in row.get('by_indicator', {}).items() if k in inds}
-    return jsonify(snap)
+    ecos = [e.strip().upper() for e in economies.split(',') if e.strip()] if economies else []
+    inds = [i.strip() for i in indicators.split(',') if i.strip()] if indicators else []
+    if ecos or inds:
+        # 过滤结果的 ETag = 基础快照 ETag + 过滤条件摘要
+        digest = hashlib.sha1(f"{','.join(ecos)}|{','.join(inds)}".encode('utf-8')).hexdigest()[:8]
+        etag = f"{entry.etag}-{digest}"
+        if request.if_none_match.contains(etag):
+            body = ''
+        else:
+            body = json.dumps(filter_snapshot(entry.payload, ecos, inds), sort_keys=True, separators=(',', ':'))
+    else:
+        etag, body = entry.etag, entry.body
+    resp = current_app.response_class(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.last_modified = datetime.fromtimestamp(int(entry.last_modified), tz=timezone.utc)
+    # 允许浏览器/代理缓存，但每次使用前需携带验证器回源确认（命中返回 304）
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
 
 @api_macro_bp.route('/country')
@@ -49,8 +64,13 @@ def snapshot():
 def country():
     economy = request.args.get('economy', 'US')
     window = request.args.get('window', '3y')
+    points, method = parse_sampling_args(request.args.get('points'), request.args.get('downsample'))
+    fmt = parse_series_format(request.args.get('format'))
     svc = MacroService(current_app.db_service)
-    return jsonify(svc.get_country(economy=economy, window=window))
+    data = svc.get_country(economy=economy, window=window, points=points, downsample=method, fmt=fmt)
+    if fmt == 'arrow':
+        return Response(columns_to_arrow_ipc(stack_columns(data['series'], 'indicator')), mimetype=ARROW_MIMETYPE)
+    return jsonify(data)
 
 
 @api_macro_bp.route('/score')
@@ -5,6 +5,7 @@ from __future__ import annotations
 
 from flask import Blueprint, jsonify, request
 from services.meso_service import MesoService
+from utils.exceptions import ConflictError
 
 
 api_meso_bp = Blueprint('api_meso', __name__)
@@ -83,3 +84,23 @@ def meso_rankings_equity_category():
     return jsonify(res)
 
 
+
+
+@api_meso_bp.route('/api/meso/rankings/history', methods=['GET'])
+def meso_rankings_history():
+    """分组名次历史（读取排名快照）：scope=asset_class|equity_market|equity_category, group, market, return_mode, start；快照过期返回 409"""
+    svc = MesoService()
+    try:
+        res = svc.get_ranking_history(
+            scope=request.args.get('scope', ''),
+            group=request.args.get('group', ''),
+            return_mode=request.args.get('return_mode', 'price'),
+            market=request.args.get('market'),
+            start=request.args.get('start'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ConflictError as e:
+        # 快照过期：不在请求内重建，客户端可改用当日排名接口或稍后重试
+        return jsonify({"error": str(e), "code": e.code}), 409
+    return jsonify(res)
@@ -4,13 +4,16 @@
 API路由
 """
 
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from typing import Any, cast
 
 from services import StrategyService, AnalysisService
-from services.meso_service import MesoService
+from services.meso_service import MAX_COMPARE_SYMBOLS, MesoService
 from services.trading_service import TradingService
 from utils.decorators import handle_errors
+from utils.timeseries import (
+    ARROW_MIMETYPE, columns_to_arrow_ipc, parse_sampling_args, parse_series_format, stack_columns,
+)
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -373,6 +376,72 @@ def get_strategy_trend():
         }), 500
 
 
+# ---- 数据导出：交易与交易明细（流式 CSV / Parquet） ----
+
+def _split_multi_arg(name: str) -> list:
+    """解析逗号/空格分隔的多值参数（与交易列表页口径一致）。"""
+    raw = request.args.get(name, '').strip()
+    if not raw:
+        return []
+    tmp = [p for chunk in raw.replace('，', ',').split(',') for p in chunk.split()]
+    return list({s.strip().upper() for s in tmp if s.strip()})
+
+
+def _export_filters() -> dict:
+    status = request.args.get('status', 'all')
+    strategy_arg = request.args.get('strategy', 'all')
+    strategy: Any = None
+    if strategy_arg and strategy_arg != 'all':
+        try:
+            strategy = int(strategy_arg)
+        except ValueError:
+            strategy = strategy_arg
+    include_deleted = str(request.args.get('include_deleted', '')).lower() in ('1', 'true', 'yes', 'on')
+    return {
+        'status': None if not status or status == 'all' else status,
+        'strategy': strategy,
+        'include_deleted': include_deleted,
+        'symbols': _split_multi_arg('symbols'),
+        'symbol_names': _split_multi_arg('names'),
+        'date_from': request.args.get('date_from', '').strip() or None,
+        'date_to': request.args.get('date_to', '').strip() or None,
+    }
+
+
+def _export_response(chunks, fmt: str, basename: str) -> Response:
+    from services.export_service import EXPORT_MIMETYPES
+    ext = 'parquet' if fmt == 'parquet' else 'csv'
+    headers = {
+        'Content-Disposition': f'attachment; filename={basename}.{ext}',
+        'Cache-Control': 'no-store',
+    }
+    return Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+
+
+@api_bp.route('/export/trades')
+@handle_errors
+def export_trades():
+    """流式导出交易（format=csv|parquet），筛选参数与交易列表页一致，按交易ID升序输出。"""
+    from services.export_service import ExportService
+    app = cast(Any, current_app)
+    svc = ExportService(app.db_service)
+    fmt = svc.normalize_format(request.args.get('format', 'csv'))
+    chunks = svc.stream_trades(fmt=fmt, **_export_filters())
+    return _export_response(chunks, fmt, 'trades')
+
+
+@api_bp.route('/export/trade_details')
+@handle_errors
+def export_trade_details():
+    """流式导出交易明细（format=csv|parquet），按交易筛选条件过滤。"""
+    from services.export_service import ExportService
+    app = cast(Any, current_app)
+    svc = ExportService(app.db_service)
+    fmt = svc.normalize_format(request.args.get('format', 'csv'))
+    chunks = svc.stream_trade_details(fmt=fmt, **_export_filters())
+    return _export_response(chunks, fmt, 'trade_details')
+
+
 # ---- 中观观察：全球股指趋势 API ----
 
 @api_bp.route('/meso/indexes')
@@ -388,8 +457,17 @@ def get_meso_trend_series():
     symbol = request.args.get('symbol', '^GSPC')
     window = request.args.get('window', '3y')
     currency = request.args.get('currency', 'USD')
+    points, method = parse_sampling_args(request.args.get('points'), request.args.get('downsample'))
+    fmt = parse_series_format(request.args.get('format'))
     svc = MesoService()
-    return jsonify({'success': True, 'data': svc.get_trend_series(symbol, window, currency)})
+    data = svc.get_trend_series(symbol, window, currency, points=points, downsample=method, fmt=fmt)
+    if fmt == 'arrow':
+        # 二进制输出一次只含一条序列：series=prices（默认）/scores
+        which = request.args.get('series', 'prices')
+        if which not in ('prices', 'scores'):
+            return jsonify({'success': False, 'message': 'series must be prices or scores'}), 400
+        return Response(columns_to_arrow_ipc(data[which]), mimetype=ARROW_MIMETYPE)
+    return jsonify({'success': True, 'data': data})
 
 
 @api_bp.route('/meso/compare_series')
@@ -397,12 +475,17 @@ def get_meso_trend_series():
 def get_meso_compare_series():
     symbols_raw = request.args.get('symbols', '^GSPC,^NDX')
     symbols = [s.strip() for s in symbols_raw.split(',') if s.strip()]
-    if len(symbols) == 0 or len(symbols) > 10:
-        return jsonify({'success': False, 'message': 'symbols must be 1..10'}), 400
+    if len(symbols) == 0 or len(symbols) > MAX_COMPARE_SYMBOLS:
+        return jsonify({'success': False, 'message': f'symbols must be 1..{MAX_COMPARE_SYMBOLS}'}), 400
     window = request.args.get('window', '3y')
     currency = request.args.get('currency', 'USD')
+    points, method = parse_sampling_args(request.args.get('points'), request.args.get('downsample'))
+    fmt = parse_series_format(request.args.get('format'))
     svc = MesoService()
-    return jsonify({'success': True, 'data': svc.get_compare_series(symbols, window, currency)})
+    data = svc.get_compare_series(symbols, window, currency, points=points, downsample=method, fmt=fmt)
+    if fmt == 'arrow':
+        return Response(columns_to_arrow_ipc(stack_columns(data['series'], 'symbol')), mimetype=ARROW_MIMETYPE)
+    return jsonify({'success': True, 'data': data})
 
 
 @api_bp.route('/meso/refresh', methods=['POST'])
@@ -434,12 +517,9 @@ def meso_delete_symbol():
         return jsonify({'success': False, 'message': 'symbol is required'}), 400
     remove_meta = request.args.get('remove_meta') or (request.json.get('remove_meta') if request.is_json else None)
     remove_meta = str(remove_meta).lower() in ('1','true','yes','on')
-    repo = MesoService().repo
-    result = repo.delete_symbol_data(symbol)
-    meta_deleted = 0
-    if remove_meta:
-        meta_deleted = repo.delete_index_metadata(symbol)
-    return jsonify({'success': True, 'message': f"deleted total: {result.get('total',0)}", 'detail': result, 'metadata_deleted': meta_deleted})
+    res = MesoService().delete_symbol_data(symbol, remove_meta=remove_meta)
+    result = res['detail']
+    return jsonify({'success': True, 'message': f"deleted total: {result.get('total',0)}", 'detail': result, 'metadata_deleted': res['metadata_deleted']})
 
 
 # ---- 资产大类横向排名（强制 USD / 共同开市日 / 统一价格指标） ----
@@ -509,7 +509,7 @@ def permanently_delete_trade(trade_id):
 @trading_bp.route('/batch_delete_trades', methods=['POST'])
 @handle_errors
 def batch_delete_trades():
-    """批量软删除交易"""
+    """批量软删除交易（单事务）"""
     trading_service = TradingService(current_app.db_service)
 
     trade_ids = request.form.getlist('trade_ids[]')
@@ -522,33 +522,19 @@ def batch_delete_trades():
     if not confirmation_code:
         return jsonify({'success': False, 'message': '请提供确认码'}), 400
 
-    success_count = 0
-    for tid in trade_ids:
-        try:
-            trade_id = int(tid)
-        except Exception:
-            continue
-        ok = trading_service.soft_delete_trade(
-            trade_id=trade_id,
-            confirmation_code=confirmation_code,
-            delete_reason=delete_reason,
-            operator_note=operator_note,
-        )
-        if ok:
-            success_count += 1
-
-    if success_count == len(trade_ids):
-        return jsonify({'success': True, 'message': f'成功删除 {success_count} 笔交易'})
-    elif success_count == 0:
-        return jsonify({'success': False, 'message': '删除失败，请重试'}), 500
-    else:
-        return jsonify({'success': True, 'message': f'部分成功：已删除 {success_count}/{len(trade_ids)} 笔交易'})
+    outcomes = trading_service.batch_soft_delete_trades(
+        _parse_trade_ids(trade_ids),
+        confirmation_code=confirmation_code,
+        delete_reason=delete_reason,
+        operator_note=operator_note,
+    )
+    return _batch_response(outcomes, len(dict.fromkeys(trade_ids)), '删除')
 
 
 @trading_bp.route('/batch_restore_trades', methods=['POST'])
 @handle_errors
 def batch_restore_trades():
-    """批量恢复交易"""
+    """批量恢复交易（单事务）"""
     trading_service = TradingService(current_app.db_service)
 
     trade_ids = request.form.getlist('trade_ids[]')
@@ -560,32 +546,18 @@ def batch_restore_trades():
     if not confirmation_code:
         return jsonify({'success': False, 'message': '请提供确认码'}), 400
 
-    success_count = 0
-    for tid in trade_ids:
-        try:
-            trade_id = int(tid)
-        except Exception:
-            continue
-        ok = trading_service.restore_trade(
-            trade_id=trade_id,
-            confirmation_code=confirmation_code,
-            operator_note=operator_note,
-        )
-        if ok:
-            success_count += 1
-
-    if success_count == len(trade_ids):
-        return jsonify({'success': True, 'message': f'成功恢复 {success_count} 笔交易'})
-    elif success_count == 0:
-        return jsonify({'success': False, 'message': '恢复失败，请重试'}), 500
-    else:
-        return jsonify({'success': True, 'message': f'部分成功：已恢复 {success_count}/{len(trade_ids)} 笔交易'})
+    outcomes = trading_service.batch_restore_trades(
+        _parse_trade_ids(trade_ids),
+        confirmation_code=confirmation_code,
+        operator_note=operator_note,
+    )
+    return _batch_response(outcomes, len(dict.fromkeys(trade_ids)), '恢复')
 
 
 @trading_bp.route('/batch_permanently_delete_trades', methods=['POST'])
 @handle_errors
 def batch_permanently_delete_trades():
-    """批量永久删除交易"""
+    """批量永久删除交易（单事务）"""
     trading_service = TradingService(current_app.db_service)
 
     trade_ids = request.form.getlist('trade_ids[]')
@@ -599,25 +571,34 @@ def batch_permanently_delete_trades():
     if not confirmation_code or not confirmation_text:
         return jsonify({'success': False, 'message': '请提供确认码和确认文本'}), 400
 
-    success_count = 0
-    for tid in trade_ids:
+    outcomes = trading_service.batch_permanently_delete_trades(
+        _parse_trade_ids(trade_ids),
+        confirmation_code=confirmation_code,
+        confirmation_text=confirmation_text,
+        delete_reason=delete_reason,
+        operator_note=operator_note,
+    )
+    return _batch_response(outcomes, len(dict.fromkeys(trade_ids)), '彻底删除')
+
+
+def _parse_trade_ids(raw_ids) -> list:
+    """解析表单中的交易ID，忽略无法转换为整数的值（计入失败数）。"""
+    ids = []
+    for tid in raw_ids:
         try:
-            trade_id = int(tid)
+            ids.append(int(tid))
         except Exception:
             continue
-        ok = trading_service.permanently_delete_trade(
-            trade_id=trade_id,
-            confirmation_code=confirmation_code,
-            confirmation_text=confirmation_text,
-            delete_reason=delete_reason,
-            operator_note=operator_note,
-        )
-        if ok:
-            success_count += 1
+    return ids
+
 
-    if success_count == len(trade_ids):
-        return jsonify({'success': True, 'message': f'成功彻底删除 {success_count} 笔交易'})
+def _batch_response(outcomes: dict, requested: int, action: str):
+    """根据逐ID结果生成统一的批量操作响应（文案与逐条处理时一致）。"""
+    success_count = sum(1 for v in outcomes.values() if v == 'ok')
+    results = {str(k): v for k, v in outcomes.items()}
+    if success_count == requested:
+        return jsonify({'success': True, 'message': f'成功{action} {success_count} 笔交易', 'results': results})
     elif success_count == 0:
-        return jsonify({'success': False, 'message': '彻底删除失败，请重试'}), 500
+        return jsonify({'success': False, 'message': f'{action}失败，请重试', 'results': results}), 500
     else:
-        return jsonify({'success': True, 'message': f'部分成功：已彻底删除 {success_count}/{len(trade_ids)} 笔交易'})
+        return jsonify({'success': True, 'message': f'部分成功：已{action} {success_count}/{requested} 笔交易', 'results': results})
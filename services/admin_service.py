@@ -280,6 +280,11 @@ class DatabaseMaintenanceService:
                 row = self.db.execute_query("SELECT trade_id FROM trade_details WHERE id = ?", (pk_id,), fetch_one=True)
                 if row:
                     self.trading_service.update_trade_record(int(row['trade_id']), [])
+            else:
+                # 交易字段（策略/代码/开仓日期）冗余在日收益表中
+                with self.db.get_connection() as conn:
+                    self.trading_service.daily_returns.rebuild_trades(conn.cursor(), [pk_id])
+                    conn.commit()
             return True, '更新成功'
         except Exception as e:
             return False, f'更新失败: {e}'
@@ -10,9 +10,30 @@ from decimal import Decimal
 
 from .database_service import DatabaseService
 from .strategy_service import StrategyService
+from .daily_returns import DailyReturnStore
 from utils.helpers import get_period_date_range
 from .mappers import dict_to_trade_dto, TradeDTO, ScoreDTO, to_dict_dataclass
 
+_ZERO_METRICS: Tuple[float, float, float, float, float] = (0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+def _daily_return_series(points: Dict[str, List[float]]):
+    """将 {date: [Σwret, Σweight]} 展开为自然日日收益数组（首个到最后一个卖出日，空天为 0）。
+
+    同一日期字符串内按卖出份额加权；同一自然日的不同日期字符串（带时间）收益相加。
+    """
+    import numpy as np
+
+    points = {d: agg for d, agg in points.items() if agg[1] > 0}
+    if not points:
+        return None
+    days = np.fromiter((date.fromisoformat(d[:10]).toordinal() for d in points), dtype=np.int64, count=len(points))
+    rets = np.fromiter((agg[0] / agg[1] for agg in points.values()), dtype=np.float64, count=len(points))
+    first = int(days.min())
+    daily = np.zeros(int(days.max()) - first + 1, dtype=np.float64)
+    np.add.at(daily, days - first, rets)
+    return daily
+
 
 class AnalysisService:
     """分析服务"""
@@ -20,11 +41,16 @@ class AnalysisService:
     def __init__(self, db_service: Optional[DatabaseService] = None):
         self.db = db_service or DatabaseService(create_trading_schema=True)
         self.strategy_service = StrategyService(self.db)
+        self.daily_returns = DailyReturnStore(self.db)
 
     def calculate_strategy_score(self, strategy_id: Optional[int] = None, strategy: Optional[str] = None,
                                symbol_code: Optional[str] = None, start_date: Optional[str] = None,
-                               end_date: Optional[str] = None, return_dto: bool = False) -> Dict[str, Any] | ScoreDTO:
-        """计算策略评分"""
+                               end_date: Optional[str] = None, return_dto: bool = False,
+                               advanced_metrics: Optional[Tuple[float, float, float, float, float]] = None) -> Dict[str, Any] | ScoreDTO:
+        """计算策略评分
+
+        advanced_metrics：批量评分时预先计算好的高级指标（见 _batch_advanced_metrics），提供时不再单独计算。
+        """
         query = '''
             SELECT t.*, s.name as strategy_name
             FROM trades t
@@ -63,10 +89,12 @@ class AnalysisService:
         trades = self.db.execute_query(query, tuple(params))
         result = self._calculate_performance_metrics(trades)
 
-        # 附加高级风险/收益指标（使用专业库计算）
+        # 附加高级风险/收益指标（NumPy 指标内核计算）
         try:
-            trade_ids = [int(t['id']) for t in trades]
-            ann_vol, ann_ret, mdd, sharpe, calmar = self._compute_advanced_metrics(trade_ids, start_date, end_date)
+            if advanced_metrics is None:
+                trade_ids = [int(t['id']) for t in trades]
+                advanced_metrics = self._compute_advanced_metrics(trade_ids, start_date, end_date)
+            ann_vol, ann_ret, mdd, sharpe, calmar = advanced_metrics
             result['stats']['annual_volatility'] = float(ann_vol)
             result['stats']['annual_return'] = float(ann_ret)
             result['stats']['max_drawdown'] = float(mdd)
@@ -179,9 +207,11 @@ class AnalysisService:
         """获取所有策略的评分"""
         strategies = self.strategy_service.get_all_strategies()
         scores: List[Dict[str, Any]] = []
+        advanced = self._batch_advanced_metrics('strategy_id')
 
         for strategy in strategies:
-            score = self.calculate_strategy_score(strategy_id=strategy['id'])
+            score = self.calculate_strategy_score(strategy_id=strategy['id'],
+                                                  advanced_metrics=self._group_metrics(advanced, strategy['id']))
             if isinstance(score, dict):
                 score['strategy_id'] = strategy['id']
                 score['strategy_name'] = strategy['name']
@@ -217,13 +247,15 @@ class AnalysisService:
         query += " ORDER BY symbol_code"
 
         symbols = self.db.execute_query(query, tuple(params))
+        advanced = self._batch_advanced_metrics('symbol_code', strategy_id=params[0] if params else None)
 
         scores: List[Dict[str, Any]] = []
         for symbol in symbols:
             score = self.calculate_strategy_score(
                 strategy_id=strategy_id,
                 strategy=strategy,
-                symbol_code=symbol['symbol_code']
+                symbol_code=symbol['symbol_code'],
+                advanced_metrics=self._group_metrics(advanced, symbol['symbol_code'])
             )
             if isinstance(score, dict):
                 score['symbol_code'] = symbol['symbol_code']
@@ -258,11 +290,13 @@ class AnalysisService:
         """按股票获取策略评分"""
         strategies = self.strategy_service.get_all_strategies()
         scores: List[Dict[str, Any]] = []
+        advanced = self._batch_advanced_metrics('strategy_id', symbol_code=symbol_code)
 
         for strategy in strategies:
             score = self.calculate_strategy_score(
                 strategy_id=strategy['id'],
-                symbol_code=symbol_code
+                symbol_code=symbol_code,
+                advanced_metrics=self._group_metrics(advanced, strategy['id'])
             )
 
             # 只有该策略有该股票的交易时才添加
@@ -321,12 +355,14 @@ class AnalysisService:
 
         strategies = self.strategy_service.get_all_strategies()
         scores: List[Dict[str, Any]] = []
+        advanced = self._batch_advanced_metrics('strategy_id', start_date=start_date, end_date=end_date)
 
         for strategy in strategies:
             score = self.calculate_strategy_score(
                 strategy_id=strategy['id'],
                 start_date=start_date,
-                end_date=end_date
+                end_date=end_date,
+                advanced_metrics=self._group_metrics(advanced, strategy['id'])
             )
 
             # 只有该策略在该时期有交易时才添加
@@ -518,8 +554,8 @@ class AnalysisService:
         }
 
     # -------------------------------------------
-    # 高级指标（年化波动率、年化收益率、最大回撤）
-    # 使用 numpy/pandas/empyrical 计算
+    # 高级指标（年化波动率、年化收益率、最大回撤、夏普、卡玛）
+    # 读取持久化日收益（strategy_daily_returns），使用 NumPy 指标内核批量计算
     # -------------------------------------------
     def _compute_advanced_metrics(
         self,
@@ -531,111 +567,66 @@ class AnalysisService:
 
         说明：
         - 日收益构造：以每个卖出明细相对于该交易加权买入均价的不含费毛收益率为当日收益，
-          按卖出份额加权聚合到交易日。
-        - 指标计算：严格委托于 empyrical 库，不自行编码公式。
+          按卖出份额加权聚合到交易日；首末卖出日之间的自然日逐日展开，无卖出的日期收益为 0。
+        - 逐笔加权收益已持久化在 strategy_daily_returns（见 DailyReturnStore），此处只做读取与汇总。
+        - 指标计算：委托 risk_metrics 内核，口径与 empyrical 一致。
         """
         if not trade_ids:
-            return 0.0, 0.0, 0.0, 0.0, 0.0
+            return _ZERO_METRICS
+        points = self.daily_returns.points_for_trades(trade_ids, start_date, end_date)
+        return self._metrics_from_points({0: points}).get(0, _ZERO_METRICS)
 
+    def _batch_advanced_metrics(self, group_column: str, strategy_id: Optional[int] = None,
+                                symbol_code: Optional[str] = None, start_date: Optional[str] = None,
+                                end_date: Optional[str] = None) -> Optional[Dict[Any, Tuple[float, float, float, float, float]]]:
+        """按分组列（strategy_id / symbol_code）一次性计算各组高级指标。
+
+        交易筛选口径与 calculate_strategy_score 相同（开仓日期与卖出日期均限定在区间内）；
+        结果中缺失的组没有卖出收益，指标为 0。出错时返回 None，由调用方逐组回退计算。
+        """
+        if group_column not in ('strategy_id', 'symbol_code'):
+            raise ValueError(f"不支持的分组列: {group_column}")
         try:
-            import numpy as np  # noqa: F401
-            import pandas as pd
-            try:
-                import empyrical as ep
-            except Exception:
-                import empyrical_reloaded as ep
+            grouped = self.daily_returns.points_by_group(
+                group_column, strategy_id=strategy_id, symbol_code=symbol_code,
+                open_from=start_date, open_to=end_date, date_from=start_date, date_to=end_date,
+            )
+            return self._metrics_from_points(grouped)
         except Exception:
-            return 0.0, 0.0, 0.0, 0.0, 0.0
-
-        # 读取每个 trade 的买入聚合（用于计算加权买入均价）
-        in_clause = ','.join(['?'] * len(trade_ids))
-        buys_sql = f"""
-            SELECT trade_id,
-                   SUM(CASE WHEN transaction_type='buy' THEN price*quantity END) AS gross_buy,
-                   SUM(CASE WHEN transaction_type='buy' THEN quantity END) AS buy_qty
-            FROM trade_details
-            WHERE trade_id IN ({in_clause}) AND is_deleted = 0
-            GROUP BY trade_id
-        """
-        buy_rows = self.db.execute_query(buys_sql, tuple(trade_ids))
-        trade_to_avg_buy: Dict[int, float] = {}
-        for r in buy_rows:
-            try:
-                gid = int(r['trade_id'])
-                gross_buy = float(r['gross_buy'] or 0.0)
-                buy_qty = float(r['buy_qty'] or 0.0)
-                trade_to_avg_buy[gid] = (gross_buy / buy_qty) if buy_qty > 0 else 0.0
-            except Exception:
-                continue
-
-        # 卖出明细（限定日期范围）
-        where_dates = []
-        params: List[Any] = list(trade_ids)
-        if start_date:
-            where_dates.append("transaction_date >= ?")
-            params.append(start_date)
-        if end_date:
-            where_dates.append("transaction_date <= ?")
-            params.append(end_date)
-        where_clause = (" AND " + " AND ".join(where_dates)) if where_dates else ""
-
-        sells_sql = f"""
-            SELECT trade_id, transaction_date, price, quantity
-            FROM trade_details
-            WHERE trade_id IN ({in_clause})
-              AND transaction_type='sell' AND is_deleted = 0
-              {where_clause}
-            ORDER BY transaction_date
-        """
-        sell_rows = self.db.execute_query(sells_sql, tuple(params))
-        if not sell_rows:
-            return 0.0, 0.0, 0.0, 0.0, 0.0
-
-        # 聚合到日期：按卖出份额对每笔 (price - avg_buy)/avg_buy 加权
-        by_date: Dict[str, Dict[str, float]] = {}
-        for r in sell_rows:
-            tid = int(r['trade_id'])
-            dt = str(r['transaction_date'])
-            price = float(r['price'])
-            qty = float(r['quantity'])
-            avg_buy = float(trade_to_avg_buy.get(tid, 0.0))
-            if avg_buy <= 0 or qty <= 0:
-                continue
-            ret = (price - avg_buy) / avg_buy
-            bucket = by_date.setdefault(dt, {'wret': 0.0, 'w': 0.0})
-            bucket['wret'] += ret * qty
-            bucket['w'] += qty
-
-        if not by_date:
-            return 0.0, 0.0, 0.0, 0.0, 0.0
-
-        # 构造 pandas Series（日频，缺失天填充 0）
-        data = []
-        for d, agg in by_date.items():
-            w = agg['w'] or 1.0
-            data.append((pd.to_datetime(d), agg['wret'] / w))
-        df = pd.DataFrame(data, columns=['date', 'ret']).sort_values('date')
-        df = df.set_index('date')
-        # 日频重采样，空天补 0 收益（无交易日视作0）
-        full = df.resample('D').sum().fillna(0.0)
-        ret_series = full['ret']
+            return None
 
+    @staticmethod
+    def _group_metrics(advanced: Optional[Dict[Any, Tuple[float, float, float, float, float]]],
+                       key: Any) -> Optional[Tuple[float, float, float, float, float]]:
+        if advanced is None:
+            return None
+        return advanced.get(key, _ZERO_METRICS)
+
+    def _metrics_from_points(
+        self,
+        grouped: Dict[Any, Dict[str, List[float]]]
+    ) -> Dict[Any, Tuple[float, float, float, float, float]]:
+        """将各组日收益对齐为二维数组（组 × 天）后由指标内核一次算出；无收益的组为 0。"""
+        results: Dict[Any, Tuple[float, float, float, float, float]] = {key: _ZERO_METRICS for key in grouped}
         try:
-            ann_vol = float(ep.annual_volatility(ret_series))
-            ann_ret = float(ep.annual_return(ret_series))
-            mdd = float(ep.max_drawdown(ret_series))
-            try:
-                # 兼容 empyrical 与 empyrical_reloaded 两种包的 API
-                sharpe = float(getattr(ep, 'sharpe_ratio', ep.stats.sharpe_ratio)(ret_series))
-            except Exception:
-                sharpe = 0.0
-            try:
-                calmar = float(getattr(ep, 'calmar_ratio', ep.stats.calmar_ratio)(ret_series))
-            except Exception:
-                calmar = 0.0
-            return ann_vol, ann_ret, mdd, sharpe, calmar
+            from . import risk_metrics
         except Exception:
-            return 0.0, 0.0, 0.0, 0.0, 0.0
+            return results
+
+        keys: List[Any] = []
+        series: List[Any] = []
+        for key, points in grouped.items():
+            daily = _daily_return_series(points)
+            if daily is not None:
+                keys.append(key)
+                series.append(daily)
+        if not keys:
+            return results
+
+        metrics = risk_metrics.compute_risk_metrics(risk_metrics.stack_series(series))
+        for i, key in enumerate(keys):
+            results[key] = tuple(float(metrics[name][i]) for name in risk_metrics.METRIC_NAMES)  # type: ignore[assignment]
+        return results
 
     def _get_strategy_by_name(self, strategy_name: str) -> Optional[Dict[str, Any]]:
         """根据名称获取策略"""
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑时序存储：整数日序号、字典编码与旧表迁移
+
+说明：
+- 日期以整数日序号（自 1970-01-01 起的天数）存储，范围扫描为整数比较；对外仍为 YYYY-MM-DD 字符串。
+- 时序物理表使用 (字典 id, 日序号) 复合主键的 WITHOUT ROWID 表：行按主键聚簇存放，不再有
+  rowid + UNIQUE 二级索引的双份存储。
+- 旧表（同名 TABLE）迁移后改为同名兼容视图，供临时查询与外部只读工具使用；读写统一走仓储层。
+"""
+
+from __future__ import annotations
+
+from datetime import date as _date
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Sequence
+
+_EPOCH_ORDINAL = _date(1970, 1, 1).toordinal()
+# 1970-01-01 的儒略日（SQLite julianday 返回值），用于 SQL 内的日序号与日期互转
+JULIAN_EPOCH = 2440587.5
+# 未指定起点时的最小日序号（早于任何真实日期）
+MIN_DAY = -(2 ** 31)
+
+
+def to_day(value: Any) -> int:
+    """YYYY-MM-DD（或以其开头的字符串/date 对象）→ 日序号。"""
+    if isinstance(value, _date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    return _date.fromisoformat(str(value)[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def to_day_or_min(value: Optional[Any]) -> int:
+    """起始日期转日序号；空值返回 MIN_DAY（不截取）。"""
+    return to_day(value) if value else MIN_DAY
+
+
+@lru_cache(maxsize=65536)
+def from_day(day: int) -> str:
+    """日序号 → YYYY-MM-DD（同一交易日在多个标的间重复出现，使用缓存）。"""
+    return _date.fromordinal(int(day) + _EPOCH_ORDINAL).isoformat()
+
+
+def sql_day(column: str) -> str:
+    """SQL 表达式：文本日期列 → 日序号。"""
+    return f"CAST(julianday({column}) - {JULIAN_EPOCH} AS INTEGER)"
+
+
+def sql_date(column: str) -> str:
+    """SQL 表达式：日序号列 → YYYY-MM-DD。"""
+    return f"date({column} + {JULIAN_EPOCH})"
+
+
+def decode_rows(rows: Iterable[Sequence[Any]], day_index: int = 0) -> list[tuple]:
+    """将行中的日序号列还原为日期字符串（其余列原样）。"""
+    out = []
+    for r in rows:
+        t = tuple(r)
+        out.append(t[:day_index] + (from_day(t[day_index]),) + t[day_index + 1:])
+    return out
+
+
+def object_kind(cur, name: str) -> Optional[str]:
+    """返回 sqlite_master 中同名对象的类型（table/view），不存在时返回 None。"""
+    cur.execute("SELECT type FROM sqlite_master WHERE name=? AND type IN ('table', 'view')", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def migrate_to_view(cur, name: str, physical_ddl: str, copy_sqls: Sequence[str], view_sql: str) -> bool:
+    """创建物理表；若 name 仍为旧表，则按 copy_sqls 搬迁数据并删除旧表；最后建立同名兼容视图。
+
+    返回是否执行了数据搬迁。调用方负责提交事务。
+    """
+    kind = object_kind(cur, name)
+    cur.execute(physical_ddl)
+    migrated = False
+    if kind == "table":
+        for sql in copy_sqls:
+            cur.execute(sql)
+        cur.execute(f"DROP TABLE {name}")
+        migrated = True
+    if kind != "view":
+        cur.execute(view_sql)
+    return migrated
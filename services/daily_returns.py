@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日收益存储：持久化每笔交易按卖出日期聚合的加权收益，供高级指标直接读取。
+
+说明：
+- strategy_daily_returns 以 (trade_id, date) 为主键，冗余 strategy_id/symbol_code/open_date，
+  分析侧按策略/代码 + 日期区间走索引范围扫描，无需再关联买入与卖出明细。
+- wret = Σ (卖出价 − 加权买入均价) / 加权买入均价 × 卖出数量，weight = Σ 卖出数量；
+  加权买入均价取该交易全部未删除买入明细（与历史口径一致），因此买入变化会改变该交易的全部行。
+- 维护方式（调用方事务内）：
+  - 卖出：仅重算并 upsert 该交易当日一行
+  - 买入（已有交易）、明细编辑、交易字段编辑、恢复：按单条 INSERT...SELECT 重建该交易的行
+  - 软删除/永久删除：删除该交易的行
+- 表只包含未删除交易的行；表首次创建时全量回填，亦可通过 `flask rebuild-daily-returns` 重建。
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# 单条 IN (...) 语句的最大 ID 数（低于 SQLite 变量上限）
+_CHUNK_SIZE = 500
+
+GROUP_COLUMNS = ('strategy_id', 'symbol_code')
+
+# 以交易为单位，从明细聚合出每个卖出日期的加权收益；{trade_filter} 为对 trade_id 的额外筛选
+_SELECT_DAILY_RETURNS = """
+    SELECT d.trade_id, d.transaction_date, t.strategy_id, t.symbol_code, t.open_date,
+           SUM((d.price - b.avg_buy) / b.avg_buy * d.quantity), SUM(d.quantity)
+    FROM trade_details d
+    JOIN trades t ON t.id = d.trade_id AND t.is_deleted = 0
+    JOIN (
+        SELECT trade_id, SUM(price * quantity) * 1.0 / SUM(quantity) AS avg_buy
+        FROM trade_details
+        WHERE transaction_type = 'buy' AND is_deleted = 0 {buy_filter}
+        GROUP BY trade_id
+    ) b ON b.trade_id = d.trade_id
+    WHERE d.transaction_type = 'sell' AND d.is_deleted = 0 AND d.quantity > 0 AND b.avg_buy > 0
+      {sell_filter}
+    GROUP BY d.trade_id, d.transaction_date
+"""
+
+_INSERT_COLUMNS = "INSERT INTO strategy_daily_returns (trade_id, date, strategy_id, symbol_code, open_date, wret, weight) "
+
+
+class DailyReturnStore:
+    def __init__(self, db):
+        self.db = db
+
+    # --------------------- 增量维护（调用方事务内） ---------------------
+    def record_sell(self, cursor, trade_id: int, transaction_date: str) -> None:
+        """卖出后重算该交易在卖出日期的一行（upsert）。"""
+        cursor.execute(
+            _INSERT_COLUMNS
+            + _SELECT_DAILY_RETURNS.format(
+                buy_filter="AND trade_id = ?",
+                sell_filter="AND d.trade_id = ? AND d.transaction_date = ?",
+            )
+            + " ON CONFLICT(trade_id, date) DO UPDATE SET "
+              "strategy_id = excluded.strategy_id, symbol_code = excluded.symbol_code, "
+              "open_date = excluded.open_date, wret = excluded.wret, weight = excluded.weight",
+            (int(trade_id), int(trade_id), transaction_date),
+        )
+
+    def rebuild_trades(self, cursor, trade_ids: Sequence[int]) -> None:
+        """按明细重建若干交易的全部行（买入均价或交易字段变化时使用）。"""
+        ids = [int(t) for t in trade_ids]
+        for i in range(0, len(ids), _CHUNK_SIZE):
+            chunk = ids[i:i + _CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            cursor.execute(f"DELETE FROM strategy_daily_returns WHERE trade_id IN ({placeholders})", tuple(chunk))
+            cursor.execute(
+                _INSERT_COLUMNS
+                + _SELECT_DAILY_RETURNS.format(
+                    buy_filter=f"AND trade_id IN ({placeholders})",
+                    sell_filter=f"AND d.trade_id IN ({placeholders})",
+                ),
+                tuple(chunk) * 2,
+            )
+
+    def drop(self, cursor, trade_ids: Sequence[int]) -> None:
+        """删除交易的全部行（软删除/永久删除）。"""
+        ids = [int(t) for t in trade_ids]
+        for i in range(0, len(ids), _CHUNK_SIZE):
+            chunk = ids[i:i + _CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            cursor.execute(f"DELETE FROM strategy_daily_returns WHERE trade_id IN ({placeholders})", tuple(chunk))
+
+    def rebuild_all(self, cursor=None) -> int:
+        """全量重建（回填/修复），返回写入的行数。未传入游标时自行开启连接并提交。"""
+        if cursor is None:
+            with self.db.get_connection() as conn:
+                count = self.rebuild_all(conn.cursor())
+                conn.commit()
+                return count
+        cursor.execute("DELETE FROM strategy_daily_returns")
+        cursor.execute(_INSERT_COLUMNS + _SELECT_DAILY_RETURNS.format(buy_filter="", sell_filter=""))
+        cursor.execute("SELECT COUNT(*) AS c FROM strategy_daily_returns")
+        row = cursor.fetchone()
+        return int(row['c'] if row else 0)
+
+    # --------------------- 读取 ---------------------
+    def points_for_trades(self, trade_ids: Sequence[int], date_from: Optional[str] = None,
+                          date_to: Optional[str] = None) -> Dict[str, List[float]]:
+        """返回一组交易按日期汇总的 {date: [Σwret, Σweight]}。"""
+        ids = sorted({int(t) for t in trade_ids})
+        points: Dict[str, List[float]] = {}
+        date_sql, date_params = _date_range_sql(date_from, date_to)
+        for i in range(0, len(ids), _CHUNK_SIZE):
+            chunk = ids[i:i + _CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            rows = self.db.execute_query(
+                f"SELECT date, SUM(wret) AS wret, SUM(weight) AS weight FROM strategy_daily_returns "
+                f"WHERE trade_id IN ({placeholders}){date_sql} GROUP BY date",
+                tuple(chunk) + date_params,
+            )
+            for r in rows or []:
+                bucket = points.setdefault(str(r['date']), [0.0, 0.0])
+                bucket[0] += float(r['wret'] or 0.0)
+                bucket[1] += float(r['weight'] or 0.0)
+        return points
+
+    def points_by_group(self, group_column: str, strategy_id: Optional[int] = None,
+                        symbol_code: Optional[str] = None, open_from: Optional[str] = None,
+                        open_to: Optional[str] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None) -> Dict[Any, Dict[str, List[float]]]:
+        """按策略或代码分组返回 {group: {date: [Σwret, Σweight]}}（单次索引范围扫描）。
+
+        open_from/open_to 按交易开仓日期筛选，date_from/date_to 按卖出日期筛选。
+        """
+        if group_column not in GROUP_COLUMNS:
+            raise ValueError(f"不支持的分组列: {group_column}")
+        conditions: List[str] = []
+        params: List[Any] = []
+        if strategy_id:
+            conditions.append("strategy_id = ?")
+            params.append(strategy_id)
+        if symbol_code:
+            conditions.append("symbol_code = ?")
+            params.append(symbol_code)
+        if open_from:
+            conditions.append("open_date >= ?")
+            params.append(open_from)
+        if open_to:
+            conditions.append("open_date <= ?")
+            params.append(open_to)
+        date_sql, date_params = _date_range_sql(date_from, date_to)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        if date_sql:
+            where = (where + date_sql) if where else " WHERE " + date_sql[len(" AND "):]
+        rows = self.db.execute_query(
+            f"SELECT {group_column} AS grp, date, SUM(wret) AS wret, SUM(weight) AS weight "
+            f"FROM strategy_daily_returns{where} GROUP BY {group_column}, date",
+            tuple(params) + date_params,
+        )
+        grouped: Dict[Any, Dict[str, List[float]]] = {}
+        for r in rows or []:
+            grouped.setdefault(r['grp'], {})[str(r['date'])] = [float(r['wret'] or 0.0), float(r['weight'] or 0.0)]
+        return grouped
+
+
+def _date_range_sql(date_from: Optional[str], date_to: Optional[str]):
+    sql = ""
+    params: tuple = ()
+    if date_from:
+        sql += " AND date >= ?"
+        params += (date_from,)
+    if date_to:
+        sql += " AND date <= ?"
+        params += (date_to,)
+    return sql, params
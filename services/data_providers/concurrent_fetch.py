@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发 HTTP JSON 抓取层
+
+说明：
+- 共享 requests.Session（keep-alive 连接池），由有界线程池并发请求，池大小与并发数一致。
+- 单次请求超时 timeout；整体截止时间 deadline 到达后不再重试、不再等待，未完成项计为失败。
+- 连接错误/超时/429/5xx 按指数退避重试；域名解析失败与其余 4xx 不重试。
+- 返回部分结果：成功项与失败原因分别给出，调用方可据此记录/上报。
+- 经 http_client 访问：配置了磁盘响应缓存时，TTL 内命中不发请求，过期后条件请求重新验证；replay 模式下未命中计为失败。
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, Hashable, Mapping, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .http_client import ProviderHTTPError, ProviderHttpClient, cache_from_config
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# 请求键类型：结果与错误按调用方传入的键回填
+K = TypeVar("K", bound=Hashable)
+
+
+@dataclass
+class FetchReport(Generic[K]):
+    """批量抓取结果：results 为 {key: 解析后的 JSON}，errors 为 {key: 失败原因}。"""
+    results: Dict[K, Any] = field(default_factory=dict)
+    errors: Dict[K, str] = field(default_factory=dict)
+    attempts: int = 0
+    elapsed: float = 0.0
+
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """创建带连接池的会话（连接复用，不在适配器层重试，重试由本模块控制）。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, ProviderHTTPError):
+        return exc.status_code in RETRY_STATUS
+    if isinstance(exc, requests.HTTPError):
+        return getattr(exc.response, "status_code", None) in RETRY_STATUS
+    if isinstance(exc, requests.Timeout):
+        return True
+    if isinstance(exc, requests.ConnectionError):
+        # 域名解析失败重试无益（离线环境下快速失败）
+        reason = getattr(exc.args[0], "reason", None) if exc.args else None
+        return "NameResolution" not in type(reason).__name__
+    return False
+
+
+def fetch_json_many(
+    urls: Mapping[K, str],
+    session: Optional[requests.Session] = None,
+    max_workers: int = 8,
+    timeout: float = 8.0,
+    retries: int = 2,
+    backoff: float = 0.5,
+    deadline: Optional[float] = None,
+) -> FetchReport[K]:
+    """并发抓取 {key: url} 并解析 JSON。
+
+    - timeout：单次请求（连接/读取）超时秒数，不超过剩余的整体时间
+    - retries/backoff：可重试错误的重试次数与退避基数（第 n 次重试前等待 backoff × 2^(n-1) 加抖动）
+    - deadline：整体耗时上限（秒），None 表示不限
+    """
+    report: FetchReport[K] = FetchReport()
+    if not urls:
+        return report
+    started = time.monotonic()
+    end_at = started + deadline if deadline is not None else None
+    workers = max(1, min(int(max_workers), len(urls)))
+    own_session = session is None
+    sess = session or make_session(workers)
+    client = ProviderHttpClient(sess, cache_from_config())
+    lock = threading.Lock()
+
+    def remaining() -> Optional[float]:
+        return None if end_at is None else end_at - time.monotonic()
+
+    def fetch_one(url: str) -> Any:
+        attempt = 0
+        while True:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise TimeoutError("deadline exceeded")
+            with lock:
+                report.attempts += 1
+            try:
+                resp = client.get(url, timeout=timeout if left is None else min(timeout, left))
+                resp.raise_for_status()
+                return resp.json()
+            except Exception as exc:
+                if attempt >= retries or not _is_retryable(exc):
+                    raise
+                attempt += 1
+                delay = backoff * (2 ** (attempt - 1))
+                delay += random.uniform(0, delay / 2) if delay > 0 else 0.0
+                left = remaining()
+                if left is not None and delay >= left:
+                    raise
+                if delay > 0:
+                    time.sleep(delay)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+    pending: set = set()
+    try:
+        futures = {pool.submit(fetch_one, url): key for key, url in urls.items()}
+        done, pending = wait(futures, timeout=remaining())
+        for fut in done:
+            key = futures[fut]
+            exc = fut.exception()
+            if exc is None:
+                report.results[key] = fut.result()
+            else:
+                report.errors[key] = f"{type(exc).__name__}: {exc}"
+        for fut in pending:
+            fut.cancel()
+            report.errors[futures[fut]] = "TimeoutError: deadline exceeded"
+    finally:
+        # 截止后不等待仍在进行的请求（其结果被丢弃）
+        pool.shutdown(wait=False, cancel_futures=True)
+        if own_session and not pending:
+            sess.close()
+    report.elapsed = time.monotonic() - started
+    return report
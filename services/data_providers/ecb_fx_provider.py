@@ -12,9 +12,30 @@ ECB 汇率 Provider (MVP)
 
 from __future__ import annotations
 
-import json
-import urllib.request
-from typing import List, Dict
+import threading
+import time
+from typing import Any, List, Dict
+
+from .http_client import get_json
+
+_LATEST_URL = "https://api.frankfurter.app/latest"
+# ECB 每个工作日仅发布一次：同一进程内短时间复用最新报价，宏观/中观的多个调用方共用一次请求
+# （经共享 HTTP 客户端访问，配置磁盘缓存后跨进程/跨次刷新同样复用）
+_LATEST_TTL_SECONDS = 300.0
+_LATEST_CACHE: Dict[str, Any] = {}
+_LATEST_LOCK = threading.Lock()
+
+
+def fetch_latest_eur_rates(timeout: float = 6.0) -> Dict[str, Any]:
+    """Frankfurter 最新 EUR 基准报价 {"date": ..., "rates": {CUR: EUR→CUR}}；失败时抛出异常（不缓存）。"""
+    with _LATEST_LOCK:
+        hit = _LATEST_CACHE.get("latest")
+        if hit is not None and time.monotonic() - hit[0] < _LATEST_TTL_SECONDS:
+            return hit[1]
+    data = get_json(_LATEST_URL, timeout=timeout)
+    with _LATEST_LOCK:
+        _LATEST_CACHE["latest"] = (time.monotonic(), data)
+    return data
 
 
 def fetch_fx_latest_frankfurter(pairs: List[str], timeout: float = 6.0) -> List[Dict]:
@@ -24,8 +45,7 @@ def fetch_fx_latest_frankfurter(pairs: List[str], timeout: float = 6.0) -> List[
     results: List[Dict] = []
     # frankfurter 基础：最新（EUR基准）
     try:
-        with urllib.request.urlopen("https://api.frankfurter.app/latest", timeout=timeout) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
+        data = fetch_latest_eur_rates(timeout=timeout)
     except Exception:
         return results
 
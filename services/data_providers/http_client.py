@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据源共享 HTTP 客户端：连接池会话 + 条件请求 + 磁盘响应缓存
+
+说明：
+- 会话：默认客户端持有一个 keep-alive 连接池会话（见 concurrent_fetch.make_session），各 Provider 共用。
+- 磁盘缓存（配置目录后启用）：每个 URL 一份响应体与元数据（ETag / Last-Modified / 抓取时间）；
+  TTL 内直接返回缓存，过期后携带 If-None-Match / If-Modified-Since 重新验证，304 时沿用缓存并刷新时间。
+  仅缓存 200 响应；写入为临时文件 + os.replace，多进程并发读写安全。
+- 模式：live（默认，按上述策略访问网络）| replay（只读缓存，未命中抛出 CacheMiss，不访问网络；用于离线基准与回放）。
+- 配置：Config.PROVIDER_HTTP_CACHE_DIR / PROVIDER_HTTP_CACHE_TTL / PROVIDER_HTTP_MODE（对应同名环境变量）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import requests
+
+MODES = ("live", "replay")
+
+
+class CacheMiss(LookupError):
+    """replay 模式下请求的 URL 不在缓存中。"""
+
+
+class ProviderHTTPError(requests.HTTPError):
+    """非 2xx 响应（requests.HTTPError 子类，按原方式捕获即可）；status_code 为响应状态码。"""
+
+    def __init__(self, url: str, status_code: int):
+        super().__init__(f"{status_code} Error for url: {url}")
+        self.url = url
+        self.status_code = status_code
+
+
+class HttpResponse:
+    """与 requests.Response 常用接口兼容的响应（status_code/content/text/json/raise_for_status）。"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: Optional[Dict[str, str]] = None,
+                 from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = dict(headers or {})
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.content.decode("utf-8"))
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise ProviderHTTPError(self.url, self.status_code)
+
+
+class HttpCache:
+    """按 URL 存储的磁盘响应缓存。"""
+
+    def __init__(self, directory: str, ttl: float = 3600.0, mode: str = "live"):
+        if mode not in MODES:
+            raise ValueError(f"mode 必须为 {MODES} 之一")
+        self.directory = directory
+        self.ttl = float(ttl)
+        self.mode = mode
+        self.stats = {"hits": 0, "revalidated": 0, "stored": 0, "misses": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        """返回 {meta..., body}；不存在或已损坏时返回 None。"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                meta["body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("url") == url else None
+
+    def store(self, url: str, body: bytes, headers: Dict[str, str]) -> None:
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "fetched_at": time.time(),
+        }
+        # 先写响应体再写元数据：元数据存在即表示响应体完整
+        self._write(body_path, body)
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        self._count("stored")
+
+    def touch(self, url: str, entry: Dict[str, Any]) -> None:
+        """304 重新验证成功：刷新抓取时间。"""
+        meta = {k: v for k, v in entry.items() if k != "body"}
+        meta["fetched_at"] = time.time()
+        self._write(self._paths(url)[0], json.dumps(meta).encode("utf-8"))
+        self._count("revalidated")
+
+    def is_fresh(self, entry: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        age = time.time() - float(entry.get("fetched_at") or 0)
+        return age < (self.ttl if ttl is None else float(ttl))
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+
+class ProviderHttpClient:
+    """会话 + 可选磁盘缓存；cache 为 None 时等同于直接使用会话。"""
+
+    def __init__(self, session=None, cache: Optional[HttpCache] = None):
+        self._session = session
+        self.cache = cache
+
+    @property
+    def session(self):
+        if self._session is None:
+            from .concurrent_fetch import make_session
+            self._session = make_session()
+        return self._session
+
+    def get(self, url: str, timeout: float = 10.0, ttl: Optional[float] = None) -> HttpResponse:
+        cache = self.cache
+        entry = cache.load(url) if cache is not None else None
+        if cache is not None and cache.mode == "replay":
+            if entry is None:
+                cache._count("misses")
+                raise CacheMiss(url)
+            cache._count("hits")
+            return self._cached(url, entry)
+        if entry is not None and cache.is_fresh(entry, ttl):
+            cache._count("hits")
+            return self._cached(url, entry)
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        resp = self.session.get(url, timeout=timeout, headers=headers)
+        status = int(resp.status_code)
+        if status == 304 and entry is not None:
+            cache.touch(url, entry)
+            return self._cached(url, entry)
+        if cache is not None:
+            cache._count("misses")
+        content = resp.content
+        resp_headers = dict(resp.headers or {})
+        if cache is not None and status == 200:
+            cache.store(url, content, resp_headers)
+        return HttpResponse(url, status, content, resp_headers)
+
+    @staticmethod
+    def _cached(url: str, entry: Dict[str, Any]) -> HttpResponse:
+        headers = {"Content-Type": entry.get("content_type") or "application/json"}
+        return HttpResponse(url, 200, entry["body"], headers, from_cache=True)
+
+
+_DEFAULT: Optional[ProviderHttpClient] = None
+_DEFAULT_LOCK = threading.Lock()
+# 按 (目录, TTL, 模式) 复用缓存实例（统计计数随实例累计）
+_CACHES: Dict[tuple, HttpCache] = {}
+
+
+def cache_from_config() -> Optional[HttpCache]:
+    """按配置构建磁盘缓存；未配置目录时返回 None（不缓存）。"""
+    try:
+        from flask import current_app
+        cfg = current_app.config
+        directory = cfg.get("PROVIDER_HTTP_CACHE_DIR")
+        ttl = cfg.get("PROVIDER_HTTP_CACHE_TTL", 3600.0)
+        mode = cfg.get("PROVIDER_HTTP_MODE", "live")
+    except Exception:
+        from config import Config
+        directory = Config.PROVIDER_HTTP_CACHE_DIR
+        ttl = Config.PROVIDER_HTTP_CACHE_TTL
+        mode = Config.PROVIDER_HTTP_MODE
+    if not directory:
+        return None
+    key = (str(directory), float(ttl), str(mode or "live").strip().lower())
+    with _DEFAULT_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = HttpCache(key[0], ttl=key[1], mode=key[2])
+        return _CACHES[key]
+
+
+def default_client() -> ProviderHttpClient:
+    """进程内共享客户端（单一连接池会话）；缓存配置在每次调用时读取，便于按应用/测试切换。"""
+    global _DEFAULT
+    cache = cache_from_config()
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = ProviderHttpClient()
+        _DEFAULT.cache = cache
+        return _DEFAULT
+
+
+def get_json(url: str, timeout: float = 10.0, ttl: Optional[float] = None) -> Any:
+    """经共享客户端 GET 并解析 JSON；非 2xx 抛出 ProviderHTTPError（requests.HTTPError 子类）。"""
+    resp = default_client().get(url, timeout=timeout, ttl=ttl)
+    resp.raise_for_status()
+    return resp.json()
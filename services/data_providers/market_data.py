@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中观行情数据源接口与选择
+
+约定：
+- 数据源实现 fetch_index_history / fetch_fx_timeseries_to_usd 两个方法（模块或对象均可，按属性调用）。
+- 默认数据源为 meso_market_provider 模块（yfinance + Frankfurter），运行时按模块名导入，
+  测试可通过替换 sys.modules 中的同名模块注入伪实现。
+- 配置 MESO_MARKET_PROVIDER=synthetic（Config/环境变量）时使用确定性的合成数据源，用于离线压测与基准。
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Dict, List, Optional, Protocol
+
+PROVIDER_NAMES = ("yfinance", "synthetic")
+
+
+class MarketDataProvider(Protocol):
+    def fetch_index_history(self, symbols: List[str], period: str = "5y", start: Optional[str] = None,
+                            end: Optional[str] = None, adjusted: bool = False, total_return: bool = False) -> Dict[str, List[Dict]]:
+        """{symbol: [{date, close, adj_factor?, close_tr?}, ...]}（按日期升序）。"""
+        ...
+
+    def fetch_fx_timeseries_to_usd(self, quote_list: List[str], start_date: str,
+                                   end_date: str) -> Dict[str, Dict[str, float]]:
+        """{date: {CUR: CUR→USD}}。"""
+        ...
+
+
+def configured_provider_name() -> str:
+    try:
+        from flask import current_app
+        name = current_app.config.get("MESO_MARKET_PROVIDER", "yfinance")
+    except Exception:
+        from config import Config
+        name = Config.MESO_MARKET_PROVIDER
+    return str(name or "yfinance").strip().lower()
+
+
+def default_market_provider() -> MarketDataProvider:
+    """按配置返回数据源；未知名称按默认数据源处理。"""
+    if configured_provider_name() == "synthetic":
+        from .synthetic_provider import SyntheticMarketProvider
+        return SyntheticMarketProvider()
+    return importlib.import_module(f"{__package__}.meso_market_provider")
@@ -3,7 +3,7 @@
 """
 真实数据 Provider（中观）：
 - 指数价格：yfinance
-- 外汇：Frankfurter（EUR基）
+- 外汇：Frankfurter（EUR基），经共享 HTTP 客户端（http_client：连接池 + 可选磁盘缓存/回放）
 
 注意：为避免在测试环境硬依赖第三方库，import 放在函数内部；非测试环境调用这些函数时需要安装依赖：
   python3 -m pip install yfinance requests
@@ -13,14 +13,14 @@ from __future__ import annotations
 
 from typing import List, Dict, Optional
 
+from .ecb_fx_provider import fetch_latest_eur_rates
+from .http_client import get_json
+
 
 def fetch_fx_rates_usd(base: str, quote_list: List[str]) -> Dict[str, float]:
-    import requests
-    # Frankfurter 最新 EUR 基础报价
-    r = requests.get("https://api.frankfurter.app/latest", timeout=10)
-    r.raise_for_status()
-    data = r.json()
-    rates = data.get("rates", {})
+    # Frankfurter 最新 EUR 基础报价（与宏观 FX 共用同一次 /latest 请求）
+    data = fetch_latest_eur_rates(timeout=10)
+    rates = dict(data.get("rates", {}))
     rates["EUR"] = 1.0
     # 计算 base→USD、quote→USD 需要的交叉：若 base 不是 USD
     def to_usd(cur: str) -> Optional[float]:
@@ -95,7 +95,6 @@ def fetch_fx_timeseries_to_usd(quote_list: List[str], start_date: str, end_date:
       C→USD = (1 / (EUR→C)) * (EUR→USD)
     特殊：C 为 EUR 时，C→USD = EUR→USD；C 为 USD 时，= 1.0。
     """
-    import requests
     # 需要的目标货币集合（用于一次拉取所有 quote 的时序）
     quotes = set(quote_list or [])
     quotes.add("USD")
@@ -103,9 +102,7 @@ def fetch_fx_timeseries_to_usd(quote_list: List[str], start_date: str, end_date:
         quotes.add("EUR")
     to_param = ",".join(sorted(quotes))
     url = f"https://api.frankfurter.app/{start_date}..{end_date}?to={to_param}"
-    r = requests.get(url, timeout=15)
-    r.raise_for_status()
-    data = r.json()
+    data = get_json(url, timeout=15)
     rates = data.get("rates", {})  # {date: {CUR: rate}}
     out: Dict[str, Dict[str, float]] = {}
     for d, m in rates.items():
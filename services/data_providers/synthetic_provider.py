@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成行情数据源（确定性、离线）：用于刷新与排名的压测和基准
+
+说明：
+- 交易日为 [origin, end] 内的工作日；各市场另有休市日（按 市场 × 日期 哈希，约 holidays_per_year 天/年），
+  单个标的再按 gap_rate 随机缺失交易日。
+- 价格为对数正态随机游走；每 split_every 个交易日一次拆股（价格按 split_ratio 下跳），
+  每 63 个交易日派息一次（dividend_yield 年化）；adj_factor = 总回报价 / 收盘价，total_return 时给出 close_tr。
+- 汇率：每个非 USD 币种一条 CUR→USD 随机游走，汇率源另有独立的缺失日（fx_gap_rate）。
+- 结果只取决于参数、seed 与标的名；advance() 后移终点时已有历史不变，可模拟逐日增量刷新。
+"""
+
+from __future__ import annotations
+
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 合成汇率的起点（CUR→USD），未列出的币种从 1.0 开始
+_FX_BASE = {"EUR": 1.1, "GBP": 1.27, "JPY": 0.0068, "CNY": 0.14, "HKD": 0.128, "CHF": 1.12, "CAD": 0.74, "AUD": 0.66}
+_MARKETS = ("US", "EU", "UK", "JP", "HK", "CN")
+_ASSET_CLASSES = ("equity", "equity", "equity", "bond", "commodity")
+_DIVIDEND_EVERY = 63
+
+
+def _stable_seed(*parts: Any) -> int:
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+def _draws(seed: int, n: int, kind: str) -> np.ndarray:
+    """同一 seed 下长度 n 的随机数是更长序列的前缀，终点后移时已有交易日的取值不变。"""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal(n) if kind == "normal" else rng.random(n)
+
+
+class SyntheticMarketProvider:
+    """实现 MarketDataProvider 接口的确定性合成数据源。"""
+
+    def __init__(self, years: float = 5.0, end: Optional[str] = None, seed: int = 7,
+                 currencies: Sequence[str] = ("USD", "EUR", "JPY", "GBP"), gap_rate: float = 0.01,
+                 holidays_per_year: int = 8, split_every: int = 750, split_ratio: float = 2.0,
+                 dividend_yield: float = 0.02, fx_gap_rate: float = 0.02):
+        self.end = date.fromisoformat(end) if end else date(2024, 12, 31)
+        self.origin = self.end - timedelta(days=int(round(float(years) * 365.25)))
+        self.seed = int(seed)
+        self.currencies = tuple(str(c).upper() for c in currencies) or ("USD",)
+        self.gap_rate = float(gap_rate)
+        self.holiday_rate = float(holidays_per_year) / 261.0
+        self.split_every = int(split_every)
+        self.split_ratio = float(split_ratio)
+        self.dividend_yield = float(dividend_yield)
+        self.fx_gap_rate = float(fx_gap_rate)
+        self.calls = {"history": 0, "symbols": 0, "fx": 0}
+
+    def advance(self, days: int) -> None:
+        """终点后移若干自然日（模拟次日/次周的增量刷新）。"""
+        self.end = self.end + timedelta(days=int(days))
+
+    # ---- 标的 ----
+    def universe(self, n: int) -> List[Dict[str, Any]]:
+        """n 个合成标的的元数据（可直接写入 index_metadata），市场/币种/资产类别/分类轮流分配。"""
+        return [{
+            "symbol": f"SYN{i:05d}",
+            "name": f"Synthetic {i}",
+            "currency": self.currencies[i % len(self.currencies)],
+            "market": _MARKETS[i % len(_MARKETS)],
+            "asset_class": _ASSET_CLASSES[i % len(_ASSET_CLASSES)],
+            "category": f"cat{i % 7}",
+            "instrument_type": ("INDEX", "ETF", "STOCK")[i % 3],
+            "provider": "synthetic",
+        } for i in range(int(n))]
+
+    @staticmethod
+    def _market_of(symbol: str) -> str:
+        s = str(symbol)
+        if s.startswith("SYN") and s[3:].isdigit():
+            return _MARKETS[int(s[3:]) % len(_MARKETS)]
+        return _MARKETS[_stable_seed(s) % len(_MARKETS)]
+
+    # ---- 日历 ----
+    def _business_days(self) -> np.ndarray:
+        days = np.arange(np.datetime64(self.origin.isoformat()), np.datetime64(self.end.isoformat()) + 1,
+                         dtype="datetime64[D]")
+        return days[np.is_busday(days)]
+
+    def _calendar(self, market: str) -> np.ndarray:
+        days = self._business_days()
+        # 休市日只取决于 市场 × 日期（Knuth 乘法哈希），与终点无关
+        ordinal = days.astype(np.int64).astype(np.uint64)
+        h = (ordinal * np.uint64(2654435761) + np.uint64(_stable_seed(self.seed, market))) % np.uint64(1_000_003)
+        return days[h.astype(np.float64) / 1_000_003.0 >= self.holiday_rate]
+
+    # ---- 行情 ----
+    def fetch_index_history(self, symbols: List[str], period: str = "5y", start: Optional[str] = None,
+                            end: Optional[str] = None, adjusted: bool = False,
+                            total_return: bool = False) -> Dict[str, List[Dict]]:
+        self.calls["history"] += 1
+        self.calls["symbols"] += len(symbols or [])
+        calendars: Dict[str, np.ndarray] = {}
+        out: Dict[str, List[Dict]] = {}
+        for sym in symbols or []:
+            market = self._market_of(sym)
+            if market not in calendars:
+                calendars[market] = self._calendar(market)
+            out[sym] = self._series(sym, calendars[market], start, end, total_return)
+        return out
+
+    def _series(self, sym: str, days: np.ndarray, start: Optional[str], end: Optional[str],
+                total_return: bool) -> List[Dict]:
+        n = len(days)
+        if n == 0:
+            return []
+        rets = 0.0003 + 0.011 * _draws(_stable_seed(self.seed, "ret", sym), n, "normal")
+        keep = _draws(_stable_seed(self.seed, "gap", sym), n, "uniform") >= self.gap_rate
+        keep[0] = True
+        tr = 100.0 * np.exp(np.cumsum(rets))
+        # 派息：收盘价下跳，总回报价不变
+        div = np.zeros(n)
+        div[_DIVIDEND_EVERY - 1::_DIVIDEND_EVERY] = self.dividend_yield * _DIVIDEND_EVERY / 252.0
+        price = tr * np.cumprod(1.0 - div)
+        # 拆股：收盘价按比例下跳，总回报价不变
+        if self.split_every > 0:
+            splits = np.zeros(n)
+            splits[self.split_every::self.split_every] = 1.0
+            price = price / np.power(self.split_ratio, np.cumsum(splits))
+        mask = keep
+        if start:
+            mask = mask & (days >= np.datetime64(str(start)[:10]))
+        if end:
+            mask = mask & (days <= np.datetime64(str(end)[:10]))
+        dates = days[mask].astype(str).tolist()
+        closes = np.round(price[mask], 6).tolist()
+        factors = np.round(tr[mask] / price[mask], 8).tolist()
+        if total_return:
+            trs = np.round(tr[mask], 6).tolist()
+            return [{"date": d, "close": c, "adj_factor": a, "close_tr": t}
+                    for d, c, a, t in zip(dates, closes, factors, trs)]
+        return [{"date": d, "close": c, "adj_factor": a} for d, c, a in zip(dates, closes, factors)]
+
+    # ---- 汇率 ----
+    def fetch_fx_timeseries_to_usd(self, quote_list: List[str], start_date: str,
+                                   end_date: str) -> Dict[str, Dict[str, float]]:
+        self.calls["fx"] += 1
+        days = self._business_days()
+        window = (days >= np.datetime64(str(start_date)[:10])) & (days <= np.datetime64(str(end_date)[:10]))
+        out: Dict[str, Dict[str, float]] = {}
+        for cur in sorted({str(q).upper() for q in quote_list or []} - {"USD"}):
+            steps = 0.004 * _draws(_stable_seed(self.seed, "fx", cur), len(days), "normal")
+            path = _FX_BASE.get(cur, 1.0) * np.exp(np.cumsum(steps))
+            quoted = window & (_draws(_stable_seed(self.seed, "fxgap", cur), len(days), "uniform") >= self.fx_gap_rate)
+            for d, v in zip(days[quoted].astype(str), np.round(path[quoted], 8)):
+                out.setdefault(str(d), {"USD": 1.0})[cur] = float(v)
+        return out
@@ -4,6 +4,7 @@
 World Bank Provider (MVP)
 
 抓取宏观指标最新数据（按经济体/指标），失败回退由调用方处理。
+各经济体-指标并发请求，共享 keep-alive 连接池，带单次超时/整体截止/退避重试（见 concurrent_fetch）。
 
 指标映射（示例）：
 - cpi_yoy -> FP.CPI.TOTL.ZG（消费价格指数年度同比，%）
@@ -15,9 +16,10 @@ World Bank Provider (MVP)
 
 from __future__ import annotations
 
-import json
-import urllib.request
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .concurrent_fetch import fetch_json_many
 
 
 WB_COUNTRY_CODE: Dict[str, str] = {
@@ -38,64 +40,109 @@ WB_INDICATOR_CODE: Dict[str, str] = {
 }
 
 
-def _wb_url(country_code: str, indicator_code: str, per_page: int = 60) -> str:
+WB_BASE_URL = "https://api.worldbank.org/v2"
+
+# 并发抓取默认参数：并发数/单次超时/重试次数/退避基数/整体截止（秒）
+WB_MAX_WORKERS = 8
+WB_RETRIES = 2
+WB_BACKOFF = 0.5
+WB_DEADLINE = 60.0
+
+
+@dataclass
+class WorldBankFetchResult:
+    """抓取结果：rows 为成功记录，failed 为 {(economy, indicator): 原因}（含请求失败与无有效数据）。"""
+    rows: List[Dict] = field(default_factory=list)
+    failed: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    requested: int = 0
+    elapsed: float = 0.0
+
+
+def _wb_url(country_code: str, indicator_code: str, per_page: int = 60, base_url: str = WB_BASE_URL) -> str:
     # 返回 JSON 格式，按日期倒序查询（WB默认已按日期）
     return (
-        f"https://api.worldbank.org/v2/country/{country_code}/indicator/{indicator_code}"
+        f"{base_url.rstrip('/')}/country/{country_code}/indicator/{indicator_code}"
         f"?format=json&per_page={per_page}"
     )
 
 
-def fetch_macro_latest(economies: List[str], indicators: List[str], timeout: float = 8.0) -> List[Dict]:
-    """抓取各经济体-指标的最近一期非空值，返回 macro_series 兼容记录列表。
-
-    记录字段：economy, indicator, date(YYYY-MM-DD), value, provider
-    """
-    results: List[Dict] = []
+def _parse_latest(eco: str, ind: str, data) -> Optional[Dict]:
+    """从 WB JSON 中取最近一期非空值，无有效数据返回 None。"""
+    # WB JSON: [metadata, [ {"date": "2024", "value": 3.2, ...}, ... ]]
+    if not isinstance(data, list) or len(data) < 2 or not isinstance(data[1], list):
+        return None
+    latest = None
+    for item in data[1]:
+        if isinstance(item, dict) and item.get("value") is not None:
+            latest = item
+            break
+    if latest is None:
+        return None
+    year = str(latest.get("date") or "")
+    # WB年度数据仅给年份，这里拼接到年底日期
+    date_str = f"{year}-12-31" if len(year) == 4 else year
+    try:
+        value_f = float(latest.get("value"))
+    except Exception:
+        return None
+    return {
+        "economy": eco,
+        "indicator": ind,
+        "date": date_str,
+        "value": value_f,
+        "provider": "worldbank",
+        "revised_at": None,
+    }
+
+
+def fetch_macro_latest_report(
+    economies: List[str],
+    indicators: List[str],
+    timeout: float = 8.0,
+    max_workers: int = WB_MAX_WORKERS,
+    retries: int = WB_RETRIES,
+    backoff: float = WB_BACKOFF,
+    deadline: Optional[float] = WB_DEADLINE,
+    session=None,
+    base_url: str = WB_BASE_URL,
+) -> WorldBankFetchResult:
+    """并发抓取各经济体-指标的最近一期非空值，返回成功记录与失败明细（部分成功时仍返回已得结果）。"""
+    urls: Dict[Tuple[str, str], str] = {}
     for eco in economies:
         ccode = WB_COUNTRY_CODE.get(eco)
         if not ccode:
             continue
         for ind in indicators:
             icode = WB_INDICATOR_CODE.get(ind)
-            if not icode:
-                continue
-            url = _wb_url(ccode, icode)
-            try:
-                with urllib.request.urlopen(url, timeout=timeout) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-            except Exception:
-                continue
-
-            # WB JSON: [metadata, [ {"date": "2024", "value": 3.2, ...}, ... ]]
-            if not isinstance(data, list) or len(data) < 2 or not isinstance(data[1], list):
-                continue
-            series = data[1]
-            latest = None
-            for item in series:
-                val = item.get("value")
-                if val is not None:
-                    latest = item
-                    break
-            if latest is None:
-                continue
-            year = str(latest.get("date") or "")
-            # WB年度数据仅给年份，这里拼接到年底日期
-            date_str = f"{year}-12-31" if len(year) == 4 else year
-            try:
-                value_f = float(latest.get("value"))
-            except Exception:
-                continue
-            results.append(
-                {
-                    "economy": eco,
-                    "indicator": ind,
-                    "date": date_str,
-                    "value": value_f,
-                    "provider": "worldbank",
-                    "revised_at": None,
-                }
-            )
-    return results
+            if icode:
+                urls[(eco, ind)] = _wb_url(ccode, icode, base_url=base_url)
+    out = WorldBankFetchResult(requested=len(urls))
+    if not urls:
+        return out
+    report = fetch_json_many(urls, session=session, max_workers=max_workers, timeout=timeout,
+                             retries=retries, backoff=backoff, deadline=deadline)
+    out.elapsed = report.elapsed
+    out.failed.update(report.errors)
+    # 按请求顺序输出，保证结果稳定
+    for key in urls:
+        if key not in report.results:
+            continue
+        row = _parse_latest(key[0], key[1], report.results[key])
+        if row is None:
+            out.failed[key] = "no data"
+        else:
+            out.rows.append(row)
+    return out
 
 
+def fetch_macro_latest(economies: List[str], indicators: List[str], timeout: float = 8.0,
+                       failed: Optional[Dict[Tuple[str, str], str]] = None) -> List[Dict]:
+    """抓取各经济体-指标的最近一期非空值，返回 macro_series 兼容记录列表。
+
+    记录字段：economy, indicator, date(YYYY-MM-DD), value, provider
+    传入 failed 字典时写入失败明细 {(economy, indicator): 原因}，便于调用方上报部分成功。
+    """
+    result = fetch_macro_latest_report(economies, indicators, timeout=timeout)
+    if failed is not None:
+        failed.update(result.failed)
+    return result.rows
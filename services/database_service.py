@@ -161,6 +161,58 @@ class DatabaseService:
                 )
             ''')
 
+            # FIFO 批次表：买入明细即批次，记录剩余数量（由 TradeLotEngine 维护）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS trade_lots (
+                    buy_detail_id INTEGER PRIMARY KEY,  -- 买入明细ID
+                    trade_id INTEGER NOT NULL,
+                    transaction_date DATE,
+                    created_at TIMESTAMP,
+                    original_quantity INTEGER NOT NULL,
+                    remaining_quantity INTEGER NOT NULL
+                )
+            ''')
+
+            # 批次消耗记录：卖出明细对各买入批次的消耗数量
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS trade_lot_allocations (
+                    sell_detail_id INTEGER NOT NULL,
+                    buy_detail_id INTEGER NOT NULL,
+                    trade_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    PRIMARY KEY (sell_detail_id, buy_detail_id)
+                )
+            ''')
+
+            # 批次状态戳：与明细聚合比对以判断批次是否可信
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS trade_lot_state (
+                    trade_id INTEGER PRIMARY KEY,
+                    buy_count INTEGER NOT NULL DEFAULT 0,
+                    buy_quantity INTEGER NOT NULL DEFAULT 0,
+                    sell_count INTEGER NOT NULL DEFAULT 0,
+                    sell_quantity INTEGER NOT NULL DEFAULT 0,
+                    unallocated_quantity INTEGER NOT NULL DEFAULT 0,  -- 超卖且未能分配的数量
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # 日收益表：每笔交易按卖出日期聚合的加权收益（由 DailyReturnStore 维护）
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'strategy_daily_returns'")
+            backfill_daily_returns = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS strategy_daily_returns (
+                    trade_id INTEGER NOT NULL,
+                    date DATE NOT NULL,             -- 卖出日期（与 trade_details.transaction_date 一致）
+                    strategy_id INTEGER,
+                    symbol_code TEXT,
+                    open_date DATE,
+                    wret REAL NOT NULL DEFAULT 0,   -- Σ 收益率 × 卖出数量
+                    weight REAL NOT NULL DEFAULT 0, -- Σ 卖出数量
+                    PRIMARY KEY (trade_id, date)
+                )
+            ''')
+
             # 数据库升级处理
             self._handle_database_migrations(cursor)
             
@@ -172,6 +224,11 @@ class DatabaseService:
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_is_deleted ON trades(is_deleted)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_details_trade ON trade_details(trade_id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_details_type_deleted ON trade_details(transaction_type, is_deleted)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_lots_trade_order ON trade_lots(trade_id, transaction_date, created_at, buy_detail_id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_lot_alloc_trade ON trade_lot_allocations(trade_id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_lot_alloc_buy ON trade_lot_allocations(buy_detail_id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_returns_strategy_date ON strategy_daily_returns(strategy_id, date)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_returns_symbol_date ON strategy_daily_returns(symbol_code, date)")
             except sqlite3.OperationalError as e:
                 try:
                     from flask import current_app
@@ -180,6 +237,11 @@ class DatabaseService:
                     import logging
                     logging.getLogger(__name__).warning(f"索引创建警告: {e}")
 
+            # 首次创建日收益表时从既有明细回填
+            if backfill_daily_returns:
+                from .daily_returns import DailyReturnStore
+                DailyReturnStore(self).rebuild_all(cursor)
+
             conn.commit()
 
     def _handle_database_migrations(self, cursor):
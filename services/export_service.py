@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出服务：将交易与交易明细以流式方式编码为 CSV 或 Parquet。
+
+说明：
+- 数据通过 TradeRepository 的游标分批读取（fetchmany），逐批编码后立即产出，
+  内存占用只与批大小相关，与账本规模无关。
+- Parquet 依赖可选的 pyarrow；未安装时抛出 ValidationError，由路由统一映射为 400。
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .database_service import DatabaseService
+from .trade_repository import TradeRepository
+from utils.exceptions import ValidationError
+
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Batch = (列名, 行元组列表)
+Batch = Tuple[List[str], List[tuple]]
+
+
+class ExportService:
+    def __init__(self, db_service: Optional[DatabaseService] = None):
+        self.db = db_service or DatabaseService()
+        self.trade_repo = TradeRepository(self.db)
+
+    def stream_trades(self, fmt: str = 'csv', status: Optional[str] = None,
+                      strategy: Optional[Any] = None, include_deleted: bool = False,
+                      order_by: str = 't.id ASC',
+                      symbols: Optional[List[str]] = None,
+                      symbol_names: Optional[List[str]] = None,
+                      date_from: Optional[str] = None,
+                      date_to: Optional[str] = None,
+                      batch_size: Optional[int] = None) -> Iterator[bytes]:
+        """流式导出交易主表，筛选条件与 TradeRepository.fetch_trades 一致。
+
+        strategy 可为策略ID或名称，解析口径与 TradingService.get_trades_paginated 相同。
+        """
+        fmt = self.normalize_format(fmt)
+        strategy_id = self._resolve_strategy(strategy)
+        batches = self.trade_repo.iter_trades(
+            status, strategy_id, include_deleted, order_by,
+            symbols, symbol_names, date_from, date_to, batch_size,
+        )
+        return self._encode(fmt, batches, ('trades',))
+
+    def stream_trade_details(self, fmt: str = 'csv', status: Optional[str] = None,
+                             strategy: Optional[Any] = None, include_deleted: bool = False,
+                             symbols: Optional[List[str]] = None,
+                             symbol_names: Optional[List[str]] = None,
+                             date_from: Optional[str] = None,
+                             date_to: Optional[str] = None,
+                             batch_size: Optional[int] = None) -> Iterator[bytes]:
+        """流式导出交易明细（按交易筛选条件过滤）。"""
+        fmt = self.normalize_format(fmt)
+        strategy_id = self._resolve_strategy(strategy)
+        batches = self.trade_repo.iter_trade_details(
+            status, strategy_id, include_deleted,
+            symbols, symbol_names, date_from, date_to, batch_size,
+        )
+        return self._encode(fmt, batches, ('trade_details', 'trades'))
+
+    @staticmethod
+    def normalize_format(fmt: Optional[str]) -> str:
+        value = (fmt or 'csv').strip().lower()
+        if value not in EXPORT_FORMATS:
+            raise ValidationError(f"不支持的导出格式: {fmt}（可选: {', '.join(EXPORT_FORMATS)}）")
+        if value == 'parquet' and not parquet_available():
+            raise ValidationError("Parquet 导出需要安装 pyarrow")
+        return value
+
+    def _resolve_strategy(self, strategy: Optional[Any]) -> Optional[int]:
+        if not strategy:
+            return None
+        from .trading_service import TradingService
+        return TradingService(self.db)._resolve_strategy(strategy)
+
+    def _encode(self, fmt: str, batches: Iterable[Batch], tables: Tuple[str, ...]) -> Iterator[bytes]:
+        if fmt == 'parquet':
+            return encode_parquet(batches, self._column_types(tables))
+        return encode_csv(batches)
+
+    def _column_types(self, tables: Tuple[str, ...]) -> Dict[str, str]:
+        """读取表声明类型，供 Parquet 构建稳定的 schema（先出现的表优先）。"""
+        types: Dict[str, str] = {}
+        for table in tables:
+            rows = self.db.execute_query(f"PRAGMA table_info({table})")
+            for r in rows or []:
+                types.setdefault(r['name'], str(r['type'] or ''))
+        return types
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def encode_csv(batches: Iterable[Batch]) -> Iterator[bytes]:
+    """将批次编码为 UTF-8 CSV 字节块；首块带 BOM 以便 Excel 正确识别中文。"""
+    header_written = False
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for columns, rows in batches:
+        if not header_written:
+            buf.write('\ufeff')
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        chunk = buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+        if chunk:
+            yield chunk.encode('utf-8')
+
+
+class _ChunkSink:
+    """只写文件对象：累积 ParquetWriter 的输出，由调用方按批取走。
+
+    tell() 返回累计写入字节数，保证 Parquet 页脚中的偏移量正确。
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self._chunks.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b''.join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def _arrow_type(pa, declared: str):
+    t = (declared or '').upper()
+    if 'INT' in t or 'BOOL' in t:
+        return pa.int64()
+    if any(k in t for k in ('DECIMAL', 'REAL', 'FLOA', 'DOUB', 'NUMERIC')):
+        return pa.float64()
+    return pa.string()
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    try:
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def encode_parquet(batches: Iterable[Batch], column_types: Dict[str, str]) -> Iterator[bytes]:
+    """将批次逐个写为 Parquet 行组，并在每个行组写出后产出字节块。"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    kinds: List[str] = []
+    try:
+        for columns, rows in batches:
+            if writer is None:
+                fields = [pa.field(c, _arrow_type(pa, column_types.get(c, ''))) for c in columns]
+                schema = pa.schema(fields)
+                kinds = ['int' if pa.types.is_integer(f.type) else 'float' if pa.types.is_floating(f.type) else 'str'
+                         for f in fields]
+                writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+            if rows:
+                arrays = [
+                    pa.array([_coerce(r[i], kinds[i]) for r in rows], type=schema.field(i).type)
+                    for i in range(len(kinds))
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇率对齐与 USD 换算（pandas/NumPy 向量化）
+
+说明：
+- 汇率表：{date: {CUR: CUR→USD}} 透视为 日期 × 币种 的 DataFrame，各币种按日期前向填充，USD 恒为 1.0。
+- 价格换算：按标的的价格日期做 as-of 对齐（取不晚于该日的最近汇率，覆盖汇率源无报价的节假日），
+  close_usd / close_usd_tr 为整列相乘；早于首个汇率日期的价格无 USD 值。
+- 同币种的多个标的合并为一次换算（convert_many_to_usd），换算成本与标的数量无关。
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+
+def fx_frame(fx_ts: Mapping[str, Mapping[str, Any]], currencies: Iterable[str]) -> pd.DataFrame:
+    """{date: {CUR: rate}} → 以日期（datetime64，升序）为索引、币种为列的汇率表（前向填充，USD=1.0）。"""
+    columns = sorted({str(c).upper() for c in currencies if c} - {"USD"})
+    frame = pd.DataFrame.from_dict(dict(fx_ts), orient="index", dtype=float).reindex(columns=columns)
+    frame.index = pd.to_datetime(frame.index.astype(str).str[:10], format="%Y-%m-%d")
+    frame = frame.sort_index().ffill()
+    frame["USD"] = 1.0
+    return frame
+
+
+def _as_of_rates(days: np.ndarray, currency: str, fx: pd.DataFrame) -> np.ndarray:
+    """各价格日期（datetime64[D]）不晚于该日的最近汇率；早于首个汇率日期或无该币种时为 NaN。"""
+    if currency == "USD":
+        return np.ones(len(days))
+    if currency not in fx.columns or not len(fx):
+        return np.full(len(days), np.nan)
+    fx_days = fx.index.to_numpy().astype("datetime64[D]")
+    pos = np.searchsorted(fx_days, days, side="right") - 1
+    rates = fx[currency].to_numpy(dtype=float)[np.maximum(pos, 0)]
+    rates[pos < 0] = np.nan
+    return rates
+
+
+def convert_many_to_usd(series: Mapping[str, Sequence[Mapping[str, Any]]], currency: str,
+                        fx: pd.DataFrame) -> List[Dict[str, Any]]:
+    """同币种多个标的 {symbol: 行情行} 一次对齐换算 → 含 symbol 的价格表写入行（按标的、日期升序）。"""
+    symbols = [sym for sym, rows in series.items() if rows]
+    if not symbols:
+        return []
+    currency = currency or "USD"
+    records = [r for sym in symbols for r in series[sym]]
+    codes = np.repeat(np.arange(len(symbols)), [len(series[sym]) for sym in symbols])
+    dates = [str(r.get("date")) for r in records]
+    days = np.array([d[:10] for d in dates], dtype="datetime64[D]")
+    # 稳定排序：同一标的同日重复行保持原顺序（写入时后者覆盖前者）
+    order = np.lexsort((days, codes))
+    rate = _as_of_rates(days[order], str(currency).upper(), fx)
+    columns = {
+        key: np.array([r.get(key) for r in records], dtype=float)[order]
+        for key in ("close", "close_tr", "adj_factor")
+    }
+    close_usd = columns["close"] * rate
+    close_usd_tr = columns["close_tr"] * rate
+    return [
+        {
+            "symbol": symbols[k],
+            "date": dates[i],
+            "close": _none_if_nan(c),
+            "close_tr": _none_if_nan(ct),
+            "currency": currency,
+            "close_usd": _none_if_nan(cu),
+            "close_usd_tr": _none_if_nan(cut),
+            "adj_factor": _none_if_nan(a),
+        }
+        for i, k, c, ct, cu, cut, a in zip(
+            order.tolist(), codes[order].tolist(), columns["close"].tolist(), columns["close_tr"].tolist(),
+            close_usd.tolist(), close_usd_tr.tolist(), columns["adj_factor"].tolist(),
+        )
+    ]
+
+
+def convert_to_usd(rows: Sequence[Mapping[str, Any]], currency: str, fx: pd.DataFrame) -> List[Dict[str, Any]]:
+    """单个标的的行情行（date, close, close_tr, adj_factor）→ 含 close_usd/close_usd_tr 的价格表写入行（按日期升序）。"""
+    out = convert_many_to_usd({"": rows}, currency, fx)
+    for row in out:
+        del row["symbol"]
+    return out
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+宏观快照归一化引擎（NumPy 向量化）。
+
+说明：
+- 输入为 经济体 × 指标 的最新值矩阵（缺失为 NaN）；可选 日期 × 经济体 × 指标 的历史立方体，
+  提供时以窗口内全部历史观测（各经济体合并）作为归一化参照，否则以当期横截面作为参照。
+- 四种口径一次完成，结果为 [0,1] 分数矩阵（缺失为 NaN）：
+  - value：参照集 min-max
+  - zscore：按参照集均值/标准差求 z，再按参照集 z 的范围 min-max
+  - percentile：参照集中的百分位秩，相同取值取平均秩（(小于数 + (等于数 − 1)/2) / (n − 1)）
+  - trend：最近两期差分（按方向一致化）在参照差分集中的 min-max
+- 方向：+1 越大越好；−1 越小越好（value/zscore/percentile 映射后取 1 − x；trend 在差分时已对齐）。
+- 参照集只有一个取值或范围为 0 时得 0.5。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VIEWS: Tuple[str, ...] = ("value", "zscore", "percentile", "trend")
+
+
+# ---------------------- 数据整形 ----------------------
+def build_matrix(values: Dict[str, Dict[str, float]], economies: Sequence[str],
+                 indicators: Sequence[str]) -> np.ndarray:
+    """{indicator: {economy: value}} → 经济体 × 指标 矩阵（缺失为 NaN）。"""
+    out = np.full((len(economies), len(indicators)), np.nan)
+    eco_idx = {e: i for i, e in enumerate(economies)}
+    for j, ind in enumerate(indicators):
+        for eco, v in (values.get(ind) or {}).items():
+            i = eco_idx.get(eco)
+            if i is not None and v is not None:
+                out[i, j] = float(v)
+    return out
+
+
+def build_cube(rows: Iterable[Tuple[str, str, str, Optional[float]]], economies: Sequence[str],
+               indicators: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """(indicator, economy, date, value) 行 → (日期列表, 日期 × 经济体 × 指标 立方体)。"""
+    rows = [r for r in rows]
+    dates = sorted({str(r[2]) for r in rows})
+    cube = np.full((len(dates), len(economies), len(indicators)), np.nan)
+    d_idx = {d: i for i, d in enumerate(dates)}
+    e_idx = {e: i for i, e in enumerate(economies)}
+    i_idx = {k: i for i, k in enumerate(indicators)}
+    for ind, eco, d, v in rows:
+        if v is None or eco not in e_idx or ind not in i_idx:
+            continue
+        cube[d_idx[str(d)], e_idx[eco], i_idx[ind]] = float(v)
+    return dates, cube
+
+
+def last_two_observations(cube: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """沿日期轴取每个 (经济体, 指标) 的最近两期非空观测 → (latest, prev)。"""
+    valid = ~np.isnan(cube)
+    t = cube.shape[0]
+    order = np.where(valid, np.arange(t)[:, None, None], -1)
+    last_idx = order.max(axis=0)
+    # 屏蔽最近一期后再取一次得到上一期
+    masked = np.where(order == last_idx[None], -1, order)
+    prev_idx = masked.max(axis=0)
+    latest = _take_time(cube, last_idx)
+    prev = _take_time(cube, prev_idx)
+    return latest, prev
+
+
+def _take_time(cube: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    safe = np.clip(idx, 0, max(cube.shape[0] - 1, 0))
+    if cube.shape[0] == 0:
+        return np.full(idx.shape, np.nan)
+    picked = np.take_along_axis(cube, safe[None], axis=0)[0]
+    return np.where(idx >= 0, picked, np.nan)
+
+
+def history_diffs(cube: np.ndarray) -> np.ndarray:
+    """每个 (经济体, 指标) 相邻两期非空观测的差分，按日期对齐（首个观测处为 NaN）。"""
+    t = cube.shape[0]
+    if t == 0:
+        return cube.copy()
+    # 前向填充得到“上一期非空值”
+    valid = ~np.isnan(cube)
+    idx = np.where(valid, np.arange(t)[:, None, None], -1)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    prev_idx = np.concatenate([np.full((1,) + cube.shape[1:], -1), idx[:-1]], axis=0)
+    prev_vals = np.where(prev_idx >= 0, np.take_along_axis(cube, np.clip(prev_idx, 0, t - 1), axis=0), np.nan)
+    return np.where(valid, cube - prev_vals, np.nan)
+
+
+# ---------------------- 归一化 ----------------------
+def _reference(current: np.ndarray, history: Optional[np.ndarray]) -> np.ndarray:
+    """参照集：R × 指标（横截面为经济体，历史为 日期×经济体 展开）。"""
+    if history is None:
+        return current
+    return history.reshape(-1, history.shape[-1])
+
+
+def _minmax(current: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mn = _nan_reduce(np.nanmin, ref)
+        mx = _nan_reduce(np.nanmax, ref)
+        span = mx - mn
+        out = (current - mn) / span
+    return np.where(span == 0, np.where(np.isnan(current), np.nan, 0.5), out)
+
+
+def _zscore(current: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = _nan_reduce(np.nanmean, ref)
+        std = _nan_reduce(np.nanstd, ref)
+        z = (current - mean) / std
+        z_min = (_nan_reduce(np.nanmin, ref) - mean) / std
+        z_max = (_nan_reduce(np.nanmax, ref) - mean) / std
+        z_span = z_max - z_min
+        out = (z - z_min) / z_span
+    flat = (std == 0) | (z_span == 0)
+    return np.where(flat, np.where(np.isnan(current), np.nan, 0.5), out)
+
+
+def _percentile(current: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    """平均秩百分位：相同取值得到相同分数（不再依赖首次出现位置）。"""
+    r = ref[:, None, :]
+    c = current[None, :, :]
+    less = np.sum(r < c, axis=0)
+    equal = np.sum(r == c, axis=0)
+    n = np.sum(~np.isnan(ref), axis=0)[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = (less + (np.maximum(equal, 1) - 1) / 2.0) / (n - 1)
+    out = np.where(n > 1, out, 0.5)
+    return np.where(np.isnan(current), np.nan, out)
+
+
+def _nan_reduce(func, ref: np.ndarray) -> np.ndarray:
+    """按列归约，全 NaN 列返回 NaN 且不告警。"""
+    out = np.full(ref.shape[1], np.nan)
+    ok = np.any(~np.isnan(ref), axis=0)
+    if np.any(ok):
+        out[ok] = func(ref[:, ok], axis=0)
+    return out
+
+
+def normalize(view: str, latest: np.ndarray, directions: Sequence[int],
+              prev: Optional[np.ndarray] = None, history: Optional[np.ndarray] = None) -> np.ndarray:
+    """计算 经济体 × 指标 的 [0,1] 分数矩阵（缺失为 NaN）。
+
+    - latest/prev：经济体 × 指标；trend 口径需要 prev
+    - history：可选 日期 × 经济体 × 指标 立方体，提供时作为参照集
+    未知 view 按 value 处理。
+    """
+    latest = np.asarray(latest, dtype=np.float64)
+    sign = np.where(np.asarray(directions, dtype=np.float64) >= 0, 1.0, -1.0)
+    method = (view or "value").lower()
+    if method == "trend":
+        if prev is None:
+            raise ValueError("trend 口径需要上一期取值 prev")
+        diffs = (latest - np.asarray(prev, dtype=np.float64)) * sign
+        ref = diffs if history is None else (history_diffs(history) * sign).reshape(-1, latest.shape[1])
+        scores = _minmax(diffs, ref)
+    else:
+        ref = _reference(latest, history)
+        if method == "zscore":
+            norm = _zscore(latest, ref)
+        elif method == "percentile":
+            norm = _percentile(latest, ref)
+        else:
+            norm = _minmax(latest, ref)
+        scores = np.where(sign >= 0, norm, 1.0 - norm)
+    return np.clip(scores, 0.0, 1.0)
+
+
+def normalize_all(latest: np.ndarray, directions: Sequence[int], prev: Optional[np.ndarray] = None,
+                  history: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """一次计算四种口径 {view: 分数矩阵}；未提供 prev 时不含 trend。"""
+    views = VIEWS if prev is not None else VIEWS[:3]
+    return {v: normalize(v, latest, directions, prev=prev, history=history) for v in views}
+
+
+def composite(scores: np.ndarray, weights: Sequence[float]) -> np.ndarray:
+    """按指标权重对可用分数加权平均（0~100）；无任何分数的经济体为 0。"""
+    w = np.asarray(weights, dtype=np.float64)[None, :]
+    avail = ~np.isnan(scores)
+    w_sum = np.sum(np.where(avail, w, 0.0), axis=1)
+    total = np.sum(np.where(avail, scores * w, 0.0), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(w_sum > 0, total / np.where(w_sum > 0, w_sum, 1.0) * 100.0, 0.0)
+    return np.where(np.any(avail, axis=1), out, 0.0)
+
+
+def snapshot_tables(economies: Sequence[str], indicators: Sequence[str],
+                    scores: np.ndarray, weights: Sequence[float]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """将分数矩阵整理为快照的 matrix 与 ranking 结构（保留一位小数）。"""
+    comp = composite(scores, weights)
+    matrix: Dict[str, Dict[str, Any]] = {}
+    ranking: List[Dict[str, Any]] = []
+    for i, eco in enumerate(economies):
+        score = round(float(comp[i]), 1)
+        matrix[eco] = {
+            "composite": score,
+            "by_indicator": {ind: round(float(scores[i, j]) * 100.0, 1)
+                             for j, ind in enumerate(indicators) if not np.isnan(scores[i, j])},
+        }
+        ranking.append({"economy": eco, "score": score})
+    ranking.sort(key=lambda x: x["score"], reverse=True)
+    return matrix, ranking
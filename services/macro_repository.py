@@ -10,12 +10,76 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import uuid
+from itertools import groupby
+from typing import Any, Iterable, Optional
 
+from .compact_storage import from_day, migrate_to_view, sql_date, sql_day, to_day, to_day_or_min
 from .database_service import DatabaseService
 from config import Config
 
 
+# refresh_meta 中用于使快照缓存失效的记录来源（不在刷新历史中展示）
+SNAPSHOT_CACHE_SOURCE = "snapshot_cache"
+
+# 序列写入版本令牌（data_version 表中的名称）：任何 macro_series 写入都会更新
+_MACRO_SERIES_VERSION = "macro_series"
+
+# 字典编码的键类型（series_keys.kind）
+_ECONOMY, _INDICATOR, _COMMODITY, _PAIR = "economy", "indicator", "commodity", "pair"
+
+# 时序表：兼容视图名 → (物理表名, [(视图列, 字典键类型)], [(数据列, 类型)])；
+# 物理表以 (键 id..., day) 为 WITHOUT ROWID 主键，宏观序列键顺序为 (indicator, economy)
+_SERIES_TABLES = {
+    "macro_series": (
+        "macro_series_data",
+        [("indicator", _INDICATOR), ("economy", _ECONOMY)],
+        [("value", "REAL"), ("provider", "TEXT"), ("revised_at", "TEXT")],
+    ),
+    "commodity_series": (
+        "commodity_series_data",
+        [("commodity", _COMMODITY)],
+        [("value", "REAL"), ("currency", "TEXT"), ("provider", "TEXT")],
+    ),
+    "fx_series": ("fx_series_data", [("pair", _PAIR)], [("price", "REAL")]),
+}
+
+
+def _series_ddl(name: str, physical: str, keys: list[tuple[str, str]],
+                fields: list[tuple[str, str]]) -> tuple[str, list[str], str]:
+    """返回 (物理表 DDL, 旧表搬迁语句, 兼容视图 DDL)。"""
+    id_cols = [f"{col}_id" for col, _ in keys]
+    physical_ddl = (
+        f"CREATE TABLE IF NOT EXISTS {physical} ("
+        + ", ".join(f"{c} INTEGER NOT NULL" for c in id_cols)
+        + ", day INTEGER NOT NULL, "
+        + ", ".join(f"{f} {t}" for f, t in fields)
+        + f", PRIMARY KEY ({', '.join(id_cols)}, day)) WITHOUT ROWID"
+    )
+    copy_sqls = [
+        f"INSERT OR IGNORE INTO series_keys (kind, code) SELECT DISTINCT '{kind}', {col} FROM {name} "
+        f"WHERE {col} IS NOT NULL"
+        for col, kind in keys
+    ]
+    joins = " ".join(f"JOIN series_keys k_{col} ON k_{col}.kind = '{kind}' AND k_{col}.code = t.{col}"
+                     for col, kind in keys)
+    copy_sqls.append(
+        f"INSERT OR REPLACE INTO {physical} ({', '.join(id_cols)}, day, {', '.join(f for f, _ in fields)}) "
+        f"SELECT {', '.join(f'k_{col}.key_id' for col, _ in keys)}, {sql_day('t.date')}, "
+        + ", ".join(f"t.{f}" for f, _ in fields)
+        + f" FROM {name} t {joins} WHERE julianday(t.date) IS NOT NULL"
+    )
+    view_joins = " ".join(f"JOIN series_keys k_{col} ON k_{col}.key_id = t.{col}_id" for col, _ in keys)
+    view_sql = (
+        f"CREATE VIEW IF NOT EXISTS {name} AS SELECT "
+        + ", ".join(f"k_{col}.code AS {col}" for col, _ in keys)
+        + f", {sql_date('t.day')} AS date, "
+        + ", ".join(f"t.{f}" for f, _ in fields)
+        + f" FROM {physical} t {view_joins}"
+    )
+    return physical_ddl, copy_sqls, view_sql
+
+
 class MacroRepository:
     def __init__(self, db_service: DatabaseService | None = None):
         # 使用独立的宏观数据库，保证与交易数据库物理隔离
@@ -39,44 +103,27 @@ class MacroRepository:
                     cur.execute(f"DROP TABLE IF EXISTS {t}")
             except Exception:
                 pass
-            # 表结构与计划文档一致（精简版，MVP可用）
+            # 时序表：经济体/指标/商品/货币对字典编码为整数 id、日期存为整数日序号，
+            # 自然键 + day 为 WITHOUT ROWID 主键；旧库中的同名表搬迁后改为兼容视图，仓储读写直接访问物理表
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS macro_series (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    economy TEXT NOT NULL,
-                    indicator TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    value REAL,
-                    provider TEXT,
-                    revised_at TEXT,
-                    UNIQUE(economy, indicator, date)
+                CREATE TABLE IF NOT EXISTS series_keys (
+                    key_id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    code TEXT NOT NULL,
+                    UNIQUE(kind, code)
                 )
                 """
             )
+            for name, (physical, keys, fields) in _SERIES_TABLES.items():
+                migrate_to_view(cur, name, *_series_ddl(name, physical, keys, fields))
 
+            # 序列写入版本令牌（快照缓存据此失效）
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS commodity_series (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    commodity TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    value REAL,
-                    currency TEXT,
-                    provider TEXT,
-                    UNIQUE(commodity, date)
-                )
-                """
-            )
-
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS fx_series (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pair TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    price REAL,
-                    UNIQUE(pair, date)
+                CREATE TABLE IF NOT EXISTS data_version (
+                    name TEXT PRIMARY KEY,
+                    token TEXT NOT NULL
                 )
                 """
             )
@@ -108,6 +155,20 @@ class MacroRepository:
                 """
             )
 
+            # 快照缓存（跨进程共享）：按 视图/日期/窗口 存放序列化结果，version 与数据版本不一致即失效
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshot_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    body TEXT NOT NULL
+                )
+                """
+            )
+
             conn.commit()
 
 
@@ -124,16 +185,18 @@ class MacroRepository:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            ind_ids = self._key_ids(cur, _INDICATOR, (r.get("indicator") for r in records), create=True)
+            eco_ids = self._key_ids(cur, _ECONOMY, (r.get("economy") for r in records), create=True)
             cur.executemany(
                 (
-                    "INSERT OR REPLACE INTO macro_series (economy, indicator, date, value, provider, revised_at) "
+                    "INSERT OR REPLACE INTO macro_series_data (indicator_id, economy_id, day, value, provider, revised_at) "
                     "VALUES (?, ?, ?, ?, ?, ?)"
                 ),
                 [
                     (
-                        r.get("economy"),
-                        r.get("indicator"),
-                        r.get("date"),
+                        ind_ids[r.get("indicator")],
+                        eco_ids[r.get("economy")],
+                        to_day(r.get("date")),
                         float(r.get("value")) if r.get("value") is not None else None,
                         r.get("provider"),
                         r.get("revised_at"),
@@ -141,8 +204,13 @@ class MacroRepository:
                     for r in records
                 ],
             )
+            n = cur.rowcount or 0
+            cur.execute(
+                "INSERT INTO data_version (name, token) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET token=excluded.token",
+                (_MACRO_SERIES_VERSION, uuid.uuid4().hex),
+            )
             conn.commit()
-            return cur.rowcount or 0
+            return n
 
     def bulk_upsert_commodity_series(self, records: list[dict[str, Any]]) -> int:
         """批量写入/更新 commodity_series。字段：commodity, date, value, currency, provider"""
@@ -150,15 +218,16 @@ class MacroRepository:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            ids = self._key_ids(cur, _COMMODITY, (r.get("commodity") for r in records), create=True)
             cur.executemany(
                 (
-                    "INSERT OR REPLACE INTO commodity_series (commodity, date, value, currency, provider) "
+                    "INSERT OR REPLACE INTO commodity_series_data (commodity_id, day, value, currency, provider) "
                     "VALUES (?, ?, ?, ?, ?)"
                 ),
                 [
                     (
-                        r.get("commodity"),
-                        r.get("date"),
+                        ids[r.get("commodity")],
+                        to_day(r.get("date")),
                         float(r.get("value")) if r.get("value") is not None else None,
                         r.get("currency"),
                         r.get("provider"),
@@ -175,12 +244,13 @@ class MacroRepository:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            ids = self._key_ids(cur, _PAIR, (r.get("pair") for r in records), create=True)
             cur.executemany(
-                "INSERT OR REPLACE INTO fx_series (pair, date, price) VALUES (?, ?, ?)",
+                "INSERT OR REPLACE INTO fx_series_data (pair_id, day, price) VALUES (?, ?, ?)",
                 [
                     (
-                        r.get("pair"),
-                        r.get("date"),
+                        ids[r.get("pair")],
+                        to_day(r.get("date")),
                         float(r.get("price")) if r.get("price") is not None else None,
                     )
                     for r in records
@@ -189,71 +259,182 @@ class MacroRepository:
             conn.commit()
             return cur.rowcount or 0
 
+    @staticmethod
+    def _key_ids(cur, kind: str, codes: Iterable[Optional[str]], create: bool = False) -> dict[str, int]:
+        """字典编码：code → key_id（create=True 时为新 code 分配 id）。"""
+        uniq = list(dict.fromkeys(c for c in codes if c))
+        if not uniq:
+            return {}
+        if create:
+            cur.executemany("INSERT OR IGNORE INTO series_keys (kind, code) VALUES (?, ?)", [(kind, c) for c in uniq])
+        cur.execute(
+            f"SELECT code, key_id FROM series_keys WHERE kind = ? AND code IN ({','.join('?' * len(uniq))})",
+            (kind, *uniq),
+        )
+        return {r[0]: r[1] for r in cur.fetchall()}
+
     # ----------------------
     # 数据读取
     # ----------------------
-    def fetch_macro_series_by_economy(self, economy: str) -> dict[str, list[dict[str, Any]]]:
-        """按经济体读取时间序列，返回 {indicator: [{date, value}...]} 结构。"""
+    def fetch_macro_series_by_economy(self, economy: str, start: Optional[str] = None,
+                                      columnar: bool = False) -> dict[str, Any]:
+        """按经济体读取时间序列（start 指定时仅取该日期及之后），返回 {indicator: [{date, value}...]} 结构。
+
+        columnar=True 时返回 {indicator: {dates: [...], value: [...]}}（按指标分组后直接转置游标元组）。
+        """
         result: dict[str, list[dict[str, Any]]] = {}
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            # 逐指标在 (indicator_id, economy_id, day) 主键上定位该经济体的日期区间
             cur.execute(
-                "SELECT indicator, date, value FROM macro_series WHERE economy = ? ORDER BY indicator, date",
-                (economy.upper(),),
+                """
+                SELECT i.code, t.day, t.value
+                FROM series_keys i
+                JOIN macro_series_data t ON t.indicator_id = i.key_id AND t.day >= ?
+                    AND t.economy_id = (SELECT key_id FROM series_keys WHERE kind = ? AND code = ?)
+                WHERE i.kind = ?
+                ORDER BY i.code, t.day
+                """,
+                (to_day_or_min(start), _ECONOMY, economy.upper(), _INDICATOR),
             )
-            rows = cur.fetchall()
+            rows = [(r[0], from_day(r[1]), r[2]) for r in cur.fetchall()]
+        if columnar:
+            # 结果已按指标排序：整体转置一次，再按指标切片
+            columns: dict[str, Any] = {}
+            inds, dates, values = (list(c) for c in zip(*rows)) if rows else ([], [], [])
+            begin = 0
+            for i in range(1, len(inds) + 1):
+                if i == len(inds) or inds[i] != inds[begin]:
+                    columns[inds[begin]] = {"dates": dates[begin:i], "value": values[begin:i]}
+                    begin = i
+            return columns
         for row in rows:
             indicator = row[0]
             result.setdefault(indicator, []).append({"date": row[1], "value": row[2]})
         return result
 
-    def fetch_latest_by_indicator(self, indicator: str) -> dict[str, float]:
-        """读取某指标各经济体的最近值，返回 {economy: value}。
-        若某经济体存在多期，取最新日期。"""
-        # value 允许为 None，在过滤时剔除
-        latest: dict[str, tuple[str, Optional[float]]] = {}
+    def fetch_latest_values(
+        self, indicators: Optional[list[str]] = None
+    ) -> tuple[dict[str, dict[str, float]], dict[str, dict[str, tuple[Optional[float], Optional[float]]]]]:
+        """单次查询返回全部 (indicator, economy) 的最新值与最近两期非空值。
+
+        返回 (latest, latest_two)：
+        - latest: {indicator: {economy: value}}，取日期最新的一期，其值为空时不返回该经济体
+        - latest_two: {indicator: {economy: (latest, prev)}}，忽略空值后的最近两期，不足两期时 prev 为 None
+        indicators 为空时返回全部指标。
+        """
+        params: tuple = (_INDICATOR,)
+        ind_filter = ""
+        if indicators:
+            ind_filter = "AND i.code IN (" + ",".join(["?"] * len(indicators)) + ")"
+            params = (_INDICATOR, *indicators)
+        # 逐 (指标, 经济体) 在主键上倒序定位：最新一期（可能为空值）与最近两期非空值，无需扫描与排序全部历史；
+        # CROSS JOIN 固定连接顺序（键字典 → 数据表主键）
+        sql = f"""
+            SELECT i.code, e.code, t.value
+            FROM series_keys i CROSS JOIN series_keys e CROSS JOIN macro_series_data t
+            WHERE i.kind = ? {ind_filter} AND e.kind = ?
+              AND t.indicator_id = i.key_id AND t.economy_id = e.key_id
+              AND t.day IN (
+                  SELECT MAX(day) FROM macro_series_data m
+                  WHERE m.indicator_id = i.key_id AND m.economy_id = e.key_id
+                  UNION ALL
+                  SELECT day FROM (
+                      SELECT day FROM macro_series_data m
+                      WHERE m.indicator_id = i.key_id AND m.economy_id = e.key_id AND m.value IS NOT NULL
+                      ORDER BY day DESC LIMIT 2
+                  )
+              )
+            ORDER BY i.code, e.code, t.day DESC
+        """
+        latest: dict[str, dict[str, float]] = {}
+        latest_two: dict[str, dict[str, tuple[Optional[float], Optional[float]]]] = {}
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute(
-                "SELECT economy, date, value FROM macro_series WHERE indicator = ? ORDER BY economy, date",
-                (indicator,),
-            )
-            for eco, d, v in cur.fetchall():
-                # 逐行覆盖，ORDER BY 确保同一 economy 下最后一条为最新日期（字典序日期格式 YYYY-MM-DD）
-                latest[str(eco)] = (str(d), float(v) if v is not None else None)
-        return {eco: val for eco, (_, val) in latest.items() if val is not None}
+            cur.execute(sql, (*params, _ECONOMY))
+            rows = cur.fetchall()
+        # 每组按日期倒序：首行为最新一期，非空值行即最近两期非空值
+        for (ind, eco), group in groupby(rows, key=lambda r: (str(r[0]), str(r[1]))):
+            values = [r[2] for r in group]
+            if values[0] is not None:
+                latest.setdefault(ind, {})[eco] = float(values[0])
+            non_null = [float(v) for v in values if v is not None]
+            if non_null:
+                latest_two.setdefault(ind, {})[eco] = (non_null[0], non_null[1] if len(non_null) > 1 else None)
+        return latest, latest_two
 
-    def fetch_latest_two_by_indicator(self, indicator: str) -> dict[str, tuple[Optional[float], Optional[float]]]:
-        """读取某指标各经济体最近两期的值，返回 {economy: (latest, prev)}。若不足两期，prev 为 None。"""
-        result: dict[str, list[float]] = {}
+    def fetch_history(
+        self, indicators: Optional[list[str]] = None, date_from: Optional[str] = None, date_to: Optional[str] = None
+    ) -> list[tuple[str, str, str, Optional[float]]]:
+        """返回窗口内的 (indicator, economy, date, value) 行（按日期升序），供历史窗口归一化构建立方体。"""
+        conditions: list[str] = []
+        params: list[Any] = []
+        if indicators:
+            conditions.append(
+                "t.indicator_id IN (SELECT key_id FROM series_keys WHERE kind = ? AND code IN ("
+                + ",".join(["?"] * len(indicators)) + "))"
+            )
+            params.extend((_INDICATOR, *indicators))
+        if date_from:
+            conditions.append("t.day >= ?")
+            params.append(to_day(date_from))
+        if date_to:
+            conditions.append("t.day <= ?")
+            params.append(to_day(date_to))
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            # 先按 economy 分组，再按日期倒序取两条
             cur.execute(
-                "SELECT economy, date, value FROM macro_series WHERE indicator = ? ORDER BY economy, date DESC",
-                (indicator,),
+                "SELECT i.code, e.code, t.day, t.value FROM macro_series_data t "
+                "JOIN series_keys i ON i.key_id = t.indicator_id JOIN series_keys e ON e.key_id = t.economy_id "
+                f"{where} ORDER BY t.day",
+                tuple(params),
+            )
+            rows = cur.fetchall()
+        return [(str(ind), str(eco), from_day(d), (float(v) if v is not None else None)) for ind, eco, d, v in rows]
+
+    def fetch_max_date(self, indicators: Optional[list[str]] = None, date_to: Optional[str] = None,
+                       economy: Optional[str] = None) -> Optional[str]:
+        """返回指标序列中（不晚于 date_to 的）最新日期，可按经济体限定。"""
+        conditions: list[str] = []
+        params: list[Any] = []
+        if economy:
+            conditions.append("economy_id = (SELECT key_id FROM series_keys WHERE kind = ? AND code = ?)")
+            params.extend((_ECONOMY, economy.upper()))
+        if indicators:
+            conditions.append(
+                "indicator_id IN (SELECT key_id FROM series_keys WHERE kind = ? AND code IN ("
+                + ",".join(["?"] * len(indicators)) + "))"
             )
-            for eco, _d, v in cur.fetchall():
-                if v is None:
-                    continue
-                key = str(eco)
-                lst = result.setdefault(key, [])
-                if len(lst) < 2:
-                    lst.append(float(v))
-        out: dict[str, tuple[Optional[float], Optional[float]]] = {}
-        for eco, vals in result.items():
-            latest = vals[0] if len(vals) >= 1 else None
-            prev = vals[1] if len(vals) >= 2 else None
-            out[eco] = (latest, prev)
-        return out
+            params.extend((_INDICATOR, *indicators))
+        if date_to:
+            conditions.append("day <= ?")
+            params.append(to_day(date_to))
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT MAX(day) FROM macro_series_data {where}", tuple(params))
+            row = cur.fetchone()
+        return from_day(row[0]) if row and row[0] is not None else None
+
+    def fetch_latest_by_indicator(self, indicator: str) -> dict[str, float]:
+        """读取某指标各经济体的最近值，返回 {economy: value}。
+        若某经济体存在多期，取最新日期；最新一期为空值时不返回该经济体。"""
+        latest, _ = self.fetch_latest_values([indicator])
+        return latest.get(indicator, {})
+
+    def fetch_latest_two_by_indicator(self, indicator: str) -> dict[str, tuple[Optional[float], Optional[float]]]:
+        """读取某指标各经济体最近两期的值，返回 {economy: (latest, prev)}。若不足两期，prev 为 None。"""
+        _, latest_two = self.fetch_latest_values([indicator])
+        return latest_two.get(indicator, {})
 
     def has_any_data(self) -> bool:
         """判断是否已有任一宏观数据。"""
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(1) FROM macro_series", ())
-            cnt = cur.fetchone()[0]
-        return bool(cnt and cnt > 0)
+            cur.execute("SELECT EXISTS (SELECT 1 FROM macro_series_data)", ())
+            found = cur.fetchone()[0]
+        return bool(found)
 
     def upsert_score(self, view: str, entity_type: str, entity_id: str, date: str, score: float, components_json: str | None = None) -> None:
         with self.db.get_connection() as conn:
@@ -279,7 +460,65 @@ class MacroRepository:
     def get_refresh_status(self) -> dict[str, list[dict[str, str]]]:
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT source, refreshed_at, rows FROM refresh_meta ORDER BY id DESC LIMIT 10")
+            cur.execute(
+                "SELECT source, refreshed_at, rows FROM refresh_meta WHERE source != ? ORDER BY id DESC LIMIT 10",
+                (SNAPSHOT_CACHE_SOURCE,),
+            )
             rows = cur.fetchall()
         return {"history": [{"source": str(s), "refreshed_at": str(ts), "rows": str(r)} for (s, ts, r) in rows]}
 
+    # ----------------------
+    # 快照缓存
+    # ----------------------
+    def get_data_version(self) -> str:
+        """数据版本：refresh_meta 最大自增 ID 与 macro_series 写入令牌（均为主键查找，开销极小）。
+
+        refresh_all 会写入一条 refresh_meta 记录使版本前进；bulk_upsert_macro_series 每次写入都会更新
+        data_version 中的令牌，因此绕过 refresh_all 的数据写入同样会使缓存失效。
+        """
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT (SELECT MAX(id) FROM refresh_meta), (SELECT token FROM data_version WHERE name = ?)",
+                (_MACRO_SERIES_VERSION,),
+            )
+            row = cur.fetchone()
+        return f"{int(row[0] or 0)}.{row[1] or '0'}" if row else "0.0"
+
+    def get_snapshot_cache(self, cache_key: str, version: str, now: float) -> Optional[tuple[str, float, float, str]]:
+        """命中时返回 (etag, created_at, expires_at, body)，版本不符或已过期返回 None。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT etag, created_at, expires_at, body FROM snapshot_cache "
+                "WHERE cache_key = ? AND version = ? AND expires_at > ?",
+                (cache_key, version, float(now)),
+            )
+            row = cur.fetchone()
+        return (str(row[0]), float(row[1]), float(row[2]), str(row[3])) if row else None
+
+    def put_snapshot_cache(self, cache_key: str, version: str, etag: str, created_at: float,
+                           expires_at: float, body: str) -> None:
+        """写入/覆盖快照缓存，并顺带清理过期或旧版本的条目。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM snapshot_cache WHERE version != ? OR expires_at <= ?", (version, float(created_at)))
+            cur.execute(
+                "INSERT INTO snapshot_cache (cache_key, version, etag, created_at, expires_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(cache_key) DO UPDATE SET "
+                "version = excluded.version, etag = excluded.etag, created_at = excluded.created_at, "
+                "expires_at = excluded.expires_at, body = excluded.body",
+                (cache_key, version, etag, float(created_at), float(expires_at), body),
+            )
+            conn.commit()
+
+    def invalidate_snapshot_cache(self, refreshed_at: str) -> None:
+        """记录一次缓存失效（使数据版本前进）并清空缓存表。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO refresh_meta (source, refreshed_at, rows) VALUES (?, ?, 0)",
+                (SNAPSHOT_CACHE_SOURCE, refreshed_at),
+            )
+            cur.execute("DELETE FROM snapshot_cache")
+            conn.commit()
@@ -10,24 +10,65 @@
 
 from __future__ import annotations
 
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from .database_service import DatabaseService
 from .macro_repository import MacroRepository
 from .macro_config import ECONOMIES, COMMODITIES, INDICATORS, INDICATOR_WEIGHTS
+from . import macro_normalization as mn
+from utils.timeseries import downsampler, window_start
 from .data_providers.market_provider import fetch_commodities_latest, fetch_fx_latest
 from .data_providers.worldbank_provider import fetch_macro_latest as wb_fetch_macro_latest
 from datetime import datetime, timezone
+import hashlib
+import json
 import time
-import copy
+from dataclasses import dataclass
 
-# 简单的进程内快照缓存（TTL）
-_SNAPSHOT_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+import numpy as np
+
+# 快照缓存：SQLite 表 snapshot_cache 跨进程共享（见 MacroRepository），进程内再保留一层只读条目。
+# 两层均以数据版本（refresh_meta 最大自增 ID / macro_series 写入令牌）校验，refresh_all 写入 refresh_meta 使其整体失效。
+_SNAPSHOT_CACHE: Dict[Tuple[str, str], "SnapshotEntry"] = {}
 _SNAPSHOT_TTL_SECONDS: int = 300  # 5 分钟
-_CACHE_VERSION: int = 0
+
 
 def _make_cache_key(view: str, date: Optional[str], window: Optional[str]) -> str:
-    return f"v{_CACHE_VERSION}|{(view or 'value').lower()}|{date or ''}|{window or ''}"
+    return f"{(view or 'value').lower()}|{date or ''}|{window or ''}"
+
+
+@dataclass(frozen=True)
+class SnapshotEntry:
+    """一份已计算的快照：payload 在进程内共享，调用方只读不改；body 为对应的 JSON 文本。"""
+    payload: Dict[str, Any]
+    body: str
+    etag: str
+    last_modified: float
+    version: str
+    expires_at: float
+
+
+def _serialize(payload: Dict[str, Any]) -> str:
+    # 与 flask.jsonify 一致：键排序、ASCII 转义
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+def filter_snapshot(payload: Dict[str, Any], economies: Optional[List[str]] = None,
+                    indicators: Optional[List[str]] = None) -> Dict[str, Any]:
+    """按经济体/指标过滤快照，返回新的外层结构；未变动的部分与原快照共享，原快照不被修改。"""
+    out = dict(payload)
+    if economies:
+        keep = set(economies)
+        out["economies"] = [e for e in payload["economies"] if e in keep]
+        out["ranking"] = [r for r in payload["ranking"] if r["economy"] in keep]
+        out["matrix"] = {e: payload["matrix"][e] for e in out["economies"] if e in payload["matrix"]}
+    if indicators:
+        keep_ind = set(indicators)
+        out["matrix"] = {
+            e: {**row, "by_indicator": {k: v for k, v in row.get("by_indicator", {}).items() if k in keep_ind}}
+            for e, row in out["matrix"].items()
+        }
+    return out
 
 
 class MacroService:
@@ -40,127 +81,105 @@ class MacroService:
 
     # --------- 对外接口（API/页面使用） ---------
     def get_snapshot(self, view: str = "value", date: Optional[str] = None, window: Optional[str] = None, nocache: bool = False) -> Dict[str, Any]:
-        """返回热力/排行快照（纯真实数据，无样例/兜底）。"""
-        # 缓存命中（仅对未过滤的基础快照做缓存；后置过滤在路由层处理）
+        """返回热力/排行快照（纯真实数据，无样例/兜底）。结果可能为缓存共享对象，调用方不得修改。"""
+        return self.get_snapshot_entry(view=view, date=date, window=window, nocache=nocache).payload
+
+    def get_snapshot_entry(self, view: str = "value", date: Optional[str] = None, window: Optional[str] = None,
+                           nocache: bool = False) -> SnapshotEntry:
+        """返回快照缓存条目（含序列化结果与 ETag），依次查进程内缓存、共享缓存表，均未命中时计算并写回。"""
         cache_key = _make_cache_key(view, date, window)
+        local_key = (str(getattr(self.repo.db, "db_path", "")), cache_key)
         now = time.time()
+        version = self.repo.get_data_version()
         if not nocache:
-            entry = _SNAPSHOT_CACHE.get(cache_key)
-            if entry and entry[0] > now:
-                # 返回深拷贝，避免被路由过滤修改污染缓存
-                return copy.deepcopy(entry[1])
+            entry = _SNAPSHOT_CACHE.get(local_key)
+            if entry and entry.version == version and entry.expires_at > now:
+                return entry
+            shared = self.repo.get_snapshot_cache(cache_key, version, now)
+            if shared:
+                etag, created_at, expires_at, body = shared
+                entry = SnapshotEntry(json.loads(body), body, etag, created_at, version, expires_at)
+                _SNAPSHOT_CACHE[local_key] = entry
+                return entry
+        payload = self._compute_snapshot(view, date, window)
+        body = _serialize(payload)
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()[:20]
+        entry = SnapshotEntry(payload, body, etag, now, version, now + _SNAPSHOT_TTL_SECONDS)
+        try:
+            self.repo.put_snapshot_cache(cache_key, version, etag, now, entry.expires_at, body)
+        except Exception as exc:
+            # 共享缓存写入失败（如只读库）不影响本次结果
+            try:
+                from flask import current_app
+                current_app.logger.warning(f"写入快照缓存失败: {exc}")
+            except Exception:
+                import logging
+                logging.getLogger(__name__).warning(f"写入快照缓存失败: {exc}")
+        _SNAPSHOT_CACHE[local_key] = entry
+        return entry
+
+    def _compute_snapshot(self, view: str, date: Optional[str], window: Optional[str]) -> Dict[str, Any]:
         economies = ECONOMIES
         commodities = COMMODITIES
-        # 计算最新值
-        indicators_directions: List[Tuple[str, int]] = [(k, d) for k, (d, _w) in INDICATORS.items()]
-        latest_values: Dict[str, Dict[str, float]] = {eco: {} for eco in economies}
-        for ind, _dir in indicators_directions:
-            latest_map = self.repo.fetch_latest_by_indicator(ind)
-            for eco in economies:
-                if eco in latest_map:
-                    latest_values[eco][ind] = latest_map[eco]
-
-        # 评分方法：value=min-max; zscore=按z后再min-max到[0,1]; percentile=以各经济体分位映射[0,1]
+        indicators = list(INDICATORS.keys())
+        directions = [INDICATORS[k][0] for k in indicators]
+        weights = [INDICATOR_WEIGHTS.get(k, 1.0) for k in indicators]
+        # 显式窗口：以窗口内历史（日期 × 经济体 × 指标）为参照；否则以最新一期横截面为参照
+        history = None
+        as_of = self.repo.fetch_max_date(indicators, date_to=date) if window else None
+        start = window_start(as_of, window) if as_of else None
+        if start:
+            _dates, history = mn.build_cube(self.repo.fetch_history(indicators, start, as_of), economies, indicators)
+            latest, prev = mn.last_two_observations(history)
+        else:
+            # 单次查询取回全部指标的最新值与最近两期
+            latest_by_indicator, latest_two_by_indicator = self.repo.fetch_latest_values(indicators)
+            latest = mn.build_matrix(latest_by_indicator, economies, indicators)
+            # trend 使用忽略空值后的最近两期（最新一期可能为空）
+            trend_latest = mn.build_matrix({ind: {eco: p[0] for eco, p in by_eco.items()}
+                                            for ind, by_eco in latest_two_by_indicator.items()}, economies, indicators)
+            prev = mn.build_matrix({ind: {eco: p[1] for eco, p in by_eco.items()}
+                                    for ind, by_eco in latest_two_by_indicator.items()}, economies, indicators)
+
+        # 评分方法：value=min-max; zscore=按z后再min-max到[0,1]; percentile=平均秩分位; trend=最近两期差分
         method = (view or "value").lower()
-        indicator_scores: Dict[str, Dict[str, float]] = {eco: {} for eco in economies}
-        for ind, direction in indicators_directions:
-            vals: List[float] = [latest_values[eco].get(ind) for eco in economies if ind in latest_values[eco]]
-            if not vals:
-                continue
-            if method == "trend":
-                # 用最近两期差分做方向一致化后映射：正向指标用 (latest-prev)，负向指标用 (prev-latest)
-                two_map = self.repo.fetch_latest_two_by_indicator(ind)
-                diffs: Dict[str, float] = {}
-                for eco in economies:
-                    latest_prev = two_map.get(eco)
-                    if not latest_prev:
-                        continue
-                    latest_v, prev_v = latest_prev
-                    if latest_v is None or prev_v is None:
-                        continue
-                    raw_diff = latest_v - prev_v
-                    aligned_diff = raw_diff if direction >= 0 else (-raw_diff)
-                    diffs[eco] = aligned_diff
-                if not diffs:
-                    continue
-                dmin = min(diffs.values())
-                dmax = max(diffs.values())
-                dspan = dmax - dmin
-                for eco, dv in diffs.items():
-                    norm = 0.5 if dspan == 0 else (dv - dmin) / dspan
-                    indicator_scores[eco][ind] = max(0.0, min(1.0, norm))
-                continue
-            if method == "zscore":
-                mean_value = sum(vals) / len(vals)
-                variance = sum((v - mean_value) ** 2 for v in vals) / len(vals)
-                std_dev = variance ** 0.5
-                zs = [0.0 if std_dev == 0 else (v - mean_value) / std_dev for v in vals]
-                z_min, z_max = min(zs), max(zs)
-                z_span = z_max - z_min
-            elif method == "percentile":
-                sorted_values = sorted(vals)
+        if method == "trend":
+            if history is None:
+                scores = mn.normalize("trend", trend_latest, directions, prev=prev)
             else:
-                v_min, v_max = min(vals), max(vals)
-                v_span = v_max - v_min
-
-            for eco in economies:
-                v = latest_values[eco].get(ind)
-                if v is None:
-                    continue
-                if method == "zscore":
-                    if std_dev == 0 or z_span == 0:
-                        norm = 0.5
-                    else:
-                        z = (v - mean_value) / std_dev
-                        norm = (z - z_min) / z_span
-                elif method == "percentile":
-                    try:
-                        idx = sorted_values.index(v)
-                    except ValueError:
-                        idx = 0
-                    n = len(sorted_values)
-                    norm = (idx / (n - 1)) if n > 1 else 0.5
-                else:
-                    if v_span == 0:
-                        norm = 0.5
-                    else:
-                        norm = (v - v_min) / v_span
-                aligned = norm if direction >= 0 else (1.0 - norm)
-                indicator_scores[eco][ind] = max(0.0, min(1.0, aligned))
-
-        matrix: Dict[str, Dict[str, Any]] = {}
-        ranking: List[Dict[str, Any]] = []
-        for eco in economies:
-            # 加权均值（默认权重 1.0）
-            comps = []
-            weights = []
-            for ind, score01 in indicator_scores[eco].items():
-                comps.append(score01)
-                weights.append(INDICATOR_WEIGHTS.get(ind, 1.0))
-            comp = (sum(c*w for c, w in zip(comps, weights)) / (sum(weights) or 1.0) * 100.0) if comps else 0.0
-            matrix[eco] = {
-                "composite": round(comp, 1),
-                "by_indicator": {ind: round(val * 100.0, 1) for ind, val in indicator_scores[eco].items()},
-            }
-            ranking.append({"economy": eco, "score": round(comp, 1)})
-        ranking.sort(key=lambda x: x["score"], reverse=True)
+                scores = mn.normalize("trend", latest, directions, prev=prev, history=history)
+            # 与最新值口径一致：某指标无任何最新值时不参与
+            scores[:, np.all(np.isnan(latest), axis=0)] = np.nan
+        else:
+            scores = mn.normalize(method, latest, directions, history=history)
+        matrix, ranking = mn.snapshot_tables(economies, indicators, scores, weights)
         payload = {
             "as_of": date or "",
             "view": view,
-            "window": window or "3y",
+            # 按请求回报窗口；未指定窗口时以最新一期横截面为参照
+            "window": window or "latest",
             "economies": economies,
             "commodities": commodities,
             "matrix": matrix,
             "ranking": ranking,
         }
-        # 写缓存
-        _SNAPSHOT_CACHE[cache_key] = (now + _SNAPSHOT_TTL_SECONDS, copy.deepcopy(payload))
         return payload
 
-    def get_country(self, economy: str, window: str = "3y") -> Dict[str, Any]:
-        """返回单个经济体关键指标时间序列与综合分（MVP 实装：回读已种子数据）。"""
+    def get_country(self, economy: str, window: str = "3y", points: Optional[int] = None,
+                    downsample: str = "lttb", fmt: str = "rows") -> Dict[str, Any]:
+        """返回单个经济体关键指标时间序列与综合分（MVP 实装：回读已种子数据）。
+
+        序列按窗口截取（以该经济体最新日期为锚点）；points 指定时每个指标服务端降采样；
+        fmt 非 rows 时每个指标为列式 {dates: [...], value: [...]}。
+        """
         eco = economy.upper()
-        series = self.repo.fetch_macro_series_by_economy(eco)
+        as_of = self.repo.fetch_max_date(economy=eco)
+        start = window_start(as_of, window) if as_of else None
+        columnar = fmt != "rows"
+        series = self.repo.fetch_macro_series_by_economy(eco, start=start, columnar=columnar)
+        if points:
+            sample = downsampler(columnar)
+            series = {ind: sample(rows, points, "value", downsample) for ind, rows in series.items()}
         composite: List[Dict[str, Any]] = []
         # MVP: 若存在任一指标序列，则给出单点 100 分，否则 0 分
         composite.append({"date": "latest", "value": 100.0 if series else 0.0})
@@ -211,6 +230,7 @@ class MacroService:
     def refresh_all(self) -> Dict[str, Any]:
         # 使用 Provider 获取最新市场数据；失败时不落任何数据
         ts = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        partial: Dict[str, Any] = {}
         try:
             com_rows = fetch_commodities_latest()
             if com_rows:
@@ -229,16 +249,30 @@ class MacroService:
         try:
             from .macro_config import ECONOMIES as _ECOS
             indicators = [name for name in INDICATORS.keys() if name in ("cpi_yoy", "unemployment", "gdp_yoy")]
-            wb_rows = wb_fetch_macro_latest(_ECOS, indicators)
+            wb_failed: Dict[Tuple[str, str], str] = {}
+            wb_rows = wb_fetch_macro_latest(_ECOS, indicators, failed=wb_failed)
             if wb_rows:
                 self.repo.bulk_upsert_macro_series(wb_rows)
                 self.repo.record_refresh("worldbank", ts, len(wb_rows))
+            if wb_failed:
+                partial["worldbank"] = {
+                    "fetched": len(wb_rows or []),
+                    "failed": {f"{eco}:{ind}": reason for (eco, ind), reason in sorted(wb_failed.items())},
+                }
+                try:
+                    from flask import current_app
+                    current_app.logger.warning(f"WorldBank 部分抓取失败: {len(wb_failed)} 项")
+                except Exception:
+                    import logging
+                    logging.getLogger(__name__).warning(f"WorldBank 部分抓取失败: {len(wb_failed)} 项")
         except (RuntimeError, ValueError):
             pass
-        # 刷新后失效缓存（版本+清空）
-        global _CACHE_VERSION
-        _CACHE_VERSION += 1
+        # 刷新后失效缓存：写入 refresh_meta 使数据版本前进（所有进程可见），并清空本进程条目
+        self.repo.invalidate_snapshot_cache(ts)
         _SNAPSHOT_CACHE.clear()
-        return {"refreshed": True, "message": "Refresh completed.", "cache_invalidated": True}
+        result: Dict[str, Any] = {"refreshed": True, "message": "Refresh completed.", "cache_invalidated": True}
+        if partial:
+            result["partial"] = partial
+        return result
 
 
@@ -8,14 +8,93 @@
 
 from __future__ import annotations
 
-from typing import Any, Iterable
+import threading
+import uuid
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Iterable, Mapping
 
+from .compact_storage import MIN_DAY, from_day, migrate_to_view, object_kind, sql_date, sql_day, to_day, to_day_or_min
 from .database_service import DatabaseService
 from config import Config
+from utils.timeseries import rows_to_columns
+
+# 列式输出的列名（与 SELECT 顺序一致）
+_PRICE_COLUMNS = ("date", "close", "close_tr", "currency", "close_usd", "close_usd_tr")
+_SCORE_COLUMNS = ("date", "score", "components_json")
+_RS_COLUMNS = (
+    "date", "r1m", "r3m", "r6m", "r12m", "composite_score",
+    "rs_rank_market", "rs_rank_global",
+    "rs_line", "rs_line_ma_21", "rs_line_ma_50", "rs_line_slope",
+    "entry_signal", "exit_signal", "stop_level", "target_level",
+)
+# 时序表：兼容视图名 → (物理表名, 数据列及类型)；物理表以 (symbol_id, day) 为 WITHOUT ROWID 主键
+_PRICE_FIELDS = (
+    ("close", "REAL"), ("close_tr", "REAL"), ("currency", "TEXT"),
+    ("close_usd", "REAL"), ("close_usd_tr", "REAL"), ("adj_factor", "REAL"),
+)
+_SCORE_FIELDS = (("score", "REAL"), ("components_json", "TEXT"))
+_RS_FIELDS = tuple(
+    (c, "INTEGER" if c in ("rs_rank_market", "rs_rank_global", "entry_signal", "exit_signal") else "REAL")
+    for c in _RS_COLUMNS[1:]
+)
+_SERIES_TABLES = {
+    "index_prices": ("index_prices_data", _PRICE_FIELDS),
+    "trend_scores": ("trend_scores_data", _SCORE_FIELDS),
+    "rs_scores": ("rs_scores_data", _RS_FIELDS),
+}
+_EMPTY_COVERAGE = {"min_date": None, "max_date": None, "has_usd": False, "has_tr": False, "has_usd_tr": False}
+
+# 交易日历：版本令牌存于 meso_settings，任何日历写入都会更新；共同开市日缓存按版本失效
+_CALENDAR_VERSION_KEY = "market_calendar_version"
+_ALL_DATES = ("0000-00-00", "9999-99-99")
+_COMMON_DATES_CACHE: "OrderedDict[tuple, tuple[str, ...]]" = OrderedDict()
+_COMMON_DATES_CACHE_SIZE = 64
+_COMMON_DATES_LOCK = threading.Lock()
+# 价格数据版本令牌（meso_settings）：任何价格写入/调整/删除都会更新，供价格矩阵等派生数据校验新鲜度
+_PRICE_VERSION_KEY = "price_data_version"
+# 排名快照的来源键（meso_settings）：构建时的 价格版本|日历版本|全局起始日期，与当前值一致时快照有效
+_RANKING_SOURCE_KEY = "ranking_snapshots_source"
+
+
+def _opt_float(value: Any) -> float | None:
+    return None if value is None else float(value)
+
+
+def _opt_int(value: Any) -> int | None:
+    return None if value is None else int(value)
+
+
+def _series_ddl(name: str, physical: str, fields: tuple[tuple[str, str], ...]) -> tuple[str, list[str], str]:
+    """返回 (物理表 DDL, 旧表搬迁语句, 兼容视图 DDL)。"""
+    cols = ", ".join(f for f, _ in fields)
+    physical_ddl = (
+        f"CREATE TABLE IF NOT EXISTS {physical} (symbol_id INTEGER NOT NULL, day INTEGER NOT NULL, "
+        + ", ".join(f"{f} {t}" for f, t in fields)
+        + ", PRIMARY KEY (symbol_id, day)) WITHOUT ROWID"
+    )
+    copy_sqls = [
+        f"INSERT OR IGNORE INTO meso_symbols (symbol) SELECT DISTINCT symbol FROM {name} WHERE symbol IS NOT NULL",
+        f"INSERT OR REPLACE INTO {physical} (symbol_id, day, {cols}) "
+        f"SELECT s.symbol_id, {sql_day('t.date')}, " + ", ".join(f"t.{f}" for f, _ in fields)
+        + f" FROM {name} t JOIN meso_symbols s ON s.symbol = t.symbol"
+        f" WHERE julianday(t.date) IS NOT NULL ORDER BY s.symbol_id, t.date",
+    ]
+    view_sql = (
+        f"CREATE VIEW IF NOT EXISTS {name} AS SELECT s.symbol AS symbol, {sql_date('t.day')} AS date, "
+        + ", ".join(f"t.{f}" for f, _ in fields)
+        + f" FROM {physical} t JOIN meso_symbols s ON s.symbol_id = t.symbol_id"
+    )
+    return physical_ddl, copy_sqls, view_sql
 
 
 class MesoRepository:
-    def __init__(self):
+    def __init__(self, db: DatabaseService | None = None):
+        if db is not None:
+            self.db = db
+            self._ensure_tables()
+            return
         # 强制使用独立库
         try:
             from flask import current_app
@@ -73,80 +152,98 @@ class MesoRepository:
                 )
                 """
             )
+            # 时序表：symbol 字典编码为整数 id、日期存为整数日序号，(symbol_id, day) 为 WITHOUT ROWID 主键；
+            # 旧库中的同名表搬迁后改为兼容视图（symbol, date, ...），仓储读写直接访问物理表
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS index_prices (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    close REAL,
-                    close_tr REAL,
-                    currency TEXT,
-                    close_usd REAL,
-                    close_usd_tr REAL,
-                    adj_factor REAL,
-                    UNIQUE(symbol, date)
+                CREATE TABLE IF NOT EXISTS meso_symbols (
+                    symbol_id INTEGER PRIMARY KEY,
+                    symbol TEXT NOT NULL UNIQUE
                 )
                 """
             )
-            try:
-                cur.execute("ALTER TABLE index_prices ADD COLUMN adj_factor REAL")
-            except Exception:
-                pass
-            # 旧库补列：close_tr / close_usd_tr
-            try:
-                cur.execute("ALTER TABLE index_prices ADD COLUMN close_tr REAL")
-            except Exception:
-                pass
-            try:
-                cur.execute("ALTER TABLE index_prices ADD COLUMN close_usd_tr REAL")
-            except Exception:
-                pass
+            if object_kind(cur, "index_prices") == "table":
+                # 旧库补列后再搬迁：adj_factor / close_tr / close_usd_tr
+                for col in ("adj_factor", "close_tr", "close_usd_tr"):
+                    try:
+                        cur.execute(f"ALTER TABLE index_prices ADD COLUMN {col} REAL")
+                    except Exception:
+                        pass
+            for name, (physical, fields) in _SERIES_TABLES.items():
+                migrate_to_view(cur, name, *_series_ddl(name, physical, fields))
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS trend_scores (
+                CREATE TABLE IF NOT EXISTS refresh_meta (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    score REAL,
-                    components_json TEXT,
-                    UNIQUE(symbol, date)
+                    source TEXT NOT NULL,
+                    refreshed_at TEXT NOT NULL,
+                    rows INTEGER DEFAULT 0
                 )
                 """
             )
-            # O'Neil 风格相对强弱（RS）分数与序列（独立于 trend_scores）
+            # 物化交易日历：市场（index_metadata.market，大写）× 日期，has_usd_price 表示当日该市场
+            # 至少一个标的有 USD 价格；由价格/元数据写入维护
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='market_calendar'")
+            calendar_missing = cur.fetchone() is None
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS rs_scores (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
+                CREATE TABLE IF NOT EXISTS market_calendar (
+                    market TEXT NOT NULL,
                     date TEXT NOT NULL,
-                    r1m REAL,
-                    r3m REAL,
-                    r6m REAL,
-                    r12m REAL,
-                    composite_score REAL,
-                    rs_rank_market INTEGER,
-                    rs_rank_global INTEGER,
-                    rs_line REAL,
-                    rs_line_ma_21 REAL,
-                    rs_line_ma_50 REAL,
-                    rs_line_slope REAL,
-                    entry_signal INTEGER,
-                    exit_signal INTEGER,
-                    stop_level REAL,
-                    target_level REAL,
-                    UNIQUE(symbol, date)
+                    has_usd_price INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (market, date)
+                ) WITHOUT ROWID
+                """
+            )
+            if calendar_missing:
+                # 旧库迁移：按已有价格一次性回填
+                self._rebuild_market_calendar(cur)
+            # 排名快照：scope 为 asset_class / equity_market / equity_category:<MARKET>，
+            # 每个共同开市日按名次存储各分组的综合分（由刷新流程整体重建）
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ranking_snapshots (
+                    scope TEXT NOT NULL,
+                    return_mode TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    group_key TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (scope, return_mode, day, rank)
+                ) WITHOUT ROWID
+                """
+            )
+            # 名次历史：按分组取全部日期
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ranking_snapshots_group "
+                "ON ranking_snapshots(scope, return_mode, group_key, day)"
+            )
+            # 价格请求覆盖：各标的已向数据源请求过的最早日期（早于此的缺口才需回补；旧库无记录时以已存最早日期为准）
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS price_fetch_coverage (
+                    symbol_id INTEGER PRIMARY KEY,
+                    first_day INTEGER NOT NULL
                 )
                 """
             )
+            # 本地汇率库：币种→USD 日汇率（USD 恒为 1.0，不存储）；fx_rates_coverage 记录各币种已向数据源
+            # 请求过的最早日期，已存汇率的最大日期即增量起点，刷新只请求这两端之外的缺口
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS refresh_meta (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source TEXT NOT NULL,
-                    refreshed_at TEXT NOT NULL,
-                    rows INTEGER DEFAULT 0
+                CREATE TABLE IF NOT EXISTS fx_rates_usd (
+                    currency TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    rate REAL NOT NULL,
+                    PRIMARY KEY (currency, day)
+                ) WITHOUT ROWID
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fx_rates_coverage (
+                    currency TEXT PRIMARY KEY,
+                    first_day INTEGER NOT NULL
                 )
                 """
             )
@@ -155,223 +252,284 @@ class MesoRepository:
     def upsert_index_prices(self, rows: list[dict[str, Any]]) -> int:
         if not rows:
             return 0
+        return self.upsert_index_prices_batched([rows])
+
+    def upsert_index_prices_batched(self, batches: Iterable[list[dict[str, Any]]]) -> int:
+        """在同一事务内逐批写入价格行（batches 可为生成器，内存只保留当前批）；全部写入后按受影响的市场与
+        日期范围重建一次交易日历，并各更新一次日历与价格版本。"""
+        n = 0
+        symbols: set[str] = set()
+        date_from: str | None = None
+        date_to: str | None = None
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.executemany(
-                """
-                INSERT OR REPLACE INTO index_prices (symbol, date, close, close_tr, currency, close_usd, close_usd_tr, adj_factor)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    (
-                        r.get("symbol"),
-                        r.get("date"),
-                        float(r.get("close")) if r.get("close") is not None else None,
-                        float(r.get("close_tr")) if r.get("close_tr") is not None else None,
-                        r.get("currency"),
-                        float(r.get("close_usd")) if r.get("close_usd") is not None else None,
-                        float(r.get("close_usd_tr")) if r.get("close_usd_tr") is not None else None,
-                        float(r.get("adj_factor")) if r.get("adj_factor") is not None else None,
-                    )
-                    for r in rows
-                ],
-            )
+            for rows in batches:
+                if not rows:
+                    continue
+                n += self._upsert_series(cur, "index_prices", rows, lambda r: (
+                    _opt_float(r.get("close")),
+                    _opt_float(r.get("close_tr")),
+                    r.get("currency"),
+                    _opt_float(r.get("close_usd")),
+                    _opt_float(r.get("close_usd_tr")),
+                    _opt_float(r.get("adj_factor")),
+                ))
+                symbols.update(r.get("symbol") for r in rows)
+                dates = [str(r.get("date")) for r in rows if r.get("date")]
+                if dates:
+                    date_from = min(dates) if date_from is None else min(date_from, min(dates))
+                    date_to = max(dates) if date_to is None else max(date_to, max(dates))
+            if not symbols:
+                return 0
+            if date_from is not None:
+                self._rebuild_market_calendar(cur, symbols=symbols, date_from=date_from, date_to=date_to)
+            self._bump_token(cur, _PRICE_VERSION_KEY)
             conn.commit()
-            return cur.rowcount or 0
+            return n
 
     def upsert_trend_scores(self, rows: list[dict[str, Any]]) -> int:
         if not rows:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.executemany(
-                """
-                INSERT OR REPLACE INTO trend_scores (symbol, date, score, components_json)
-                VALUES (?, ?, ?, ?)
-                """,
-                [
-                    (
-                        r.get("symbol"),
-                        r.get("date"),
-                        float(r.get("score")) if r.get("score") is not None else None,
-                        r.get("components_json"),
-                    )
-                    for r in rows
-                ],
-            )
+            n = self._upsert_series(cur, "trend_scores", rows, lambda r: (
+                _opt_float(r.get("score")),
+                r.get("components_json"),
+            ))
             conn.commit()
-            return cur.rowcount or 0
+            return n
 
     def upsert_rs_scores(self, rows: list[dict[str, Any]]) -> int:
         if not rows:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.executemany(
-                """
-                INSERT OR REPLACE INTO rs_scores (
-                    symbol, date,
-                    r1m, r3m, r6m, r12m,
-                    composite_score,
-                    rs_rank_market, rs_rank_global,
-                    rs_line, rs_line_ma_21, rs_line_ma_50, rs_line_slope,
-                    entry_signal, exit_signal,
-                    stop_level, target_level
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                [
-                    (
-                        r.get("symbol"),
-                        r.get("date"),
-                        None if r.get("r1m") is None else float(r.get("r1m")),
-                        None if r.get("r3m") is None else float(r.get("r3m")),
-                        None if r.get("r6m") is None else float(r.get("r6m")),
-                        None if r.get("r12m") is None else float(r.get("r12m")),
-                        None if r.get("composite_score") is None else float(r.get("composite_score")),
-                        None if r.get("rs_rank_market") is None else int(r.get("rs_rank_market")),
-                        None if r.get("rs_rank_global") is None else int(r.get("rs_rank_global")),
-                        None if r.get("rs_line") is None else float(r.get("rs_line")),
-                        None if r.get("rs_line_ma_21") is None else float(r.get("rs_line_ma_21")),
-                        None if r.get("rs_line_ma_50") is None else float(r.get("rs_line_ma_50")),
-                        None if r.get("rs_line_slope") is None else float(r.get("rs_line_slope")),
-                        None if r.get("entry_signal") is None else int(bool(r.get("entry_signal"))),
-                        None if r.get("exit_signal") is None else int(bool(r.get("exit_signal"))),
-                        None if r.get("stop_level") is None else float(r.get("stop_level")),
-                        None if r.get("target_level") is None else float(r.get("target_level")),
-                    )
-                    for r in rows
-                ],
-            )
+            n = self._upsert_series(cur, "rs_scores", rows, lambda r: (
+                _opt_float(r.get("r1m")),
+                _opt_float(r.get("r3m")),
+                _opt_float(r.get("r6m")),
+                _opt_float(r.get("r12m")),
+                _opt_float(r.get("composite_score")),
+                _opt_int(r.get("rs_rank_market")),
+                _opt_int(r.get("rs_rank_global")),
+                _opt_float(r.get("rs_line")),
+                _opt_float(r.get("rs_line_ma_21")),
+                _opt_float(r.get("rs_line_ma_50")),
+                _opt_float(r.get("rs_line_slope")),
+                None if r.get("entry_signal") is None else int(bool(r.get("entry_signal"))),
+                None if r.get("exit_signal") is None else int(bool(r.get("exit_signal"))),
+                _opt_float(r.get("stop_level")),
+                _opt_float(r.get("target_level")),
+            ))
             conn.commit()
-            return cur.rowcount or 0
+            return n
+
+    @staticmethod
+    def _symbol_ids(cur, symbols: Iterable[str], create: bool = False) -> dict[str, int]:
+        """symbol → symbol_id（create=True 时为新 symbol 分配 id）。"""
+        syms = list(dict.fromkeys(s for s in symbols if s))
+        if not syms:
+            return {}
+        if create:
+            cur.executemany("INSERT OR IGNORE INTO meso_symbols (symbol) VALUES (?)", [(s,) for s in syms])
+        cur.execute(f"SELECT symbol, symbol_id FROM meso_symbols WHERE symbol IN ({','.join('?' * len(syms))})", syms)
+        return {r[0]: r[1] for r in cur.fetchall()}
+
+    def _upsert_series(self, cur, name: str, rows: list[dict[str, Any]], values) -> int:
+        """按 (symbol_id, day) 写入时序物理表；values(r) 返回数据列取值（顺序同 _SERIES_TABLES）。"""
+        physical, fields = _SERIES_TABLES[name]
+        ids = self._symbol_ids(cur, (r.get("symbol") for r in rows), create=True)
+        cur.executemany(
+            f"INSERT OR REPLACE INTO {physical} (symbol_id, day, {', '.join(f for f, _ in fields)}) "
+            f"VALUES ({', '.join('?' * (len(fields) + 2))})",
+            [(ids[r.get("symbol")], to_day(r.get("date")), *values(r)) for r in rows],
+        )
+        return cur.rowcount or 0
 
     def get_latest_price_date(self, symbol: str) -> str | None:
-        with self.db.get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT MAX(date) FROM index_prices WHERE symbol=?", (symbol,))
-            row = cur.fetchone()
-            return row[0] if row and row[0] else None
+        return self._latest_dates("index_prices", [symbol]).get(symbol)
 
     def get_latest_score_date(self, symbol: str) -> str | None:
+        return self._latest_dates("trend_scores", [symbol]).get(symbol)
+
+    def fetch_prices(self, symbol: str, start: str | None = None, columnar: bool = False):
+        """读取价格序列；columnar=True 时直接由游标元组转置为 {dates: [...], close: [...], ...}。"""
+        return self._fetch_many("index_prices", _PRICE_COLUMNS, [symbol], start, columnar)[symbol]
+
+    def get_price_bounds(self, symbols: list[str]) -> dict[str, dict[str, str | None]]:
+        """一次查询返回 {symbol: {first_date, last_date, requested_from}}（均按主键定位，不扫描序列）；
+        既无价格也无请求记录的 symbol 不出现。"""
+        syms = list(dict.fromkeys(s for s in symbols or [] if s))
+        if not syms:
+            return {}
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT MAX(date) FROM trend_scores WHERE symbol=?", (symbol,))
-            row = cur.fetchone()
-            return row[0] if row and row[0] else None
+            cur.execute(
+                f"""
+                SELECT s.symbol,
+                       (SELECT MIN(t.day) FROM index_prices_data t WHERE t.symbol_id = s.symbol_id),
+                       (SELECT MAX(t.day) FROM index_prices_data t WHERE t.symbol_id = s.symbol_id),
+                       (SELECT c.first_day FROM price_fetch_coverage c WHERE c.symbol_id = s.symbol_id)
+                FROM meso_symbols s WHERE s.symbol IN ({','.join('?' * len(syms))})
+                """,
+                syms,
+            )
+            rows = cur.fetchall()
+        return {
+            r[0]: {
+                "first_date": from_day(r[1]) if r[1] is not None else None,
+                "last_date": from_day(r[2]) if r[2] is not None else None,
+                "requested_from": from_day(r[3]) if r[3] is not None else None,
+            }
+            for r in rows
+            if r[1] is not None or r[3] is not None
+        }
 
-    def fetch_prices(self, symbol: str, start: str | None = None) -> list[dict[str, Any]]:
+    def record_price_requests(self, starts: Mapping[str, str]) -> None:
+        """记录 {symbol: 本次请求起点}，已请求最早日期只向前扩展。"""
+        items = [(sym, d) for sym, d in (starts or {}).items() if sym and d]
+        if not items:
+            return
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            if start:
-                cur.execute(
-                    "SELECT date, close, close_tr, currency, close_usd, close_usd_tr FROM index_prices WHERE symbol=? AND date>=? ORDER BY date",
-                    (symbol, start),
-                )
-            else:
-                cur.execute(
-                    "SELECT date, close, close_tr, currency, close_usd, close_usd_tr FROM index_prices WHERE symbol=? ORDER BY date",
-                    (symbol,),
-                )
-            rows = cur.fetchall()
-        return [
-            {"date": r[0], "close": r[1], "close_tr": r[2], "currency": r[3], "close_usd": r[4], "close_usd_tr": r[5]} for r in rows
-        ]
+            ids = self._symbol_ids(cur, (sym for sym, _ in items), create=True)
+            cur.executemany(
+                "INSERT INTO price_fetch_coverage (symbol_id, first_day) VALUES (?, ?) "
+                "ON CONFLICT(symbol_id) DO UPDATE SET first_day = MIN(first_day, excluded.first_day)",
+                [(ids[sym], to_day(d)) for sym, d in items],
+            )
+            conn.commit()
 
     def get_price_date_range(self, symbol: str) -> dict[str, Any]:
         """
         返回该 symbol 的历史数据范围（最早/最晚日期），同时返回是否存在 USD 与 TR 序列。
         """
+        return self.get_price_coverage([symbol]).get(symbol, dict(_EMPTY_COVERAGE))
+
+    def get_price_coverage(self, symbols: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        """
+        一次分组查询返回多个 symbol 的数据覆盖（min_date/max_date/has_usd/has_tr/has_usd_tr）。
+
+        symbols 为空时返回全部有价格的 symbol；无价格数据的 symbol 不出现在结果中。
+        """
+        where, params = "", []
+        if symbols is not None:
+            if not symbols:
+                return {}
+            where = f"WHERE s.symbol IN ({','.join('?' * len(symbols))})"
+            params = list(symbols)
         with self.db.get_connection() as conn:
             cur = conn.cursor()
             cur.execute(
-                """
-                SELECT MIN(date), MAX(date),
-                       SUM(CASE WHEN close_usd IS NOT NULL THEN 1 ELSE 0 END),
-                       SUM(CASE WHEN close_tr IS NOT NULL THEN 1 ELSE 0 END),
-                       SUM(CASE WHEN close_usd_tr IS NOT NULL THEN 1 ELSE 0 END)
-                FROM index_prices WHERE symbol=?
+                f"""
+                SELECT s.symbol, MIN(t.day), MAX(t.day),
+                       MAX(t.close_usd IS NOT NULL), MAX(t.close_tr IS NOT NULL), MAX(t.close_usd_tr IS NOT NULL)
+                FROM index_prices_data t JOIN meso_symbols s ON s.symbol_id = t.symbol_id {where}
+                GROUP BY t.symbol_id
                 """,
-                (symbol,),
+                params,
             )
-            row = cur.fetchone()
-        if not row:
-            return {"min_date": None, "max_date": None, "has_usd": False, "has_tr": False, "has_usd_tr": False}
+            rows = cur.fetchall()
         return {
-            "min_date": row[0],
-            "max_date": row[1],
-            "has_usd": bool(row[2] and row[2] > 0),
-            "has_tr": bool(row[3] and row[3] > 0),
-            "has_usd_tr": bool(row[4] and row[4] > 0),
+            r[0]: {
+                "min_date": from_day(r[1]),
+                "max_date": from_day(r[2]),
+                "has_usd": bool(r[3]),
+                "has_tr": bool(r[4]),
+                "has_usd_tr": bool(r[5]),
+            }
+            for r in rows
         }
 
-    def fetch_scores(self, symbol: str, start: str | None = None) -> list[dict[str, Any]]:
-        with self.db.get_connection() as conn:
-            cur = conn.cursor()
-            if start:
-                cur.execute(
-                    "SELECT date, score, components_json FROM trend_scores WHERE symbol=? AND date>=? ORDER BY date",
-                    (symbol, start),
-                )
-            else:
-                cur.execute(
-                    "SELECT date, score, components_json FROM trend_scores WHERE symbol=? ORDER BY date",
-                    (symbol,),
-                )
-            rows = cur.fetchall()
-        return [
-            {"date": r[0], "score": r[1], "components_json": r[2]} for r in rows
-        ]
+    def fetch_scores(self, symbol: str, start: str | None = None, columnar: bool = False):
+        """读取趋势分序列；columnar=True 时返回 {dates: [...], score: [...], components_json: [...]}。"""
+        return self._fetch_many("trend_scores", _SCORE_COLUMNS, [symbol], start, columnar)[symbol]
 
     def fetch_rs_scores(self, symbol: str, start: str | None = None) -> list[dict[str, Any]]:
+        return self._fetch_many("rs_scores", _RS_COLUMNS, [symbol], start, False)[symbol]
+
+    def get_latest_rs_date(self, symbol: str) -> str | None:
+        return self._latest_dates("rs_scores", [symbol]).get(symbol)
+
+    # ----------------------
+    # 多标的批量读取
+    # ----------------------
+    def get_latest_price_dates(self, symbols: list[str]) -> dict[str, str]:
+        """一次分组查询返回 {symbol: 最新价格日期}（无数据的 symbol 不出现）。"""
+        return self._latest_dates("index_prices", symbols)
+
+    def get_latest_score_dates(self, symbols: list[str]) -> dict[str, str]:
+        """一次分组查询返回 {symbol: 最新趋势分日期}。"""
+        return self._latest_dates("trend_scores", symbols)
+
+    def fetch_prices_many(self, symbols: list[str], start: str | Mapping[str, str | None] | None = None,
+                          columnar: bool = False) -> dict[str, Any]:
+        """批量读取多个标的价格，返回 {symbol: fetch_prices 同结构}；start 可为统一起点或 {symbol: 起点}。"""
+        return self._fetch_many("index_prices", _PRICE_COLUMNS, symbols, start, columnar)
+
+    def fetch_scores_many(self, symbols: list[str], start: str | Mapping[str, str | None] | None = None,
+                          columnar: bool = False) -> dict[str, Any]:
+        """批量读取多个标的趋势分，返回 {symbol: fetch_scores 同结构}。"""
+        return self._fetch_many("trend_scores", _SCORE_COLUMNS, symbols, start, columnar)
+
+    def fetch_rs_scores_many(self, symbols: list[str], start: str | Mapping[str, str | None] | None = None,
+                             columnar: bool = False) -> dict[str, Any]:
+        """批量读取多个标的相对强度，返回 {symbol: fetch_rs_scores 同结构}。"""
+        return self._fetch_many("rs_scores", _RS_COLUMNS, symbols, start, columnar)
+
+    def _latest_dates(self, table: str, symbols: list[str]) -> dict[str, str]:
+        syms = list(dict.fromkeys(s for s in symbols or [] if s))
+        if not syms:
+            return {}
+        physical, _ = _SERIES_TABLES[table]
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            if start:
-                cur.execute(
-                    """
-                    SELECT date, r1m, r3m, r6m, r12m, composite_score,
-                           rs_rank_market, rs_rank_global,
-                           rs_line, rs_line_ma_21, rs_line_ma_50, rs_line_slope,
-                           entry_signal, exit_signal, stop_level, target_level
-                    FROM rs_scores
-                    WHERE symbol=? AND date>=? ORDER BY date
-                    """,
-                    (symbol, start),
-                )
-            else:
-                cur.execute(
-                    """
-                    SELECT date, r1m, r3m, r6m, r12m, composite_score,
-                           rs_rank_market, rs_rank_global,
-                           rs_line, rs_line_ma_21, rs_line_ma_50, rs_line_slope,
-                           entry_signal, exit_signal, stop_level, target_level
-                    FROM rs_scores
-                    WHERE symbol=? ORDER BY date
-                    """,
-                    (symbol,),
-                )
-            rows = cur.fetchall()
-        keys = [
-            "date", "r1m", "r3m", "r6m", "r12m", "composite_score",
-            "rs_rank_market", "rs_rank_global",
-            "rs_line", "rs_line_ma_21", "rs_line_ma_50", "rs_line_slope",
-            "entry_signal", "exit_signal", "stop_level", "target_level",
-        ]
-        out: list[dict[str, Any]] = []
-        for r in rows:
-            item = {}
-            for i, k in enumerate(keys):
-                item[k] = r[i]
-            out.append(item)
-        return out
+            cur.execute(
+                f"""
+                SELECT s.symbol, MAX(t.day) FROM meso_symbols s JOIN {physical} t ON t.symbol_id = s.symbol_id
+                WHERE s.symbol IN ({','.join('?' * len(syms))}) GROUP BY s.symbol_id
+                """,
+                syms,
+            )
+            return {r[0]: from_day(r[1]) for r in cur.fetchall() if r[1] is not None}
 
-    def get_latest_rs_date(self, symbol: str) -> str | None:
+    def _fetch_many(self, table: str, columns: tuple[str, ...], symbols: list[str],
+                    start: str | Mapping[str, str | None] | None, columnar: bool) -> dict[str, Any]:
+        """单条查询读取多个标的：(symbol_id, day) 主键上的按标的范围扫描，结果按 (symbol_id, day) 有序，流式切分。
+
+        每个标的的起始日期不同（如各自按最新日期回推窗口）时，通过 VALUES 参数表逐标的连接。
+        """
+        syms = list(dict.fromkeys(s for s in symbols or [] if s))
+        if not syms:
+            return {}
+        physical, _ = _SERIES_TABLES[table]
+        if isinstance(start, Mapping):
+            starts = [to_day_or_min(start.get(sym)) for sym in syms]
+        else:
+            starts = [to_day_or_min(start)] * len(syms)
+        select = ", ".join(f"t.{c}" for c in columns[1:])
+        params: list[Any] = []
+        for sym, st in zip(syms, starts):
+            params.extend((sym, st))
+        out: dict[str, Any] = {}
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT MAX(date) FROM rs_scores WHERE symbol=?", (symbol,))
-            row = cur.fetchone()
-            return row[0] if row and row[0] else None
+            result = cur.execute(
+                f"""
+                WITH q(symbol, start) AS (VALUES {','.join(['(?, ?)'] * len(syms))})
+                SELECT s.symbol, t.day, {select}
+                FROM q JOIN meso_symbols s ON s.symbol = q.symbol
+                JOIN {physical} t ON t.symbol_id = s.symbol_id AND t.day >= q.start
+                ORDER BY s.symbol_id, t.day
+                """,
+                params,
+            )
+            for sym, group in groupby(result, key=itemgetter(0)):
+                rows = [(from_day(r[1]), *tuple(r)[2:]) for r in group]
+                out[sym] = rows_to_columns(columns, rows) if columnar else [dict(zip(columns, r)) for r in rows]
+        # 无数据的标的返回空序列（列式时为空列），保持与单标的读取一致
+        return {sym: out[sym] if sym in out else (rows_to_columns(columns, []) if columnar else []) for sym in syms}
 
-    # ------- 元数据与设置 -------
     def upsert_index_metadata(self, rows: list[dict[str, Any]]) -> int:
         if not rows:
             return 0
@@ -412,8 +570,11 @@ class MesoRepository:
                     for r in rows
                 ],
             )
+            n = cur.rowcount or 0
+            # 市场归属可能变化：重建整张日历（元数据写入频率低）
+            self._rebuild_market_calendar(cur)
             conn.commit()
-            return cur.rowcount or 0
+            return n
 
     def list_index_metadata(self, only_active: bool = True) -> list[dict[str, Any]]:
         with self.db.get_connection() as conn:
@@ -440,11 +601,24 @@ class MesoRepository:
         counts = {}
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            cur.execute("SELECT symbol FROM index_metadata WHERE UPPER(symbol)=UPPER(?)", (symbol,))
+            affected = {r[0] for r in cur.fetchall()}
+            cur.execute("SELECT symbol_id FROM meso_symbols WHERE UPPER(symbol)=UPPER(?)", (symbol,))
+            ids = [r[0] for r in cur.fetchall()]
             for table in ("trend_scores", "rs_scores", "index_prices"):
-                cur.execute(f"DELETE FROM {table} WHERE UPPER(symbol)=UPPER(?)", (symbol,))
-                n = cur.rowcount or 0
+                n = 0
+                if ids:
+                    cur.execute(
+                        f"DELETE FROM {_SERIES_TABLES[table][0]} WHERE symbol_id IN ({','.join('?' * len(ids))})", ids)
+                    n = cur.rowcount or 0
                 counts[table] = n
                 total += n
+            if ids:
+                cur.execute(f"DELETE FROM price_fetch_coverage WHERE symbol_id IN ({','.join('?' * len(ids))})", ids)
+            if affected:
+                self._rebuild_market_calendar(cur, symbols=affected)
+            if counts["index_prices"]:
+                self._bump_token(cur, _PRICE_VERSION_KEY)
             conn.commit()
         return {"total": total, "by_table": counts}
 
@@ -452,8 +626,15 @@ class MesoRepository:
         """删除元数据（管理列表中移除该标的）。大小写不敏感。"""
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            cur.execute("SELECT DISTINCT UPPER(market) FROM index_metadata WHERE UPPER(symbol)=UPPER(?)", (symbol,))
+            markets = {r[0] for r in cur.fetchall() if r[0]}
             cur.execute("DELETE FROM index_metadata WHERE UPPER(symbol)=UPPER(?)", (symbol,))
             n = cur.rowcount or 0
+            for market in markets:
+                self._rebuild_calendar_market(cur, market)
+            if markets or n:
+                # 未设市场的标的也参与资产大类排名：删除元数据同样使依赖日历版本的派生数据失效
+                self._bump_calendar_version(cur)
             conn.commit()
             return n
 
@@ -462,22 +643,183 @@ class MesoRepository:
             return 0
         with self.db.get_connection() as conn:
             cur = conn.cursor()
+            symbol_id = self._symbol_ids(cur, [symbol]).get(symbol)
+            if symbol_id is None:
+                return 0
             cur.executemany(
                 """
-                UPDATE index_prices SET close_tr = ?, close_usd_tr = ? WHERE symbol = ? AND date = ?
+                UPDATE index_prices_data SET close_tr = ?, close_usd_tr = ? WHERE symbol_id = ? AND day = ?
                 """,
                 [
                     (
-                        float(r.get("close_tr")) if r.get("close_tr") is not None else None,
-                        float(r.get("close_usd_tr")) if r.get("close_usd_tr") is not None else None,
-                        symbol,
-                        r.get("date"),
+                        _opt_float(r.get("close_tr")),
+                        _opt_float(r.get("close_usd_tr")),
+                        symbol_id,
+                        to_day(r.get("date")),
                     )
                     for r in rows
                 ],
             )
+            n = cur.rowcount or 0
+            if n:
+                self._bump_token(cur, _PRICE_VERSION_KEY)
+            conn.commit()
+            return n
+
+    def get_price_data_version(self) -> str | None:
+        """价格数据版本令牌（尚无价格写入时为 None）。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT value FROM meso_settings WHERE key=?", (_PRICE_VERSION_KEY,))
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    # ---- 本地汇率 ----
+    def get_fx_coverage(self, currencies: list[str]) -> dict[str, dict[str, str | None]]:
+        """{CUR: {first_date: 已请求过的最早日期, last_date: 已存汇率的最新日期}}；从未请求过的币种不出现。"""
+        curs = list(dict.fromkeys(str(c).upper() for c in currencies or [] if c))
+        if not curs:
+            return {}
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT c.currency, c.first_day, (SELECT MAX(f.day) FROM fx_rates_usd f WHERE f.currency = c.currency)
+                FROM fx_rates_coverage c WHERE c.currency IN ({','.join('?' * len(curs))})
+                """,
+                curs,
+            )
+            return {
+                r[0]: {"first_date": from_day(r[1]), "last_date": from_day(r[2]) if r[2] is not None else None}
+                for r in cur.fetchall()
+            }
+
+    def upsert_fx_rates(self, fx_ts: Mapping[str, Mapping[str, Any]], currencies: list[str], requested_from: str) -> int:
+        """写入 {date: {CUR: CUR→USD}} 中指定币种的汇率，并把各币种的已请求起点扩展到 requested_from。"""
+        curs = list(dict.fromkeys(str(c).upper() for c in currencies or [] if c and str(c).upper() != "USD"))
+        if not curs:
+            return 0
+        rows = [
+            (c, to_day(d), float(v))
+            for d, day_map in (fx_ts or {}).items()
+            for c, v in (day_map or {}).items()
+            if str(c).upper() in curs and v is not None
+        ]
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            if rows:
+                cur.executemany("INSERT OR REPLACE INTO fx_rates_usd (currency, day, rate) VALUES (?, ?, ?)",
+                                [(c.upper(), day, v) for c, day, v in rows])
+            cur.executemany(
+                "INSERT INTO fx_rates_coverage (currency, first_day) VALUES (?, ?) "
+                "ON CONFLICT(currency) DO UPDATE SET first_day = MIN(first_day, excluded.first_day)",
+                [(c, to_day(requested_from)) for c in curs],
+            )
             conn.commit()
-            return cur.rowcount or 0
+        return len(rows)
+
+    def fetch_fx_rates(self, currencies: list[str], end: str | None = None) -> dict[str, dict[str, float]]:
+        """本地汇率 {date: {CUR: CUR→USD}}（按日期升序，截至 end）。"""
+        curs = list(dict.fromkeys(str(c).upper() for c in currencies or [] if c and str(c).upper() != "USD"))
+        if not curs:
+            return {}
+        out: dict[str, dict[str, float]] = {}
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT day, currency, rate FROM fx_rates_usd
+                WHERE currency IN ({','.join('?' * len(curs))}) AND day <= ? ORDER BY day
+                """,
+                (*curs, to_day(end) if end else -MIN_DAY),
+            )
+            for day, c, rate in cur.fetchall():
+                out.setdefault(from_day(day), {})[c] = rate
+        return out
+
+    def recompute_usd_prices(self, symbols: list[str], currency: str, date_from: str, date_to: str) -> int:
+        """按本地汇率（不晚于价格日期的最近汇率）回算已存价格的 close_usd/close_usd_tr；返回更新行数。"""
+        syms = list(dict.fromkeys(s for s in symbols or [] if s))
+        currency = str(currency or "").upper()
+        if not syms or not currency or currency == "USD":
+            return 0
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            ids = list(self._symbol_ids(cur, syms).values())
+            if not ids:
+                return 0
+            cur.execute(
+                f"""
+                UPDATE index_prices_data AS p
+                SET close_usd = p.close * r.rate, close_usd_tr = p.close_tr * r.rate
+                FROM (
+                    SELECT t.symbol_id AS symbol_id, t.day AS day,
+                           (SELECT f.rate FROM fx_rates_usd f WHERE f.currency = ? AND f.day <= t.day
+                            ORDER BY f.day DESC LIMIT 1) AS rate
+                    FROM index_prices_data t
+                    WHERE t.symbol_id IN ({','.join('?' * len(ids))}) AND t.day BETWEEN ? AND ?
+                      AND UPPER(t.currency) = ?
+                ) AS r
+                WHERE p.symbol_id = r.symbol_id AND p.day = r.day
+                """,
+                (currency, *ids, to_day(date_from), to_day(date_to), currency),
+            )
+            n = cur.rowcount or 0
+            if n:
+                # USD 价格由空变为有值会改变日历的 has_usd_price
+                self._rebuild_market_calendar(cur, symbols=syms, date_from=date_from, date_to=date_to)
+                self._bump_token(cur, _PRICE_VERSION_KEY)
+            conn.commit()
+            return n
+
+    # ---- 排名快照 ----
+    def get_ranking_source(self) -> tuple[str, str | None]:
+        """返回 (当前来源键, 快照构建时记录的来源键)。"""
+        keys = (_PRICE_VERSION_KEY, _CALENDAR_VERSION_KEY, "global_start_date", _RANKING_SOURCE_KEY)
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT key, value FROM meso_settings WHERE key IN ({','.join('?' * len(keys))})", keys)
+            values = {r[0]: r[1] for r in cur.fetchall()}
+        current = "|".join(str(values.get(k) or "") for k in keys[:3])
+        return current, values.get(_RANKING_SOURCE_KEY)
+
+    def replace_ranking_snapshots(self, rows: list[tuple[str, str, str, int, str, float]], source: str) -> int:
+        """整体替换排名快照；rows 为 (scope, return_mode, date, rank, group_key, score)。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM ranking_snapshots")
+            cur.executemany(
+                "INSERT INTO ranking_snapshots (scope, return_mode, day, rank, group_key, score) VALUES (?, ?, ?, ?, ?, ?)",
+                [(scope, mode, to_day(d), rank, key, score) for scope, mode, d, rank, key, score in rows],
+            )
+            cur.execute(
+                "INSERT INTO meso_settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (_RANKING_SOURCE_KEY, source),
+            )
+            conn.commit()
+        return len(rows)
+
+    def fetch_ranking_snapshot(self, scope: str, return_mode: str, date: str) -> list[tuple[str, float]]:
+        """某日的快照排名 [(group_key, score)...]（按名次）。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT group_key, score FROM ranking_snapshots WHERE scope = ? AND return_mode = ? AND day = ? ORDER BY rank",
+                (scope, return_mode, to_day(date)),
+            )
+            return [(str(r[0]), float(r[1])) for r in cur.fetchall()]
+
+    def fetch_ranking_history(self, scope: str, return_mode: str, group_key: str,
+                              start: str | None = None) -> list[dict[str, Any]]:
+        """某分组的名次历史 [{date, rank, score}...]（按日期升序）。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT day, rank, score FROM ranking_snapshots "
+                "WHERE scope = ? AND return_mode = ? AND group_key = ? AND day >= ? ORDER BY day",
+                (scope, return_mode, group_key, to_day_or_min(start)),
+            )
+            return [{"date": from_day(d), "rank": int(rk), "score": float(sc)} for d, rk, sc in cur.fetchall()]
 
     def set_global_start_date(self, date_str: str) -> None:
         with self.db.get_connection() as conn:
@@ -505,59 +847,111 @@ class MesoRepository:
         """
         返回从 start_date 到数据库最新日期，所有指定市场共同开市且有有效 USD 价格的数据日期（交集，升序）。
         规则：
-        - 以 `index_prices` 中存在任一该市场符号且 `close_usd` 非空为“该市场当日有效”。
+        - 市场归属取自 `index_metadata.market`；某市场任一标的当日 `close_usd` 非空即视为该市场当日有效。
         - 缺少当日 FX 导致 `close_usd` 为空的记录视为无效，该日不计入交集。
         - 仅返回日期字符串列表（YYYY-MM-DD），升序。
-        注：市场到符号的映射应来自元数据（后续 index_metadata 表）；当前实现以 symbol 前缀/集合外部注入为主，先提供市场级占位查询：按 symbol LIKE 近似匹配。
+        读取物化的 `market_calendar`（按 (market, date) 主键范围扫描），结果按 (市场集合, 起始日) 缓存，
+        日历版本变化时自动失效。
         """
-        if not markets:
+        mkts = sorted({str(m).upper() for m in markets or [] if m})
+        if not mkts:
             return []
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            market_to_dates: dict[str, set[str]] = {}
-            for m in markets:
-                # 占位：常见市场符号特征（可在引入 index_metadata 后替换为精确映射）
-                like_patterns = {
-                    'US': ['%'],  # 不过滤：匹配所有
-                    'HK': ['%.HK', '^HSI', '^HSCE', '^HSTECH'],  # LIKE 中 '.' 为字面量，无需转义
-                    'CN': ['.SS%', '.SZ%', '000300.SS']
-                }.get(m.upper(), ['%'])
-                dates: set[str] = set()
-                for pat in like_patterns:
-                    try:
-                        # SQLite 不支持正则，这里仅对包含式 LIKE 提供占位；复杂前缀待元数据落地
-                        if '%' in pat or '_' in pat:
-                            cur.execute(
-                                """
-                                SELECT DISTINCT date FROM index_prices
-                                WHERE date >= ? AND close_usd IS NOT NULL AND symbol LIKE ?
-                                ORDER BY date
-                                """,
-                                (start_date, pat)
-                            )
-                        else:
-                            cur.execute(
-                                """
-                                SELECT DISTINCT date FROM index_prices
-                                WHERE date >= ? AND close_usd IS NOT NULL AND symbol = ?
-                                ORDER BY date
-                                """,
-                                (start_date, pat)
-                            )
-                        rows = cur.fetchall()
-                        for r in rows:
-                            dates.add(str(r[0]))
-                    except Exception:
-                        continue
-                market_to_dates[m] = dates
-            # 交集
-            it = iter(market_to_dates.values())
-            try:
-                common = set(next(it))
-            except StopIteration:
-                return []
-            for s in it:
-                common &= s
-            return sorted(common)
+            cur.execute("SELECT value FROM meso_settings WHERE key=?", (_CALENDAR_VERSION_KEY,))
+            row = cur.fetchone()
+            key = (str(self.db.db_path), row[0] if row else None, tuple(mkts), str(start_date))
+            with _COMMON_DATES_LOCK:
+                hit = _COMMON_DATES_CACHE.get(key)
+                if hit is not None:
+                    _COMMON_DATES_CACHE.move_to_end(key)
+                    return list(hit)
+            cur.execute(
+                f"""
+                SELECT date FROM market_calendar
+                WHERE market IN ({','.join('?' * len(mkts))}) AND date >= ? AND has_usd_price = 1
+                GROUP BY date HAVING COUNT(*) = ?
+                ORDER BY date
+                """,
+                (*mkts, start_date, len(mkts)),
+            )
+            dates = tuple(str(r[0]) for r in cur.fetchall())
+        with _COMMON_DATES_LOCK:
+            _COMMON_DATES_CACHE[key] = dates
+            while len(_COMMON_DATES_CACHE) > _COMMON_DATES_CACHE_SIZE:
+                _COMMON_DATES_CACHE.popitem(last=False)
+        return list(dates)
+
+    def rebuild_market_calendar(self) -> int:
+        """按 index_prices 与 index_metadata 全量重建交易日历，返回日历行数。"""
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            self._rebuild_market_calendar(cur)
+            conn.commit()
+            cur.execute("SELECT COUNT(*) FROM market_calendar")
+            return int(cur.fetchone()[0])
+
+    def _rebuild_market_calendar(self, cur, symbols: Iterable[str] | None = None,
+                                 date_from: str | None = None, date_to: str | None = None) -> None:
+        """重建受影响市场在 [date_from, date_to] 内的日历行（symbols 为空时重建全部市场、全部日期）。"""
+        if symbols is None:
+            cur.execute("DELETE FROM market_calendar")
+            cur.execute(
+                f"""
+                INSERT INTO market_calendar (market, date, has_usd_price)
+                SELECT UPPER(m.market), {sql_date('p.day')}, MAX(p.close_usd IS NOT NULL)
+                FROM index_metadata m
+                JOIN meso_symbols s ON s.symbol = m.symbol
+                JOIN index_prices_data p ON p.symbol_id = s.symbol_id
+                WHERE m.market IS NOT NULL AND m.market <> ''
+                GROUP BY UPPER(m.market), p.day
+                """
+            )
+            self._bump_calendar_version(cur)
+            return
+        syms = [s for s in set(symbols) if s]
+        if not syms:
+            return
+        cur.execute(
+            f"SELECT DISTINCT UPPER(market) FROM index_metadata WHERE symbol IN ({','.join('?' * len(syms))})",
+            syms,
+        )
+        markets = [r[0] for r in cur.fetchall() if r[0]]
+        for market in markets:
+            self._rebuild_calendar_market(cur, market, date_from, date_to)
+        if markets:
+            self._bump_calendar_version(cur)
+
+    @staticmethod
+    def _rebuild_calendar_market(cur, market: str, date_from: str | None = None, date_to: str | None = None) -> None:
+        """重建单个市场在 [date_from, date_to] 内的日历行（边界为空表示不限）。"""
+        cur.execute(
+            "DELETE FROM market_calendar WHERE market = ? AND date BETWEEN ? AND ?",
+            (market, date_from or _ALL_DATES[0], date_to or _ALL_DATES[1]),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO market_calendar (market, date, has_usd_price)
+            SELECT ?, {sql_date('p.day')}, MAX(p.close_usd IS NOT NULL)
+            FROM index_metadata m
+            JOIN meso_symbols s ON s.symbol = m.symbol
+            JOIN index_prices_data p ON p.symbol_id = s.symbol_id
+            WHERE UPPER(m.market) = ? AND p.day BETWEEN ? AND ?
+            GROUP BY p.day
+            """,
+            (market, market, to_day(date_from) if date_from else MIN_DAY, to_day(date_to) if date_to else -MIN_DAY),
+        )
+
+    @classmethod
+    def _bump_calendar_version(cls, cur) -> None:
+        cls._bump_token(cur, _CALENDAR_VERSION_KEY)
+
+    @staticmethod
+    def _bump_token(cur, key: str) -> None:
+        # 随机令牌而非自增计数：重建的库（如测试内存库）不会与旧缓存版本碰撞
+        cur.execute(
+            "INSERT INTO meso_settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, uuid.uuid4().hex),
+        )
 
 
@@ -10,17 +10,113 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 import time
 
+import numpy as np
+
+from .compact_storage import from_day, to_day
+from .data_providers.market_data import MarketDataProvider, default_market_provider
 from .meso_repository import MesoRepository
 from .meso_config import INDEX_DEFS, index_currency_map
+from .price_matrix import PriceMatrix, PriceMatrixStore, load_price_matrix
+from utils.exceptions import ConflictError
+from utils.timeseries import downsampler, window_start
+
+
+# 对比序列的标的数量上限（批量读取为单条查询，数量对延迟影响很小）
+MAX_COMPARE_SYMBOLS = 50
+
+
+# 排名名次历史支持的口径
+RANKING_SCOPES = ("asset_class", "equity_market", "equity_category")
+
+# 综合强度：窗口（按共同开市日计数）与权重，与排名接口逐标的计算的口径一致
+_COMPOSITE_WINDOWS = ((252, 0.4), (126, 0.3), (63, 0.2), (21, 0.1))
+# 增量趋势分的回看窗口（自然日）：覆盖 62 个交易日收益窗口并留足节假日余量
+_SCORE_LOOKBACK_DAYS = 400
+# 刷新写入价格时每批的行数（跨标的）
+_PRICE_WRITE_BATCH = 5000
+
+
+def _iso_date(value: Any) -> Optional[str]:
+    """YYYY-MM-DD 字符串（无效/空值返回 None）。"""
+    try:
+        return from_day(to_day(value)) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _next_weekday(date_str: str) -> str:
+    """date_str 之后的下一个工作日（周一至周五）。"""
+    day = to_day(date_str) + 1
+    # 1970-01-01 为周四：(day + 3) % 7 即周一为 0 的星期序号
+    while (day + 3) % 7 >= 5:
+        day += 1
+    return from_day(day)
+
+
+def _length(series: Any) -> int:
+    """行式或列式序列的点数。"""
+    return len(series.get("dates", [])) if isinstance(series, dict) else len(series)
+
+
+def _composite_matrix(prices: np.ndarray) -> np.ndarray:
+    """(日期, 标的) 综合分矩阵：prices 为共同开市日上的价格（缺失为 NaN），各标的在其非空序列
+    每一点上取窗口收益加权均值，无可用窗口为 NaN。
+
+    窗口按该标的非空点计数，运算顺序与排名接口一致（权重按 12m/6m/3m/1m 依次累加），结果逐位相同。
+    """
+    out = np.full(prices.shape, np.nan)
+    for j in range(prices.shape[1]):
+        rows = np.flatnonzero(~np.isnan(prices[:, j]))
+        n = len(rows)
+        if not n:
+            continue
+        values = prices[rows, j]
+        num = np.zeros(n)
+        den = np.zeros(n)
+        for window, weight in _COMPOSITE_WINDOWS:
+            if n <= window:
+                continue
+            now, past = values[window:], values[:-window]
+            nonzero = past != 0
+            ret = np.full(n, np.nan)
+            ret[window:][nonzero] = now[nonzero] / past[nonzero] - 1.0
+            valid = ~np.isnan(ret)
+            num[valid] += weight * ret[valid]
+            den[valid] += weight
+        has = den > 0
+        out[rows[has], j] = num[has] / den[has]
+    return out
+
+
+def _ranked_groups(composites: np.ndarray, group_keys: List[str]) -> List[List[Tuple[str, float]]]:
+    """逐日按分组取最强标的的综合分并降序排列；同分按分组内首个有效标的的先后（与排名接口一致）。"""
+    order = list(dict.fromkeys(group_keys))
+    best_cols, first_cols = [], []
+    for g in order:
+        cols = np.array([j for j, k in enumerate(group_keys) if k == g], dtype=np.int64)
+        block = composites[:, cols]
+        valid = ~np.isnan(block)
+        best_cols.append(np.fmax.reduce(block, axis=1))
+        first_cols.append(np.where(valid.any(axis=1), cols[valid.argmax(axis=1)], len(group_keys)))
+    best = np.column_stack(best_cols)
+    first = np.column_stack(first_cols)
+    out: List[List[Tuple[str, float]]] = []
+    for t in range(best.shape[0]):
+        ok = np.flatnonzero(~np.isnan(best[t]))
+        ranked = sorted(ok, key=lambda g: (-best[t, g], first[t, g]))
+        out.append([(order[g], float(best[t, g])) for g in ranked])
+    return out
 
 
 class MesoService:
-    def __init__(self):
+    def __init__(self, provider: Optional[MarketDataProvider] = None):
         self.repo = MesoRepository()
+        # 行情数据源：未指定时在刷新时按配置选择（见 data_providers.market_data）
+        self.provider = provider
 
     def list_indexes(self) -> List[Dict[str, Any]]:
         # 最小占位，后续由配置/provider 返回可用清单
@@ -32,119 +128,185 @@ class MesoService:
             {"symbol": "^HSI", "name": "Hang Seng", "region": "APAC", "currency": "HKD"},
         ]
 
-    def get_trend_series(self, symbol: str, window: str = "3y", currency: str = "USD") -> Dict[str, Any]:
+    def get_trend_series(self, symbol: str, window: str = "3y", currency: str = "USD",
+                         points: Optional[int] = None, downsample: str = "lttb",
+                         fmt: str = "rows") -> Dict[str, Any]:
+        """返回窗口内的分数与价格序列（窗口以各序列最新日期为锚点）；points 指定时服务端降采样。
+
+        fmt=rows 时序列为 [{date, ...}]；其余（columnar/arrow）为 {dates: [...], 列名: [...]}。
+        """
+        columnar = fmt != "rows"
+        sample = downsampler(columnar)
         # 读取已存储的分数与价格（真实序列应由抓取与计算流程提前写入 repo）
-        series_scores = self.repo.fetch_scores(symbol)
-        series_prices = self.repo.fetch_prices(symbol)
-        return {
+        series_scores = self.repo.fetch_scores(
+            symbol, self._window_start(self.repo.get_latest_score_date(symbol), window), columnar=columnar)
+        series_prices = self.repo.fetch_prices(
+            symbol, self._window_start(self.repo.get_latest_price_date(symbol), window), columnar=columnar)
+        out: Dict[str, Any] = {
             "symbol": symbol,
             "window": window,
             "currency": currency,
-            "scores": series_scores,
-            "prices": series_prices,
+            "scores": sample(series_scores, points, "score", downsample),
+            "prices": sample(series_prices, points, self._price_key(series_prices, currency), downsample),
         }
+        if columnar:
+            out["format"] = "columnar"
+        if points:
+            out["sampling"] = {"method": downsample, "points": points,
+                               "source_points": {"scores": _length(series_scores), "prices": _length(series_prices)}}
+        return out
 
-    def get_compare_series(self, symbols: List[str], window: str = "3y", currency: str = "USD") -> Dict[str, Any]:
-        if not symbols or len(symbols) > 10:
-            raise ValueError("symbols must be 1..10")
-        data: Dict[str, List[Dict[str, Any]]] = {}
-        for sym in symbols:
-            data[sym] = self.repo.fetch_scores(sym)
-        return {"symbols": symbols, "window": window, "currency": currency, "series": data}
+    def get_compare_series(self, symbols: List[str], window: str = "3y", currency: str = "USD",
+                           points: Optional[int] = None, downsample: str = "lttb",
+                           fmt: str = "rows") -> Dict[str, Any]:
+        if not symbols or len(symbols) > MAX_COMPARE_SYMBOLS:
+            raise ValueError(f"symbols must be 1..{MAX_COMPARE_SYMBOLS}")
+        columnar = fmt != "rows"
+        sample = downsampler(columnar)
+        # 两次查询完成：各标的最新日期（分组）+ 按各自窗口起点的批量读取
+        latest = self.repo.get_latest_score_dates(symbols)
+        starts = {sym: self._window_start(latest.get(sym), window) for sym in symbols}
+        series = self.repo.fetch_scores_many(symbols, starts, columnar=columnar)
+        data: Dict[str, Any] = {sym: sample(series[sym], points, "score", downsample) for sym in symbols}
+        out: Dict[str, Any] = {"symbols": symbols, "window": window, "currency": currency, "series": data}
+        if columnar:
+            out["format"] = "columnar"
+        if points:
+            out["sampling"] = {"method": downsample, "points": points}
+        return out
+
+    @staticmethod
+    def _window_start(latest_date: Optional[str], window: Optional[str]) -> Optional[str]:
+        """窗口起点（以该序列最新日期为锚点）；无数据或窗口无法识别时返回 None（不截取）。"""
+        return window_start(latest_date, window) if latest_date else None
+
+    @staticmethod
+    def _price_key(series: Any, currency: str) -> str:
+        """降采样依据的价格列：USD 口径且存在 USD 价格时用 close_usd，否则用本币 close。"""
+        if isinstance(series, dict):
+            usd = series.get("close_usd") or []
+        else:
+            usd = [r.get("close_usd") for r in series]
+        if (currency or "").upper() == "USD" and any(v is not None for v in usd):
+            return "close_usd"
+        return "close"
 
     # ---- 真实数据刷新 ----
+    def plan_price_refresh(self, symbols: List[str], since: Optional[str] = None,
+                           today: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """增量刷新计划（不访问数据源）：{symbol: {start, full, skip, first_date, last_date}}。
+
+        - 起点下限：元数据 start_date_override，否则为调用方传入的 since（通常为全局起始日期）；均无时按 period。
+        - always_full_refresh 或尚无数据：从下限起请求并全部写入。
+        - 已有数据：从最新已存日期后的下一个工作日起请求；下限早于已请求过的最早日期时改从下限起请求以回补。
+        - 无需回补且下一个工作日晚于 today：跳过（尚无新数据）。
+        """
+        today = today or datetime.now(timezone.utc).date().isoformat()
+        meta = {row.get("symbol"): row for row in self.repo.list_index_metadata(only_active=False)}
+        bounds = self.repo.get_price_bounds(symbols)
+        plan: Dict[str, Dict[str, Any]] = {}
+        for sym in dict.fromkeys(symbols):
+            m = meta.get(sym) or {}
+            floor = _iso_date(m.get("start_date_override")) or _iso_date(since)
+            b = bounds.get(sym) or {}
+            first, last = b.get("first_date"), b.get("last_date")
+            full = bool(m.get("always_full_refresh")) or last is None
+            skip = False
+            if full:
+                start = floor
+            elif floor and floor < (b.get("requested_from") or first):
+                start = floor
+            else:
+                start = max(_next_weekday(last), floor or "")
+                skip = start > today
+            plan[sym] = {"start": start, "full": full, "skip": skip, "first_date": first, "last_date": last}
+        return plan
+
     def refresh_prices_and_scores(self, symbols: Optional[List[str]] = None, period: str = "3y", since: Optional[str] = None, return_mode: str = "price") -> Dict[str, Any]:
         # 仅真实数据，不做样本；调用者需确保网络可用并安装依赖
-        syms = symbols or [row["symbol"] for row in INDEX_DEFS]
-        from .data_providers.meso_market_provider import (
-            fetch_index_history,
-            fetch_fx_timeseries_to_usd,
-        )
-
-        # 抓取历史收盘价
-        use_adjusted = (return_mode == "total")
-        hist_map = fetch_index_history(syms, period=period, start=since, adjusted=False, total_return=(return_mode == "total"))
-
-        # 计算增量边界：按各 symbol 最新已存日期+1 作为起始
-        cur_map = index_currency_map()
-        min_start: Optional[str] = None
+        syms = list(dict.fromkeys(symbols or [row["symbol"] for row in INDEX_DEFS]))
+        provider = self.provider or default_market_provider()
+        fetch_index_history = provider.fetch_index_history
+        fetch_fx_timeseries_to_usd = provider.fetch_fx_timeseries_to_usd
+        # pandas 较重，仅在刷新时加载
+        from .fx_conversion import convert_many_to_usd, fx_frame
+
+        # 刷新计划：按各标的缺口确定请求起点，同一起点的标的合并为一次请求；无新数据的标的不请求
+        plan = self.plan_price_refresh(syms, since=since)
+        skipped = [s for s in syms if plan[s]["skip"]]
+        groups: Dict[Optional[str], List[str]] = {}
         for sym in syms:
-            last = self.repo.get_latest_price_date(sym)
-            if last is None:
-                # 无数据，则允许整个 period
-                continue
-            # 下一天（简化：不加一天，直接交由去重 INSERT OR REPLACE，避免日期运算依赖）
-            if min_start is None or last < min_start:
-                min_start = last
+            if not plan[sym]["skip"]:
+                groups.setdefault(plan[sym]["start"], []).append(sym)
+        hist_map: Dict[str, List[Dict[str, Any]]] = {}
+        for start, group in groups.items():
+            # start 为 None 时（无下限且尚无数据）按 period 请求
+            hist_map.update(fetch_index_history(group, period=period, start=start, adjusted=False,
+                                                total_return=(return_mode == "total")))
+        self.repo.record_price_requests({
+            sym: plan[sym]["start"] or min((r["date"] for r in hist_map.get(sym) or []), default=None)
+            for group in groups.values() for sym in group
+        })
+
+        # 仅写入已存范围之外的行（全量刷新的标的覆盖写入）
+        for sym, rows in hist_map.items():
+            p = plan.get(sym) or {}
+            if not p.get("full") and p.get("last_date"):
+                hist_map[sym] = [r for r in rows if r["date"] < p["first_date"] or r["date"] > p["last_date"]]
 
-        # 推断 timeseries 的起止（若无本地数据，则用历史里最早/最晚日期）
+        # 同币种其他标的的最新日期，供汇率回补后回算其 USD 价格
+        cur_map = self._currency_map()
+        last_dates = {s: p["last_date"] for s, p in plan.items() if p["last_date"]}
+        others = [s for s in cur_map if s not in plan]
+        last_dates.update(self.repo.get_latest_price_dates(others))
+
+        # 推断 timeseries 的起止（本次新取得行的最早/最晚日期）
         all_dates = [r["date"] for rows in hist_map.values() for r in rows]
         if not all_dates:
-            return {"refreshed": True, "symbols": syms, "prices": 0, "scores": 0}
-        start_date = min(all_dates) if min_start is None else min(all_dates)
+            return {"refreshed": True, "symbols": syms, "prices": 0, "scores": 0, "skipped": skipped}
+        start_date = min(all_dates)
         end_date = max(all_dates)
 
-        # 拉取历史当日汇率时序并换算到 USD
-        unique_curs = sorted(set(cur_map.get(s, "USD") for s in syms))
-        fx_ts = fetch_fx_timeseries_to_usd(unique_curs, start_date, end_date)  # {date: {CUR: USD_rate}}
-        # 前向填充每日汇率，避免非USD币种缺失时错误使用1.0
-        all_fx_dates = sorted(fx_ts.keys())
-        currencies = set(unique_curs)
-        currencies.add("USD")
-        ff_fx_ts: Dict[str, Dict[str, float]] = {}
-        last_seen: Dict[str, float] = {"USD": 1.0}
-        for d in all_fx_dates:
-            day_map = fx_ts.get(d, {}) or {}
-            # 更新已知汇率
-            for c in currencies:
-                if c == "USD":
-                    last_seen["USD"] = 1.0
-                    continue
-                v = day_map.get(c)
-                if v is not None:
-                    last_seen[c] = float(v)
-            # 写入前向填充后的映射
-            ff_fx_ts[d] = {c: last_seen[c] for c in last_seen if c in currencies and c in last_seen}
-
-        # 写入价格表（含“当日汇率”换算到 USD），仅增量（大于已存的最后日期）
-        price_rows: List[Dict[str, Any]] = []
-        # 提前获取 instrument_type map
-        meta = {row.get("symbol"): str(row.get("instrument_type") or "").upper() for row in self.repo.list_index_metadata(only_active=True)}
-        for sym, rows in hist_map.items():
-            cur = cur_map.get(sym, "USD")
-            last_date = self.repo.get_latest_price_date(sym)
-            for r in rows:
-                d = r["date"]
-                if last_date and d <= last_date:
-                    continue
-                close = float(r["close"]) if r.get("close") is not None else None
-                day_fx = ff_fx_ts.get(d, {})
-                usd_rate = 1.0 if cur == "USD" else day_fx.get(cur)
-                # 若当日汇率不可得（含前向填充后仍无），则跳过该日USD换算
-                close_usd = (close * usd_rate) if (close is not None and usd_rate is not None) else None
-                # total return 路径（若有）
-                close_tr = r.get("close_tr")
-                close_usd_tr = (close_tr * usd_rate) if (close_tr is not None and usd_rate is not None) else None
-                adj_factor = r.get("adj_factor")
-                price_rows.append({
-                    "symbol": sym,
-                    "date": d,
-                    "close": close,
-                    "close_tr": close_tr,
-                    "currency": cur,
-                    "close_usd": close_usd,
-                    "close_usd_tr": close_usd_tr,
-                    "adj_factor": adj_factor,
-                })
-        if price_rows:
-            self.repo.upsert_index_prices(price_rows)
-
-        # 计算一个最简趋势分（示意：最近63日收益归一到 [0,100]），仅增量
+        # 汇率：仅向数据源请求本地汇率库的缺口，换算读取本地汇率，透视为 日期 × 币种 表并前向填充
+        # （避免非USD币种缺失时错误使用1.0）
+        unique_curs = sorted(set(cur_map.get(s, "USD") for s in hist_map))
+        new_fx = self._sync_fx_rates(unique_curs, start_date, end_date, fetch_fx_timeseries_to_usd)
+        fx = fx_frame(self.repo.fetch_fx_rates(unique_curs, end=end_date), unique_curs)
+
+        # 按币种分组整组向量化换算（按价格日期 as-of 对齐汇率），跨标的固定行数分批写入同一事务；
+        # 交易日历与价格版本在全部写入后各更新一次
+        by_currency: Dict[str, List[str]] = {}
+        for sym in hist_map:
+            by_currency.setdefault(cur_map.get(sym, "USD"), []).append(sym)
+        written_from: Dict[str, str] = {}
+
+        def price_batches():
+            for currency, group in by_currency.items():
+                rows = convert_many_to_usd({s: hist_map.pop(s) for s in group}, currency, fx)
+                for row in rows:
+                    # 同一标的的行按日期升序，首行即最早写入日期
+                    written_from.setdefault(row["symbol"], row["date"])
+                for i in range(0, len(rows), _PRICE_WRITE_BATCH):
+                    yield rows[i:i + _PRICE_WRITE_BATCH]
+
+        n_prices = self.repo.upsert_index_prices_batched(price_batches())
+        # 新到/回补的汇率可能改变已存价格的 as-of 汇率（含此前缺汇率的日期），按本地汇率回算
+        self._recompute_usd_prices(new_fx, cur_map, last_dates)
+
+        # 计算一个最简趋势分（示意：最近63日收益归一到 [0,100]），仅增量：
+        # 只处理价格晚于最新分数的标的，并只读取最新分数日期之前的回看窗口
         score_rows: List[Dict[str, Any]] = []
-        for sym in syms:
-            series = self.repo.fetch_prices(sym)
-            closes = [(p["date"], p["close_usd"]) for p in series if p.get("close_usd") is not None]
-            last_score_date = self.repo.get_latest_score_date(sym)
+        last_scores = self.repo.get_latest_score_dates(syms)
+        latest_prices = self.repo.get_latest_price_dates(syms)
+        todo = [s for s in syms if s in latest_prices and latest_prices[s] > last_scores.get(s, "")]
+        starts = {s: from_day(to_day(last_scores[s]) - _SCORE_LOOKBACK_DAYS) if s in last_scores else None for s in todo}
+        series_map = self.repo.fetch_prices_many(todo, start=starts)
+        for sym in todo:
+            closes = [(p["date"], p["close_usd"]) for p in series_map[sym] if p.get("close_usd") is not None]
+            last_score_date = last_scores.get(sym)
+            if starts[sym] and sum(1 for d, _ in closes if d <= last_score_date) < 62:
+                # 回看窗口内有效收盘价不足 62 个（数据稀疏）：读取全部历史
+                closes = [(p["date"], p["close_usd"]) for p in self.repo.fetch_prices(sym) if p.get("close_usd") is not None]
             # 按日期累积，窗口内收益
             for i in range(len(closes)):
                 if i < 62:
@@ -168,12 +330,13 @@ class MesoService:
         if score_rows:
             self.repo.upsert_trend_scores(score_rows)
 
-        # 对于 ETF/股票：全量计算复权价格（使用 adj_factor）并写回
+        # 对于 ETF/股票：为本次新写入的价格计算复权价格（使用 adj_factor）并写回
+        meta = {row.get("symbol"): str(row.get("instrument_type") or "").upper() for row in self.repo.list_index_metadata(only_active=True)}
+        adj_syms = [s for s in written_from if meta.get(s) in ("ETF", "STOCK")]
+        adj_map = self.repo.fetch_prices_many(adj_syms, start=written_from)
         adj_rows: List[Dict[str, Any]] = []
-        for sym in syms:
-            if meta.get(sym) not in ("ETF","STOCK"):
-                continue
-            rows = self.repo.fetch_prices(sym)
+        for sym in adj_syms:
+            rows = adj_map[sym]
             # 用最近一日的 adj_factor 累积生成前/后复权（简化：此处用当日adj_factor推导 TR，如果需要精确分红拆分可扩展）
             # 这里实现一个基础版：close_tr = close * adj_factor；close_usd_tr = close_usd * adj_factor
             for p in rows:
@@ -190,7 +353,194 @@ class MesoService:
                 self.repo.update_adjusted_prices(sym, adj_rows)
                 adj_rows.clear()
 
-        return {"refreshed": True, "symbols": syms, "prices": len(price_rows), "scores": len(score_rows)}
+        self.publish_price_matrix()
+        self._update_ranking_snapshots()
+        return {"refreshed": True, "symbols": syms, "prices": n_prices, "scores": len(score_rows), "skipped": skipped}
+
+    # ------- 本地汇率 -------
+    def _currency_map(self) -> Dict[str, str]:
+        """标的 → 计价币种：元数据中登记的币种，内置指数以 INDEX_DEFS 为准。"""
+        cur_map = {m["symbol"]: str(m["currency"]).upper()
+                   for m in self.repo.list_index_metadata(only_active=False) if m.get("currency")}
+        cur_map.update(index_currency_map())
+        return cur_map
+
+    def _sync_fx_rates(self, currencies: List[str], start_date: str, end_date: str, fetch) -> Dict[str, str]:
+        """按本地汇率库的覆盖范围向数据源补齐 [start_date, end_date]：早于已请求最早日期的回补段、
+        晚于已存最新汇率的增量段；同一缺口的币种合并为一次请求。返回 {CUR: 本次写入的最早汇率日期}。"""
+        curs = sorted({str(c).upper() for c in currencies if c} - {"USD"})
+        if not curs:
+            return {}
+        coverage = self.repo.get_fx_coverage(curs)
+        gaps: Dict[Tuple[str, str], List[str]] = {}
+        for cur in curs:
+            cov = coverage.get(cur)
+            if cov is None:
+                gaps.setdefault((start_date, end_date), []).append(cur)
+                continue
+            if start_date < cov["first_date"]:
+                gaps.setdefault((start_date, from_day(to_day(cov["first_date"]) - 1)), []).append(cur)
+            tail_from = from_day(to_day(cov["last_date"]) + 1) if cov["last_date"] else cov["first_date"]
+            if tail_from <= end_date:
+                gaps.setdefault((tail_from, end_date), []).append(cur)
+        new_from: Dict[str, str] = {}
+        for (gap_start, gap_end), group in sorted(gaps.items()):
+            fx_ts = fetch(group, gap_start, gap_end)  # {date: {CUR: USD_rate}}
+            self.repo.upsert_fx_rates(fx_ts, group, gap_start)
+            for d, day_map in (fx_ts or {}).items():
+                for cur in group:
+                    if (day_map or {}).get(cur) is not None and (cur not in new_from or d[:10] < new_from[cur]):
+                        new_from[cur] = d[:10]
+        return new_from
+
+    def _recompute_usd_prices(self, new_fx: Dict[str, str], cur_map: Dict[str, str], last_dates: Dict[str, str]) -> int:
+        """对写入新汇率之前已存在的价格（截至各标的原最新日期）回算 USD 值；本次新写入的价格已按本地汇率换算。"""
+        n = 0
+        for cur, since in new_fx.items():
+            group = [s for s, c in cur_map.items() if str(c or "").upper() == cur and (last_dates.get(s) or "") >= since]
+            if group:
+                n += self.repo.recompute_usd_prices(group, cur, since, max(last_dates[s] for s in group))
+        return n
+
+    # ------- 共享价格矩阵 -------
+    def publish_price_matrix(self) -> Optional[Dict[str, Any]]:
+        """按当前价格重建并原子发布内存映射价格矩阵（内存库与测试环境不发布）；失败不影响调用方。"""
+        try:
+            from flask import current_app
+            if current_app.config.get("TESTING"):
+                return None
+        except RuntimeError:
+            pass
+        store = PriceMatrixStore.for_db_path(self.repo.db.db_path)
+        if store is None:
+            return None
+        try:
+            return store.build(self.repo)
+        except Exception as exc:
+            try:
+                from flask import current_app
+                current_app.logger.warning(f"发布价格矩阵失败: {exc}")
+            except Exception:
+                import logging
+                logging.getLogger(__name__).warning(f"发布价格矩阵失败: {exc}")
+            return None
+
+    def _fresh_price_matrix(self) -> Optional[PriceMatrix]:
+        """已发布且版本与库内价格一致的共享矩阵；否则返回 None。"""
+        store = PriceMatrixStore.for_db_path(self.repo.db.db_path)
+        matrix = store.load() if store is not None else None
+        if matrix is not None and matrix.version is not None and matrix.version == self.repo.get_price_data_version():
+            return matrix
+        return None
+
+    def _ranking_series(self, symbols: List[str], common_dates: List[str], field: str) -> Dict[str, List[Tuple[str, float]]]:
+        """各标的在共同日期上的非空价格序列 [(date, value)...]（升序）。
+
+        已发布矩阵的版本与库内价格版本一致时直接读取共享映射，否则批量查询数据库。
+        """
+        matrix = self._fresh_price_matrix()
+        if matrix is not None:
+            return matrix.series_on(symbols, common_dates, field)
+        wanted = set(common_dates)
+        prices_by_symbol = self.repo.fetch_prices_many(symbols, common_dates[0])
+        return {
+            sym: [(p["date"], p[field]) for p in prices_by_symbol.get(sym, [])
+                  if p["date"] in wanted and p.get(field) is not None]
+            for sym in symbols
+        }
+
+    # ------- 排名快照 -------
+    @staticmethod
+    def _ranking_scopes(items: List[Dict[str, Any]]) -> List[Tuple[str, List[str], List[str], Dict[str, str], Dict[str, str]]]:
+        """各排名口径：(scope, 市场集合, 标的, {标的: 分组}, {return_mode: 价格字段})，与三个排名接口的取数规则一致。"""
+        usd_fields = {"price": "close_usd", "total": "close_usd_tr"}
+        eq = [row for row in items if str(row.get("asset_class", "")).lower() == "equity"]
+        scopes = [
+            ("asset_class",
+             sorted({str(row.get("market", "")).upper() for row in items if row.get("market")}),
+             [row.get("symbol") for row in items],
+             {row.get("symbol"): row.get("asset_class") or "unknown" for row in items},
+             usd_fields),
+            ("equity_market",
+             sorted({str(row.get("market", "")).upper() for row in eq if row.get("market")}),
+             [row.get("symbol") for row in eq],
+             {row.get("symbol"): str(row.get("market", "")).upper() or "UNKNOWN" for row in eq},
+             usd_fields),
+        ]
+        for market in sorted({str(row.get("market", "")).upper() for row in eq if row.get("market")}):
+            rows = [row for row in eq if str(row.get("market", "")).upper() == market]
+            scopes.append((
+                f"equity_category:{market}", [market], [row.get("symbol") for row in rows],
+                {row.get("symbol"): str(row.get("category", "")).lower() or "unknown" for row in rows},
+                {"price": "close", "total": "close_tr"},
+            ))
+        return scopes
+
+    def rebuild_ranking_snapshots(self) -> Dict[str, Any]:
+        """按当前价格与元数据重建全部排名快照（各口径 × 各共同开市日 × price/total），返回写入行数。"""
+        # 先取来源键再计算：计算期间若有写入，快照记录的是较旧来源，只会被判定为过期
+        source, _ = self.repo.get_ranking_source()
+        items = self.repo.list_index_metadata(only_active=True)
+        global_start = self.repo.get_global_start_date() or "2000-01-01"
+        # 全部价格只读取一次：优先共享矩阵，否则在内存中构建
+        matrix = self._fresh_price_matrix() or load_price_matrix(self.repo)
+        rows: List[Tuple[str, str, str, int, str, float]] = []
+        for scope, markets, symbols, groups, fields in self._ranking_scopes(items):
+            common = self.repo.get_common_open_dates(markets, global_start) if markets else []
+            if not common or not symbols:
+                continue
+            for rm, field in fields.items():
+                composites = _composite_matrix(matrix.block(symbols, common, field))
+                for t, ranked in enumerate(_ranked_groups(composites, [groups[sym] for sym in symbols])):
+                    rows.extend((scope, rm, common[t], rank, key, score) for rank, (key, score) in enumerate(ranked, 1))
+        return {"rows": self.repo.replace_ranking_snapshots(rows, source)}
+
+    def _update_ranking_snapshots(self) -> None:
+        """写入路径末尾重建排名快照；失败只记录日志（排名接口回退实时计算）。"""
+        try:
+            self.rebuild_ranking_snapshots()
+        except Exception as exc:
+            try:
+                from flask import current_app
+                current_app.logger.warning(f"重建排名快照失败: {exc}")
+            except Exception:
+                import logging
+                logging.getLogger(__name__).warning(f"重建排名快照失败: {exc}")
+
+    def _snapshot_rankings(self, scope: str, return_mode: str, date: str) -> Optional[List[Tuple[str, float]]]:
+        """快照与当前数据一致时返回该日排名 [(group, score)...]，否则返回 None（由调用方实时计算）。"""
+        current, built = self.repo.get_ranking_source()
+        if built is None or built != current:
+            return None
+        return self.repo.fetch_ranking_snapshot(scope, return_mode, date)
+
+    def get_ranking_history(self, scope: str, group: str, return_mode: str = "price",
+                            market: Optional[str] = None, start: Optional[str] = None) -> Dict[str, Any]:
+        """某分组在排名快照中的名次历史。
+
+        快照只在写入路径（刷新、标的维护、起始日期设置、删除数据）中重建；过期时抛出 ConflictError，不在读取中重建。
+        """
+        if scope not in RANKING_SCOPES:
+            raise ValueError(f"scope must be one of {', '.join(RANKING_SCOPES)}")
+        if not group:
+            raise ValueError("group required")
+        rm = "total" if (return_mode or "price").lower() == "total" else "price"
+        key = scope
+        if scope == "equity_category":
+            if not market:
+                raise ValueError("market required for equity_category")
+            key = f"equity_category:{market.upper()}"
+            group = group.lower()
+        elif scope == "equity_market":
+            group = group.upper()
+        current, built = self.repo.get_ranking_source()
+        if built != current:
+            raise ConflictError("排名快照已过期，将在下次数据刷新后重建")
+        out: Dict[str, Any] = {"scope": scope, "group": group, "return_mode": rm,
+                               "series": self.repo.fetch_ranking_history(key, rm, group, start)}
+        if scope == "equity_category":
+            out["market"] = market.upper()
+        return out
 
     # ------- 管理与设置 -------
     # 旧方法名重复，移除
@@ -200,8 +550,16 @@ class MesoService:
 
     def set_global_start_date(self, date_str: str) -> Dict[str, Any]:
         self.repo.set_global_start_date(date_str)
+        self._update_ranking_snapshots()
         return {"ok": True, "global_start_date": date_str}
 
+    def delete_symbol_data(self, symbol: str, remove_meta: bool = False) -> Dict[str, Any]:
+        """删除标的已存数据（可选同时删除元数据），随后重建排名快照。"""
+        result = self.repo.delete_symbol_data(symbol)
+        meta_deleted = self.repo.delete_index_metadata(symbol) if remove_meta else 0
+        self._update_ranking_snapshots()
+        return {"detail": result, "metadata_deleted": meta_deleted}
+
     def upsert_tracked_instruments(self, instruments: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not instruments:
             return {"updated": 0}
@@ -217,6 +575,7 @@ class MesoService:
                 r["provider"] = str(r["provider"]).upper()
             normed.append(r)
         updated = self.repo.upsert_index_metadata(normed)
+        self._update_ranking_snapshots()
         return {"updated": updated}
 
     # ------- 基础大类资产强度对比（MVP） -------
@@ -249,13 +608,14 @@ class MesoService:
         # 用共同日期过滤每个标的的USD序列
         rankings: List[Dict[str, Any]] = []
         use_date = common_dates[-1]
+        snapshot = self._snapshot_rankings("asset_class", rm, use_date)
+        if snapshot is not None:
+            return {"asof": use_date, "return_mode": rm,
+                    "rankings": [{"asset_class": ac, "score": sc} for ac, sc in snapshot[:top]]}
 
+        series_by_symbol = self._ranking_series(symbols, common_dates, "close_usd_tr" if rm == "total" else "close_usd")
         for sym in symbols:
-            prices = self.repo.fetch_prices(sym)
-            if rm == "total":
-                series = [(p["date"], p.get("close_usd_tr")) for p in prices if (p["date"] in common_dates and p.get("close_usd_tr") is not None)]
-            else:
-                series = [(p["date"], p.get("close_usd")) for p in prices if (p["date"] in common_dates and p.get("close_usd") is not None)]
+            series = series_by_symbol.get(sym, [])
             if not series:
                 continue
             series.sort(key=lambda x: x[0])
@@ -296,7 +656,7 @@ class MesoService:
             rankings.append({
                 "symbol": sym,
                 "asof": use_date,
-                "asset_class": meta_map.get(sym, {}).get("asset_class", "unknown"),
+                "asset_class": meta_map.get(sym, {}).get("asset_class") or "unknown",
                 "market": meta_map.get(sym, {}).get("market", ""),
                 "composite": composite,
             })
@@ -319,9 +679,11 @@ class MesoService:
     def get_instruments_overview(self) -> Dict[str, Any]:
         items = self.repo.list_index_metadata(only_active=False)
         out: Dict[str, Any] = {"by_asset_class": {}, "by_market": {}, "by_category": {}, "all": []}
+        # 全部标的的覆盖范围一次分组查询取回（避免逐标的扫描）
+        coverage = self.repo.get_price_coverage()
         for row in items:
             sym = row.get("symbol")
-            rng = self.repo.get_price_date_range(sym)
+            rng = coverage.get(sym) or {}
             rec = {
                 "symbol": sym,
                 "name": row.get("name"),
@@ -333,9 +695,9 @@ class MesoService:
                 "subcategory": row.get("subcategory"),
                 "min_date": rng.get("min_date"),
                 "max_date": rng.get("max_date"),
-                "has_usd": rng.get("has_usd"),
-                "has_tr": rng.get("has_tr"),
-                "has_usd_tr": rng.get("has_usd_tr"),
+                "has_usd": bool(rng.get("has_usd")),
+                "has_tr": bool(rng.get("has_tr")),
+                "has_usd_tr": bool(rng.get("has_usd_tr")),
                 "is_active": bool(row.get("is_active", 1)),
             }
             out["all"].append(rec)
@@ -370,16 +732,16 @@ class MesoService:
         if not common_dates:
             return {"asof": asof_date, "return_mode": rm, "rankings": []}
         use_date = common_dates[-1]
+        snapshot = self._snapshot_rankings("equity_market", rm, use_date)
+        if snapshot is not None:
+            return {"asof": use_date, "return_mode": rm,
+                    "rankings": [{"market": mk, "score": sc} for mk, sc in snapshot[:top]]}
 
         # 计算每个 symbol 的 composite（基于 USD 或 USD-TR）
         symbol_scores: Dict[str, float] = {}
+        series_by_symbol = self._ranking_series(symbols, common_dates, "close_usd_tr" if rm == "total" else "close_usd")
         for sym in symbols:
-            prices = self.repo.fetch_prices(sym)
-            series = (
-                [(p["date"], p.get("close_usd_tr")) for p in prices if (p["date"] in common_dates and p.get("close_usd_tr") is not None)]
-                if rm == "total"
-                else [(p["date"], p.get("close_usd")) for p in prices if (p["date"] in common_dates and p.get("close_usd") is not None)]
-            )
+            series = series_by_symbol.get(sym, [])
             if not series:
                 continue
             series.sort(key=lambda x: x[0])
@@ -440,15 +802,17 @@ class MesoService:
         if not common_dates:
             return {"market": market_u, "asof": asof_date, "return_mode": (return_mode or "price"), "rankings": []}
         use_date = common_dates[-1]
+        snapshot = self._snapshot_rankings(
+            f"equity_category:{market_u}", "total" if (return_mode or "price").lower() == "total" else "price", use_date)
+        if snapshot is not None:
+            return {"market": market_u, "asof": asof_date,
+                    "rankings": [{"category": cat, "score": sc} for cat, sc in snapshot[:top]]}
         symbol_scores: Dict[str, float] = {}
+        # 本市场内部用本币价格序列：price→close，total→close_tr
+        series_by_symbol = self._ranking_series(
+            symbols, common_dates, "close_tr" if (return_mode or "price").lower() == "total" else "close")
         for sym in symbols:
-            prices = self.repo.fetch_prices(sym)
-            # 本市场内部用本币价格序列：price→close，total→close_tr
-            series = (
-                [(p["date"], p.get("close_tr")) for p in prices if (p["date"] in common_dates and p.get("close_tr") is not None)]
-                if (return_mode or "price").lower() == "total"
-                else [(p["date"], p.get("close")) for p in prices if (p["date"] in common_dates and p.get("close") is not None)]
-            )
+            series = series_by_symbol.get(sym, [])
             if not series:
                 continue
             series.sort(key=lambda x: x[0])
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中观价格矩阵：日期 × 标的的 float64 价格矩阵，落盘为 .npy 并由各进程只读内存映射共享
+
+说明：
+- 文件位于中观库同目录、以库文件名（去扩展名）为前缀：<库名>.price_matrix.json（清单）+
+  <库名>.price_matrix.<token>.npy（形状 (字段, 日期, 标的)，缺失为 NaN；日期轴为全部价格日期的并集，升序）；
+  同目录下的多个库互不覆盖。
+- 发布：先完整写出新的 .npy，再以 os.replace 原子替换清单；数据文件发布后不再修改，
+  已映射旧文件的进程不受影响（仅保留上一版本，更早的文件在发布时清理，只清理本库前缀的文件）。
+- 读取：np.load(mmap_mode='r')，多个 WSGI 进程经操作系统页缓存共享同一份物理内存；清单未变化时复用已加载的映射。
+- 清单记录构建时的价格数据版本，与库内版本不一致时调用方应回退到 SQL 读取；内存库/URI 形式的库不落盘。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from itertools import compress
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .compact_storage import to_day
+
+PRICE_MATRIX_FIELDS = ("close", "close_tr", "close_usd", "close_usd_tr")
+
+_NAME_INFIX = ".price_matrix"
+# 数据文件名中的 token（uuid4 十六进制）
+_TOKEN_RE = r"[0-9a-f]{32}"
+# 构建时每批读取的标的数（限制单次查询返回的行数）
+_BUILD_BATCH = 50
+
+# 进程内已加载的映射：清单路径 → (清单 stat 键, PriceMatrix)
+_LOADED: Dict[str, Tuple[tuple, "PriceMatrix"]] = {}
+_LOADED_LOCK = threading.Lock()
+
+
+class PriceMatrix:
+    """已发布价格矩阵的只读视图。"""
+
+    def __init__(self, version: Optional[str], symbols: Sequence[str], days: np.ndarray | Sequence[int],
+                 fields: Sequence[str], data: np.ndarray):
+        self.version = version
+        self.symbols = list(symbols)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.fields = tuple(fields)
+        self.data = data
+        self._col = {s: i for i, s in enumerate(self.symbols)}
+
+    def block(self, symbols: Sequence[str], dates: Sequence[str], field: str) -> np.ndarray:
+        """(日期, 标的) 取值子块；矩阵中不存在的日期/标的为 NaN。"""
+        out = np.full((len(dates), len(symbols)), np.nan)
+        present = [j for j, s in enumerate(symbols) if s in self._col]
+        if not len(dates) or not present or field not in self.fields or not len(self.days):
+            return out
+        target = np.array([to_day(d) for d in dates], dtype=np.int64)
+        pos = np.searchsorted(self.days, target)
+        hit = (pos < len(self.days)) & (self.days[np.minimum(pos, len(self.days) - 1)] == target)
+        # 按所需日期行 × 标的列取出子块（对映射文件仅读取涉及的页）
+        sub = self.data[self.fields.index(field)][np.ix_(pos[hit], [self._col[symbols[j]] for j in present])]
+        out[np.ix_(np.flatnonzero(hit), np.asarray(present, dtype=np.int64))] = sub
+        return out
+
+    def series_on(self, symbols: Sequence[str], dates: Sequence[str], field: str) -> Dict[str, List[Tuple[str, float]]]:
+        """各标的在给定日期（升序）上的非空取值 [(date, value)...]；矩阵中不存在的标的返回空列表。"""
+        block = self.block(symbols, dates, field)
+        out: Dict[str, List[Tuple[str, float]]] = {}
+        for j, sym in enumerate(symbols):
+            values = block[:, j]
+            mask = ~np.isnan(values)
+            out[sym] = list(zip(compress(dates, mask), values[mask].tolist()))
+        return out
+
+
+def collect_prices(repo) -> Tuple[Optional[str], List[str], np.ndarray, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """从仓储分批读取全部价格：返回 (价格版本, 标的, 日期轴日序号, {symbol: (日序号, (字段, 点数) 取值)})。"""
+    # 先取版本再读数据：读取期间若有写入，记录的是较旧版本，只会被判定为过期
+    version = repo.get_price_data_version()
+    symbols = sorted(repo.get_price_coverage())
+    chunks: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for i in range(0, len(symbols), _BUILD_BATCH):
+        batch = symbols[i:i + _BUILD_BATCH]
+        for sym, cols in repo.fetch_prices_many(batch, columnar=True).items():
+            if not cols["dates"]:
+                continue
+            days = np.array(cols["dates"], dtype="datetime64[D]").astype(np.int64)
+            chunks[sym] = (days, np.array([cols[f] for f in PRICE_MATRIX_FIELDS], dtype=np.float64))
+    symbols = [s for s in symbols if s in chunks]
+    days = np.unique(np.concatenate([d for d, _ in chunks.values()])) if chunks else np.empty(0, dtype=np.int64)
+    return version, symbols, days, chunks
+
+
+def _fill(out: np.ndarray, symbols: List[str], days: np.ndarray,
+          chunks: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> None:
+    out[...] = np.nan
+    for j, sym in enumerate(symbols):
+        sym_days, values = chunks[sym]
+        out[:, np.searchsorted(days, sym_days), j] = values
+
+
+def load_price_matrix(repo) -> PriceMatrix:
+    """在进程内存中构建价格矩阵（不落盘），用于无可用发布文件时的批量计算。"""
+    version, symbols, days, chunks = collect_prices(repo)
+    data = np.empty((len(PRICE_MATRIX_FIELDS), len(days), len(symbols)))
+    _fill(data, symbols, days, chunks)
+    return PriceMatrix(version, symbols, days, PRICE_MATRIX_FIELDS, data)
+
+
+class PriceMatrixStore:
+    """价格矩阵文件的发布与加载。"""
+
+    def __init__(self, directory: str, stem: str):
+        self.directory = directory
+        self.prefix = f"{stem}{_NAME_INFIX}."
+        self.manifest_path = os.path.join(directory, f"{stem}{_NAME_INFIX}.json")
+        self._data_re = re.compile(re.escape(self.prefix) + _TOKEN_RE + r"\.npy")
+
+    @classmethod
+    def for_db_path(cls, db_path: Any) -> Optional["PriceMatrixStore"]:
+        """中观库同目录、以库文件名为前缀的矩阵存储；内存库/URI 形式的库返回 None。"""
+        if not isinstance(db_path, (str, os.PathLike)):
+            return None
+        path = os.fspath(db_path).strip()
+        if not path or path == ":memory:" or path.startswith("file:"):
+            return None
+        path = os.path.abspath(path)
+        return cls(os.path.dirname(path), os.path.splitext(os.path.basename(path))[0])
+
+    def build(self, repo) -> Optional[Dict[str, Any]]:
+        """从仓储读取全部价格并发布新矩阵；无价格数据时不发布，返回 None。"""
+        version, symbols, days, chunks = collect_prices(repo)
+        if not chunks:
+            return None
+        return self.publish(version, symbols, days, chunks)
+
+    def publish(self, version: Optional[str], symbols: List[str], days: np.ndarray,
+                chunks: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> Dict[str, Any]:
+        """写出新数据文件并原子替换清单；chunks 为 {symbol: (日序号, (字段, 点数) 取值)}。"""
+        name = f"{self.prefix}{uuid.uuid4().hex}.npy"
+        final = os.path.join(self.directory, name)
+        tmp = final + ".tmp"
+        shape = (len(PRICE_MATRIX_FIELDS), len(days), len(symbols))
+        mm = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=shape)
+        _fill(mm, symbols, days, chunks)
+        mm.flush()
+        del mm
+        os.replace(tmp, final)
+
+        previous = self._read_manifest()
+        manifest = {
+            "version": version,
+            "file": name,
+            "fields": list(PRICE_MATRIX_FIELDS),
+            "symbols": symbols,
+            "days": days.tolist(),
+            "shape": list(shape),
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
+        tmp_manifest = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self.manifest_path)
+        self._cleanup(keep={name, (previous or {}).get("file")})
+        return {"file": name, "version": version, "symbols": len(symbols), "dates": len(days)}
+
+    def load(self) -> Optional[PriceMatrix]:
+        """加载当前发布的矩阵（只读映射）；无文件或文件损坏时返回 None。"""
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with _LOADED_LOCK:
+            hit = _LOADED.get(self.manifest_path)
+            if hit is not None and hit[0] == key:
+                return hit[1]
+        manifest = self._read_manifest()
+        if not manifest:
+            return None
+        try:
+            data = np.load(os.path.join(self.directory, manifest["file"]), mmap_mode="r")
+            if list(data.shape) != list(manifest["shape"]):
+                return None
+            matrix = PriceMatrix(manifest.get("version"), manifest["symbols"], manifest["days"],
+                                 manifest["fields"], data)
+        except (OSError, ValueError, KeyError):
+            return None
+        with _LOADED_LOCK:
+            _LOADED[self.manifest_path] = (key, matrix)
+        return matrix
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cleanup(self, keep: set) -> None:
+        """删除本库除当前与上一版本以外的数据文件（映射中的文件在部分平台上无法删除，忽略失败）。"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            # 按完整文件名匹配：同目录其他库（库名恰以本库前缀开头时）的文件不受影响
+            if self._data_re.fullmatch(name) and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+风险/收益指标内核（纯 NumPy）：年化波动率、年化收益率、最大回撤、夏普、卡玛。
+
+说明：
+- 输入为日收益数组，最后一维为时间轴；二维输入（序列数 × 天数）一次性批量计算，返回每行一个结果。
+- 公式与 empyrical（DAILY，annualization=252，无风险利率 0）一致，测试中逐项对照校验：
+  - 年化波动率 = nanstd(ddof=1) × sqrt(252)，观测数 < 2 时为 NaN
+  - 年化收益率 = (∏(1+r))^(252/n) − 1，无观测时为 NaN
+  - 最大回撤 = min((净值 − 历史最高净值) / 历史最高净值)，起始净值计入历史最高
+  - 夏普 = nanmean / nanstd(ddof=1) × sqrt(252)，观测数 < 2 时为 NaN
+  - 卡玛 = 年化收益率 / |最大回撤|，无回撤或结果为无穷时为 NaN
+- NaN 表示该位置无观测（用于不等长序列的对齐填充）：计数 n 只统计有效值，回撤计算中视为 0 收益。
+  对不含 NaN 的序列，结果与 empyrical 完全一致。
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+ANNUALIZATION = 252
+
+METRIC_NAMES: Tuple[str, ...] = (
+    'annual_volatility', 'annual_return', 'max_drawdown', 'sharpe_ratio', 'calmar_ratio',
+)
+
+
+def _as_2d(returns) -> Tuple[np.ndarray, bool]:
+    arr = np.asarray(returns, dtype=np.float64)
+    if arr.ndim == 1:
+        return arr[np.newaxis, :], True
+    if arr.ndim != 2:
+        raise ValueError("returns 需为一维或二维数组（序列数 × 天数）")
+    return arr, False
+
+
+def _finish(values: np.ndarray, is_1d: bool):
+    return float(values[0]) if is_1d else values
+
+
+def _valid_counts(arr: np.ndarray) -> np.ndarray:
+    return np.sum(~np.isnan(arr), axis=1)
+
+
+def _nanstd_ddof1(arr: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    out = np.full(arr.shape[0], np.nan)
+    ok = counts >= 2
+    if np.any(ok):
+        out[ok] = np.nanstd(arr[ok], axis=1, ddof=1)
+    return out
+
+
+def _nanmean(arr: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    out = np.full(arr.shape[0], np.nan)
+    ok = counts >= 1
+    if np.any(ok):
+        out[ok] = np.nanmean(arr[ok], axis=1)
+    return out
+
+
+def _annual_volatility(arr, counts, annualization):
+    return _nanstd_ddof1(arr, counts) * np.sqrt(annualization)
+
+
+def _annual_return(arr, counts, annualization):
+    out = np.full(arr.shape[0], np.nan)
+    ok = counts >= 1
+    if np.any(ok):
+        ending = np.nanprod(arr[ok] + 1.0, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            out[ok] = np.power(ending, 1.0 / (counts[ok] / annualization)) - 1.0
+    return out
+
+
+def _max_drawdown(arr, counts):
+    out = np.full(arr.shape[0], np.nan)
+    ok = counts >= 1
+    if np.any(ok):
+        wealth = np.cumprod(np.where(np.isnan(arr[ok]), 0.0, arr[ok]) + 1.0, axis=1)
+        # 起始净值 1 参与历史最高（与 empyrical 在序列前补起点的口径一致）
+        peak = np.fmax.accumulate(np.concatenate([np.ones((wealth.shape[0], 1)), wealth], axis=1), axis=1)[:, 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[ok] = np.nanmin(np.minimum((wealth - peak) / peak, 0.0), axis=1)
+    return out
+
+
+def _sharpe_ratio(arr, counts, annualization):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = _nanmean(arr, counts) / _nanstd_ddof1(arr, counts) * np.sqrt(annualization)
+    out[counts < 2] = np.nan
+    return out
+
+
+def _calmar_ratio(ann_ret, mdd):
+    out = np.full(ann_ret.shape, np.nan)
+    has_dd = mdd < 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[has_dd] = ann_ret[has_dd] / np.abs(mdd[has_dd])
+    out[np.isinf(out)] = np.nan
+    return out
+
+
+def annual_volatility(returns, annualization: int = ANNUALIZATION):
+    arr, is_1d = _as_2d(returns)
+    return _finish(_annual_volatility(arr, _valid_counts(arr), annualization), is_1d)
+
+
+def annual_return(returns, annualization: int = ANNUALIZATION):
+    arr, is_1d = _as_2d(returns)
+    return _finish(_annual_return(arr, _valid_counts(arr), annualization), is_1d)
+
+
+def max_drawdown(returns):
+    arr, is_1d = _as_2d(returns)
+    return _finish(_max_drawdown(arr, _valid_counts(arr)), is_1d)
+
+
+def sharpe_ratio(returns, annualization: int = ANNUALIZATION):
+    arr, is_1d = _as_2d(returns)
+    return _finish(_sharpe_ratio(arr, _valid_counts(arr), annualization), is_1d)
+
+
+def calmar_ratio(returns, annualization: int = ANNUALIZATION):
+    arr, is_1d = _as_2d(returns)
+    counts = _valid_counts(arr)
+    return _finish(_calmar_ratio(_annual_return(arr, counts, annualization), _max_drawdown(arr, counts)), is_1d)
+
+
+def compute_risk_metrics(returns, annualization: int = ANNUALIZATION) -> Dict[str, np.ndarray]:
+    """一次计算全部五项指标（共享有效计数、年化收益与回撤）。
+
+    returns 为一维时返回标量字典，二维时每项为长度等于序列数的数组。
+    """
+    arr, is_1d = _as_2d(returns)
+    counts = _valid_counts(arr)
+    ann_ret = _annual_return(arr, counts, annualization)
+    mdd = _max_drawdown(arr, counts)
+    values = {
+        'annual_volatility': _annual_volatility(arr, counts, annualization),
+        'annual_return': ann_ret,
+        'max_drawdown': mdd,
+        'sharpe_ratio': _sharpe_ratio(arr, counts, annualization),
+        'calmar_ratio': _calmar_ratio(ann_ret, mdd),
+    }
+    return {k: _finish(v, is_1d) for k, v in values.items()}
+
+
+def stack_series(series, fill: float = np.nan) -> np.ndarray:
+    """将若干不等长一维序列右侧填充为二维数组（序列数 × 最大长度）。"""
+    items = [np.asarray(s, dtype=np.float64).ravel() for s in series]
+    width = max((len(s) for s in items), default=0)
+    out = np.full((len(items), width), fill)
+    for i, s in enumerate(items):
+        out[i, :len(s)] = s
+    return out
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FIFO 批次引擎：持久化每笔买入明细（批次）的剩余数量及其被哪些卖出消耗。
+
+说明：
+- trade_lots：每个买入明细对应一个批次，记录原始/剩余数量与 FIFO 排序键。
+- trade_lot_allocations：卖出明细对批次的消耗记录（sell_detail_id → buy_detail_id, quantity）。
+- trade_lot_state：每笔交易的批次状态戳（买入/卖出笔数与数量、未分配的超卖数量）。
+- 买入/卖出在写事务内增量维护；历史明细被编辑或出现补录（早于已消耗批次的买入、早于已有卖出的卖出）时，
+  删除状态戳，下次读取时按明细全量重放。
+- 读取时将状态戳与明细聚合比对，不一致（例如直接写库）则自动重放并持久化，保证与全量重放结果一致。
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .database_service import DatabaseService
+
+
+# FIFO 排序键：成交日期、创建时间、明细ID（与历史全量重放口径一致）
+_LOT_ORDER = "transaction_date, created_at, buy_detail_id"
+
+
+class TradeLotEngine:
+    def __init__(self, db: Optional[DatabaseService] = None):
+        self.db = db or DatabaseService(create_trading_schema=True)
+
+    # --------------------- 读取 ---------------------
+    def remaining_map(self, trade_id: int) -> Dict[int, int]:
+        """返回 {buy_detail_id: remaining_quantity}（按 FIFO 顺序）。
+
+        状态戳与明细一致时仅做索引读取；否则重放并持久化后返回。
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if not self._state_is_current(cursor, trade_id):
+                self.rebuild(cursor, trade_id)
+                conn.commit()
+            cursor.execute(
+                f"SELECT buy_detail_id, remaining_quantity FROM trade_lots WHERE trade_id = ? ORDER BY {_LOT_ORDER}",
+                (trade_id,),
+            )
+            return {int(r['buy_detail_id']): max(0, int(r['remaining_quantity'])) for r in cursor.fetchall()}
+
+    def allocations_for_lot(self, buy_detail_id: int) -> List[Dict[str, Any]]:
+        """返回消耗某买入批次的卖出明细列表 [{sell_detail_id, quantity}]。"""
+        rows = self.db.execute_query(
+            "SELECT sell_detail_id, quantity FROM trade_lot_allocations WHERE buy_detail_id = ? ORDER BY sell_detail_id",
+            (buy_detail_id,),
+        )
+        return [{'sell_detail_id': int(r['sell_detail_id']), 'quantity': int(r['quantity'])} for r in rows or []]
+
+    # --------------------- 增量维护（调用方事务内） ---------------------
+    def record_buy(self, cursor, trade_id: int, buy_detail_id: int, new_trade: bool = False) -> None:
+        """登记新的买入批次。新建交易时初始化状态戳。"""
+        if new_trade:
+            self._delete_trade_state(cursor, [trade_id])
+            cursor.execute(
+                "INSERT INTO trade_lot_state (trade_id, buy_count, buy_quantity, sell_count, sell_quantity, unallocated_quantity) "
+                "VALUES (?, 0, 0, 0, 0, 0)",
+                (trade_id,),
+            )
+        state = self._load_state(cursor, trade_id)
+        if state is None:
+            # 状态未建立（历史数据）：等待读取时全量重放
+            return
+        cursor.execute(
+            "INSERT INTO trade_lots (buy_detail_id, trade_id, transaction_date, created_at, original_quantity, remaining_quantity) "
+            "SELECT id, trade_id, transaction_date, created_at, quantity, quantity FROM trade_details WHERE id = ?",
+            (buy_detail_id,),
+        )
+        # 存在未分配的超卖，或新批次排在已被消耗的批次之前：FIFO 结果会改变，需要重放
+        cursor.execute(
+            "SELECT 1 FROM trade_lots l JOIN trade_lots n ON n.buy_detail_id = ? "
+            "WHERE l.trade_id = ? AND l.buy_detail_id != n.buy_detail_id "
+            "AND l.remaining_quantity < l.original_quantity "
+            "AND (l.transaction_date, l.created_at, l.buy_detail_id) > (n.transaction_date, n.created_at, n.buy_detail_id) "
+            "LIMIT 1",
+            (buy_detail_id, trade_id),
+        )
+        if state['unallocated_quantity'] > 0 or cursor.fetchone():
+            self.invalidate(cursor, [trade_id])
+            return
+        cursor.execute(
+            "UPDATE trade_lot_state SET buy_count = buy_count + 1, "
+            "buy_quantity = buy_quantity + (SELECT original_quantity FROM trade_lots WHERE buy_detail_id = ?), "
+            "updated_at = CURRENT_TIMESTAMP WHERE trade_id = ?",
+            (buy_detail_id, trade_id),
+        )
+
+    def record_sell(self, cursor, trade_id: int, sell_detail_id: int, quantity: int,
+                    transaction_date: str) -> None:
+        """按 FIFO 消耗剩余批次并记录分配。补录（早于已有卖出）时改为失效待重放。"""
+        state = self._load_state(cursor, trade_id)
+        if state is None:
+            return
+        cursor.execute(
+            "SELECT 1 FROM trade_details n JOIN trade_details d ON d.trade_id = n.trade_id "
+            "WHERE n.id = ? AND d.id != n.id AND d.transaction_type = 'sell' AND d.is_deleted = 0 "
+            "AND (d.transaction_date, d.created_at, d.id) > (n.transaction_date, n.created_at, n.id) "
+            "LIMIT 1",
+            (sell_detail_id,),
+        )
+        if cursor.fetchone():
+            self.invalidate(cursor, [trade_id])
+            return
+        cursor.execute(
+            f"SELECT buy_detail_id, remaining_quantity FROM trade_lots "
+            f"WHERE trade_id = ? AND remaining_quantity > 0 ORDER BY {_LOT_ORDER}",
+            (trade_id,),
+        )
+        lots = [(int(r['buy_detail_id']), int(r['remaining_quantity'])) for r in cursor.fetchall()]
+        left = int(quantity)
+        updates: List[Tuple[int, int]] = []
+        allocations: List[Tuple[int, int, int, int]] = []
+        for lot_id, remaining in lots:
+            if left <= 0:
+                break
+            take = min(remaining, left)
+            left -= take
+            updates.append((remaining - take, lot_id))
+            allocations.append((sell_detail_id, lot_id, trade_id, take))
+        if updates:
+            cursor.executemany("UPDATE trade_lots SET remaining_quantity = ? WHERE buy_detail_id = ?", updates)
+            cursor.executemany(
+                "INSERT INTO trade_lot_allocations (sell_detail_id, buy_detail_id, trade_id, quantity) VALUES (?, ?, ?, ?)",
+                allocations,
+            )
+        cursor.execute(
+            "UPDATE trade_lot_state SET sell_count = sell_count + 1, sell_quantity = sell_quantity + ?, "
+            "unallocated_quantity = unallocated_quantity + ?, updated_at = CURRENT_TIMESTAMP WHERE trade_id = ?",
+            (int(quantity), max(0, left), trade_id),
+        )
+
+    def invalidate(self, cursor, trade_ids: Sequence[int]) -> None:
+        """丢弃批次状态，下次读取时按明细全量重放（用于历史明细编辑、恢复等场景）。"""
+        self._delete_trade_state(cursor, trade_ids)
+
+    def drop(self, cursor, trade_ids: Sequence[int]) -> None:
+        """删除交易的全部批次数据（软删除/永久删除）。"""
+        self._delete_trade_state(cursor, trade_ids)
+
+    # --------------------- 全量重放 ---------------------
+    def rebuild(self, cursor, trade_id: int) -> None:
+        """基于未删除明细全量重放 FIFO 并持久化批次、分配与状态戳。"""
+        self._delete_trade_state(cursor, [trade_id])
+        cursor.execute(
+            "SELECT id, transaction_type, quantity, transaction_date, created_at FROM trade_details "
+            "WHERE trade_id = ? AND is_deleted = 0 ORDER BY transaction_date, created_at, id",
+            (trade_id,),
+        )
+        details = [dict(r) for r in cursor.fetchall()]
+        buys = [d for d in details if d['transaction_type'] == 'buy']
+        remaining = [int(d['quantity']) for d in buys]
+        allocations: List[Tuple[int, int, int, int]] = []
+        sell_count = 0
+        sell_quantity = 0
+        unallocated = 0
+        head = 0
+        for d in details:
+            if d['transaction_type'] != 'sell':
+                continue
+            sell_count += 1
+            left = int(d['quantity'])
+            sell_quantity += left
+            while left > 0 and head < len(buys):
+                take = min(remaining[head], left)
+                if take > 0:
+                    remaining[head] -= take
+                    left -= take
+                    allocations.append((int(d['id']), int(buys[head]['id']), trade_id, take))
+                if remaining[head] <= 0:
+                    head += 1
+            unallocated += max(0, left)
+        if buys:
+            cursor.executemany(
+                "INSERT INTO trade_lots (buy_detail_id, trade_id, transaction_date, created_at, original_quantity, remaining_quantity) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(int(b['id']), trade_id, b['transaction_date'], b['created_at'], int(b['quantity']), max(0, rem))
+                 for b, rem in zip(buys, remaining)],
+            )
+        if allocations:
+            cursor.executemany(
+                "INSERT INTO trade_lot_allocations (sell_detail_id, buy_detail_id, trade_id, quantity) VALUES (?, ?, ?, ?)",
+                allocations,
+            )
+        cursor.execute(
+            "INSERT INTO trade_lot_state (trade_id, buy_count, buy_quantity, sell_count, sell_quantity, unallocated_quantity) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (trade_id, len(buys), sum(int(b['quantity']) for b in buys), sell_count, sell_quantity, unallocated),
+        )
+
+    # --------------------- 内部工具 ---------------------
+    def _load_state(self, cursor, trade_id: int) -> Optional[Dict[str, int]]:
+        cursor.execute(
+            "SELECT buy_count, buy_quantity, sell_count, sell_quantity, unallocated_quantity "
+            "FROM trade_lot_state WHERE trade_id = ?",
+            (trade_id,),
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {k: int(row[k] or 0) for k in row.keys()}
+
+    def _state_is_current(self, cursor, trade_id: int) -> bool:
+        """状态戳与明细聚合（笔数/数量）一致时认为批次可信。"""
+        cursor.execute(
+            """
+            SELECT COUNT(CASE WHEN transaction_type = 'buy' THEN 1 END) AS buy_count,
+                   COALESCE(SUM(CASE WHEN transaction_type = 'buy' THEN quantity END), 0) AS buy_quantity,
+                   COUNT(CASE WHEN transaction_type = 'sell' THEN 1 END) AS sell_count,
+                   COALESCE(SUM(CASE WHEN transaction_type = 'sell' THEN quantity END), 0) AS sell_quantity
+            FROM trade_details WHERE trade_id = ? AND is_deleted = 0
+            """,
+            (trade_id,),
+        )
+        actual = cursor.fetchone()
+        state = self._load_state(cursor, trade_id)
+        if state is None or actual is None:
+            return False
+        return all(int(actual[k] or 0) == state[k] for k in ('buy_count', 'buy_quantity', 'sell_count', 'sell_quantity'))
+
+    def _delete_trade_state(self, cursor, trade_ids: Sequence[int]) -> None:
+        ids = [int(t) for t in trade_ids]
+        if not ids:
+            return
+        placeholders = ",".join(["?"] * len(ids))
+        for table in ('trade_lot_allocations', 'trade_lots', 'trade_lot_state'):
+            cursor.execute(f"DELETE FROM {table} WHERE trade_id IN ({placeholders})", tuple(ids))
@@ -5,7 +5,7 @@ TradeRepository：封装 trades 与 trade_details 的读取查询，隔离 SQL
 遵循依赖倒置，服务面向接口/仓储而非直接SQL。
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from decimal import Decimal
 
 from .database_service import DatabaseService
@@ -15,18 +15,17 @@ class TradeRepository:
     def __init__(self, db: Optional[DatabaseService] = None):
         self.db = db or DatabaseService(create_trading_schema=True)
 
-    def fetch_trades(self, status: Optional[str], strategy_id: Optional[int], include_deleted: bool,
-                     order_by: str, limit: Optional[int], offset: Optional[int] = None,
-                     symbols: Optional[List[str]] = None,
-                     symbol_names: Optional[List[str]] = None,
-                     date_from: Optional[str] = None,
-                     date_to: Optional[str] = None) -> List[Dict[str, Any]]:
-        query = '''
-            SELECT t.*, s.name as strategy_name
-            FROM trades t
-            LEFT JOIN strategies s ON t.strategy_id = s.id
-        '''
-        conditions = []
+    # 单批从游标读取的默认行数（导出流式读取使用）
+    STREAM_BATCH_SIZE = 500
+
+    @staticmethod
+    def _build_trade_filters(status: Optional[str], strategy_id: Optional[int], include_deleted: bool,
+                             symbols: Optional[List[str]] = None,
+                             symbol_names: Optional[List[str]] = None,
+                             date_from: Optional[str] = None,
+                             date_to: Optional[str] = None) -> Tuple[List[str], List[Any]]:
+        """构建 trades 查询的 WHERE 条件与参数（列表查询、计数与导出共用）。"""
+        conditions: List[str] = []
         params: List[Any] = []
         if not include_deleted:
             conditions.append("t.is_deleted = 0")
@@ -61,16 +60,34 @@ class TradeRepository:
         elif dt:
             conditions.append("(t.open_date <= ? OR (t.close_date IS NOT NULL AND t.close_date <= ?))")
             params.extend([dt, dt])
+        return conditions, params
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+    @staticmethod
+    def _safe_order_by(order_by: Optional[str], default: str = 't.created_at DESC') -> str:
         # whitelist columns for ordering
         ob = (order_by or '').strip()
-        safe_order_by = 't.created_at DESC'
         # 简单白名单校验：仅允许以 t./s. 开头，并且仅包含一个空格分隔 ASC/DESC
         if (ob.startswith('t.') or ob.startswith('s.')) and (';' not in ob):
-            safe_order_by = ob
-        query += f" ORDER BY {safe_order_by}"
+            return ob
+        return default
+
+    def fetch_trades(self, status: Optional[str], strategy_id: Optional[int], include_deleted: bool,
+                     order_by: str, limit: Optional[int], offset: Optional[int] = None,
+                     symbols: Optional[List[str]] = None,
+                     symbol_names: Optional[List[str]] = None,
+                     date_from: Optional[str] = None,
+                     date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = '''
+            SELECT t.*, s.name as strategy_name
+            FROM trades t
+            LEFT JOIN strategies s ON t.strategy_id = s.id
+        '''
+        conditions, params = self._build_trade_filters(
+            status, strategy_id, include_deleted, symbols, symbol_names, date_from, date_to
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {self._safe_order_by(order_by)}"
         if limit is not None and isinstance(limit, int) and limit > 0:
             # LIMIT 和 OFFSET 仅接受非负整数，来源已在上游校验
             query += f" LIMIT {int(limit)}"
@@ -90,41 +107,9 @@ class TradeRepository:
             FROM trades t
             LEFT JOIN strategies s ON t.strategy_id = s.id
         '''
-        conditions = []
-        params: List[Any] = []
-        if not include_deleted:
-            conditions.append("t.is_deleted = 0")
-        if status:
-            conditions.append("t.status = ?")
-            params.append(status)
-        if strategy_id:
-            conditions.append("t.strategy_id = ?")
-            params.append(strategy_id)
-        if symbols:
-            symbols_clean = [str(s).strip().upper() for s in symbols if str(s).strip()]
-            if symbols_clean:
-                placeholders = ",".join(["?"] * len(symbols_clean))
-                conditions.append(f"UPPER(t.symbol_code) IN ({placeholders})")
-                params.extend(symbols_clean)
-        if symbol_names:
-            names_clean = [str(s).strip().upper() for s in symbol_names if str(s).strip()]
-            if names_clean:
-                placeholders = ",".join(["?"] * len(names_clean))
-                conditions.append(f"UPPER(t.symbol_name) IN ({placeholders})")
-                params.extend(names_clean)
-        # 日期区间过滤（开仓或平仓在区间内）
-        df = (date_from or '').strip()
-        dt = (date_to or '').strip()
-        if df and dt:
-            conditions.append("(t.open_date BETWEEN ? AND ? OR t.close_date BETWEEN ? AND ?)")
-            params.extend([df, dt, df, dt])
-        elif df:
-            conditions.append("(t.open_date >= ? OR (t.close_date IS NOT NULL AND t.close_date >= ?))")
-            params.extend([df, df])
-        elif dt:
-            conditions.append("(t.open_date <= ? OR (t.close_date IS NOT NULL AND t.close_date <= ?))")
-            params.extend([dt, dt])
-
+        conditions, params = self._build_trade_filters(
+            status, strategy_id, include_deleted, symbols, symbol_names, date_from, date_to
+        )
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
         row = self.db.execute_query(query, tuple(params), fetch_one=True)
@@ -133,7 +118,81 @@ class TradeRepository:
         except Exception:
             return int(row[0]) if row else 0
 
-    def aggregate_trade_details(self, trade_id: int, include_deleted: bool) -> Dict[str, Decimal]:
+    def iter_trades(self, status: Optional[str], strategy_id: Optional[int], include_deleted: bool,
+                    order_by: str = 't.id ASC',
+                    symbols: Optional[List[str]] = None,
+                    symbol_names: Optional[List[str]] = None,
+                    date_from: Optional[str] = None,
+                    date_to: Optional[str] = None,
+                    batch_size: Optional[int] = None) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """按 fetch_trades 相同的筛选条件流式读取交易。
+
+        通过游标 fetchmany 分批返回 (列名, 行元组列表)，内存占用与账本规模无关。
+        """
+        query = '''
+            SELECT t.*, s.name as strategy_name
+            FROM trades t
+            LEFT JOIN strategies s ON t.strategy_id = s.id
+        '''
+        conditions, params = self._build_trade_filters(
+            status, strategy_id, include_deleted, symbols, symbol_names, date_from, date_to
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {self._safe_order_by(order_by, 't.id ASC')}"
+        return self._stream_query(query, tuple(params), batch_size)
+
+    def iter_trade_details(self, status: Optional[str], strategy_id: Optional[int], include_deleted: bool,
+                           symbols: Optional[List[str]] = None,
+                           symbol_names: Optional[List[str]] = None,
+                           date_from: Optional[str] = None,
+                           date_to: Optional[str] = None,
+                           batch_size: Optional[int] = None) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """流式读取满足交易筛选条件的交易明细（附带标的与策略信息）。
+
+        include_deleted 同时作用于交易与明细；排序固定为交易ID、成交日期、明细ID。
+        """
+        query = '''
+            SELECT d.*, t.strategy_id, s.name as strategy_name, t.symbol_code, t.symbol_name
+            FROM trade_details d
+            JOIN trades t ON d.trade_id = t.id
+            LEFT JOIN strategies s ON t.strategy_id = s.id
+        '''
+        conditions, params = self._build_trade_filters(
+            status, strategy_id, include_deleted, symbols, symbol_names, date_from, date_to
+        )
+        if not include_deleted:
+            conditions.append("d.is_deleted = 0")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY d.trade_id ASC, d.transaction_date ASC, d.id ASC"
+        return self._stream_query(query, tuple(params), batch_size)
+
+    def _stream_query(self, query: str, params: tuple,
+                      batch_size: Optional[int]) -> Iterator[Tuple[List[str], List[tuple]]]:
+        size = int(batch_size) if batch_size and int(batch_size) > 0 else self.STREAM_BATCH_SIZE
+        # 连接在生成器首次迭代时打开，迭代结束或生成器关闭时释放
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            columns = [c[0] for c in (cursor.description or [])]
+            emitted = False
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                emitted = True
+                yield columns, [tuple(r) for r in rows]
+            if not emitted:
+                # 空结果也返回一次列名，便于编码器输出表头
+                yield columns, []
+
+    def aggregate_trade_details(self, trade_id: int, include_deleted: bool,
+                                cursor: Any = None) -> Dict[str, Decimal]:
+        """单次扫描聚合交易明细的买卖金额、费用与数量。
+
+        传入 cursor 时在调用方的事务内执行（例如卖出路径的 BEGIN IMMEDIATE 事务）。
+        """
         sql = (
             """
             SELECT 
@@ -146,9 +205,15 @@ class TradeRepository:
             FROM trade_details WHERE trade_id = ?
             """ + (" AND is_deleted = 0" if not include_deleted else "")
         )
-        row = self.db.execute_query(sql, (trade_id,), fetch_one=True)
+        if cursor is not None:
+            cursor.execute(sql, (trade_id,))
+            row = cursor.fetchone()
+        else:
+            row = self.db.execute_query(sql, (trade_id,), fetch_one=True)
+        # sqlite3.Row 不支持 get，统一转为 dict 读取
+        data = dict(row) if row is not None and not isinstance(row, dict) else (row or {})
         def to_dec(k: str) -> Decimal:
-            return Decimal(str(row[k])) if row and row.get(k) is not None else Decimal('0')
+            return Decimal(str(data[k])) if data.get(k) is not None else Decimal('0')
         return {
             'gross_buy': to_dec('gross_buy'),
             'buy_fees': to_dec('buy_fees'),
@@ -157,5 +222,3 @@ class TradeRepository:
             'sold_qty': to_dec('sold_qty'),
             'buy_qty': to_dec('buy_qty'),
         }
-
-
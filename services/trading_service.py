@@ -11,6 +11,8 @@ from decimal import Decimal
 from .database_service import DatabaseService
 from .strategy_service import StrategyService
 from .trade_repository import TradeRepository
+from .trade_lot_engine import TradeLotEngine
+from .daily_returns import DailyReturnStore
 from .trade_calculation import compute_trade_profit_metrics
 from .mappers import dict_to_trade_dto
 from models.trading import Trade, TradeDetail, TradeModification
@@ -25,6 +27,8 @@ class TradingService:
         self.db = db_service or DatabaseService(create_trading_schema=True)
         self.strategy_service = StrategyService(self.db)
         self.trade_repo = TradeRepository(self.db)
+        self.lot_engine = TradeLotEngine(self.db)
+        self.daily_returns = DailyReturnStore(self.db)
 
     def add_buy_transaction(self, strategy, symbol_code: str, symbol_name: str,
                           price: Decimal, quantity: int, transaction_date: str,
@@ -93,6 +97,11 @@ class TradingService:
                         transaction_date, transaction_fee, buy_reason, created_at
                     ) VALUES (?, 'buy', ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ''', (trade_id, float(price), quantity, float(amount), transaction_date, float(transaction_fee), buy_reason))
+                # 登记 FIFO 批次
+                self.lot_engine.record_buy(cursor, trade_id, cursor.lastrowid, new_trade=not existing_trade)
+                # 加权买入均价变化：重建该交易的日收益
+                if existing_trade:
+                    self.daily_returns.rebuild_trades(cursor, [trade_id])
 
                 conn.commit()
                 return True, trade_id
@@ -130,145 +139,123 @@ class TradingService:
             if not ok_d:
                 return False, msg_d
 
-            # 获取交易信息 (包含已删除的)
-            trade = self.get_trade_by_id(trade_id, include_deleted=True)
-            if not trade:
-                return False, f"交易ID {trade_id} 不存在"
-
-            if trade.get('is_deleted'):
-                return False, "该交易已被删除，无法操作"
-
-            if trade['status'] == 'closed':
-                return False, "该交易已平仓"
-
-            if trade['remaining_quantity'] < quantity:
-                return False, f"卖出数量({quantity})超过剩余持仓({trade['remaining_quantity']})"
-
             # 计算交易金额（amount 记录净额用于旧字段兼容；展示时卖出金额使用不含费成交额）
             sell_amount = price * quantity - transaction_fee
 
-            # 计算不含费用的加权买入均价与盈亏
-            # 按买入明细聚合，得到总买入金额（不含费用）与数量，以及买入手续费总额
-            buy_agg = self.db.execute_query(
-                """
-                SELECT COALESCE(SUM(price * quantity), 0) AS gross_buy,
-                       COALESCE(SUM(quantity), 0) AS qty,
-                       COALESCE(SUM(transaction_fee), 0) AS buy_fees
-                FROM trade_details
-                WHERE trade_id = ? AND transaction_type = 'buy' AND is_deleted = 0
-                """,
-                (trade_id,),
-                fetch_one=True,
-            )
-            gross_buy = Decimal(str(buy_agg['gross_buy'])) if buy_agg else Decimal('0')
-            total_buy_quantity = Decimal(str(buy_agg['qty'])) if buy_agg else Decimal('0')
-            total_buy_fees = Decimal(str(buy_agg['buy_fees'])) if buy_agg else Decimal('0')
-
-            avg_buy_price_ex_fee = (gross_buy / total_buy_quantity) if total_buy_quantity > 0 else Decimal('0')
-            buy_cost_ex_fee = avg_buy_price_ex_fee * Decimal(str(quantity))
-            gross_sell_amount = price * quantity
-            # 毛利（不含任何费用）
-            profit_loss = gross_sell_amount - buy_cost_ex_fee
-            # 分摊到本次卖出的买入手续费
-            buy_fee_alloc_for_this_sell = (total_buy_fees * (Decimal(str(quantity)) / total_buy_quantity)) if total_buy_quantity > 0 else Decimal('0')
-            # 净利 = 净卖出(扣本次卖出费) - 不含费买入成本 - 分摊买入手续费
-            net_profit_this_sell = (gross_sell_amount - transaction_fee) - buy_cost_ex_fee - buy_fee_alloc_for_this_sell
-            profit_loss_pct = ((gross_sell_amount - buy_cost_ex_fee) / buy_cost_ex_fee * 100) if buy_cost_ex_fee > 0 else Decimal('0')
-
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
-
-                # 添加卖出明细（不存储单笔盈亏，仅存金额与费用）
-                cursor.execute('''
-                    INSERT INTO trade_details (
-                        trade_id, transaction_type, price, quantity, amount,
-                        transaction_date, transaction_fee, sell_reason,
-                        created_at
-                    ) VALUES (?, 'sell', ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (trade_id, float(price), quantity, float(sell_amount), transaction_date,
-                      float(transaction_fee), sell_reason))
-
-                # 更新交易主记录（增量更新：金额为不含费成交额，费用单列）
-                new_remaining = trade['remaining_quantity'] - quantity
-                new_sell_amount = Decimal(str(trade['total_sell_amount'])) + (price * quantity)
-                new_sell_quantity = trade['total_sell_quantity'] + quantity
-                new_profit_loss = Decimal(str(trade['total_profit_loss'])) + profit_loss
-                # 使用不含费用的总买入额作为分母计算汇总盈亏比例
-                # 以买入明细实时聚合为准，避免费用干扰
-                cursor.execute(
-                    """
-                    SELECT COALESCE(SUM(price * quantity), 0) AS gross_buy
-                    FROM trade_details
-                    WHERE trade_id = ? AND transaction_type = 'buy' AND is_deleted = 0
-                    """,
-                    (trade_id,),
-                )
-                total_buy_gross_row = cursor.fetchone()
-                total_buy_gross = Decimal(str(total_buy_gross_row['gross_buy'])) if total_buy_gross_row else Decimal('0')
-                new_profit_loss_pct = (new_profit_loss / total_buy_gross * 100) if total_buy_gross > 0 else Decimal('0')
-
-                # 计算累计手续费（卖出+分摊买入），用于得到总净利润与净利率
-                cursor.execute(
-                    """
-                    SELECT COALESCE(SUM(transaction_fee),0) AS sell_fees
-                    FROM trade_details
-                    WHERE trade_id = ? AND transaction_type = 'sell' AND is_deleted = 0
-                    """,
-                    (trade_id,),
-                )
-                sell_fees_row = cursor.fetchone()
-                sell_fees_total = Decimal(str(sell_fees_row['sell_fees'])) if sell_fees_row else Decimal('0')
-                cursor.execute(
-                    """
-                    SELECT COALESCE(SUM(transaction_fee),0) AS buy_fees
-                    FROM trade_details
-                    WHERE trade_id = ? AND transaction_type = 'buy' AND is_deleted = 0
-                    """,
-                    (trade_id,),
-                )
-                buy_fees_row = cursor.fetchone()
-                buy_fees_total = Decimal(str(buy_fees_row['buy_fees'])) if buy_fees_row else Decimal('0')
-                # 已卖出部分的买入成本与分摊买入手续费
-                buy_cost_for_sold = avg_buy_price_ex_fee * Decimal(str(new_sell_quantity))
-                allocated_buy_fees_for_sold = (buy_fees_total * (Decimal(str(new_sell_quantity)) / total_buy_quantity)) if total_buy_quantity > 0 else Decimal('0')
-                new_gross_profit_total = new_profit_loss
-                new_net_profit_total = new_gross_profit_total - sell_fees_total - allocated_buy_fees_for_sold
-                denom_buy_cost_for_sold = buy_cost_for_sold
-                new_net_profit_pct = (new_net_profit_total / denom_buy_cost_for_sold * 100) if denom_buy_cost_for_sold > 0 else Decimal('0')
-
-                status = 'closed' if new_remaining == 0 else 'open'
-                close_date = transaction_date if status == 'closed' else None
-
-                # 计算持仓天数
-                if status == 'closed':
-                    open_date = datetime.strptime(trade['open_date'], '%Y-%m-%d').date()
-                    close_date_obj = datetime.strptime(transaction_date, '%Y-%m-%d').date()
-                    holding_days = (close_date_obj - open_date).days
-                else:
-                    holding_days = trade['holding_days']
-
-                cursor.execute('''
-                    UPDATE trades SET
-                        total_sell_amount = ?, total_sell_quantity = ?, remaining_quantity = ?,
-                        total_profit_loss = ?, total_profit_loss_pct = ?,
-                        total_gross_profit = ?, total_net_profit = ?, total_net_profit_pct = ?,
-                        total_sell_fees = ?, total_fees = ?, total_fee_ratio_pct = ?,
-                        status = ?, close_date = ?, holding_days = ?, trade_log = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (
-                        float(new_sell_amount), new_sell_quantity, new_remaining,
-                        float(new_gross_profit_total), float(new_profit_loss_pct),
-                        float(new_gross_profit_total), float(new_net_profit_total), float(new_net_profit_pct),
-                        float(sell_fees_total), float(buy_fees_total + sell_fees_total), float(((buy_fees_total + sell_fees_total) / total_buy_gross * 100) if total_buy_gross > 0 else 0),
-                        status, close_date, holding_days, trade_log, trade_id
-                ))
-
+                # BEGIN IMMEDIATE：读取前即获取写锁，避免并发卖出基于过期持仓/聚合计算
+                if not getattr(conn, 'in_transaction', False):
+                    cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    ok, msg = self._apply_sell(
+                        cursor, trade_id, price, quantity, transaction_date,
+                        transaction_fee, sell_amount, sell_reason, trade_log,
+                    )
+                except Exception:
+                    conn.rollback()
+                    raise
+                if not ok:
+                    conn.rollback()
+                    return False, msg
                 conn.commit()
                 return True, "卖出交易添加成功"
 
         except Exception as e:
             return False, f"添加卖出交易失败: {str(e)}"
 
+    def _apply_sell(self, cursor, trade_id: int, price: Decimal, quantity: int,
+                    transaction_date: str, transaction_fee: Decimal, sell_amount: Decimal,
+                    sell_reason: str, trade_log: str) -> Tuple[bool, str]:
+        """在调用方事务内完成卖出：一次读取交易、一次聚合明细，随后写入明细并增量更新主记录。"""
+        # 获取交易信息 (包含已删除的)
+        trade = self.get_trade_by_id(trade_id, include_deleted=True, cursor=cursor)
+        if not trade:
+            return False, f"交易ID {trade_id} 不存在"
+
+        if trade.get('is_deleted'):
+            return False, "该交易已被删除，无法操作"
+
+        if trade['status'] == 'closed':
+            return False, "该交易已平仓"
+
+        if trade['remaining_quantity'] < quantity:
+            return False, f"卖出数量({quantity})超过剩余持仓({trade['remaining_quantity']})"
+
+        # 单次聚合（插入本次卖出前）：不含费买入总额/数量、买入费与既有卖出费
+        sums = self.trade_repo.aggregate_trade_details(trade_id, include_deleted=False, cursor=cursor)
+        gross_buy = sums['gross_buy']
+        total_buy_quantity = sums['buy_qty']
+        buy_fees_total = sums['buy_fees']
+        # 卖出费合计包含本次卖出
+        sell_fees_total = sums['sell_fees'] + transaction_fee
+
+        # 计算不含费用的加权买入均价与盈亏
+        avg_buy_price_ex_fee = (gross_buy / total_buy_quantity) if total_buy_quantity > 0 else Decimal('0')
+        buy_cost_ex_fee = avg_buy_price_ex_fee * Decimal(str(quantity))
+        gross_sell_amount = price * quantity
+        # 毛利（不含任何费用）
+        profit_loss = gross_sell_amount - buy_cost_ex_fee
+
+        # 添加卖出明细（不存储单笔盈亏，仅存金额与费用）
+        cursor.execute('''
+            INSERT INTO trade_details (
+                trade_id, transaction_type, price, quantity, amount,
+                transaction_date, transaction_fee, sell_reason,
+                created_at
+            ) VALUES (?, 'sell', ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (trade_id, float(price), quantity, float(sell_amount), transaction_date,
+              float(transaction_fee), sell_reason))
+        # 按 FIFO 消耗买入批次
+        self.lot_engine.record_sell(cursor, trade_id, cursor.lastrowid, quantity, transaction_date)
+        # 更新该交易在卖出日期的日收益
+        self.daily_returns.record_sell(cursor, trade_id, transaction_date)
+
+        # 更新交易主记录（增量更新：金额为不含费成交额，费用单列）
+        new_remaining = trade['remaining_quantity'] - quantity
+        new_sell_amount = Decimal(str(trade['total_sell_amount'])) + (price * quantity)
+        new_sell_quantity = trade['total_sell_quantity'] + quantity
+        new_profit_loss = Decimal(str(trade['total_profit_loss'])) + profit_loss
+        # 使用不含费用的总买入额作为分母计算汇总盈亏比例（以买入明细聚合为准，避免费用干扰）
+        total_buy_gross = gross_buy
+        new_profit_loss_pct = (new_profit_loss / total_buy_gross * 100) if total_buy_gross > 0 else Decimal('0')
+
+        # 已卖出部分的买入成本与分摊买入手续费，用于得到总净利润与净利率
+        buy_cost_for_sold = avg_buy_price_ex_fee * Decimal(str(new_sell_quantity))
+        allocated_buy_fees_for_sold = (buy_fees_total * (Decimal(str(new_sell_quantity)) / total_buy_quantity)) if total_buy_quantity > 0 else Decimal('0')
+        new_gross_profit_total = new_profit_loss
+        new_net_profit_total = new_gross_profit_total - sell_fees_total - allocated_buy_fees_for_sold
+        denom_buy_cost_for_sold = buy_cost_for_sold
+        new_net_profit_pct = (new_net_profit_total / denom_buy_cost_for_sold * 100) if denom_buy_cost_for_sold > 0 else Decimal('0')
+
+        status = 'closed' if new_remaining == 0 else 'open'
+        close_date = transaction_date if status == 'closed' else None
+
+        # 计算持仓天数
+        if status == 'closed':
+            open_date = datetime.strptime(trade['open_date'], '%Y-%m-%d').date()
+            close_date_obj = datetime.strptime(transaction_date, '%Y-%m-%d').date()
+            holding_days = (close_date_obj - open_date).days
+        else:
+            holding_days = trade['holding_days']
+
+        cursor.execute('''
+            UPDATE trades SET
+                total_sell_amount = ?, total_sell_quantity = ?, remaining_quantity = ?,
+                total_profit_loss = ?, total_profit_loss_pct = ?,
+                total_gross_profit = ?, total_net_profit = ?, total_net_profit_pct = ?,
+                total_sell_fees = ?, total_fees = ?, total_fee_ratio_pct = ?,
+                status = ?, close_date = ?, holding_days = ?, trade_log = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (
+                float(new_sell_amount), new_sell_quantity, new_remaining,
+                float(new_gross_profit_total), float(new_profit_loss_pct),
+                float(new_gross_profit_total), float(new_net_profit_total), float(new_net_profit_pct),
+                float(sell_fees_total), float(buy_fees_total + sell_fees_total), float(((buy_fees_total + sell_fees_total) / total_buy_gross * 100) if total_buy_gross > 0 else 0),
+                status, close_date, holding_days, trade_log, trade_id
+        ))
+        return True, "卖出交易添加成功"
+
     def get_all_trades(self, status: Optional[str] = None, strategy: Optional[str] = None,
                        include_deleted: bool = False,
                        order_by: str = 't.created_at DESC',
@@ -459,15 +446,20 @@ class TradingService:
             return [dict_to_trade_dto(t) for t in trade_dicts], total_count
         return trade_dicts, total_count
 
-    def get_trade_by_id(self, trade_id: int, include_deleted: bool = False) -> Optional[Dict[str, Any]]:
-        """根据ID获取交易"""
+    def get_trade_by_id(self, trade_id: int, include_deleted: bool = False,
+                        cursor: Any = None) -> Optional[Dict[str, Any]]:
+        """根据ID获取交易；传入 cursor 时在调用方事务内读取"""
         query = "SELECT t.*, s.name as strategy_name FROM trades t LEFT JOIN strategies s ON t.strategy_id = s.id WHERE t.id = ?"
         params = [trade_id]
 
         if not include_deleted:
             query += " AND t.is_deleted = 0"
 
-        trade = self.db.execute_query(query, tuple(params), fetch_one=True)
+        if cursor is not None:
+            cursor.execute(query, tuple(params))
+            trade = cursor.fetchone()
+        else:
+            trade = self.db.execute_query(query, tuple(params), fetch_one=True)
         return dict(trade) if trade else None
 
     def get_trade_overview_metrics(self, trade_id: int, return_dto: bool = False) -> Dict[str, Any]:
@@ -552,38 +544,10 @@ class TradingService:
     def compute_buy_detail_remaining_map(self, trade_id: int) -> Dict[int, int]:
         """基于FIFO计算每个买入明细剩余可卖份额。
 
+        读取持久化批次（索引读取）；批次缺失或与明细不一致时由批次引擎全量重放。
         返回: {buy_detail_id: remaining_quantity}
         """
-        # 读取该交易所有明细，按日期+创建顺序
-        query = "SELECT * FROM trade_details WHERE trade_id = ? AND is_deleted = 0 ORDER BY transaction_date, created_at, id"
-        rows = self.db.execute_query(query, (trade_id,))
-        details = [dict(r) for r in rows]
-
-        # 仅买入明细列表（FIFO队列）
-        buy_queue: List[Dict[str, Any]] = []
-        for d in details:
-            if d['transaction_type'] == 'buy':
-                buy_queue.append({'id': d['id'], 'remaining': int(d['quantity'])})
-
-        # 消耗卖出数量（FIFO）
-        for d in details:
-            if d['transaction_type'] == 'sell':
-                sell_qty = int(d['quantity'])
-                i = 0
-                while sell_qty > 0 and i < len(buy_queue):
-                    take = min(buy_queue[i]['remaining'], sell_qty)
-                    buy_queue[i]['remaining'] -= take
-                    sell_qty -= take
-                    if buy_queue[i]['remaining'] == 0:
-                        i += 1
-                    else:
-                        i += 1  # move forward to avoid infinite loop in unexpected data
-
-        # 生成映射
-        remaining_map: Dict[int, int] = {}
-        for b in buy_queue:
-            remaining_map[b['id']] = max(0, int(b['remaining']))
-        return remaining_map
+        return self.lot_engine.remaining_map(trade_id)
 
     def soft_delete_trade(self, trade_id: int, confirmation_code: str,
                          delete_reason: str, operator_note: str = '') -> bool:
@@ -607,6 +571,8 @@ class TradingService:
                         delete_reason = ?, operator_note = ?
                     WHERE trade_id = ?
                 ''', (delete_reason, operator_note, trade_id))
+                self.lot_engine.drop(cursor, [trade_id])
+                self.daily_returns.drop(cursor, [trade_id])
 
                 conn.commit()
                 return True
@@ -641,6 +607,9 @@ class TradingService:
                         delete_reason = '', operator_note = ?
                     WHERE trade_id = ?
                 ''', (operator_note, trade_id))
+                # 批次在下次读取时按恢复后的明细重放
+                self.lot_engine.invalidate(cursor, [trade_id])
+                self.daily_returns.rebuild_trades(cursor, [trade_id])
 
                 conn.commit()
                 return True
@@ -664,6 +633,8 @@ class TradingService:
                 # 先删除修改历史，再删除明细，最后删除主表，避免外键约束失败
                 cursor.execute("DELETE FROM trade_modifications WHERE trade_id = ?", (trade_id,))
                 cursor.execute("DELETE FROM trade_details WHERE trade_id = ?", (trade_id,))
+                self.lot_engine.drop(cursor, [trade_id])
+                self.daily_returns.drop(cursor, [trade_id])
 
                 # 删除交易主记录
                 cursor.execute("DELETE FROM trades WHERE id = ?", (trade_id,))
@@ -680,6 +651,103 @@ class TradingService:
                 logging.getLogger(__name__).warning(f"永久删除交易失败: {str(e)}")
             return False
 
+    # --------------------- 批量删除/恢复 ---------------------
+    # 单条 IN (...) 语句的最大 ID 数（低于 SQLite 变量上限）
+    BATCH_CHUNK_SIZE = 500
+
+    def batch_soft_delete_trades(self, trade_ids: List[int], confirmation_code: str,
+                                 delete_reason: str, operator_note: str = '') -> Dict[int, str]:
+        """单事务批量软删除交易及其明细。
+
+        返回每个ID的结果：'ok'（已删除）、'not_found'（交易不存在）或 'failed'（事务失败，整体回滚）。
+        """
+        def apply(cursor, ids: List[int], placeholders: str) -> None:
+            cursor.execute(f'''
+                UPDATE trades SET
+                    is_deleted = 1, delete_date = CURRENT_TIMESTAMP,
+                    delete_reason = ?, operator_note = ?
+                WHERE id IN ({placeholders})
+            ''', (delete_reason, operator_note, *ids))
+            cursor.execute(f'''
+                UPDATE trade_details SET
+                    is_deleted = 1, delete_date = CURRENT_TIMESTAMP,
+                    delete_reason = ?, operator_note = ?
+                WHERE trade_id IN ({placeholders})
+            ''', (delete_reason, operator_note, *ids))
+            self.lot_engine.drop(cursor, ids)
+            self.daily_returns.drop(cursor, ids)
+
+        return self._run_batch(trade_ids, apply, "批量软删除交易失败")
+
+    def batch_restore_trades(self, trade_ids: List[int], confirmation_code: str,
+                             operator_note: str = '') -> Dict[int, str]:
+        """单事务批量恢复交易及其明细，返回每个ID的结果（同 batch_soft_delete_trades）。"""
+        def apply(cursor, ids: List[int], placeholders: str) -> None:
+            cursor.execute(f'''
+                UPDATE trades SET
+                    is_deleted = 0, delete_date = NULL,
+                    delete_reason = '', operator_note = ?
+                WHERE id IN ({placeholders})
+            ''', (operator_note, *ids))
+            cursor.execute(f'''
+                UPDATE trade_details SET
+                    is_deleted = 0, delete_date = NULL,
+                    delete_reason = '', operator_note = ?
+                WHERE trade_id IN ({placeholders})
+            ''', (operator_note, *ids))
+            self.lot_engine.invalidate(cursor, ids)
+            self.daily_returns.rebuild_trades(cursor, ids)
+
+        return self._run_batch(trade_ids, apply, "批量恢复交易失败")
+
+    def batch_permanently_delete_trades(self, trade_ids: List[int], confirmation_code: str,
+                                        confirmation_text: str, delete_reason: str,
+                                        operator_note: str = '') -> Dict[int, str]:
+        """单事务批量永久删除交易（修改历史、明细、批次与主记录），返回每个ID的结果。"""
+        def apply(cursor, ids: List[int], placeholders: str) -> None:
+            # 先删除修改历史，再删除明细，最后删除主表，避免外键约束失败
+            cursor.execute(f"DELETE FROM trade_modifications WHERE trade_id IN ({placeholders})", tuple(ids))
+            cursor.execute(f"DELETE FROM trade_details WHERE trade_id IN ({placeholders})", tuple(ids))
+            self.lot_engine.drop(cursor, ids)
+            self.daily_returns.drop(cursor, ids)
+            cursor.execute(f"DELETE FROM trades WHERE id IN ({placeholders})", tuple(ids))
+
+        return self._run_batch(trade_ids, apply, "批量永久删除交易失败")
+
+    def _run_batch(self, trade_ids: List[int], apply, error_label: str) -> Dict[int, str]:
+        """按块执行批量操作：先确认存在的ID，再以 IN (...) 批量更新；全部块在同一事务内提交。"""
+        ids = list(dict.fromkeys(int(t) for t in trade_ids))
+        outcomes: Dict[int, str] = {tid: 'not_found' for tid in ids}
+        if not ids:
+            return outcomes
+        try:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    for i in range(0, len(ids), self.BATCH_CHUNK_SIZE):
+                        chunk = ids[i:i + self.BATCH_CHUNK_SIZE]
+                        placeholders = ",".join(["?"] * len(chunk))
+                        cursor.execute(f"SELECT id FROM trades WHERE id IN ({placeholders})", tuple(chunk))
+                        existing = [int(r['id']) for r in cursor.fetchall()]
+                        if not existing:
+                            continue
+                        apply(cursor, existing, ",".join(["?"] * len(existing)))
+                        for tid in existing:
+                            outcomes[tid] = 'ok'
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            try:
+                from flask import current_app
+                current_app.logger.warning(f"{error_label}: {str(e)}")
+            except Exception:
+                import logging
+                logging.getLogger(__name__).warning(f"{error_label}: {str(e)}")
+            return {tid: 'failed' for tid in ids}
+        return outcomes
+
     def get_deleted_trades(self, return_dto: bool = False) -> List[Any]:
         """获取已删除的交易"""
         query = '''
@@ -768,7 +836,12 @@ class TradingService:
         params.append(trade_id)
 
         try:
-            self.db.execute_query(query, tuple(params), fetch_all=False)
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, tuple(params))
+                # 策略/代码/开仓日期冗余在日收益表中，随之重建
+                self.daily_returns.rebuild_trades(cursor, [trade_id])
+                conn.commit()
             return True, "交易信息更新成功"
         except Exception as e:
             return False, f"更新交易信息失败: {e}"
@@ -790,6 +863,9 @@ class TradingService:
                 if not trade_row:
                     return False, f"交易ID {trade_id} 不存在或已被删除"
 
+                # 无明细更新（整笔重算/校准）或数量变化时，FIFO 批次需要重放
+                lots_stale = not detail_updates
+
                 # 逐条更新明细
                 for upd in detail_updates:
                     detail_id = upd.get('detail_id')
@@ -810,6 +886,8 @@ class TradingService:
 
                     if price <= 0 or quantity <= 0:
                         return False, "价格和数量必须大于0"
+                    if quantity != int(detail['quantity']):
+                        lots_stale = True
 
                     # 重新计算 amount 与（若为卖出）临时 profit_loss，最终会统一重算
                     if detail['transaction_type'] == 'buy':
@@ -827,6 +905,9 @@ class TradingService:
                             (float(price), quantity, float(amount), float(transaction_fee), sell_reason, detail_id)
                         )
 
+                if lots_stale:
+                    self.lot_engine.invalidate(cursor, [trade_id])
+
                 # 读取该交易的全部明细以便重算
                 cursor.execute("SELECT * FROM trade_details WHERE trade_id = ? AND is_deleted = 0 ORDER BY transaction_date, created_at, id", (trade_id,))
                 all_details = cursor.fetchall()
@@ -947,6 +1028,8 @@ class TradingService:
                         status, close_date, holding_days, trade_id
                     )
                 )
+                # 价格/数量可能变化：重建该交易的日收益
+                self.daily_returns.rebuild_trades(cursor, [trade_id])
 
                 conn.commit()
                 return True, "交易明细更新成功"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import unittest
+
+from app import create_app
+from services.export_service import parquet_available
+
+
+class TestExportApi(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.trading_service = self.app.trading_service
+        strategies = self.app.strategy_service.get_all_strategies()
+        if not strategies:
+            self.app.strategy_service.create_strategy('导出测试策略', '用于导出测试')
+            strategies = self.app.strategy_service.get_all_strategies()
+        self.strategy_name = strategies[0]['name']
+        for code in ('EXP001', 'EXP002'):
+            ok, tid = self.trading_service.add_buy_transaction(
+                strategy=self.strategy_name, symbol_code=code, symbol_name=f'导出{code}',
+                price=10, quantity=100, transaction_date='2025-01-02', transaction_fee=1,
+            )
+            self.assertTrue(ok)
+        ok, _ = self.trading_service.add_sell_transaction(tid, 11, 50, '2025-01-10', transaction_fee=1)
+        self.assertTrue(ok)
+
+    def _csv_rows(self, resp):
+        return list(csv.DictReader(io.StringIO(resp.get_data().decode('utf-8-sig'))))
+
+    def test_export_trades_csv_streams_with_filters(self):
+        resp = self.client.get('/api/export/trades')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_streamed)
+        self.assertTrue(resp.mimetype.startswith('text/csv'))
+        self.assertIn('attachment', resp.headers.get('Content-Disposition', ''))
+        rows = self._csv_rows(resp)
+        self.assertEqual({r['symbol_code'] for r in rows}, {'EXP001', 'EXP002'})
+
+        resp = self.client.get('/api/export/trades?symbols=exp002')
+        rows = self._csv_rows(resp)
+        self.assertEqual([r['symbol_code'] for r in rows], ['EXP002'])
+
+    def test_export_trade_details_csv(self):
+        resp = self.client.get('/api/export/trade_details?symbols=EXP002')
+        self.assertEqual(resp.status_code, 200)
+        rows = self._csv_rows(resp)
+        self.assertEqual([r['transaction_type'] for r in rows], ['buy', 'sell'])
+        self.assertEqual(rows[0]['strategy_name'], self.strategy_name)
+
+    def test_export_rejects_unknown_format(self):
+        resp = self.client.get('/api/export/trades?format=xlsx')
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.get_json()['success'])
+
+    @unittest.skipUnless(parquet_available(), "pyarrow 未安装")
+    def test_export_trades_parquet(self):
+        import pyarrow.parquet as pq
+        resp = self.client.get('/api/export/trades?format=parquet')
+        self.assertEqual(resp.status_code, 200)
+        table = pq.read_table(io.BytesIO(resp.get_data()))
+        self.assertEqual(sorted(table.column('symbol_code').to_pylist()), ['EXP001', 'EXP002'])
+
+
+if __name__ == '__main__':
+    unittest.main()
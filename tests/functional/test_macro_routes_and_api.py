@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import re
 import unittest
 
 from app import create_app
@@ -19,6 +20,16 @@ class TestMacroRoutesAndApi(unittest.TestCase):
         r3 = self.client.get('/macro/compare')
         self.assertEqual(r3.status_code, 200)
 
+    def test_macro_dashboard_window_selection(self):
+        def selected(html):
+            return re.findall(r'<option value="([^"]*)" selected>', html)
+
+        # 未指定窗口：选中 latest（value 为空）
+        html = self.client.get('/macro').get_data(as_text=True)
+        self.assertEqual(selected(html), ['value', ''])
+        html = self.client.get('/macro?window=6m&view=zscore').get_data(as_text=True)
+        self.assertEqual(selected(html), ['zscore', '6m'])
+
     def test_macro_api(self):
         r1 = self.client.get('/api/macro/snapshot?window=1y&view=trend')
         self.assertEqual(r1.status_code, 200)
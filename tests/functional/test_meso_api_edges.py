@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from app import create_app
+from services.meso_service import MAX_COMPARE_SYMBOLS
 
 
 def test_meso_compare_series_symbols_param_validation():
@@ -14,8 +15,8 @@ def test_meso_compare_series_symbols_param_validation():
     body = r.get_json()
     assert body.get('success') is False
 
-    # >10
-    too_many = ','.join([f'S{i}' for i in range(11)])
+    # 超过上限
+    too_many = ','.join([f'S{i}' for i in range(MAX_COMPARE_SYMBOLS + 1)])
     r2 = client.get(f'/api/meso/compare_series?symbols={too_many}')
     assert r2.status_code == 400
     body2 = r2.get_json()
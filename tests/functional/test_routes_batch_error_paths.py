@@ -37,6 +37,25 @@ class TestRoutesBatchErrorPaths(unittest.TestCase):
         resp3 = self.client.post('/batch_permanently_delete_trades', data={'trade_ids[]': ['1'], 'confirmation_code': '123'})
         self.assertEqual(resp3.status_code, 400)
 
+    def test_batch_delete_reports_partial_results_per_id(self):
+        svc = self.app.trading_service
+        self.app.strategy_service.create_strategy('批量路由策略', 'test')
+        ok, tid = svc.add_buy_transaction('批量路由策略', 'BRP01', '批量', 1, 1, '2025-01-02', 0)
+        self.assertTrue(ok)
+        resp = self.client.post('/batch_delete_trades', data={
+            'trade_ids[]': [str(tid), '999999', 'abc'],
+            'confirmation_code': 'X',
+        })
+        self.assertEqual(resp.status_code, 200)
+        data = resp.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['message'], '部分成功：已删除 1/3 笔交易')
+        self.assertEqual(data['results'], {str(tid): 'ok', '999999': 'not_found'})
+
+        resp = self.client.post('/batch_restore_trades', data={'trade_ids[]': ['999999'], 'confirmation_code': 'X'})
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(resp.get_json()['message'], '恢复失败，请重试')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils import warmup
+from utils.warmup import WarmupThread, wait_until_listening
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def _run_child(code: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env['DB_PATH'] = os.path.join(tmpdir, 'trading.db')
+        env['MACRO_DB_PATH'] = os.path.join(tmpdir, 'macro.db')
+        env['MESO_DB_PATH'] = os.path.join(tmpdir, 'meso.db')
+        proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, env=env,
+                              capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        raise AssertionError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+class TestLazyModuleApp(unittest.TestCase):
+    def test_import_does_not_create_app_or_load_heavy_modules(self):
+        out = _run_child(
+            "import json, sys, app\n"
+            "print(json.dumps({'created': app._default_app is not None,"
+            " 'pandas': 'pandas' in sys.modules, 'empyrical': 'empyrical' in sys.modules}))"
+        )
+        self.assertEqual(out, {'created': False, 'pandas': False, 'empyrical': False})
+
+    def test_module_attributes_created_on_first_access(self):
+        out = _run_child(
+            "import json, app\n"
+            "from app import app as a1, tracker\n"
+            "print(json.dumps({'same': a1 is app.app, 'tracker': tracker is a1.trading_service,"
+            " 'created': app._default_app is a1}))"
+        )
+        self.assertEqual(out, {'same': True, 'tracker': True, 'created': True})
+
+    def test_unknown_attribute_raises(self):
+        import app as app_module
+        with self.assertRaises(AttributeError):
+            getattr(app_module, 'no_such_attribute')
+
+
+class TestRunServerWarmup(unittest.TestCase):
+    def _app(self, enabled):
+        from app import create_app
+        application = create_app('testing')
+        application.config['WARMUP_ON_START'] = enabled
+        application.config['DEBUG'] = False
+        return application
+
+    def test_warmup_started_when_enabled(self):
+        import app as app_module
+        application = self._app(True)
+        with patch('utils.warmup.start_warmup') as start, patch.object(application, 'run') as run:
+            app_module.run_server(application)
+        start.assert_called_once()
+        self.assertIsNotNone(start.call_args.kwargs['wait_for'])
+        run.assert_called_once()
+
+    def test_warmup_not_started_when_disabled(self):
+        import app as app_module
+        application = self._app(False)
+        with patch('utils.warmup.start_warmup') as start, patch.object(application, 'run'):
+            app_module.run_server(application)
+        start.assert_not_called()
+
+
+class TestWarmupThread(unittest.TestCase):
+    def test_imports_candidates_and_records_failures(self):
+        t = WarmupThread(['json', ('no_such_module_abc', 'csv'), 'no_such_module_xyz'])
+        t.start()
+        t.join(10)
+        self.assertEqual(t.imported, ['json', 'csv'])
+        self.assertEqual(t.failed, ['no_such_module_xyz'])
+
+    def test_start_warmup_runs_once_per_process(self):
+        with patch.object(warmup, '_thread', None):
+            t1 = warmup.start_warmup(['json'])
+            t2 = warmup.start_warmup(['csv'])
+            t1.join(10)
+        self.assertIs(t1, t2)
+        self.assertEqual(t1.imported, ['json'])
+
+    def test_wait_until_listening(self):
+        srv = socket.socket()
+        srv.bind(('127.0.0.1', 0))
+        srv.listen(1)
+        port = srv.getsockname()[1]
+        try:
+            self.assertTrue(wait_until_listening('0.0.0.0', port, timeout=2))
+        finally:
+            srv.close()
+        self.assertFalse(wait_until_listening('127.0.0.1', port, timeout=0.2, interval=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+from services.analysis_service import AnalysisService
+from services.admin_service import DatabaseMaintenanceService
+from services.database_service import DatabaseService
+from services.trading_service import TradingService
+
+
+class TestDailyReturnStore(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_daily_ret_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.svc = TradingService(self.db)
+        self.store = self.svc.daily_returns
+        self.db.execute_query("INSERT INTO strategies (name) VALUES (?)", ("日收益A",))
+        self.db.execute_query("INSERT INTO strategies (name) VALUES (?)", ("日收益B",))
+        rows = self.db.execute_query("SELECT id FROM strategies WHERE name LIKE ? ORDER BY id", ("日收益%",))
+        self.s1, self.s2 = int(rows[0]['id']), int(rows[1]['id'])
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def _snapshot(self):
+        rows = self.db.execute_query(
+            "SELECT trade_id, date, strategy_id, symbol_code, open_date, wret, weight "
+            "FROM strategy_daily_returns ORDER BY trade_id, date")
+        return [(r['trade_id'], r['date'], r['strategy_id'], r['symbol_code'], r['open_date'],
+                 round(r['wret'], 9), r['weight']) for r in rows]
+
+    def assertConsistent(self):
+        incremental = self._snapshot()
+        self.store.rebuild_all()
+        self.assertEqual(incremental, self._snapshot())
+        return incremental
+
+    def _buy(self, sid, code, price, qty, day):
+        ok, tid = self.svc.add_buy_transaction(sid, code, code, Decimal(price), qty, day)
+        self.assertTrue(ok, tid)
+        return tid
+
+    def _sell(self, tid, price, qty, day):
+        ok, msg = self.svc.add_sell_transaction(tid, Decimal(price), qty, day)
+        self.assertTrue(ok, msg)
+
+    def test_sell_upserts_one_row_per_trade_and_date(self):
+        tid = self._buy(self.s1, 'AAA', '10', 100, '2024-01-02')
+        self._sell(tid, '11', 10, '2024-01-05')
+        self._sell(tid, '12', 30, '2024-01-05')
+        self._sell(tid, '9', 10, '2024-01-08')
+        rows = self.assertConsistent()
+        self.assertEqual([(r[1], r[6]) for r in rows], [('2024-01-05', 40), ('2024-01-08', 10)])
+        self.assertAlmostEqual(rows[0][5], 0.1 * 10 + 0.2 * 30)
+        self.assertEqual(rows[0][2:5], (self.s1, 'AAA', '2024-01-02'))
+
+    def test_buy_update_edit_and_delete_paths_stay_consistent(self):
+        t1 = self._buy(self.s1, 'AAA', '10', 100, '2024-01-02')
+        self._sell(t1, '12', 20, '2024-01-10')
+        # 追加买入改变加权均价
+        self._buy(self.s1, 'AAA', '14', 100, '2024-01-12')
+        rows = self.assertConsistent()
+        self.assertAlmostEqual(rows[0][5], (12 - 12) / 12 * 20)
+
+        # 明细编辑（价格/数量）
+        detail = self.db.execute_query(
+            "SELECT id FROM trade_details WHERE trade_id = ? AND transaction_type = 'buy' ORDER BY id LIMIT 1",
+            (t1,), fetch_one=True)
+        ok, msg = self.svc.update_trade_record(t1, [{'detail_id': detail['id'], 'price': '8'}])
+        self.assertTrue(ok, msg)
+        self.assertConsistent()
+
+        # 交易字段编辑（策略/开仓日期冗余在日收益表）
+        ok, msg = self.svc.edit_trade(t1, {'strategy_id': self.s2, 'open_date': '2024-01-03'}, '调整')
+        self.assertTrue(ok, msg)
+        rows = self.assertConsistent()
+        self.assertEqual(rows[0][2], self.s2)
+        self.assertEqual(rows[0][4], '2024-01-03')
+
+        # 管理端原始数据编辑
+        admin = DatabaseMaintenanceService(self.db, self.svc)
+        ok, msg = admin.update_raw_row('trades', t1, {'symbol_code': 'AAB'})
+        self.assertTrue(ok, msg)
+        self.assertEqual(self.assertConsistent()[0][3], 'AAB')
+
+        # 软删除 / 恢复 / 永久删除
+        self.assertTrue(self.svc.soft_delete_trade(t1, 'x', 'r'))
+        self.assertEqual(self.assertConsistent(), [])
+        self.assertTrue(self.svc.restore_trade(t1, 'x'))
+        self.assertEqual(len(self.assertConsistent()), 1)
+        self.assertTrue(self.svc.permanently_delete_trade(t1, 'x', 'CONFIRM', 'r'))
+        self.assertEqual(self.assertConsistent(), [])
+
+    def test_batch_operations_stay_consistent(self):
+        ids = []
+        for i, code in enumerate(('B1', 'B2', 'B3')):
+            tid = self._buy(self.s1, code, '10', 10, '2024-02-01')
+            self._sell(tid, str(10 + i), 5, '2024-02-0%d' % (i + 2))
+            ids.append(tid)
+        self.svc.batch_soft_delete_trades(ids[:2], 'x', 'r')
+        self.assertEqual([r[0] for r in self.assertConsistent()], [ids[2]])
+        self.svc.batch_restore_trades(ids[:2], 'x')
+        self.assertEqual(len(self.assertConsistent()), 3)
+        self.svc.batch_permanently_delete_trades(ids, 'x', 'CONFIRM', 'r')
+        self.assertEqual(self.assertConsistent(), [])
+
+    def test_backfill_when_table_created(self):
+        tid = self._buy(self.s1, 'AAA', '10', 100, '2024-01-02')
+        self._sell(tid, '11', 50, '2024-01-05')
+        expected = self._snapshot()
+        self.db.execute_query("DROP TABLE strategy_daily_returns", fetch_all=False)
+        DatabaseService(self.tmp_db)
+        self.assertEqual(self._snapshot(), expected)
+
+    def test_grouped_points_apply_open_and_sell_date_filters(self):
+        t1 = self._buy(self.s1, 'AAA', '10', 20, '2024-01-02')
+        self._sell(t1, '11', 10, '2024-01-05')
+        self._sell(t1, '12', 10, '2024-03-05')
+        t2 = self._buy(self.s1, 'BBB', '10', 100, '2024-02-10')
+        self._sell(t2, '9', 10, '2024-02-20')
+        grouped = self.store.points_by_group('strategy_id', open_from='2024-01-01', open_to='2024-01-31',
+                                             date_from='2024-01-01', date_to='2024-01-31')
+        self.assertEqual(list(grouped[self.s1].keys()), ['2024-01-05'])
+        by_symbol = self.store.points_by_group('symbol_code', strategy_id=self.s1)
+        self.assertEqual(sorted(by_symbol), ['AAA', 'BBB'])
+        with self.assertRaises(ValueError):
+            self.store.points_by_group('open_date')
+
+        analysis = AnalysisService(self.db)
+        period = {s['strategy_id']: s['stats'] for s in analysis.get_strategies_scores_by_time_period('2024-01', 'month')}
+        single = analysis.calculate_strategy_score(strategy_id=self.s1, start_date='2024-01-01', end_date='2024-01-31')
+        self.assertEqual(period[self.s1]['annual_return'], single['stats']['annual_return'])
+        self.assertGreater(single['stats']['annual_return'], 0.0)
+
+
+class TestRebuildCommand(unittest.TestCase):
+    def test_cli_rebuild_daily_returns(self):
+        from app import create_app
+        app = create_app('testing')
+        svc = app.trading_service
+        app.db_service.execute_query("INSERT INTO strategies (name) VALUES (?)", ("CLI日收益",))
+        sid = next(s['id'] for s in app.strategy_service.get_all_strategies() if s['name'] == 'CLI日收益')
+        ok, tid = svc.add_buy_transaction(sid, 'CLI', 'CLI', Decimal('10'), 10, '2024-01-02')
+        svc.add_sell_transaction(tid, Decimal('11'), 5, '2024-01-03')
+        app.db_service.execute_query("DELETE FROM strategy_daily_returns", fetch_all=False)
+        result = app.test_cli_runner().invoke(args=['rebuild-daily-returns'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('1', result.output)
+        rows = app.db_service.execute_query("SELECT COUNT(*) AS c FROM strategy_daily_returns", fetch_one=True)
+        self.assertEqual(rows['c'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from services.database_service import DatabaseService
+from services.trade_repository import TradeRepository
+from services.export_service import ExportService, encode_csv, parquet_available
+from utils.exceptions import ValidationError
+
+
+class TestExportServiceStreaming(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_unit_export_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.repo = TradeRepository(self.db)
+        ops = []
+        for i in range(7):
+            ops.append({
+                'query': (
+                    "INSERT INTO trades (strategy, symbol_code, symbol_name, open_date, status, is_deleted) "
+                    "VALUES (?, ?, ?, ?, ?, ?)"
+                ),
+                'params': ("trend", f"S{i:03d}", f"名称{i}", f"2025-01-0{i + 1}", "open", 1 if i == 6 else 0),
+            })
+        for tid in range(1, 8):
+            for j in range(2):
+                ops.append({
+                    'query': (
+                        "INSERT INTO trade_details (trade_id, transaction_type, price, quantity, amount, transaction_date, is_deleted) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    ),
+                    'params': (tid, 'buy', 1.5, 100, 150.0, f"2025-01-0{j + 1}", 1 if (tid == 1 and j == 1) else 0),
+                })
+        self.assertTrue(self.db.execute_transaction(ops))
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def test_iter_trades_batches_respect_filters_and_size(self):
+        batches = list(self.repo.iter_trades(None, None, False, batch_size=3))
+        self.assertEqual([len(rows) for _, rows in batches], [3, 3])
+        columns = batches[0][0]
+        self.assertIn('symbol_code', columns)
+        self.assertIn('strategy_name', columns)
+        idx = columns.index('symbol_code')
+        codes = [r[idx] for _, rows in batches for r in rows]
+        self.assertEqual(codes, [f"S{i:03d}" for i in range(6)])
+
+        filtered = list(self.repo.iter_trades(None, None, True, symbols=['s006']))
+        self.assertEqual(len(filtered[0][1]), 1)
+
+    def test_iter_empty_result_still_yields_columns(self):
+        batches = list(self.repo.iter_trades('closed', None, False))
+        self.assertEqual(len(batches), 1)
+        columns, rows = batches[0]
+        self.assertEqual(rows, [])
+        self.assertIn('id', columns)
+
+    def test_iter_trade_details_skips_deleted(self):
+        rows = [r for _, batch in self.repo.iter_trade_details(None, None, False, batch_size=4) for r in batch]
+        # 6 笔未删除交易 × 2 条明细，减去一条已删除明细
+        self.assertEqual(len(rows), 11)
+        all_rows = [r for _, batch in self.repo.iter_trade_details(None, None, True) for r in batch]
+        self.assertEqual(len(all_rows), 14)
+
+    def test_csv_stream_has_single_header(self):
+        svc = ExportService(self.db)
+        chunks = list(svc.stream_trades('csv', batch_size=2))
+        self.assertGreater(len(chunks), 1)
+        text = b''.join(chunks).decode('utf-8-sig')
+        parsed = list(csv.reader(io.StringIO(text)))
+        self.assertEqual(parsed[0][0], 'id')
+        self.assertEqual(len(parsed), 1 + 6)
+
+    def test_encode_csv_empty_batches(self):
+        self.assertEqual(list(encode_csv([])), [])
+        out = b''.join(encode_csv([(['a', 'b'], [])])).decode('utf-8-sig')
+        self.assertEqual(out.strip(), 'a,b')
+
+    def test_invalid_format_rejected(self):
+        with self.assertRaises(ValidationError):
+            ExportService(self.db).normalize_format('xlsx')
+
+    @unittest.skipUnless(parquet_available(), "pyarrow 未安装")
+    def test_parquet_stream_round_trip(self):
+        import pyarrow.parquet as pq
+        svc = ExportService(self.db)
+        data = b''.join(svc.stream_trade_details('parquet', batch_size=4))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 11)
+        pf = pq.ParquetFile(io.BytesIO(data))
+        self.assertEqual(pf.num_row_groups, 3)
+        self.assertEqual(str(table.schema.field('price').type), 'double')
+        self.assertEqual(str(table.schema.field('quantity').type), 'int64')
+        self.assertEqual(str(table.schema.field('symbol_code').type), 'string')
+
+
+if __name__ == '__main__':
+    unittest.main()
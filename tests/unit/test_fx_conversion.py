@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import types
+from unittest import mock
+
+from app import create_app
+from services.fx_conversion import convert_many_to_usd, convert_to_usd, fx_frame
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+
+
+def test_fx_frame_forward_fills_and_pins_usd():
+    fx = fx_frame({"2024-01-03": {"EUR": 1.2}, "2024-01-02": {"EUR": 1.1, "GBP": 1.3}}, ["EUR", "GBP", "USD"])
+    assert list(fx.columns) == ["EUR", "GBP", "USD"]
+    assert [d.strftime("%Y-%m-%d") for d in fx.index] == ["2024-01-02", "2024-01-03"]
+    assert fx.loc["2024-01-03", "GBP"] == 1.3
+    assert (fx["USD"] == 1.0).all()
+
+
+def test_convert_aligns_to_previous_rate_and_sorts():
+    fx = fx_frame({"2024-01-02": {"EUR": 1.1}, "2024-01-04": {"EUR": 1.2}}, ["EUR"])
+    rows = [
+        {"date": "2024-01-03", "close": 10.0, "close_tr": 20.0},
+        {"date": "2024-01-01", "close": 10.0},
+        {"date": "2024-01-04", "close": None, "close_tr": 5.0, "adj_factor": 0.5},
+    ]
+    out = convert_to_usd(rows, "EUR", fx)
+    assert [r["date"] for r in out] == ["2024-01-01", "2024-01-03", "2024-01-04"]
+    # 早于首个汇率日期：无 USD 值
+    assert out[0]["close_usd"] is None and out[0]["close_tr"] is None
+    # 汇率源无报价的日期沿用前一日汇率
+    assert abs(out[1]["close_usd"] - 11.0) < 1e-12 and abs(out[1]["close_usd_tr"] - 22.0) < 1e-12
+    assert out[2]["close"] is None and out[2]["close_usd"] is None
+    assert abs(out[2]["close_usd_tr"] - 6.0) < 1e-12 and out[2]["adj_factor"] == 0.5
+    assert all(r["currency"] == "EUR" for r in out)
+
+
+def test_convert_usd_passthrough_and_unknown_currency():
+    fx = fx_frame({}, ["USD"])
+    rows = [{"date": "2024-01-02", "close": 3.0}]
+    assert convert_to_usd(rows, "USD", fx)[0]["close_usd"] == 3.0
+    assert convert_to_usd(rows, "JPY", fx)[0]["close_usd"] is None
+    assert convert_to_usd([], "EUR", fx) == []
+
+
+def test_convert_many_matches_per_symbol_conversion():
+    fx = fx_frame({"2024-01-02": {"EUR": 1.1}, "2024-01-04": {"EUR": 1.2}}, ["EUR"])
+    series = {
+        "B": [{"date": "2024-01-04", "close": 2.0}, {"date": "2024-01-02", "close": 1.0}],
+        "A": [{"date": "2024-01-03", "close": 5.0}],
+        "EMPTY": [],
+    }
+    out = convert_many_to_usd(series, "EUR", fx)
+    # 按标的输入顺序、标的内日期升序
+    assert [(r["symbol"], r["date"]) for r in out] == [("B", "2024-01-02"), ("B", "2024-01-04"), ("A", "2024-01-03")]
+    for sym in ("A", "B"):
+        assert [{k: v for k, v in r.items() if k != "symbol"} for r in out if r["symbol"] == sym] == \
+            convert_to_usd(series[sym], "EUR", fx)
+
+
+def test_refresh_writes_prices_in_one_batched_call():
+    fake = types.ModuleType('services.data_providers.meso_market_provider')
+    fake.fetch_index_history = lambda symbols, period='3y', start=None, adjusted=False, total_return=False: {
+        s: [{"date": d, "close": 1.0} for d in ("2024-01-02", "2024-01-03")] for s in symbols}
+    fake.fetch_fx_timeseries_to_usd = lambda quote_list, start_date, end_date: {"2024-01-02": {"EUR": 1.1}}
+    saved = sys.modules.get('services.data_providers.meso_market_provider')
+    sys.modules['services.data_providers.meso_market_provider'] = fake
+    try:
+        with tempfile.TemporaryDirectory(prefix="meso_batch_") as d:
+            app = create_app('testing')
+            app.config['MESO_DB_PATH'] = os.path.join(d, "meso.db")
+            with app.app_context():
+                svc = MesoService()
+                with mock.patch.object(MesoRepository, "_rebuild_market_calendar",
+                                       autospec=True, side_effect=MesoRepository._rebuild_market_calendar) as rebuild:
+                    res = svc.refresh_prices_and_scores(symbols=['^GDAXI', '^GSPC', '^FCHI'], period='1y')
+                # 三个标的、两种币种：交易日历只重建一次
+                assert res["prices"] == 6 and rebuild.call_count == 1
+                assert sorted(rebuild.call_args.kwargs["symbols"]) == ['^FCHI', '^GDAXI', '^GSPC']
+                assert svc.repo.fetch_prices('^FCHI')[1]["close_usd"] == 1.1
+    finally:
+        if saved is not None:
+            sys.modules['services.data_providers.meso_market_provider'] = saved
+        else:
+            sys.modules.pop('services.data_providers.meso_market_provider', None)
+
+
+def test_refresh_converts_prices_on_fx_holidays():
+    fake = types.ModuleType('services.data_providers.meso_market_provider')
+
+    def fetch_index_history(symbols, period='3y', start=None, adjusted=False, total_return=False):
+        dates = ["2024-01-02", "2024-01-03", "2024-01-04"]
+        return {s: [{"date": d, "close": 100.0 + i} for i, d in enumerate(dates)] for s in symbols}
+
+    def fetch_fx_timeseries_to_usd(quote_list, start_date, end_date):
+        # 2024-01-03 汇率源无报价
+        return {"2024-01-02": {"EUR": 1.1}, "2024-01-04": {"EUR": 1.2}}
+
+    fake.fetch_index_history = fetch_index_history
+    fake.fetch_fx_timeseries_to_usd = fetch_fx_timeseries_to_usd
+    saved = sys.modules.get('services.data_providers.meso_market_provider')
+    sys.modules['services.data_providers.meso_market_provider'] = fake
+    try:
+        app = create_app('testing')
+        with app.app_context():
+            res = MesoService().refresh_prices_and_scores(symbols=['^GDAXI', '^GSPC'], period='1y')
+            repo = MesoRepository()
+            eu = {p["date"]: p for p in repo.fetch_prices('^GDAXI')}
+            us = {p["date"]: p for p in repo.fetch_prices('^GSPC')}
+    finally:
+        if saved is not None:
+            sys.modules['services.data_providers.meso_market_provider'] = saved
+        else:
+            sys.modules.pop('services.data_providers.meso_market_provider', None)
+    assert res["prices"] == 6
+    assert eu["2024-01-03"]["currency"] == "EUR"
+    assert abs(eu["2024-01-03"]["close_usd"] - 101.0 * 1.1) < 1e-9
+    assert abs(eu["2024-01-04"]["close_usd"] - 102.0 * 1.2) < 1e-9
+    assert us["2024-01-03"]["close_usd"] == 101.0
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from services.database_service import DatabaseService
+from services.macro_repository import MacroRepository
+
+
+class TestMacroCompactStorage(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(prefix="macro_compact_", suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        try:
+            os.remove(self.path)
+        except Exception:
+            pass
+
+    def _repo(self):
+        return MacroRepository(DatabaseService(self.path, create_trading_schema=False))
+
+    def test_legacy_tables_migrated_to_compact_layout_with_views(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE macro_series (id INTEGER PRIMARY KEY AUTOINCREMENT, economy TEXT NOT NULL, "
+                     "indicator TEXT NOT NULL, date TEXT NOT NULL, value REAL, provider TEXT, revised_at TEXT, "
+                     "UNIQUE(economy, indicator, date))")
+        conn.execute("CREATE INDEX idx_macro_series_ind_eco_date ON macro_series(indicator, economy, date DESC, value)")
+        conn.execute("CREATE TABLE commodity_series (id INTEGER PRIMARY KEY AUTOINCREMENT, commodity TEXT NOT NULL, "
+                     "date TEXT NOT NULL, value REAL, currency TEXT, provider TEXT, UNIQUE(commodity, date))")
+        conn.execute("CREATE TABLE fx_series (id INTEGER PRIMARY KEY AUTOINCREMENT, pair TEXT NOT NULL, "
+                     "date TEXT NOT NULL, price REAL, UNIQUE(pair, date))")
+        conn.executemany("INSERT INTO macro_series (economy, indicator, date, value, provider) VALUES (?,?,?,?,?)", [
+            ("US", "cpi_yoy", "1965-01-01", 1.5, "wb"),
+            ("US", "cpi_yoy", "2023-01-01", 4.0, "wb"),
+            ("US", "cpi_yoy", "2024-01-01", 3.0, "wb"),
+            ("CN", "cpi_yoy", "2024-01-01", 0.2, "wb"),
+            ("CN", "gdp_yoy", "2024-01-01", 5.0, "wb"),
+        ])
+        conn.execute("INSERT INTO commodity_series (commodity, date, value, currency) VALUES ('GOLD', '2024-01-02', 2050.0, 'USD')")
+        conn.execute("INSERT INTO fx_series (pair, date, price) VALUES ('EURUSD', '2024-01-02', 1.09)")
+        conn.commit()
+        conn.close()
+
+        repo = self._repo()
+        us = repo.fetch_macro_series_by_economy("us")
+        self.assertEqual(us, {"cpi_yoy": [{"date": "1965-01-01", "value": 1.5}, {"date": "2023-01-01", "value": 4.0},
+                                          {"date": "2024-01-01", "value": 3.0}]})
+        self.assertEqual(list(repo.fetch_macro_series_by_economy("CN", start="2024-01-01")), ["cpi_yoy", "gdp_yoy"])
+        self.assertEqual(repo.fetch_latest_two_by_indicator("cpi_yoy"), {"US": (3.0, 4.0), "CN": (0.2, None)})
+        self.assertEqual(repo.fetch_max_date(economy="CN"), "2024-01-01")
+        self.assertEqual(repo.fetch_max_date(date_to="2000-01-01"), "1965-01-01")
+        self.assertEqual(len(repo.fetch_history(["cpi_yoy"], date_from="2023-01-01")), 3)
+        with repo.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, type FROM sqlite_master WHERE name IN ('macro_series', 'commodity_series', "
+                        "'fx_series', 'macro_series_data', 'idx_macro_series_ind_eco_date')")
+            kinds = {r[0]: r[1] for r in cur.fetchall()}
+            # 兼容视图仍可按旧列名查询
+            cur.execute("SELECT commodity, date, value, currency FROM commodity_series")
+            commodity = [tuple(r) for r in cur.fetchall()]
+            cur.execute("SELECT pair, date, price FROM fx_series")
+            fx = [tuple(r) for r in cur.fetchall()]
+        self.assertEqual(kinds, {"macro_series": "view", "commodity_series": "view", "fx_series": "view",
+                                 "macro_series_data": "table"})
+        self.assertEqual(commodity, [("GOLD", "2024-01-02", 2050.0, "USD")])
+        self.assertEqual(fx, [("EURUSD", "2024-01-02", 1.09)])
+
+        # 再次打开不重复迁移；写入覆盖同一自然键，并推进数据版本
+        repo = self._repo()
+        version = repo.get_data_version()
+        self.assertEqual(repo.bulk_upsert_macro_series([{"economy": "US", "indicator": "cpi_yoy", "date": "2024-01-01",
+                                                         "value": 2.9, "provider": "wb", "revised_at": None}]), 1)
+        self.assertNotEqual(repo.get_data_version(), version)
+        self.assertEqual(repo.fetch_latest_by_indicator("cpi_yoy")["US"], 2.9)
+        self.assertEqual(len(repo.fetch_macro_series_by_economy("US")["cpi_yoy"]), 3)
+        self.assertEqual(repo.bulk_upsert_fx_series([{"pair": "EURUSD", "date": "2024-01-03", "price": 1.1}]), 1)
+        self.assertTrue(repo.has_any_data())
+
+
+if __name__ == "__main__":
+    unittest.main()
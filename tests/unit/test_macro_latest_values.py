@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import tempfile
+from unittest.mock import patch
+
+from services.database_service import DatabaseService
+from services.macro_repository import MacroRepository
+from services.macro_service import MacroService
+
+
+def _tmp_db() -> str:
+    fd, path = tempfile.mkstemp(prefix="macro_latest_", suffix=".db")
+    os.close(fd)
+    return path
+
+
+def _reference(rows, indicator):
+    """历史实现：逐行扫描该指标全部历史。"""
+    hist = sorted((r for r in rows if r["indicator"] == indicator), key=lambda r: (r["economy"], r["date"]))
+    latest = {}
+    for r in hist:
+        latest[r["economy"]] = r["value"]
+    latest = {k: v for k, v in latest.items() if v is not None}
+    two = {}
+    for r in sorted(hist, key=lambda r: (r["economy"], r["date"]), reverse=True):
+        if r["value"] is None:
+            continue
+        lst = two.setdefault(r["economy"], [])
+        if len(lst) < 2:
+            lst.append(r["value"])
+    return latest, {k: (v[0], v[1] if len(v) > 1 else None) for k, v in two.items()}
+
+
+def _seed(repo):
+    rnd = random.Random(33)
+    rows = []
+    for ind in ("cpi_yoy", "unemployment", "gdp_yoy"):
+        for eco in ("US", "DE", "JP", "CN"):
+            for year in range(2015, 2015 + rnd.randint(1, 6)):
+                value = None if rnd.random() < 0.25 else round(rnd.uniform(-2, 8), 2)
+                rows.append({"economy": eco, "indicator": ind, "date": f"{year}-12-01",
+                             "value": value, "provider": "t", "revised_at": None})
+    repo.bulk_upsert_macro_series(rows)
+    return rows
+
+
+def test_fetch_latest_values_matches_per_indicator_scan():
+    db_path = _tmp_db()
+    try:
+        repo = MacroRepository(DatabaseService(db_path, create_trading_schema=False))
+        rows = _seed(repo)
+        latest, latest_two = repo.fetch_latest_values()
+        for ind in ("cpi_yoy", "unemployment", "gdp_yoy"):
+            exp_latest, exp_two = _reference(rows, ind)
+            assert latest.get(ind, {}) == exp_latest
+            assert latest_two.get(ind, {}) == exp_two
+            assert repo.fetch_latest_by_indicator(ind) == exp_latest
+            assert repo.fetch_latest_two_by_indicator(ind) == exp_two
+        only, _ = repo.fetch_latest_values(["gdp_yoy"])
+        assert set(only) <= {"gdp_yoy"}
+    finally:
+        os.remove(db_path)
+
+
+def test_latest_value_query_uses_primary_key():
+    db_path = _tmp_db()
+    try:
+        db = DatabaseService(db_path, create_trading_schema=False)
+        MacroRepository(db)
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "EXPLAIN QUERY PLAN SELECT i.code, e.code, t.value "
+                "FROM series_keys i CROSS JOIN series_keys e CROSS JOIN macro_series_data t "
+                "WHERE i.kind = ? AND i.code IN (?, ?) AND e.kind = ? "
+                "AND t.indicator_id = i.key_id AND t.economy_id = e.key_id AND t.day IN ("
+                "SELECT day FROM macro_series_data m WHERE m.indicator_id = i.key_id AND m.economy_id = e.key_id "
+                "AND m.value IS NOT NULL ORDER BY day DESC LIMIT 2) ORDER BY i.code, e.code, t.day DESC",
+                ("indicator", "cpi_yoy", "gdp_yoy", "economy"),
+            )
+            plan = " ".join(str(r[3]) for r in cur.fetchall())
+        # 聚簇主键 (indicator_id, economy_id, day) 逐组倒序定位最近几期，无需二级索引、无需排序
+        assert "SEARCH t USING PRIMARY KEY (indicator_id=? AND economy_id=? AND day=?)" in plan
+        assert "SEARCH m USING PRIMARY KEY (indicator_id=? AND economy_id=?)" in plan
+        assert "TEMP B-TREE" not in plan
+    finally:
+        os.remove(db_path)
+
+
+def test_snapshot_issues_single_latest_query():
+    db_path = _tmp_db()
+    try:
+        repo = MacroRepository(DatabaseService(db_path, create_trading_schema=False))
+        _seed(repo)
+        svc = MacroService(DatabaseService(db_path, create_trading_schema=False))
+        svc.repo = repo
+        for view in ("value", "trend"):
+            with patch.object(repo, "fetch_latest_values", wraps=repo.fetch_latest_values) as spy, \
+                    patch.object(repo, "fetch_latest_two_by_indicator") as per_ind:
+                snap = svc.get_snapshot(view=view, nocache=True)
+            assert spy.call_count == 1
+            per_ind.assert_not_called()
+            assert snap["ranking"]
+    finally:
+        os.remove(db_path)
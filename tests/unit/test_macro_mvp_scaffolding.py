@@ -24,12 +24,14 @@ def test_macro_repository_tables_created():
 
         with db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            # 时序表为兼容视图（物理表为 *_data）
+            cur.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
             tables = {row[0] for row in cur.fetchall()}
         assert 'macro_series' in tables
         assert 'commodity_series' in tables
         assert 'fx_series' in tables
         assert 'scores' in tables
+        assert 'macro_series_data' in tables
     finally:
         try:
             os.remove(db_path)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from services import macro_normalization as mn
+from services.database_service import DatabaseService
+from services.macro_repository import MacroRepository
+from utils.timeseries import window_start
+
+
+def _reference(method, latest, prev, directions):
+    """历史实现：逐指标、逐经济体循环（percentile 使用 sorted.index）。"""
+    e, k = latest.shape
+    out = np.full((e, k), np.nan)
+    for j in range(k):
+        d = directions[j]
+        rows = [i for i in range(e) if not np.isnan(latest[i, j])]
+        vals = [latest[i, j] for i in rows]
+        if not vals:
+            continue
+        if method == "trend":
+            diffs = {i: (latest[i, j] - prev[i, j]) * (1 if d >= 0 else -1)
+                     for i in rows if not np.isnan(prev[i, j])}
+            if not diffs:
+                continue
+            lo, hi = min(diffs.values()), max(diffs.values())
+            for i, dv in diffs.items():
+                out[i, j] = min(1.0, max(0.0, 0.5 if hi == lo else (dv - lo) / (hi - lo)))
+            continue
+        for i, v in zip(rows, vals):
+            if method == "zscore":
+                mean = sum(vals) / len(vals)
+                std = (sum((x - mean) ** 2 for x in vals) / len(vals)) ** 0.5
+                zs = [0.0 if std == 0 else (x - mean) / std for x in vals]
+                span = max(zs) - min(zs)
+                norm = 0.5 if std == 0 or span == 0 else ((v - mean) / std - min(zs)) / span
+            elif method == "percentile":
+                s = sorted(vals)
+                norm = s.index(v) / (len(s) - 1) if len(s) > 1 else 0.5
+            else:
+                span = max(vals) - min(vals)
+                norm = 0.5 if span == 0 else (v - min(vals)) / span
+            out[i, j] = min(1.0, max(0.0, norm if d >= 0 else 1.0 - norm))
+    return out
+
+
+def _random_case(seed):
+    rng = np.random.default_rng(seed)
+    latest = rng.normal(2.0, 3.0, (7, 5))
+    prev = latest - rng.normal(0.0, 1.0, (7, 5))
+    latest[rng.random((7, 5)) < 0.2] = np.nan
+    prev[rng.random((7, 5)) < 0.2] = np.nan
+    latest[:, 4] = np.nan  # 整列缺失
+    return latest, prev, [1, -1, 1, -1, 1]
+
+
+def test_matches_loop_implementation_without_ties():
+    for seed in range(5):
+        latest, prev, directions = _random_case(seed)
+        for method in mn.VIEWS:
+            expected = _reference(method, latest, prev, directions)
+            actual = mn.normalize(method, latest, directions, prev=prev)
+            np.testing.assert_allclose(actual, expected, atol=1e-12, equal_nan=True)
+        all_views = mn.normalize_all(latest, directions, prev=prev)
+        assert set(all_views) == set(mn.VIEWS)
+
+
+def test_percentile_is_tie_aware():
+    latest = np.array([[1.0], [3.0], [3.0], [5.0], [np.nan]])
+    scores = mn.normalize("percentile", latest, [1])
+    # 两个 3.0 取平均秩 1.5 / 3
+    np.testing.assert_allclose(scores[:, 0], [0.0, 0.5, 0.5, 1.0, np.nan], equal_nan=True)
+    flipped = mn.normalize("percentile", latest, [-1])
+    np.testing.assert_allclose(flipped[:, 0], [1.0, 0.5, 0.5, 0.0, np.nan], equal_nan=True)
+    single = mn.normalize("percentile", np.array([[2.0], [np.nan]]), [1])
+    assert single[0, 0] == 0.5
+
+
+def test_history_cube_is_reference_distribution():
+    rows = [("gdp", eco, f"{y}-12-31", v) for y, vals in ((2021, (0.0, 10.0)), (2022, (4.0, 6.0)), (2023, (5.0, None)))
+            for eco, v in zip(("US", "DE"), vals)]
+    dates, cube = mn.build_cube(rows, ["US", "DE"], ["gdp"])
+    assert dates == ["2021-12-31", "2022-12-31", "2023-12-31"]
+    latest, prev = mn.last_two_observations(cube)
+    np.testing.assert_allclose(latest[:, 0], [5.0, 6.0])
+    np.testing.assert_allclose(prev[:, 0], [4.0, 10.0])
+    # 参照集为窗口内全部观测 {0,10,4,6,5}
+    value = mn.normalize("value", latest, [1], history=cube)
+    np.testing.assert_allclose(value[:, 0], [0.5, 0.6])
+    pct = mn.normalize("percentile", latest, [1], history=cube)
+    np.testing.assert_allclose(pct[:, 0], [0.5, 0.75])
+    # 历史差分 {US: 4, 1; DE: -4}，方向一致化后 min-max
+    trend = mn.normalize("trend", latest, [1], prev=prev, history=cube)
+    np.testing.assert_allclose(trend[:, 0], [5.0 / 8.0, 0.0])
+
+
+def test_composite_weights_only_available_indicators():
+    scores = np.array([[1.0, 0.0, np.nan], [np.nan, np.nan, np.nan]])
+    np.testing.assert_allclose(mn.composite(scores, [3.0, 1.0, 5.0]), [75.0, 0.0])
+    matrix, ranking = mn.snapshot_tables(["US", "DE"], ["a", "b", "c"], scores, [3.0, 1.0, 5.0])
+    assert matrix["US"] == {"composite": 75.0, "by_indicator": {"a": 100.0, "b": 0.0}}
+    assert ranking[0] == {"economy": "US", "score": 75.0}
+
+
+def test_window_start():
+    assert window_start("2024-03-31", "1m") == "2024-02-29"
+    assert window_start("2024-12-31", "3y") == "2021-12-31"
+    assert window_start("2024-06-15", "6m") == "2023-12-15"
+    assert window_start("2024-06-15", "all") is None
+    assert window_start("2024-06-15", None) is None
+
+
+def test_repository_history_and_snapshot_window(monkeypatch):
+    fd, path = tempfile.mkstemp(prefix="macro_norm_", suffix=".db")
+    os.close(fd)
+    try:
+        repo = MacroRepository(DatabaseService(path, create_trading_schema=False))
+        rnd = random.Random(34)
+        records = [{"economy": eco, "indicator": "gdp_yoy", "date": f"{y}-12-31", "value": round(rnd.uniform(-1, 5), 2),
+                    "provider": "t", "revised_at": None}
+                   for y in range(2015, 2025) for eco in ("US", "DE", "JP")]
+        repo.bulk_upsert_macro_series(records)
+        hist = repo.fetch_history(["gdp_yoy"], "2022-12-31", "2024-12-31")
+        assert len(hist) == 9 and hist[0][2] == "2022-12-31"
+        assert repo.fetch_max_date(["gdp_yoy"]) == "2024-12-31"
+        assert repo.fetch_max_date(["gdp_yoy"], date_to="2023-06-30") == "2022-12-31"
+
+        from services import macro_service
+        svc = macro_service.MacroService(repo.db)
+        svc.repo = repo
+        monkeypatch.setattr(macro_service, "INDICATORS", {"gdp_yoy": (1, "3y")})
+        cross = svc.get_snapshot(view="percentile", nocache=True)
+        windowed = svc.get_snapshot(view="percentile", window="3y", nocache=True)
+        assert cross["window"] == "latest" and windowed["window"] == "3y"
+        # 横截面：三个经济体的分位为 {0, 50, 100}；窗口：以 2021-12-31 以来的全部观测为参照
+        assert sorted(v["by_indicator"]["gdp_yoy"] for k, v in cross["matrix"].items() if v["by_indicator"]) == [0.0, 50.0, 100.0]
+        _dates, cube = mn.build_cube(repo.fetch_history(["gdp_yoy"], "2021-12-31", "2024-12-31"), ["US", "DE", "JP"], ["gdp_yoy"])
+        latest, _prev = mn.last_two_observations(cube)
+        expected = mn.normalize("percentile", latest, [1], history=cube)[:, 0]
+        for i, eco in enumerate(("US", "DE", "JP")):
+            assert windowed["matrix"][eco]["by_indicator"]["gdp_yoy"] == round(float(expected[i]) * 100.0, 1)
+    finally:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
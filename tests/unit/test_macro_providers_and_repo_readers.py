@@ -48,19 +48,12 @@ def test_provider_stubs_no_network_ok():
     assert isinstance(rows, list)
 
     # mock frankfurter path to raise and then to return
-    with mock.patch("services.data_providers.ecb_fx_provider.urllib.request.urlopen", side_effect=Exception("net")):
+    with mock.patch("services.data_providers.ecb_fx_provider._LATEST_CACHE", {}), \
+            mock.patch("services.data_providers.ecb_fx_provider.get_json", side_effect=Exception("net")):
         assert fetch_fx_latest_frankfurter(["EURUSD"]) == []
-    class DummyResp:
-        def __init__(self, payload: str):
-            self._p = payload.encode("utf-8")
-        def read(self):
-            return self._p
-        def __enter__(self):
-            return self
-        def __exit__(self, *_):
-            return False
-    payload = '{"amount":1,"base":"EUR","date":"2025-01-01","rates":{"USD":1.1,"JPY":165.0}}'
-    with mock.patch("services.data_providers.ecb_fx_provider.urllib.request.urlopen", return_value=DummyResp(payload)):
+    payload = {"amount": 1, "base": "EUR", "date": "2025-01-01", "rates": {"USD": 1.1, "JPY": 165.0}}
+    with mock.patch("services.data_providers.ecb_fx_provider._LATEST_CACHE", {}), \
+            mock.patch("services.data_providers.ecb_fx_provider.get_json", return_value=payload):
         data = fetch_fx_latest_frankfurter(["EURUSD","USDJPY"]) 
         assert any(x.get("pair")=="EURUSD" for x in data)
         assert any(x.get("pair")=="USDJPY" for x in data)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app import create_app
+from services import macro_service
+from services.database_service import DatabaseService
+from services.macro_repository import MacroRepository
+from services.macro_service import MacroService, filter_snapshot
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def _seed(repo):
+    rows = [{"economy": eco, "indicator": ind, "date": "2024-12-31", "value": v, "provider": "t", "revised_at": None}
+            for ind, vals in (("gdp_yoy", (2.5, 1.0, 0.5)), ("unemployment", (4.0, 5.0, 2.5)))
+            for eco, v in zip(("US", "DE", "JP"), vals)]
+    repo.bulk_upsert_macro_series(rows)
+
+
+class TestSharedSnapshotCache(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(prefix="macro_cache_", suffix=".db")
+        os.close(fd)
+        self.repo = MacroRepository(DatabaseService(self.path, create_trading_schema=False))
+        _seed(self.repo)
+        self.svc = MacroService(self.repo.db)
+        self.svc.repo = self.repo
+        macro_service._SNAPSHOT_CACHE.clear()
+
+    def tearDown(self):
+        macro_service._SNAPSHOT_CACHE.clear()
+        try:
+            os.remove(self.path)
+        except Exception:
+            pass
+
+    def test_local_hit_returns_same_object_and_shared_hit_skips_compute(self):
+        first = self.svc.get_snapshot_entry(view="value")
+        self.assertIs(self.svc.get_snapshot(view="value"), first.payload)
+        # 模拟另一个进程：进程内缓存为空，直接从共享表读取
+        macro_service._SNAPSHOT_CACHE.clear()
+        with patch.object(MacroService, "_compute_snapshot", side_effect=AssertionError("should not compute")):
+            shared = self.svc.get_snapshot_entry(view="value")
+        self.assertEqual(shared.etag, first.etag)
+        self.assertEqual(shared.payload, first.payload)
+
+    def test_data_write_and_refresh_invalidate(self):
+        first = self.svc.get_snapshot_entry(view="value")
+        self.repo.bulk_upsert_macro_series([{"economy": "JP", "indicator": "gdp_yoy", "date": "2024-12-31",
+                                              "value": 9.0, "provider": "t", "revised_at": None}])
+        second = self.svc.get_snapshot_entry(view="value")
+        self.assertNotEqual(second.version, first.version)
+        self.assertNotEqual(second.etag, first.etag)
+        with patch("services.macro_service.fetch_commodities_latest", return_value=[]), \
+                patch("services.macro_service.fetch_fx_latest", return_value=[]), \
+                patch("services.macro_service.wb_fetch_macro_latest", return_value=[]):
+            self.svc.refresh_all()
+        third = self.svc.get_snapshot_entry(view="value")
+        self.assertNotEqual(third.version, second.version)
+        # 缓存失效记录不出现在刷新历史中
+        self.assertEqual(self.repo.get_refresh_status()["history"], [])
+
+    def test_cache_shared_with_another_process(self):
+        entry = self.svc.get_snapshot_entry(view="zscore", window="1y")
+        code = (
+            "import json\n"
+            "from services.database_service import DatabaseService\n"
+            "from services.macro_repository import MacroRepository\n"
+            "from services.macro_service import MacroService\n"
+            f"repo = MacroRepository(DatabaseService({self.path!r}, create_trading_schema=False))\n"
+            "svc = MacroService(repo.db)\n"
+            "svc.repo = repo\n"
+            "MacroService._compute_snapshot = None\n"
+            "print(json.dumps(svc.get_snapshot_entry(view='zscore', window='1y').etag))\n"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(json.loads(proc.stdout.strip().splitlines()[-1]), entry.etag)
+
+    def test_filter_does_not_modify_cached_payload(self):
+        payload = self.svc.get_snapshot(view="value")
+        before = json.dumps(payload, sort_keys=True)
+        out = filter_snapshot(payload, ["US", "JP"], ["gdp_yoy"])
+        self.assertEqual(out["economies"], ["US", "JP"])
+        self.assertEqual(set(out["matrix"]), {"US", "JP"})
+        self.assertEqual(set(out["matrix"]["US"]["by_indicator"]), {"gdp_yoy"})
+        self.assertEqual(json.dumps(payload, sort_keys=True), before)
+
+
+class TestSnapshotHttpValidators(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        macro_service._SNAPSHOT_CACHE.clear()
+
+    def test_etag_and_304(self):
+        r1 = self.client.get('/api/macro/snapshot?view=value')
+        self.assertEqual(r1.status_code, 200)
+        etag = r1.headers['ETag']
+        self.assertTrue(etag)
+        self.assertIn('Last-Modified', r1.headers)
+        self.assertIn('no-cache', r1.headers['Cache-Control'])
+        self.assertEqual(r1.get_json()['view'], 'value')
+
+        r2 = self.client.get('/api/macro/snapshot?view=value', headers={'If-None-Match': etag})
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(r2.data, b'')
+
+        r3 = self.client.get('/api/macro/snapshot?view=value&economies=us,de&indicators=gdp_yoy')
+        self.assertEqual(r3.status_code, 200)
+        self.assertNotEqual(r3.headers['ETag'], etag)
+        j3 = r3.get_json()
+        self.assertEqual(j3['economies'], ['US', 'DE'])
+        for row in j3['matrix'].values():
+            self.assertLessEqual(set(row['by_indicator']), {'gdp_yoy'})
+        r4 = self.client.get('/api/macro/snapshot?view=value&economies=us,de&indicators=gdp_yoy',
+                             headers={'If-None-Match': r3.headers['ETag']})
+        self.assertEqual(r4.status_code, 304)
+        # 过滤请求不影响基础快照
+        r5 = self.client.get('/api/macro/snapshot?view=value')
+        self.assertEqual(r5.headers['ETag'], etag)
+        self.assertEqual(len(r5.get_json()['economies']), len(r1.get_json()['economies']))
+
+
+if __name__ == '__main__':
+    unittest.main()
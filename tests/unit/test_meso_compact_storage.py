@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from services.compact_storage import from_day, to_day
+from services.database_service import DatabaseService
+from services.meso_repository import MesoRepository
+
+
+class TestMesoCompactStorage(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(prefix="meso_compact_", suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        try:
+            os.remove(self.path)
+        except Exception:
+            pass
+
+    def _repo(self):
+        return MesoRepository(DatabaseService(self.path, create_trading_schema=False))
+
+    def test_day_number_round_trip(self):
+        for d in ("1970-01-01", "1965-05-03", "2000-02-29", "2024-12-31"):
+            self.assertEqual(from_day(to_day(d)), d)
+        self.assertEqual(to_day("1970-01-02"), 1)
+        self.assertEqual(to_day("2024-01-05T00:00:00"), to_day("2024-01-05"))
+
+    def test_legacy_tables_migrated_to_compact_layout_with_views(self):
+        conn = sqlite3.connect(self.path)
+        # 旧布局（缺少 close_tr/close_usd_tr/adj_factor 列的早期版本）
+        conn.execute("CREATE TABLE index_prices (id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, "
+                     "date TEXT NOT NULL, close REAL, currency TEXT, close_usd REAL, UNIQUE(symbol, date))")
+        conn.execute("CREATE TABLE trend_scores (id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, "
+                     "date TEXT NOT NULL, score REAL, components_json TEXT, UNIQUE(symbol, date))")
+        conn.executemany("INSERT INTO index_prices (symbol, date, close, currency, close_usd) VALUES (?,?,?,?,?)", [
+            ("^OLD", "2024-01-02", 10.0, "USD", 10.0),
+            ("^OLD", "1999-12-31", 5.0, "USD", None),
+            ("^EU", "2024-01-03", 7.0, "EUR", 7.7),
+        ])
+        conn.execute("INSERT INTO trend_scores (symbol, date, score) VALUES ('^OLD', '2024-01-02', 61.5)")
+        conn.commit()
+        conn.close()
+
+        repo = self._repo()
+        self.assertEqual([p["date"] for p in repo.fetch_prices("^OLD")], ["1999-12-31", "2024-01-02"])
+        self.assertEqual(repo.fetch_prices("^EU")[0]["close_usd"], 7.7)
+        self.assertEqual(repo.fetch_scores("^OLD"), [{"date": "2024-01-02", "score": 61.5, "components_json": None}])
+        with repo.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, type FROM sqlite_master WHERE name IN "
+                        "('index_prices', 'trend_scores', 'rs_scores', 'index_prices_data')")
+            kinds = {r[0]: r[1] for r in cur.fetchall()}
+            cur.execute("SELECT sql FROM sqlite_master WHERE name='index_prices_data'")
+            ddl = cur.fetchone()[0]
+            # 兼容视图仍可按旧列名查询
+            cur.execute("SELECT symbol, date, close FROM index_prices WHERE symbol='^OLD' ORDER BY date")
+            view_rows = [tuple(r) for r in cur.fetchall()]
+        self.assertEqual(kinds, {"index_prices": "view", "trend_scores": "view", "rs_scores": "view",
+                                 "index_prices_data": "table"})
+        self.assertIn("WITHOUT ROWID", ddl.upper())
+        self.assertEqual(view_rows, [("^OLD", "1999-12-31", 5.0), ("^OLD", "2024-01-02", 10.0)])
+
+        # 再次打开不重复迁移；写入/调整/删除经仓储照常工作
+        repo = self._repo()
+        self.assertEqual(repo.upsert_index_prices([{"symbol": "^OLD", "date": "2024-01-02", "close": 11.0,
+                                                    "currency": "USD", "close_usd": 11.0}]), 1)
+        self.assertEqual(len(repo.fetch_prices("^OLD")), 2)
+        self.assertEqual(repo.update_adjusted_prices("^OLD", [{"date": "2024-01-02", "close_tr": 12.0}]), 1)
+        self.assertEqual(repo.update_adjusted_prices("^NONE", [{"date": "2024-01-02", "close_tr": 12.0}]), 0)
+        self.assertEqual(repo.fetch_prices("^OLD", start="2024-01-01")[0]["close_tr"], 12.0)
+        self.assertEqual(repo.get_latest_price_date("^OLD"), "2024-01-02")
+        res = repo.delete_symbol_data("^old")
+        self.assertEqual(res["by_table"], {"trend_scores": 1, "rs_scores": 0, "index_prices": 2})
+        self.assertEqual(repo.fetch_prices("^OLD"), [])
+        self.assertIsNone(repo.get_latest_price_date("^OLD"))
+
+
+if __name__ == "__main__":
+    unittest.main()
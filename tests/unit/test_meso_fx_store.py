@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+from app import create_app
+from services.database_service import DatabaseService
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+
+_PROVIDER = 'services.data_providers.meso_market_provider'
+
+
+@pytest.fixture()
+def tmpdir_path():
+    with tempfile.TemporaryDirectory(prefix="meso_fx_") as d:
+        yield d
+
+
+def test_fx_store_coverage_and_local_reads(tmpdir_path):
+    repo = MesoRepository(DatabaseService(os.path.join(tmpdir_path, "meso.db"), create_trading_schema=False))
+    assert repo.get_fx_coverage(["EUR"]) == {}
+    n = repo.upsert_fx_rates({"2024-01-02": {"EUR": 1.1, "USD": 1.0}, "2024-01-04": {"eur": 1.2, "GBP": 1.3}},
+                             ["EUR", "USD"], "2024-01-01")
+    assert n == 2
+    assert repo.get_fx_coverage(["eur", "GBP"]) == {"EUR": {"first_date": "2024-01-01", "last_date": "2024-01-04"}}
+    # 覆盖起点只向前扩展
+    repo.upsert_fx_rates({}, ["EUR"], "2024-01-03")
+    assert repo.get_fx_coverage(["EUR"])["EUR"]["first_date"] == "2024-01-01"
+    assert repo.fetch_fx_rates(["EUR", "USD"]) == {"2024-01-02": {"EUR": 1.1}, "2024-01-04": {"EUR": 1.2}}
+    assert repo.fetch_fx_rates(["EUR"], end="2024-01-03") == {"2024-01-02": {"EUR": 1.1}}
+
+    repo.upsert_index_prices([
+        {"symbol": "^EU", "date": d, "close": 10.0, "close_tr": 20.0, "currency": "EUR", "adj_factor": 0.5}
+        for d in ("2024-01-01", "2024-01-03", "2024-01-04")
+    ])
+    version = repo.get_price_data_version()
+    assert repo.recompute_usd_prices(["^EU"], "EUR", "2024-01-01", "2024-01-04") == 3
+    prices = {p["date"]: p for p in repo.fetch_prices("^EU")}
+    assert prices["2024-01-01"]["close_usd"] is None
+    assert prices["2024-01-03"]["close_usd"] == pytest.approx(11.0)
+    assert prices["2024-01-04"]["close_usd_tr"] == pytest.approx(24.0)
+    assert repo.get_price_data_version() != version
+    assert repo.recompute_usd_prices(["^EU"], "USD", "2024-01-01", "2024-01-04") == 0
+
+
+def test_refresh_tops_up_fx_and_recomputes_backfilled_dates(tmpdir_path):
+    days = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    state = {"prices": days[:3], "fx": {"2024-01-02": {"EUR": 1.1}, "2024-01-03": {"EUR": 1.2}}}
+    calls = []
+
+    fake = types.ModuleType(_PROVIDER)
+
+    def fetch_index_history(symbols, period='3y', start=None, adjusted=False, total_return=False):
+        return {s: [{"date": d, "close": 100.0} for d in state["prices"] if not start or d >= start] for s in symbols}
+
+    def fetch_fx_timeseries_to_usd(quote_list, start_date, end_date):
+        calls.append((tuple(quote_list), start_date, end_date))
+        return {d: m for d, m in state["fx"].items() if start_date <= d <= end_date}
+
+    fake.fetch_index_history = fetch_index_history
+    fake.fetch_fx_timeseries_to_usd = fetch_fx_timeseries_to_usd
+    saved = sys.modules.get(_PROVIDER)
+    sys.modules[_PROVIDER] = fake
+    try:
+        app = create_app('testing')
+        app.config['MESO_DB_PATH'] = os.path.join(tmpdir_path, "meso.db")
+        with app.app_context():
+            svc = MesoService()
+            svc.refresh_prices_and_scores(symbols=['^GDAXI', '^STOXX'], period='1y')
+            # 2024-01-04 汇率尚未发布：沿用前一日汇率
+            first = {p["date"]: p["close_usd"] for p in svc.repo.fetch_prices('^GDAXI')}
+            assert first["2024-01-04"] == pytest.approx(120.0)
+
+            # 第二次刷新：汇率源补发 2024-01-04，价格新增 2024-01-05；只请求已存最新汇率之后的日期
+            state["prices"] = days
+            state["fx"]["2024-01-04"] = {"EUR": 1.3}
+            svc.refresh_prices_and_scores(symbols=['^GDAXI', '^STOXX'], period='1y')
+            # 起始日期提前：回补更早的价格，并只为回补段请求汇率
+            state["prices"] = ["2023-12-29", *days]
+            state["fx"]["2023-12-29"] = {"EUR": 1.0}
+            svc.refresh_prices_and_scores(symbols=['^GDAXI'], period='1y', since='2023-12-29')
+            backfilled = {p["date"]: p["close_usd"] for p in svc.repo.fetch_prices('^GDAXI')}
+            second = {p["date"]: p["close_usd"] for p in svc.repo.fetch_prices('^STOXX')}
+    finally:
+        if saved is not None:
+            sys.modules[_PROVIDER] = saved
+        else:
+            sys.modules.pop(_PROVIDER, None)
+
+    assert calls == [
+        (("EUR",), "2024-01-02", "2024-01-04"),
+        (("EUR",), "2024-01-04", "2024-01-05"),
+        (("EUR",), "2023-12-29", "2024-01-01"),
+    ]
+    assert backfilled["2023-12-29"] == pytest.approx(100.0)
+    # 已存价格按补发的汇率回算，新价格按本地汇率换算
+    assert second["2024-01-04"] == pytest.approx(130.0)
+    assert second["2024-01-05"] == pytest.approx(130.0)
+    assert second["2024-01-02"] == pytest.approx(110.0)
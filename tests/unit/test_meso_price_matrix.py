@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app import create_app
+from services.database_service import DatabaseService
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+from services.price_matrix import PRICE_MATRIX_FIELDS, PriceMatrixStore
+
+
+def _weekdays(n, start=date(2022, 1, 3)):
+    out, d = [], start
+    while len(out) < n:
+        if d.weekday() < 5:
+            out.append(d.isoformat())
+        d += timedelta(days=1)
+    return out
+
+
+@pytest.fixture()
+def svc():
+    tmpdir = tempfile.mkdtemp(prefix="meso_matrix_")
+    repo = MesoRepository(DatabaseService(os.path.join(tmpdir, "meso.db"), create_trading_schema=False))
+    repo.upsert_index_metadata([
+        {"symbol": "^US1", "name": "US1", "currency": "USD", "market": "US", "asset_class": "equity", "category": "broad"},
+        {"symbol": "^US2", "name": "US2", "currency": "USD", "market": "US", "asset_class": "equity", "category": "tech"},
+        {"symbol": "^JP1", "name": "JP1", "currency": "JPY", "market": "JP", "asset_class": "equity", "category": "broad"},
+        {"symbol": "GLD", "name": "Gold", "currency": "USD", "market": "US", "asset_class": "commodity", "category": "gold"},
+    ])
+    dates = _weekdays(300)
+    rows = []
+    for k, sym in enumerate(("^US1", "^US2", "^JP1", "GLD")):
+        for i, d in enumerate(dates):
+            if sym == "^JP1" and i % 7 == 3:
+                continue  # 日本市场休市日
+            close = 100.0 * (1.0 + 0.001 * (k + 1)) ** i
+            usd = None if (sym == "^US2" and i % 11 == 5) else close * (0.007 if sym == "^JP1" else 1.0)
+            rows.append({"symbol": sym, "date": d, "close": close, "close_tr": close * 1.01,
+                         "currency": "JPY" if sym == "^JP1" else "USD",
+                         "close_usd": usd, "close_usd_tr": None if usd is None else usd * 1.01})
+    repo.upsert_index_prices(rows)
+    service = MesoService()
+    service.repo = repo
+    yield service
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _rankings(svc):
+    return (
+        svc.get_asset_class_rankings(),
+        svc.get_asset_class_rankings(return_mode="total"),
+        svc.get_equity_market_rankings(),
+        svc.get_equity_category_rankings("US"),
+        svc.get_equity_category_rankings("US", return_mode="total"),
+    )
+
+
+def test_rankings_from_matrix_match_sql(svc):
+    expected = _rankings(svc)
+    assert expected[0]["rankings"]
+    info = svc.publish_price_matrix()
+    assert info["symbols"] == 4 and info["dates"] == 300
+
+    store = PriceMatrixStore.for_db_path(svc.repo.db.db_path)
+    matrix = store.load()
+    assert matrix.version == svc.repo.get_price_data_version()
+    assert matrix.data.shape == (len(PRICE_MATRIX_FIELDS), 300, 4)
+    assert isinstance(matrix.data, np.memmap) and not matrix.data.flags.writeable
+    # 清单未变化时复用同一映射
+    assert store.load() is matrix
+
+    with patch.object(svc.repo, "fetch_prices_many", side_effect=AssertionError("SQL path used")):
+        assert _rankings(svc) == expected
+
+
+def test_stale_matrix_falls_back_and_publish_swaps_files(svc):
+    first = svc.publish_price_matrix()
+    svc.repo.upsert_index_prices([{"symbol": "^US1", "date": "2023-06-01", "close": 1.0, "currency": "USD",
+                                   "close_usd": 1.0}])
+    with patch.object(svc.repo, "fetch_prices_many", wraps=svc.repo.fetch_prices_many) as spy:
+        svc.get_equity_market_rankings()
+    assert spy.called
+
+    second = svc.publish_price_matrix()
+    third = svc.publish_price_matrix()
+    directory = os.path.dirname(svc.repo.db.db_path)
+    files = sorted(n for n in os.listdir(directory) if n.endswith(".npy"))
+    assert all(n.startswith("meso.price_matrix.") for n in files)
+    # 仅保留当前与上一版本的数据文件
+    assert files == sorted([second["file"], third["file"]]) and first["file"] not in files
+    matrix = PriceMatrixStore.for_db_path(svc.repo.db.db_path).load()
+    assert matrix.version == svc.repo.get_price_data_version()
+    series = matrix.series_on(["^US1", "NONE"], ["2023-06-01", "2030-01-01"], "close_usd")
+    assert series == {"^US1": [("2023-06-01", 1.0)], "NONE": []}
+
+
+def test_memory_database_does_not_publish():
+    assert PriceMatrixStore.for_db_path("file:meso_memdb?mode=memory&cache=shared") is None
+    assert PriceMatrixStore.for_db_path(":memory:") is None
+    assert PriceMatrixStore.for_db_path(object()) is None
+
+
+def test_databases_in_same_directory_do_not_clobber(svc):
+    directory = os.path.dirname(svc.repo.db.db_path)
+    # 非本库命名的文件不受清理影响
+    foreign = os.path.join(directory, "meso_price_matrix." + "0" * 32 + ".npy")
+    open(foreign, "wb").close()
+    other = MesoService()
+    other.repo = MesoRepository(DatabaseService(os.path.join(directory, "meso.price_matrix.x.db"),
+                                                create_trading_schema=False))
+    other.repo.upsert_index_prices([{"symbol": "^XX", "date": "2023-06-01", "close": 2.0, "currency": "USD",
+                                     "close_usd": 2.0}])
+    theirs = other.publish_price_matrix()
+    for _ in range(3):
+        ours = svc.publish_price_matrix()
+    assert os.path.exists(os.path.join(directory, theirs["file"])) and os.path.exists(foreign)
+    assert PriceMatrixStore.for_db_path(svc.repo.db.db_path).load().symbols == ["GLD", "^JP1", "^US1", "^US2"]
+    assert PriceMatrixStore.for_db_path(other.repo.db.db_path).load().symbols == ["^XX"]
+    assert ours["file"].startswith("meso.price_matrix.")
+
+
+def test_testing_config_skips_publish(svc):
+    app = create_app('testing')
+    with app.app_context():
+        assert svc.publish_price_matrix() is None
+    assert PriceMatrixStore.for_db_path(svc.repo.db.db_path).load() is None
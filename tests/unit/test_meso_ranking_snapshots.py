@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+from utils.exceptions import ConflictError
+
+
+def _weekdays(n, start=date(2021, 1, 4)):
+    out, d = [], start
+    while len(out) < n:
+        if d.weekday() < 5:
+            out.append(d.isoformat())
+        d += timedelta(days=1)
+    return out
+
+
+DATES = _weekdays(400)
+META = [
+    ("^US1", "US", "equity", "broad", 1.0004),
+    ("^US2", "US", "equity", "tech", 1.0009),
+    ("^US3", "US", "equity", "tech", 0.9998),
+    ("^JP1", "JP", "equity", "broad", 1.0006),
+    ("GLD", "US", "commodity", "gold", 1.0002),
+    ("TLT", "US", None, "bond", 0.9999),
+]
+
+
+@pytest.fixture()
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MesoRepository()
+        repo.upsert_index_metadata([
+            {"symbol": s, "name": s, "currency": "USD", "market": m, "asset_class": ac, "category": cat}
+            for s, m, ac, cat, _ in META
+        ])
+        rows = []
+        for k, (sym, _, _, _, drift) in enumerate(META):
+            px = 100.0
+            for i, d in enumerate(DATES):
+                px *= drift * (1.0 + 0.01 * ((i * (k + 3)) % 7 - 3) / 3.0)
+                if sym == "^JP1" and i % 9 == 4:
+                    continue
+                usd = None if (sym == "^US3" and i % 13 == 6) else px
+                rows.append({"symbol": sym, "date": d, "close": px, "close_tr": px * 1.001, "currency": "USD",
+                             "close_usd": usd, "close_usd_tr": None if usd is None else usd * 1.001})
+        repo.upsert_index_prices(rows)
+        yield app
+
+
+def _all_rankings(svc, asof):
+    out = []
+    for rm in ("price", "total"):
+        out.append(svc.get_asset_class_rankings(asof=asof, return_mode=rm))
+        out.append(svc.get_equity_market_rankings(asof=asof, return_mode=rm))
+        out.append(svc.get_equity_category_rankings("US", asof=asof, top=2, return_mode=rm))
+    return out
+
+
+ASOFS = (None, DATES[30], DATES[130], "2021-07-03", DATES[260], DATES[399])
+
+
+def test_snapshot_rankings_match_live_computation(app):
+    with app.app_context():
+        svc = MesoService()
+        live = {asof: _all_rankings(svc, asof) for asof in ASOFS}
+        assert live[None][0]["rankings"] and live[None][2]["rankings"]
+        assert {r["asset_class"] for r in live[None][0]["rankings"]} == {"equity", "commodity", "unknown"}
+
+        res = svc.rebuild_ranking_snapshots()
+        assert res["rows"] > 0
+        with patch.object(svc, "_ranking_series", side_effect=AssertionError("live path used")):
+            for asof in ASOFS:
+                assert _all_rankings(svc, asof) == live[asof]
+
+
+def test_stale_snapshot_falls_back_and_history_lookup(app):
+    with app.app_context():
+        svc = MesoService()
+        svc.rebuild_ranking_snapshots()
+        hist = svc.get_ranking_history("equity_market", "us")
+        assert hist["group"] == "US" and hist["return_mode"] == "price"
+        dates = [p["date"] for p in hist["series"]]
+        assert dates == sorted(dates) and dates[-1] == DATES[-1]
+        # 名次与当日排名一致
+        day = hist["series"][-1]
+        ranked = [r["market"] for r in svc.get_equity_market_rankings(asof=day["date"])["rankings"]]
+        assert ranked.index("US") + 1 == day["rank"]
+
+        cat = svc.get_ranking_history("equity_category", "TECH", market="us", return_mode="total", start=DATES[300])
+        assert cat["market"] == "US" and cat["series"] and cat["series"][0]["date"] >= DATES[300]
+
+        # 价格写入后快照过期：实时计算；名次历史不在读取中重建
+        MesoRepository().upsert_index_prices([{"symbol": "^JP1", "date": DATES[-1], "close": 1.0, "currency": "USD",
+                                              "close_usd": 1.0, "close_usd_tr": 1.0}])
+        with patch.object(svc, "_ranking_series", wraps=svc._ranking_series) as spy:
+            latest = svc.get_equity_market_rankings()
+        assert spy.called and latest["rankings"][-1]["market"] == "JP"
+        with patch.object(svc, "rebuild_ranking_snapshots", side_effect=AssertionError("rebuilt on read")):
+            with pytest.raises(ConflictError):
+                svc.get_ranking_history("equity_market", "JP")
+        svc.rebuild_ranking_snapshots()
+        hist = svc.get_ranking_history("equity_market", "JP")
+        assert hist["series"][-1] == {"date": DATES[-1], "rank": 2, "score": latest["rankings"][-1]["score"]}
+
+        with pytest.raises(ValueError):
+            svc.get_ranking_history("sector", "x")
+        with pytest.raises(ValueError):
+            svc.get_ranking_history("equity_category", "tech")
+
+
+def test_write_paths_rebuild_snapshots(app):
+    with app.app_context():
+        svc = MesoService()
+        repo = svc.repo
+        svc.upsert_tracked_instruments([{"symbol": "EWJ", "name": "EWJ", "currency": "USD", "market": "jp",
+                                         "asset_class": "equity", "category": "broad"}])
+        current, built = repo.get_ranking_source()
+        assert built == current
+        svc.set_global_start_date(DATES[100])
+        assert repo.get_ranking_source()[1] == repo.get_ranking_source()[0]
+        res = svc.delete_symbol_data("^US3", remove_meta=True)
+        assert res["detail"]["total"] > 0 and res["metadata_deleted"] == 1
+        current, built = repo.get_ranking_source()
+        assert built == current
+        ranked = {r["category"] for r in svc.get_equity_category_rankings("US")["rankings"]}
+        hist = svc.get_ranking_history("equity_category", "tech", market="US")
+        assert "tech" in ranked and hist["series"][0]["date"] >= DATES[100]
+
+
+def test_ranking_history_route(app):
+    client = app.test_client()
+    # 快照尚未构建：不在请求内重建
+    r = client.get('/api/meso/rankings/history?scope=asset_class&group=equity')
+    assert r.status_code == 409 and r.get_json()["code"] == "conflict"
+    with app.app_context():
+        MesoService().rebuild_ranking_snapshots()
+    r = client.get('/api/meso/rankings/history?scope=asset_class&group=equity&start=' + DATES[380])
+    assert r.status_code == 200
+    body = r.get_json()
+    # 日本市场休市日不属于共同开市日
+    assert [p["date"] for p in body["series"]] == [d for i, d in enumerate(DATES) if i >= 380 and i % 9 != 4]
+    assert client.get('/api/meso/rankings/history?scope=bad&group=x').status_code == 400
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+from app import create_app
+from services.meso_service import MesoService
+
+_PROVIDER = 'services.data_providers.meso_market_provider'
+
+
+@pytest.fixture()
+def app():
+    with tempfile.TemporaryDirectory(prefix="meso_plan_") as d:
+        app = create_app('testing')
+        app.config['MESO_DB_PATH'] = os.path.join(d, "meso.db")
+        with app.app_context():
+            yield app
+
+
+def _seed(svc):
+    svc.repo.upsert_index_metadata([
+        {"symbol": "^A", "name": "A", "currency": "USD", "market": "US"},
+        {"symbol": "^B", "name": "B", "currency": "USD", "market": "US", "start_date_override": "2023-06-01"},
+        {"symbol": "^C", "name": "C", "currency": "USD", "market": "US", "always_full_refresh": True},
+    ])
+    svc.repo.upsert_index_prices([
+        {"symbol": s, "date": d, "close": 1.0, "currency": "USD", "close_usd": 1.0}
+        for s in ("^A", "^B", "^C") for d in ("2024-01-04", "2024-01-05")
+    ])
+    # ^A 曾从 2024-01-01 起请求（更早无数据）；^B 为无请求记录的旧数据
+    svc.repo.record_price_requests({"^A": "2024-01-01"})
+
+
+def test_plan_honors_metadata_and_skips_current_symbols(app):
+    svc = MesoService()
+    _seed(svc)
+    plan = svc.plan_price_refresh(["^A", "^B", "^C", "^NEW"], since="2024-01-01", today="2024-01-07")
+    # 周五之后的下一个工作日为周一，晚于 today：无新数据
+    assert plan["^A"] == {"start": "2024-01-08", "full": False, "skip": True,
+                          "first_date": "2024-01-04", "last_date": "2024-01-05"}
+    # 无请求记录时以已存最早日期为覆盖起点：override 更早则回补
+    assert plan["^B"]["start"] == "2023-06-01" and not plan["^B"]["skip"]
+    assert plan["^C"]["start"] == "2024-01-01" and plan["^C"]["full"]
+    assert plan["^NEW"] == {"start": "2024-01-01", "full": True, "skip": False, "first_date": None, "last_date": None}
+
+    # 回补请求记录后不再重复回补
+    svc.repo.record_price_requests({"^B": "2023-06-01"})
+    plan = svc.plan_price_refresh(["^A", "^B"], since="2024-01-01", today="2024-01-08")
+    assert plan["^B"]["start"] == "2024-01-08" and not plan["^B"]["skip"]
+    assert plan["^A"]["start"] == "2024-01-08" and not plan["^A"]["skip"]
+
+
+def test_refresh_requests_only_missing_ranges(app):
+    svc = MesoService()
+    _seed(svc)
+    svc.repo.record_price_requests({"^B": "2023-06-01"})
+    calls = []
+    fake = types.ModuleType(_PROVIDER)
+
+    def fetch_index_history(symbols, period='3y', start=None, adjusted=False, total_return=False):
+        calls.append((tuple(symbols), start))
+        dates = ["2024-01-04", "2024-01-05", "2024-01-08"]
+        return {s: [{"date": d, "close": 2.0} for d in dates if not start or d >= start] for s in symbols}
+
+    fake.fetch_index_history = fetch_index_history
+    fake.fetch_fx_timeseries_to_usd = lambda quote_list, start_date, end_date: {}
+    saved = sys.modules.get(_PROVIDER)
+    sys.modules[_PROVIDER] = fake
+    try:
+        res = svc.refresh_prices_and_scores(symbols=["^A", "^B", "^C"], since="2024-01-01")
+    finally:
+        if saved is not None:
+            sys.modules[_PROVIDER] = saved
+        else:
+            sys.modules.pop(_PROVIDER, None)
+
+    assert sorted(calls) == [(("^A", "^B"), "2024-01-08"), (("^C",), "2024-01-01")]
+    # 增量标的只写入新日期，全量刷新的标的覆盖写入
+    assert res["prices"] == 2 + 3 and res["skipped"] == []
+    assert [p["close"] for p in svc.repo.fetch_prices("^A")] == [1.0, 1.0, 2.0]
+    assert [p["close"] for p in svc.repo.fetch_prices("^C")] == [2.0, 2.0, 2.0]
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from unittest.mock import patch
+
 from app import create_app
 from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
 
 
 def test_meso_repository_latest_and_range_queries():
@@ -44,3 +47,105 @@ def test_meso_repository_latest_and_range_queries():
             assert cnt >= 1
 
 
+
+def test_price_coverage_single_grouped_query():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MesoRepository()
+        repo.upsert_index_prices([
+            {"symbol": "CV.A", "date": "2020-01-01", "close": 1.0, "currency": "USD", "close_usd": 1.0},
+            {"symbol": "CV.A", "date": "2021-06-30", "close": 2.0, "currency": "USD", "close_usd": 2.0, "close_tr": 2.1},
+            {"symbol": "CV.B", "date": "2022-03-01", "close": 5.0, "currency": "EUR"},
+        ])
+        cov = repo.get_price_coverage()
+        assert cov["CV.A"] == {"min_date": "2020-01-01", "max_date": "2021-06-30",
+                               "has_usd": True, "has_tr": True, "has_usd_tr": False}
+        assert cov["CV.B"]["has_usd"] is False and cov["CV.B"]["min_date"] == "2022-03-01"
+        assert set(repo.get_price_coverage(["CV.B", "CV.NONE"])) == {"CV.B"}
+        assert repo.get_price_coverage([]) == {}
+        assert repo.get_price_date_range("CV.A") == cov["CV.A"]
+        assert repo.get_price_date_range("CV.NONE")["min_date"] is None
+
+        repo.upsert_index_metadata([
+            {"symbol": s, "name": s, "currency": "USD", "market": "US", "asset_class": "equity", "is_active": 1}
+            for s in ("CV.A", "CV.B", "CV.C")
+        ])
+        svc = MesoService()
+        with patch.object(svc.repo, "get_price_coverage", wraps=svc.repo.get_price_coverage) as cov_q, \
+                patch.object(svc.repo, "get_price_date_range") as per_symbol:
+            overview = {r["symbol"]: r for r in svc.get_instruments_overview()["all"]}
+        assert cov_q.call_count == 1 and per_symbol.call_count == 0
+        assert overview["CV.A"]["max_date"] == "2021-06-30" and overview["CV.A"]["has_tr"] is True
+        assert overview["CV.C"]["min_date"] is None and overview["CV.C"]["has_usd"] is False
+
+
+def test_market_calendar_common_dates_maintained_and_cached():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MesoRepository()
+        repo.upsert_index_metadata([
+            {"symbol": "MC.US1", "name": "u1", "currency": "USD", "market": "xus", "asset_class": "equity"},
+            {"symbol": "MC.US2", "name": "u2", "currency": "USD", "market": "XUS", "asset_class": "equity"},
+            {"symbol": "MC.HK1", "name": "h1", "currency": "HKD", "market": "XHK", "asset_class": "equity"},
+        ])
+        repo.upsert_index_prices([
+            {"symbol": "MC.US1", "date": "2024-03-01", "close": 1.0, "close_usd": 1.0},
+            {"symbol": "MC.US1", "date": "2024-03-04", "close": 1.0, "close_usd": 1.0},
+            {"symbol": "MC.US2", "date": "2024-03-05", "close": 1.0, "close_usd": 1.0},
+            {"symbol": "MC.HK1", "date": "2024-03-01", "close": 7.8, "close_usd": 1.0},
+            {"symbol": "MC.HK1", "date": "2024-03-04", "close": 7.8, "close_usd": None},  # 缺 FX
+            {"symbol": "MC.HK1", "date": "2024-03-05", "close": 7.8, "close_usd": 1.0},
+            {"symbol": "MC.NOMETA", "date": "2024-03-06", "close": 1.0, "close_usd": 1.0},
+        ])
+        assert repo.get_common_open_dates(["XUS"], "2024-01-01") == ["2024-03-01", "2024-03-04", "2024-03-05"]
+        assert repo.get_common_open_dates(["xhk", "XUS"], "2024-01-01") == ["2024-03-01", "2024-03-05"]
+        assert repo.get_common_open_dates(["XUS", "XHK"], "2024-03-02") == ["2024-03-05"]
+        assert repo.get_common_open_dates([], "2024-01-01") == []
+
+        # 缓存命中不再扫描日历（绕过写入路径直接清表，版本未变时仍返回缓存结果）
+        with repo.db.get_connection() as conn:
+            conn.execute("DELETE FROM market_calendar WHERE market='XHK'")
+            conn.commit()
+        assert repo.get_common_open_dates(["XUS", "XHK"], "2024-01-01") == ["2024-03-01", "2024-03-05"]
+        assert repo.rebuild_market_calendar() == 6
+        # 补齐 FX：写入路径更新日历与版本，缓存失效
+        repo.upsert_index_prices([{"symbol": "MC.HK1", "date": "2024-03-04", "close": 7.8, "close_usd": 1.0}])
+        assert repo.get_common_open_dates(["XUS", "XHK"], "2024-01-01") == ["2024-03-01", "2024-03-04", "2024-03-05"]
+
+        repo.delete_symbol_data("mc.hk1")
+        assert repo.get_common_open_dates(["XUS", "XHK"], "2024-01-01") == []
+        repo.delete_index_metadata("MC.US2")
+        assert repo.get_common_open_dates(["XUS"], "2024-01-01") == ["2024-03-01", "2024-03-04"]
+
+
+def test_bulk_multi_symbol_readers_match_single_reads():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MesoRepository()
+        syms = [f"BK.{i:02d}" for i in range(30)]
+        repo.upsert_index_prices([{"symbol": s, "date": f"2024-01-{d:02d}", "close": float(d), "currency": "USD",
+                                   "close_usd": float(d)} for s in syms for d in range(1, 11 + syms.index(s) % 5)])
+        repo.upsert_trend_scores([{"symbol": s, "date": f"2024-01-{d:02d}", "score": float(d), "components_json": None}
+                                  for s in syms for d in range(1, 8)])
+        repo.upsert_rs_scores([{"symbol": "BK.00", "date": "2024-01-05", "r1m": 0.1, "composite_score": 55.0}])
+
+        many = repo.fetch_prices_many(syms + ["BK.NONE"], start="2024-01-03")
+        assert list(many) == syms + ["BK.NONE"] and many["BK.NONE"] == []
+        for s in syms:
+            assert many[s] == repo.fetch_prices(s, start="2024-01-03")
+        per_symbol = repo.fetch_scores_many(["BK.01", "BK.02"], {"BK.01": "2024-01-06", "BK.02": None})
+        assert [r["date"] for r in per_symbol["BK.01"]] == ["2024-01-06", "2024-01-07"]
+        assert len(per_symbol["BK.02"]) == 7
+        cols = repo.fetch_scores_many(["BK.03", "BK.NONE"], columnar=True)
+        assert cols["BK.03"] == repo.fetch_scores("BK.03", columnar=True)
+        assert cols["BK.NONE"] == {"dates": [], "score": [], "components_json": []}
+        assert repo.fetch_rs_scores_many(["BK.00", "BK.01"]) == {"BK.00": repo.fetch_rs_scores("BK.00"), "BK.01": []}
+        assert repo.get_latest_price_dates(["BK.04", "BK.NONE"]) == {"BK.04": "2024-01-14"}
+        assert repo.get_latest_score_dates(syms)["BK.29"] == "2024-01-07"
+        assert repo.fetch_prices_many([]) == {}
+
+        svc = MesoService()
+        with patch.object(svc.repo, "fetch_scores") as single:
+            out = svc.get_compare_series(syms, window="all")
+        assert single.call_count == 0
+        assert len(out["series"]) == 30 and out["series"]["BK.05"] == repo.fetch_scores("BK.05")
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import unittest
-from services.meso_service import MesoService
+from services.meso_service import MAX_COMPARE_SYMBOLS, MesoService
 
 
 class TestMesoServiceEdges(unittest.TestCase):
@@ -11,7 +11,7 @@ class TestMesoServiceEdges(unittest.TestCase):
         with self.assertRaises(ValueError):
             svc.get_compare_series([], window='3y', currency='USD')
         with self.assertRaises(ValueError):
-            svc.get_compare_series(['S' + str(i) for i in range(11)], window='3y', currency='USD')
+            svc.get_compare_series(['S' + str(i) for i in range(MAX_COMPARE_SYMBOLS + 1)], window='3y', currency='USD')
 
 
     def test_meso_trend_series_shape_keys_present(self):
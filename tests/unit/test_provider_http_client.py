@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from services.data_providers import concurrent_fetch
+from services.data_providers.http_client import CacheMiss, HttpCache, ProviderHttpClient
+
+
+class _EtagHandler(BaseHTTPRequestHandler):
+    """带 ETag 的 JSON 端点：If-None-Match 命中返回 304。"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        return None
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/missing"):
+            return self._send(404, b'{"error": "nope"}', etag=None)
+        etag = '"v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return self._send(200, json.dumps({"path": self.path}).encode("utf-8"), etag=etag)
+
+    def _send(self, status, body, etag):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestProviderHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.tmp = tempfile.TemporaryDirectory(prefix="http_cache_")
+        self.session = concurrent_fetch.make_session(2)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_ttl_hit_conditional_revalidation_and_replay(self):
+        cache = HttpCache(self.tmp.name, ttl=3600)
+        client = ProviderHttpClient(self.session, cache)
+        url = f"{self.base}/a?x=1"
+        first = client.get(url)
+        self.assertEqual((first.json(), first.from_cache), ({"path": "/a?x=1"}, False))
+        # TTL 内：不访问网络
+        self.assertTrue(client.get(url).from_cache)
+        self.assertEqual(len(self.server.requests), 1)
+        # 过期：携带 If-None-Match 重新验证，304 沿用缓存
+        again = client.get(url, ttl=0)
+        self.assertEqual(again.json(), {"path": "/a?x=1"})
+        self.assertEqual(self.server.requests[-1], ("/a?x=1", '"v1"'))
+        self.assertEqual(cache.stats, {"hits": 1, "revalidated": 1, "stored": 1, "misses": 1})
+        # 非 200 不缓存
+        with self.assertRaises(Exception):
+            client.get(f"{self.base}/missing").raise_for_status()
+        self.assertIsNone(cache.load(f"{self.base}/missing"))
+
+        # replay：离线只读缓存
+        self.server.shutdown()
+        replay = ProviderHttpClient(self.session, HttpCache(self.tmp.name, mode="replay"))
+        self.assertEqual(replay.get(url).json(), {"path": "/a?x=1"})
+        with self.assertRaises(CacheMiss):
+            replay.get(f"{self.base}/b")
+
+    def test_concurrent_fetch_uses_configured_cache(self):
+        urls = {i: f"{self.base}/c?i={i}" for i in range(3)}
+        with mock.patch("services.data_providers.concurrent_fetch.cache_from_config",
+                        return_value=HttpCache(self.tmp.name, ttl=3600)):
+            first = concurrent_fetch.fetch_json_many(urls, session=self.session, backoff=0.0)
+            second = concurrent_fetch.fetch_json_many(urls, session=self.session, backoff=0.0)
+        self.assertEqual(first.results, second.results)
+        self.assertEqual(len(self.server.requests), 3)
+
+        replay = HttpCache(self.tmp.name, mode="replay")
+        with mock.patch("services.data_providers.concurrent_fetch.cache_from_config", return_value=replay):
+            report = concurrent_fetch.fetch_json_many({**urls, "new": f"{self.base}/new"},
+                                                      session=self.session, backoff=0.0)
+        self.assertEqual(len(report.results), 3)
+        self.assertIn("CacheMiss", report.errors["new"])
+        self.assertEqual(report.attempts, 4)  # 未命中不重试
+        self.assertEqual(len(self.server.requests), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,17 +8,11 @@ from types import SimpleNamespace
 def test_ecb_fx_provider_fetch_latest_frankfurter(monkeypatch):
     from services.data_providers import ecb_fx_provider as mod
 
-    class FakeResp:
-        def __init__(self, data):
-            self._data = data
-        def read(self):
-            return json.dumps(self._data).encode('utf-8')
+    def fake_get_json(url, timeout=6.0):
+        return {"date": "2024-01-01", "rates": {"USD": 1.1, "JPY": 160.0}}
 
-    def fake_urlopen(url, timeout=6.0):
-        data = {"date": "2024-01-01", "rates": {"USD": 1.1, "JPY": 160.0}}
-        return FakeResp(data)
-
-    monkeypatch.setattr(mod.urllib.request, 'urlopen', fake_urlopen)
+    monkeypatch.setattr(mod, 'get_json', fake_get_json)
+    monkeypatch.setattr(mod, '_LATEST_CACHE', {})
 
     out = mod.fetch_fx_latest_frankfurter(["EURUSD", "USDJPY"])
     pairs = {r['pair']: r['price'] for r in out}
@@ -26,3 +20,28 @@ def test_ecb_fx_provider_fetch_latest_frankfurter(monkeypatch):
     assert 'USDJPY' in pairs and abs(pairs['USDJPY'] - (160.0 / 1.1)) < 1e-9
 
 
+
+
+def test_latest_rates_shared_between_macro_and_meso_callers(monkeypatch):
+    import importlib
+    import sys
+    from services.data_providers import ecb_fx_provider as mod
+
+    # 其他用例可能在 sys.modules 中留下伪 provider：加载真实模块（结束后由 monkeypatch 还原）
+    monkeypatch.delitem(sys.modules, 'services.data_providers.meso_market_provider', raising=False)
+    meso = importlib.import_module('services.data_providers.meso_market_provider')
+
+    calls = []
+
+    def fake_get_json(url, timeout=6.0):
+        calls.append(url)
+        return {"date": "2024-01-01", "rates": {"USD": 1.1, "JPY": 160.0}}
+
+    monkeypatch.setattr(mod, 'get_json', fake_get_json)
+    monkeypatch.setattr(mod, '_LATEST_CACHE', {})
+
+    pairs = {r['pair']: r['price'] for r in mod.fetch_fx_latest_frankfurter(["EURUSD"])}
+    usd = meso.fetch_fx_rates_usd("EUR", ["JPY"])
+    assert abs(pairs['EURUSD'] - 1.1) < 1e-9
+    assert abs(usd['EUR'] - 1.1) < 1e-9 and abs(usd['JPY'] - 1.1 / 160.0) < 1e-12
+    assert len(calls) == 1
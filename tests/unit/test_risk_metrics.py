@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from services import risk_metrics
+from services.analysis_service import AnalysisService
+from services.database_service import DatabaseService
+from services.trading_service import TradingService
+
+try:
+    import empyrical as ep
+except Exception:  # pragma: no cover - 依赖可选
+    try:
+        import empyrical_reloaded as ep  # type: ignore
+    except Exception:
+        ep = None
+
+
+def _assert_same(testcase, actual, expected):
+    if np.isnan(expected):
+        testcase.assertTrue(np.isnan(actual), f"expected NaN, got {actual}")
+    elif np.isinf(expected):
+        testcase.assertEqual(actual, expected)
+    else:
+        testcase.assertAlmostEqual(actual, expected, delta=1e-9 * max(1.0, abs(expected)))
+
+
+def _series_cases():
+    rng = np.random.default_rng(20240601)
+    return [
+        rng.normal(0.001, 0.02, 300),
+        rng.normal(-0.002, 0.03, 45),
+        np.zeros(30),
+        np.array([0.01, 0.02, 0.005, 0.0]),  # 无回撤 → 卡玛 NaN
+        np.array([0.05]),                   # 单个观测 → 波动率/夏普 NaN
+        np.array([-0.5, -0.8, 0.1]),
+        np.array([0.02, 0.02, 0.02]),       # 标准差为 0 → 夏普 inf
+        np.concatenate([np.zeros(100), [0.1, -0.05], np.zeros(50), [0.03]]),
+    ]
+
+
+@unittest.skipIf(ep is None, "empyrical 未安装，跳过对照校验")
+class TestRiskMetricsAgainstEmpyrical(unittest.TestCase):
+    def test_each_metric_matches_empyrical(self):
+        for returns in _series_cases():
+            with self.subTest(n=len(returns)):
+                _assert_same(self, risk_metrics.annual_volatility(returns), float(ep.annual_volatility(returns)))
+                _assert_same(self, risk_metrics.annual_return(returns), float(ep.annual_return(returns)))
+                _assert_same(self, risk_metrics.max_drawdown(returns), float(ep.max_drawdown(returns)))
+                _assert_same(self, risk_metrics.sharpe_ratio(returns), float(ep.sharpe_ratio(returns)))
+                _assert_same(self, risk_metrics.calmar_ratio(returns), float(ep.calmar_ratio(returns)))
+
+    def test_compute_risk_metrics_batch_matches_empyrical_per_row(self):
+        rng = np.random.default_rng(7)
+        batch = rng.normal(0.0005, 0.015, (12, 250))
+        out = risk_metrics.compute_risk_metrics(batch)
+        for i in range(batch.shape[0]):
+            row = batch[i]
+            _assert_same(self, out['annual_volatility'][i], float(ep.annual_volatility(row)))
+            _assert_same(self, out['annual_return'][i], float(ep.annual_return(row)))
+            _assert_same(self, out['max_drawdown'][i], float(ep.max_drawdown(row)))
+            _assert_same(self, out['sharpe_ratio'][i], float(ep.sharpe_ratio(row)))
+            _assert_same(self, out['calmar_ratio'][i], float(ep.calmar_ratio(row)))
+
+
+class TestRiskMetricsKernel(unittest.TestCase):
+    def test_ragged_batch_equals_individual_series(self):
+        cases = _series_cases()
+        out = risk_metrics.compute_risk_metrics(risk_metrics.stack_series(cases))
+        for i, returns in enumerate(cases):
+            single = risk_metrics.compute_risk_metrics(returns)
+            for name in risk_metrics.METRIC_NAMES:
+                _assert_same(self, float(out[name][i]), single[name])
+
+    def test_empty_series_is_nan(self):
+        out = risk_metrics.compute_risk_metrics(np.array([]))
+        for name in risk_metrics.METRIC_NAMES:
+            self.assertTrue(np.isnan(out[name]))
+
+    def test_scalar_for_1d_and_array_for_2d(self):
+        self.assertIsInstance(risk_metrics.max_drawdown([0.1, -0.1]), float)
+        self.assertEqual(risk_metrics.max_drawdown(np.zeros((3, 5))).shape, (3,))
+        with self.assertRaises(ValueError):
+            risk_metrics.max_drawdown(np.zeros((2, 2, 2)))
+
+
+class TestAnalysisServiceUsesKernel(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_risk_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.trading = TradingService(self.db)
+        self.svc = AnalysisService(self.db)
+        self.db.execute_query("INSERT INTO strategies (name) VALUES (?)", ("甲",))
+        self.db.execute_query("INSERT INTO strategies (name) VALUES (?)", ("乙",))
+        rows = self.db.execute_query("SELECT id FROM strategies ORDER BY id")
+        self.s1, self.s2 = int(rows[-2]['id']), int(rows[-1]['id'])
+        plan = [
+            (self.s1, 'AAA', '10', 100, '2024-01-02', [('11', 30, '2024-01-10'), ('9.5', 20, '2024-02-03')]),
+            (self.s1, 'BBB', '20', 50, '2024-01-05', [('21', 50, '2024-01-10')]),
+            (self.s2, 'AAA', '10', 80, '2024-03-01', [('12', 40, '2024-03-15'), ('8', 40, '2024-04-20')]),
+        ]
+        for sid, code, price, qty, day, sells in plan:
+            ok, tid = self.trading.add_buy_transaction(sid, code, code, Decimal(price), qty, day)
+            self.assertTrue(ok)
+            for sp, sq, sd in sells:
+                ok, _ = self.trading.add_sell_transaction(tid, Decimal(sp), sq, sd)
+                self.assertTrue(ok)
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def _reference(self, trade_ids):
+        """历史实现：pandas 日频重采样 + empyrical。"""
+        import pandas as pd
+        rows = self.db.execute_query(
+            f"SELECT trade_id, transaction_type, transaction_date, price, quantity FROM trade_details "
+            f"WHERE trade_id IN ({','.join('?' * len(trade_ids))}) AND is_deleted = 0", tuple(trade_ids))
+        gross, qty = {}, {}
+        for r in rows:
+            if r['transaction_type'] == 'buy':
+                gross[r['trade_id']] = gross.get(r['trade_id'], 0.0) + float(r['price']) * float(r['quantity'])
+                qty[r['trade_id']] = qty.get(r['trade_id'], 0.0) + float(r['quantity'])
+        by_date = {}
+        for r in sorted(rows, key=lambda x: x['transaction_date']):
+            if r['transaction_type'] != 'sell':
+                continue
+            avg = gross[r['trade_id']] / qty[r['trade_id']]
+            b = by_date.setdefault(r['transaction_date'], [0.0, 0.0])
+            b[0] += (float(r['price']) - avg) / avg * float(r['quantity'])
+            b[1] += float(r['quantity'])
+        df = pd.DataFrame([(pd.to_datetime(d), v[0] / v[1]) for d, v in by_date.items()], columns=['date', 'ret'])
+        series = df.sort_values('date').set_index('date').resample('D').sum().fillna(0.0)['ret']
+        return (ep.annual_volatility(series), ep.annual_return(series), ep.max_drawdown(series),
+                ep.sharpe_ratio(series), ep.calmar_ratio(series))
+
+    @unittest.skipIf(ep is None, "empyrical 未安装，跳过对照校验")
+    def test_compute_advanced_metrics_matches_pandas_empyrical_path(self):
+        ids = [int(r['id']) for r in self.db.execute_query("SELECT id FROM trades ORDER BY id")]
+        for subset in (ids[:1], ids[:2], ids):
+            actual = self.svc._compute_advanced_metrics(subset, None, None)
+            for a, e in zip(actual, self._reference(subset)):
+                _assert_same(self, a, float(e))
+
+    def test_batched_scores_equal_individual_scores(self):
+        batched = {s['strategy_id']: s['stats'] for s in self.svc.get_strategy_scores()}
+        for sid in (self.s1, self.s2):
+            single = self.svc.calculate_strategy_score(strategy_id=sid)['stats']
+            for name in risk_metrics.METRIC_NAMES:
+                _assert_same(self, batched[sid][name], single[name])
+        by_symbol = {s['strategy_id']: s['stats'] for s in self.svc.get_strategies_scores_by_symbol('AAA')}
+        single = self.svc.calculate_strategy_score(strategy_id=self.s2, symbol_code='AAA')['stats']
+        _assert_same(self, by_symbol[self.s2]['max_drawdown'], single['max_drawdown'])
+        self.assertLess(single['max_drawdown'], 0.0)
+
+    def test_batch_falls_back_when_grouping_fails(self):
+        def boom(*args, **kwargs):
+            raise RuntimeError('x')
+
+        self.svc.daily_returns.points_by_group = boom
+        self.assertIsNone(self.svc._batch_advanced_metrics('strategy_id'))
+        self.assertIsNone(self.svc._group_metrics(None, self.s1))
+        self.assertEqual(self.svc._group_metrics({}, self.s1), (0.0, 0.0, 0.0, 0.0, 0.0))
+        # 回退为逐组计算，结果不变
+        stats = {s['strategy_id']: s['stats'] for s in self.svc.get_strategy_scores()}
+        self.assertLess(stats[self.s1]['max_drawdown'], 0.0)
+        with self.assertRaises(ValueError):
+            self.svc._batch_advanced_metrics('symbol_name')
+
+
+if __name__ == '__main__':
+    unittest.main()
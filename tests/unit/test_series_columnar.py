@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pytest
+
+from app import create_app
+from services.macro_repository import MacroRepository
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+from utils.exceptions import ValidationError
+from utils.timeseries import ARROW_MIMETYPE, parse_series_format, rows_to_columns, stack_columns
+
+
+def _daily(n, start=date(2015, 1, 1)):
+    return [(start + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+def _read_arrow(data):
+    return ipc.open_stream(pa.BufferReader(data)).read_all()
+
+
+@pytest.fixture()
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        dates = _daily(1500)
+        repo = MesoRepository()
+        repo.upsert_index_prices([{"symbol": "^COL", "date": d, "close": 100.0 + i, "currency": "USD",
+                                   "close_usd": 100.0 + i} for i, d in enumerate(dates)])
+        repo.upsert_trend_scores([{"symbol": "^COL", "date": d, "score": float(i % 100), "components_json": None}
+                                  for i, d in enumerate(dates)])
+        MacroRepository().bulk_upsert_macro_series(
+            [{"economy": "ZC", "indicator": ind, "date": f"{y}-{m:02d}-01", "value": float(y + m),
+              "provider": "t", "revised_at": None}
+             for ind in ("cpi_yoy", "gdp_yoy") for y in range(2018, 2025) for m in range(1, 13)])
+    return app
+
+
+def test_parse_series_format_and_helpers():
+    assert parse_series_format(None) == "rows"
+    assert parse_series_format("JSON") == "rows"
+    assert parse_series_format("columnar") == "columnar"
+    with pytest.raises(ValidationError):
+        parse_series_format("csv")
+    assert rows_to_columns(("date", "close"), [("2024-01-01", 1.0), ("2024-01-02", 2.0)]) == {
+        "dates": ["2024-01-01", "2024-01-02"], "close": [1.0, 2.0]}
+    assert rows_to_columns(("date", "close"), []) == {"dates": [], "close": []}
+    long = stack_columns({"A": {"dates": ["d1"], "value": [1.0]}, "B": {"dates": ["d1", "d2"], "value": [2.0, 3.0]}}, "key")
+    assert long == {"key": ["A", "B", "B"], "dates": ["d1", "d1", "d2"], "value": [1.0, 2.0, 3.0]}
+
+
+def test_columnar_equals_transposed_rows(app):
+    with app.app_context():
+        svc = MesoService()
+        rows = svc.get_trend_series('^COL', window='1y')
+        cols = svc.get_trend_series('^COL', window='1y', fmt='columnar')
+        assert cols['format'] == 'columnar'
+        assert cols['prices']['dates'] == [r['date'] for r in rows['prices']]
+        assert cols['prices']['close_usd'] == [r['close_usd'] for r in rows['prices']]
+        assert cols['scores']['score'] == [r['score'] for r in rows['scores']]
+        # 降采样在两种格式下选中同一组点
+        rows_s = svc.get_trend_series('^COL', window='all', points=200)
+        cols_s = svc.get_trend_series('^COL', window='all', points=200, fmt='columnar')
+        assert cols_s['prices']['dates'] == [r['date'] for r in rows_s['prices']]
+        cmp_out = svc.get_compare_series(['^COL'], window='all', points=50, fmt='columnar')
+        assert len(cmp_out['series']['^COL']['dates']) == 50
+
+
+def test_columnar_payload_smaller_than_rows(app):
+    client = app.test_client()
+    r_rows = client.get('/api/meso/trend_series?symbol=%5ECOL&window=all')
+    r_cols = client.get('/api/meso/trend_series?symbol=%5ECOL&window=all&format=columnar')
+    assert r_rows.status_code == 200 and r_cols.status_code == 200
+    assert len(r_cols.data) < len(r_rows.data) * 0.6
+    assert json.loads(r_cols.data)['data']['prices']['dates'][-1] == _daily(1500)[-1]
+
+
+def test_arrow_round_trip(app):
+    client = app.test_client()
+    r = client.get('/api/meso/trend_series?symbol=%5ECOL&window=all&format=arrow')
+    assert r.status_code == 200 and r.mimetype == ARROW_MIMETYPE
+    table = _read_arrow(r.data)
+    assert table.num_rows == 1500
+    assert table.column('close').to_pylist()[:2] == [100.0, 101.0]
+    scores = _read_arrow(client.get('/api/meso/trend_series?symbol=%5ECOL&format=arrow&series=scores').data)
+    assert 'score' in scores.column_names
+
+    cmp_tbl = _read_arrow(client.get('/api/meso/compare_series?symbols=%5ECOL&window=1y&format=arrow').data)
+    assert set(cmp_tbl.column('symbol').to_pylist()) == {'^COL'}
+
+    country = client.get('/api/macro/country?economy=ZC&window=all&format=arrow')
+    assert country.status_code == 200
+    tbl = _read_arrow(country.data)
+    assert tbl.num_rows == 2 * 7 * 12
+    assert set(tbl.column('indicator').to_pylist()) == {'cpi_yoy', 'gdp_yoy'}
+
+
+def test_macro_country_columnar_and_invalid_format(app):
+    client = app.test_client()
+    rows = client.get('/api/macro/country?economy=ZC&window=1y').get_json()['series']['cpi_yoy']
+    cols = client.get('/api/macro/country?economy=ZC&window=1y&format=columnar').get_json()['series']['cpi_yoy']
+    assert cols == {"dates": [r['date'] for r in rows], "value": [r['value'] for r in rows]}
+    assert client.get('/api/macro/country?economy=ZC&format=xml').status_code == 400
+    assert client.get('/api/meso/trend_series?symbol=%5ECOL&format=xml').status_code == 400
+    assert client.get('/api/meso/trend_series?symbol=%5ECOL&format=arrow&series=x').status_code == 400
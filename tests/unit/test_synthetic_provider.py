@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import pytest
+
+from app import create_app
+from services.data_providers import market_data
+from services.data_providers.synthetic_provider import SyntheticMarketProvider
+from services.meso_service import MesoService
+
+
+def test_history_is_deterministic_and_stable_across_advance():
+    a = SyntheticMarketProvider(years=2, gap_rate=0.05, split_every=200)
+    b = SyntheticMarketProvider(years=2, gap_rate=0.05, split_every=200)
+    b.advance(30)
+    ra = a.fetch_index_history(["SYN00001"])["SYN00001"]
+    rb = b.fetch_index_history(["SYN00001"], start="2024-01-01")["SYN00001"]
+    older = [r for r in ra if r["date"] >= "2024-01-01"]
+    assert rb[:len(older)] == older and rb[-1]["date"] > "2024-12-31"
+    # 缺失交易日与休市日：行数少于工作日数
+    assert len(ra) < 2 * 261
+    # 拆股/派息：收盘价下跳、adj_factor 单调不减
+    factors = [r["adj_factor"] for r in ra]
+    assert factors == sorted(factors) and factors[-1] > 2.0
+
+
+def test_fx_series_has_gaps_and_skips_usd():
+    p = SyntheticMarketProvider(years=1, fx_gap_rate=0.2)
+    fx = p.fetch_fx_timeseries_to_usd(["EUR", "USD"], "2024-06-01", "2024-12-31")
+    assert fx and min(fx) >= "2024-06-03" and max(fx) <= "2024-12-31"
+    assert all(set(v) == {"USD", "EUR"} for v in fx.values())
+    # 2024-06-03 至年末共 152 个工作日，约 20% 无报价
+    assert 100 < len(fx) < 140
+
+
+def test_refresh_with_injected_provider_converts_metadata_currency():
+    provider = SyntheticMarketProvider(years=1, currencies=("USD", "JPY"))
+    with tempfile.TemporaryDirectory(prefix="meso_syn_") as d:
+        app = create_app('testing')
+        app.config['MESO_DB_PATH'] = os.path.join(d, "meso.db")
+        with app.app_context():
+            svc = MesoService(provider=provider)
+            svc.repo.upsert_index_metadata(provider.universe(2))
+            res = svc.refresh_prices_and_scores(symbols=["SYN00000", "SYN00001"], since=provider.origin.isoformat())
+            assert res["prices"] > 400 and provider.calls["history"] == 1
+            jpy = svc.repo.fetch_prices("SYN00001")[-1]
+            assert jpy["currency"] == "JPY" and jpy["close_usd"] == pytest.approx(jpy["close"] * 0.0068, rel=0.5)
+            # 终点未变：增量请求无新行
+            assert svc.refresh_prices_and_scores(symbols=["SYN00000", "SYN00001"])["prices"] == 0
+
+
+def test_default_provider_follows_config():
+    app = create_app('testing')
+    with app.app_context():
+        assert market_data.default_market_provider().__name__.endswith("meso_market_provider")
+        app.config['MESO_MARKET_PROVIDER'] = 'synthetic'
+        assert isinstance(market_data.default_market_provider(), SyntheticMarketProvider)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app import create_app
+from services.macro_repository import MacroRepository
+from services.meso_repository import MesoRepository
+from services.meso_service import MesoService
+from utils.exceptions import ValidationError
+from utils.timeseries import downsample_rows, lttb_indices, minmax_indices, parse_sampling_args, window_start
+
+
+def _daily(n, start=date(2005, 1, 3)):
+    return [(start + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+def test_lttb_keeps_endpoints_shape_and_spike():
+    rng = np.random.default_rng(37)
+    y = np.cumsum(rng.normal(0, 1, 5000))
+    y[2345] += 500.0
+    idx = lttb_indices(y, 200, dates=_daily(5000))
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == 4999
+    assert np.all(np.diff(idx) > 0)
+    assert 2345 in idx
+    # 不超过原长度时原样返回
+    assert list(lttb_indices([1.0, 2.0, 3.0], 10)) == [0, 1, 2]
+
+
+def test_minmax_keeps_extremes_and_skips_none():
+    values = [float(v) for v in np.sin(np.linspace(0, 20, 1000))]
+    values[10] = None
+    values[500] = -5.0
+    values[700] = 5.0
+    idx = minmax_indices(values, 50)
+    assert len(idx) <= 50
+    assert {0, 500, 700, 999} <= set(int(i) for i in idx)
+    assert 10 not in idx
+
+
+def test_downsample_rows_selects_whole_rows():
+    rows = [{"date": d, "close": float(i), "close_usd": float(i) * 2} for i, d in enumerate(_daily(300))]
+    out = downsample_rows(rows, 30, "close_usd", "lttb")
+    assert len(out) == 30
+    assert all(r["close_usd"] == r["close"] * 2 for r in out)
+    assert downsample_rows(rows, None, "close") is rows
+
+
+def test_parse_sampling_args():
+    assert parse_sampling_args(None, None) == (None, "lttb")
+    assert parse_sampling_args("120", "MINMAX") == (120, "minmax")
+    for points, method in (("abc", None), ("1", None), ("100", "avg")):
+        with pytest.raises(ValidationError):
+            parse_sampling_args(points, method)
+
+
+def test_meso_trend_series_window_and_points_bounded():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MesoRepository()
+        dates = _daily(7300)  # 约 20 年日线
+        repo.upsert_index_prices([{"symbol": "^TST", "date": d, "close": 100.0 + i, "currency": "USD",
+                                   "close_usd": 100.0 + i} for i, d in enumerate(dates)])
+        repo.upsert_trend_scores([{"symbol": "^TST", "date": d, "score": float(i % 100), "components_json": None}
+                                  for i, d in enumerate(dates)])
+        svc = MesoService()
+        full = svc.get_trend_series('^TST', window='all')
+        assert len(full['prices']) == 7300
+        one_year = svc.get_trend_series('^TST', window='1y')
+        assert one_year['prices'][0]['date'] == window_start(dates[-1], '1y') and one_year['prices'][-1]['date'] == dates[-1]
+        assert len(one_year['scores']) == 367
+        sampled = svc.get_trend_series('^TST', window='10y', points=300)
+        assert len(sampled['prices']) == 300 and len(sampled['scores']) == 300
+        assert sampled['prices'][-1]['date'] == dates[-1]
+        assert sampled['sampling']['source_points']['prices'] > 3000
+        cmp_out = svc.get_compare_series(['^TST'], window='all', points=100, downsample='minmax')
+        assert len(cmp_out['series']['^TST']) <= 100
+
+    client = app.test_client()
+    r = client.get('/api/meso/trend_series?symbol=%5ETST&window=5y&points=150')
+    assert r.status_code == 200
+    assert len(r.get_json()['data']['prices']) == 150
+    assert client.get('/api/meso/trend_series?symbol=%5ETST&points=x').status_code == 400
+    assert client.get('/api/meso/compare_series?symbols=%5ETST&downsample=avg').status_code == 400
+
+
+def test_macro_country_window_and_points():
+    app = create_app('testing')
+    with app.app_context():
+        repo = MacroRepository()
+        repo.bulk_upsert_macro_series([{"economy": "ZZ", "indicator": "cpi_yoy", "date": f"{y}-{m:02d}-01",
+                                        "value": float(y - 2000 + m / 12), "provider": "t", "revised_at": None}
+                                       for y in range(2000, 2025) for m in range(1, 13)])
+    client = app.test_client()
+    r = client.get('/api/macro/country?economy=ZZ&window=1y')
+    series = r.get_json()['series']['cpi_yoy']
+    assert series[0]['date'] == '2023-12-01' and len(series) == 13
+    r2 = client.get('/api/macro/country?economy=ZZ&window=all&points=40')
+    assert len(r2.get_json()['series']['cpi_yoy']) == 40
+    assert client.get('/api/macro/country?economy=ZZ&points=0').status_code == 400
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import tempfile
+import unittest
+from decimal import Decimal
+
+from services.database_service import DatabaseService
+from services.trading_service import TradingService
+
+
+def _reference_remaining(db, trade_id):
+    """历史实现：读取全部明细并从头重放 FIFO。"""
+    rows = db.execute_query(
+        "SELECT * FROM trade_details WHERE trade_id = ? AND is_deleted = 0 ORDER BY transaction_date, created_at, id",
+        (trade_id,),
+    )
+    queue = [[r['id'], int(r['quantity'])] for r in rows if r['transaction_type'] == 'buy']
+    for r in rows:
+        if r['transaction_type'] != 'sell':
+            continue
+        left = int(r['quantity'])
+        for lot in queue:
+            if left <= 0:
+                break
+            take = min(lot[1], left)
+            lot[1] -= take
+            left -= take
+    return {lot_id: max(0, rem) for lot_id, rem in queue}
+
+
+class TestTradeLotEngine(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_unit_lots_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.svc = TradingService(self.db)
+        self.svc.strategy_service.create_strategy('批次策略', 'test')
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def _buy(self, qty, day, code='LOT1'):
+        ok, tid = self.svc.add_buy_transaction('批次策略', code, '批次', Decimal('10'), qty, day, Decimal('0'))
+        self.assertTrue(ok, tid)
+        return tid
+
+    def _sell(self, tid, qty, day):
+        ok, msg = self.svc.add_sell_transaction(tid, Decimal('11'), qty, day, Decimal('0'))
+        self.assertTrue(ok, msg)
+
+    def _state(self, tid):
+        return self.db.execute_query("SELECT * FROM trade_lot_state WHERE trade_id = ?", (tid,), fetch_one=True)
+
+    def test_incremental_matches_replay_for_random_sequences(self):
+        rng = random.Random(7)
+        tid = self._buy(100, '2025-01-01')
+        held = 100
+        for i in range(40):
+            day = f"2025-02-{(i % 28) + 1:02d}" if i < 28 else f"2025-03-{(i % 28) + 1:02d}"
+            if held > 0 and rng.random() < 0.5:
+                qty = rng.randint(1, held)
+                self._sell(tid, qty, day)
+                held -= qty
+                if held == 0:
+                    break
+            else:
+                qty = rng.randint(1, 50)
+                self._buy(qty, day)
+                held += qty
+        # 增量维护得到的状态应保持有效（未触发重放）
+        self.assertIsNotNone(self._state(tid))
+        self.assertEqual(self.svc.compute_buy_detail_remaining_map(tid), _reference_remaining(self.db, tid))
+
+    def test_allocations_record_consuming_sells(self):
+        tid = self._buy(30, '2025-01-01')
+        self._buy(30, '2025-01-02')
+        self._sell(tid, 40, '2025-01-03')
+        remap = self.svc.compute_buy_detail_remaining_map(tid)
+        first, second = list(remap)
+        self.assertEqual(remap, {first: 0, second: 20})
+        sell_id = self.db.execute_query(
+            "SELECT id FROM trade_details WHERE trade_id = ? AND transaction_type = 'sell'", (tid,), fetch_one=True
+        )['id']
+        self.assertEqual(self.svc.lot_engine.allocations_for_lot(first), [{'sell_detail_id': sell_id, 'quantity': 30}])
+        self.assertEqual(self.svc.lot_engine.allocations_for_lot(second), [{'sell_detail_id': sell_id, 'quantity': 10}])
+
+    def test_backdated_buy_triggers_replay(self):
+        tid = self._buy(10, '2025-01-05')
+        self._sell(tid, 5, '2025-01-06')
+        # 补录更早的买入：FIFO 应优先消耗补录批次
+        self._buy(10, '2025-01-01')
+        self.assertIsNone(self._state(tid))
+        self.assertEqual(self.svc.compute_buy_detail_remaining_map(tid), _reference_remaining(self.db, tid))
+        self.assertIsNotNone(self._state(tid))
+
+    def test_quantity_edit_replays_and_price_edit_keeps_lots(self):
+        tid = self._buy(10, '2025-01-01')
+        self._buy(10, '2025-01-02')
+        self._sell(tid, 12, '2025-01-03')
+        details = self.svc.get_trade_details(tid)
+        first_buy = details[0]['id']
+        ok, msg = self.svc.update_trade_record(tid, [{'detail_id': first_buy, 'price': 9}])
+        self.assertTrue(ok, msg)
+        self.assertIsNotNone(self._state(tid))
+        ok, msg = self.svc.update_trade_record(tid, [{'detail_id': first_buy, 'quantity': 20}])
+        self.assertTrue(ok, msg)
+        self.assertIsNone(self._state(tid))
+        self.assertEqual(self.svc.compute_buy_detail_remaining_map(tid), _reference_remaining(self.db, tid))
+
+    def test_direct_sql_write_is_detected(self):
+        tid = self._buy(10, '2025-01-01')
+        self.db.execute_query(
+            "INSERT INTO trade_details (trade_id, transaction_type, price, quantity, amount, transaction_date) "
+            "VALUES (?, 'sell', 11, 4, 44, '2025-01-02')",
+            (tid,), fetch_all=False,
+        )
+        remap = self.svc.compute_buy_detail_remaining_map(tid)
+        self.assertEqual(list(remap.values()), [6])
+
+    def test_soft_delete_restore_and_permanent_delete(self):
+        tid = self._buy(10, '2025-01-01')
+        self._sell(tid, 3, '2025-01-02')
+        self.assertTrue(self.svc.soft_delete_trade(tid, 'CODE', 'reason'))
+        self.assertEqual(self.svc.compute_buy_detail_remaining_map(tid), {})
+        self.assertTrue(self.svc.restore_trade(tid, 'CODE'))
+        self.assertEqual(list(self.svc.compute_buy_detail_remaining_map(tid).values()), [7])
+        self.assertTrue(self.svc.permanently_delete_trade(tid, 'CODE', 'CONFIRM', 'reason'))
+        for table in ('trade_lots', 'trade_lot_allocations', 'trade_lot_state'):
+            row = self.db.execute_query(f"SELECT COUNT(*) AS c FROM {table} WHERE trade_id = ?", (tid,), fetch_one=True)
+            self.assertEqual(row['c'], 0, table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from services.database_service import DatabaseService
+from services.trading_service import TradingService
+
+
+class TestTradingServiceBatchOperations(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_unit_batch_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.svc = TradingService(self.db)
+        self.svc.strategy_service.create_strategy('批量策略', 'test')
+        self.ids = []
+        for i in range(5):
+            ok, tid = self.svc.add_buy_transaction('批量策略', f'BAT{i}', '批量', Decimal('1'), 10, '2025-01-02', Decimal('0'))
+            self.assertTrue(ok)
+            self.ids.append(tid)
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def _deleted_flags(self):
+        rows = self.db.execute_query("SELECT id, is_deleted FROM trades ORDER BY id")
+        return {r['id']: r['is_deleted'] for r in rows}
+
+    def test_soft_delete_and_restore_report_per_id_outcomes(self):
+        outcomes = self.svc.batch_soft_delete_trades(self.ids[:3] + [99999], 'CODE', 'reason', 'note')
+        self.assertEqual(outcomes, {self.ids[0]: 'ok', self.ids[1]: 'ok', self.ids[2]: 'ok', 99999: 'not_found'})
+        flags = self._deleted_flags()
+        self.assertEqual([flags[t] for t in self.ids], [1, 1, 1, 0, 0])
+        detail_flags = self.db.execute_query(
+            "SELECT DISTINCT is_deleted FROM trade_details WHERE trade_id = ?", (self.ids[0],)
+        )
+        self.assertEqual([r['is_deleted'] for r in detail_flags], [1])
+
+        outcomes = self.svc.batch_restore_trades(self.ids[:3], 'CODE', 'back')
+        self.assertEqual(set(outcomes.values()), {'ok'})
+        self.assertEqual(set(self._deleted_flags().values()), {0})
+        self.assertEqual(list(self.svc.compute_buy_detail_remaining_map(self.ids[0]).values()), [10])
+
+    def test_permanent_delete_removes_all_rows(self):
+        outcomes = self.svc.batch_permanently_delete_trades(self.ids[:2], 'CODE', 'CONFIRM', 'reason')
+        self.assertEqual(set(outcomes.values()), {'ok'})
+        remaining = self.db.execute_query("SELECT COUNT(*) AS c FROM trade_details WHERE trade_id IN (?, ?)",
+                                          tuple(self.ids[:2]), fetch_one=True)
+        self.assertEqual(remaining['c'], 0)
+        self.assertEqual(sorted(self._deleted_flags()), self.ids[2:])
+
+    def test_chunks_share_one_transaction_and_roll_back_on_failure(self):
+        original = self.svc.lot_engine.drop
+        calls = []
+
+        def failing_drop(cursor, ids):
+            calls.append(list(ids))
+            if len(calls) == 2:
+                raise RuntimeError("boom")
+            return original(cursor, ids)
+
+        with patch.object(TradingService, 'BATCH_CHUNK_SIZE', 2), \
+                patch.object(self.svc.lot_engine, 'drop', side_effect=failing_drop):
+            outcomes = self.svc.batch_soft_delete_trades(self.ids, 'CODE', 'reason')
+        self.assertEqual(set(outcomes.values()), {'failed'})
+        # 第一块已执行但随事务整体回滚
+        self.assertEqual(set(self._deleted_flags().values()), {0})
+
+    def test_empty_input(self):
+        self.assertEqual(self.svc.batch_restore_trades([], 'CODE'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
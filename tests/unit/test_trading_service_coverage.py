@@ -80,6 +80,8 @@ class TestTradingServiceCoverage(unittest.TestCase):
         self.assertIn('价格和数量必须大于0', message)
     
     def test_add_sell_transaction_trade_not_found(self):
+        # 交易读取在卖出事务内进行，需要可用作上下文管理器的连接
+        self.mock_db.get_connection.return_value = MagicMock()
         with patch.object(self.service, 'get_trade_by_id', return_value=None):
             result, message = self.service.add_sell_transaction(
                 trade_id=999, price=Decimal('10.00'), quantity=100,
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from decimal import Decimal
+
+from services.database_service import DatabaseService
+from services.trading_service import TradingService
+
+
+class TestSellSingleTransaction(unittest.TestCase):
+    def setUp(self):
+        fd, self.tmp_db = tempfile.mkstemp(prefix="mirror_unit_sell_tx_", suffix=".db")
+        os.close(fd)
+        self.db = DatabaseService(self.tmp_db)
+        self.svc = TradingService(self.db)
+        self.svc.strategy_service.create_strategy('卖出事务策略', 'test')
+        ok, self.tid = self.svc.add_buy_transaction(
+            strategy='卖出事务策略', symbol_code='TX001', symbol_name='事务',
+            price=Decimal('10'), quantity=100, transaction_date='2025-01-02',
+            transaction_fee=Decimal('2'),
+        )
+        self.assertTrue(ok)
+        ok, _ = self.svc.add_buy_transaction(
+            strategy='卖出事务策略', symbol_code='TX001', symbol_name='事务',
+            price=Decimal('12'), quantity=100, transaction_date='2025-01-03',
+            transaction_fee=Decimal('2'),
+        )
+        self.assertTrue(ok)
+
+    def tearDown(self):
+        try:
+            os.remove(self.tmp_db)
+        except Exception:
+            pass
+
+    def _sell_count(self):
+        row = self.db.execute_query(
+            "SELECT COUNT(*) AS c FROM trade_details WHERE trade_id = ? AND transaction_type = 'sell'",
+            (self.tid,), fetch_one=True,
+        )
+        return row['c']
+
+    def test_totals_after_sequential_sells(self):
+        ok, _ = self.svc.add_sell_transaction(self.tid, Decimal('13'), 50, '2025-01-05', Decimal('1'))
+        self.assertTrue(ok)
+        ok, _ = self.svc.add_sell_transaction(self.tid, Decimal('14'), 150, '2025-01-08', Decimal('3'))
+        self.assertTrue(ok)
+        t = self.svc.get_trade_by_id(self.tid)
+        # 均价 11：毛利 = (13-11)*50 + (14-11)*150 = 550
+        self.assertAlmostEqual(t['total_profit_loss'], 550.0, places=6)
+        self.assertAlmostEqual(t['total_sell_fees'], 4.0, places=6)
+        self.assertAlmostEqual(t['total_fees'], 8.0, places=6)
+        # 净利 = 550 - 4 - 4（买入费全部分摊）
+        self.assertAlmostEqual(t['total_net_profit'], 542.0, places=6)
+        self.assertEqual(t['status'], 'closed')
+        self.assertEqual(t['remaining_quantity'], 0)
+        self.assertEqual(t['holding_days'], 6)
+
+    def test_rejected_sell_leaves_no_detail(self):
+        ok, msg = self.svc.add_sell_transaction(self.tid, Decimal('13'), 500, '2025-01-05')
+        self.assertFalse(ok)
+        self.assertIn('超过剩余持仓', msg)
+        self.assertEqual(self._sell_count(), 0)
+        ok, msg = self.svc.add_sell_transaction(99999, Decimal('13'), 1, '2025-01-05')
+        self.assertFalse(ok)
+        self.assertIn('不存在', msg)
+
+    def test_concurrent_sells_cannot_oversell(self):
+        results = []
+        barrier = threading.Barrier(2)
+
+        def worker():
+            svc = TradingService(DatabaseService(self.tmp_db))
+            original = svc.get_trade_by_id
+
+            def slow_read(*args, **kwargs):
+                # 读取后停顿，放大“读-改-写”窗口
+                trade = original(*args, **kwargs)
+                time.sleep(0.2)
+                return trade
+
+            svc.get_trade_by_id = slow_read
+            barrier.wait()
+            results.append(svc.add_sell_transaction(self.tid, Decimal('13'), 120, '2025-01-05'))
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        self.assertEqual(sorted(ok for ok, _ in results), [False, True])
+        self.assertEqual(self._sell_count(), 1)
+        self.assertEqual(self.svc.get_trade_by_id(self.tid)['remaining_quantity'], 80)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.data_providers import concurrent_fetch
+from services.data_providers.worldbank_provider import fetch_macro_latest_report
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """模拟 WB API：按国家代码决定行为（正常/先 503 后成功/404/慢响应/无数据）。"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        return None
+
+    def do_GET(self):
+        srv = self.server
+        country = self.path.split("/country/")[1].split("/")[0]
+        with srv.lock:
+            srv.hits[country] = srv.hits.get(country, 0) + 1
+            srv.peers.add(self.client_address)
+            hits = srv.hits[country]
+        if country == "DEU" and hits == 1:
+            return self._send(503, {"error": "busy"})
+        if country == "JPN":
+            return self._send(404, {"error": "nope"})
+        if country == "CHN":
+            time.sleep(srv.slow)
+        if country == "HKG":
+            return self._send(200, [{"page": 1}, [{"date": "2024", "value": None}]])
+        return self._send(200, [{"page": 1}, [{"date": "2024", "value": None}, {"date": "2023", "value": 2.5}]])
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestWorldBankConcurrentFetch(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.hits = {}
+        self.server.peers = set()
+        self.server.slow = 0.0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v2"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_partial_results_retry_and_no_retry_on_404(self):
+        res = fetch_macro_latest_report(["US", "DE", "JP", "HK", "XX"], ["cpi_yoy", "gdp_yoy"],
+                                        base_url=self.base_url, backoff=0.0, deadline=10.0)
+        self.assertEqual(res.requested, 8)  # XX 无映射，不请求
+        got = {(r["economy"], r["indicator"]) for r in res.rows}
+        self.assertEqual(got, {("US", "cpi_yoy"), ("US", "gdp_yoy"), ("DE", "cpi_yoy"), ("DE", "gdp_yoy")})
+        self.assertTrue(all(r["date"] == "2023-12-31" and r["value"] == 2.5 for r in res.rows))
+        self.assertIn("HTTPError", res.failed[("JP", "cpi_yoy")])
+        self.assertEqual(res.failed[("HK", "gdp_yoy")], "no data")
+        self.assertEqual(self.server.hits["JPN"], 2)  # 404 不重试
+        self.assertEqual(self.server.hits["DEU"], 3)  # 首次 503 后重试成功
+
+    def test_deadline_returns_partial_results(self):
+        self.server.slow = 1.5
+        started = time.monotonic()
+        res = fetch_macro_latest_report(["US", "CN"], ["cpi_yoy"], base_url=self.base_url,
+                                        backoff=0.0, deadline=0.5)
+        self.assertLess(time.monotonic() - started, 1.4)
+        self.assertEqual([r["economy"] for r in res.rows], ["US"])
+        self.assertIn("Timeout", res.failed[("CN", "cpi_yoy")])
+
+    def test_requests_run_concurrently_and_reuse_connections(self):
+        self.server.slow = 0.3
+        session = concurrent_fetch.make_session(4)
+        try:
+            urls = {i: f"{self.base_url}/country/CHN/indicator/X?i={i}" for i in range(8)}
+            started = time.monotonic()
+            report = concurrent_fetch.fetch_json_many(urls, session=session, max_workers=4, backoff=0.0)
+            elapsed = time.monotonic() - started
+            self.assertEqual(len(report.results), 8)
+            self.assertLess(elapsed, 8 * 0.3 * 0.6)
+            # 8 个请求最多 4 条连接（keep-alive 复用）
+            self.assertLessEqual(len(self.server.peers), 4)
+            self.assertEqual(report.attempts, 8)
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
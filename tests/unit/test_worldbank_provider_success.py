@@ -1,31 +1,45 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 from unittest import mock
 
 from services.data_providers.worldbank_provider import fetch_macro_latest
 
 
 class DummyResp:
+    status_code = 200
+    headers: dict = {}
+
     def __init__(self, payload: str):
-        self._p = payload.encode("utf-8")
-    def read(self):
-        return self._p
-    def __enter__(self):
-        return self
-    def __exit__(self, *_):
-        return False
+        self._p = payload
+        self.content = payload.encode("utf-8")
+    def raise_for_status(self):
+        return None
+    def json(self):
+        return json.loads(self._p)
+
+
+class DummySession:
+    def __init__(self, resp=None, exc=None):
+        self._resp, self._exc = resp, exc
+    def get(self, url, timeout=None, headers=None):
+        if self._exc is not None:
+            raise self._exc
+        return self._resp
+    def close(self):
+        return None
 
 
 def test_worldbank_success_and_failure_paths():
     # failure path: exception -> empty
-    with mock.patch("services.data_providers.worldbank_provider.urllib.request.urlopen", side_effect=Exception("net")):
+    with mock.patch("services.data_providers.concurrent_fetch.make_session", return_value=DummySession(exc=Exception("net"))):
         out = fetch_macro_latest(["US"], ["cpi_yoy"])
         assert out == []
 
     # success path: valid JSON array & series
     payload = '[{"page":1},[{"date":"2024","value":3.2},{"date":"2023","value":2.8}]]'
-    with mock.patch("services.data_providers.worldbank_provider.urllib.request.urlopen", return_value=DummyResp(payload)):
+    with mock.patch("services.data_providers.concurrent_fetch.make_session", return_value=DummySession(DummyResp(payload))):
         rows = fetch_macro_latest(["US"], ["cpi_yoy","industrial_prod_yoy","retail_sales_yoy"]) 
         assert isinstance(rows, list) and len(rows) >= 1
         r0 = rows[0]
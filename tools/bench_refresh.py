@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中观刷新与排名基准：以确定性合成数据源（SyntheticMarketProvider）离线驱动
+refresh_prices_and_scores（全量 + 增量）与各排名接口，报告吞吐与峰值内存。
+
+用法：
+- python tools/bench_refresh.py run [--sizes 100,1000,5000] [--years 3] [--increment-days 7]
+      [--currencies USD,EUR,JPY,GBP] [--gap-rate 0.01] [--seed 7] [--tracemalloc]
+    每个规模在独立子进程中执行（进程峰值 RSS 互不影响），汇总输出 JSON。
+- python tools/bench_refresh.py one --symbols 1000 [同上参数]
+    单个规模，在当前进程执行。
+
+各阶段报告：耗时、写入行数与行/秒、截至该阶段的进程峰值 RSS（--tracemalloc 时另报告该阶段的
+Python 分配峰值，含 numpy 数组，但计时显著变慢）；另报告导入后的 RSS 基线、库文件大小与数据源调用次数。
+数据写入临时目录，不会触碰 database/ 下的产品库。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def _child_env(tmpdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env['DB_PATH'] = os.path.join(tmpdir, 'trading.db')
+    env['MACRO_DB_PATH'] = os.path.join(tmpdir, 'macro.db')
+    env['MESO_DB_PATH'] = os.path.join(tmpdir, 'meso.db')
+    env['PYTHONPATH'] = str(ROOT_DIR) + os.pathsep + env.get('PYTHONPATH', '')
+    env.pop('APP_WARMUP', None)
+    return env
+
+
+def _max_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1e6 if sys.platform == 'darwin' else 1e3), 1)
+
+
+def _phase(fn: Callable[[], Any], rows: Callable[[Any], int] = lambda _: 0, trace: bool = False) -> Dict[str, Any]:
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    # 进程峰值 RSS 单调不减：各阶段的值为截至该阶段结束的峰值
+    out: Dict[str, Any] = {'s': round(elapsed, 3), 'max_rss_mb': _max_rss_mb()}
+    if trace:
+        out['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+    n = rows(result)
+    if n:
+        out.update({'rows': n, 'rows_per_s': round(n / elapsed) if elapsed > 0 else None})
+    return out
+
+
+def run_one(symbols: int, years: float = 3.0, increment_days: int = 7, currencies: List[str] | None = None,
+            gap_rate: float = 0.01, seed: int = 7, trace: bool = False) -> Dict[str, Any]:
+    from app import create_app
+    from services.data_providers.synthetic_provider import SyntheticMarketProvider
+    from services.meso_service import MesoService
+
+    rss_baseline = _max_rss_mb()
+    provider = SyntheticMarketProvider(years=years, seed=seed, gap_rate=gap_rate,
+                                       currencies=currencies or ('USD', 'EUR', 'JPY', 'GBP'))
+    with tempfile.TemporaryDirectory(prefix='bench_refresh_') as tmpdir:
+        app = create_app('testing')
+        db_path = os.path.join(tmpdir, 'meso.db')
+        app.config['MESO_DB_PATH'] = db_path
+        with app.app_context():
+            svc = MesoService(provider=provider)
+            universe = provider.universe(symbols)
+            svc.repo.upsert_index_metadata(universe)
+            syms = [m['symbol'] for m in universe]
+            since = provider.origin.isoformat()
+
+            def refresh():
+                return svc.refresh_prices_and_scores(symbols=syms, since=since)
+
+            def rankings():
+                return [
+                    svc.get_asset_class_rankings(),
+                    svc.get_equity_market_rankings(),
+                    svc.get_equity_category_rankings('US'),
+                ]
+
+            def prices(res):
+                return res['prices']
+
+            phases = {'full_refresh': _phase(refresh, prices, trace)}
+            phases['rankings_cold'] = _phase(rankings, trace=trace)
+            phases['rankings_warm'] = _phase(rankings, trace=trace)
+            provider.advance(increment_days)
+            phases['incremental_refresh'] = _phase(refresh, prices, trace)
+            phases['rankings_after_increment'] = _phase(rankings, trace=trace)
+            # 数据源无新数据时的再次刷新
+            phases['noop_refresh'] = _phase(refresh, prices, trace)
+        db_mb = round(os.path.getsize(db_path) / 1e6, 2)
+    return {
+        'symbols': symbols,
+        'years': years,
+        'phases': phases,
+        'max_rss_mb': _max_rss_mb(),
+        'rss_baseline_mb': rss_baseline,
+        'db_mb': db_mb,
+        'provider_calls': provider.calls,
+    }
+
+
+def run_sizes(sizes: List[int], **kwargs: Any) -> Dict[str, Any]:
+    results = []
+    for n in sizes:
+        argv = [sys.executable, str(Path(__file__).resolve()), 'one', '--symbols', str(n)]
+        for key, value in kwargs.items():
+            if key == 'trace':
+                argv += ['--tracemalloc'] if value else []
+            elif value is not None:
+                flag = '--' + key.replace('_', '-')
+                argv += [flag, ','.join(value) if isinstance(value, list) else str(value)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            proc = subprocess.run(argv, cwd=str(ROOT_DIR), env=_child_env(tmpdir), capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        results.append(json.loads(proc.stdout))
+    return {'results': results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='中观刷新与排名基准（合成数据源）')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='按多个规模分别在子进程中执行')
+    p_run.add_argument('--sizes', default='100,1000,5000')
+    p_one = sub.add_parser('one', help='单个规模')
+    p_one.add_argument('--symbols', type=int, default=100)
+    for p in (p_run, p_one):
+        p.add_argument('--years', type=float, default=3.0)
+        p.add_argument('--increment-days', type=int, default=7)
+        p.add_argument('--currencies', default='USD,EUR,JPY,GBP')
+        p.add_argument('--gap-rate', type=float, default=0.01)
+        p.add_argument('--seed', type=int, default=7)
+        p.add_argument('--tracemalloc', dest='trace', action='store_true',
+                       help='额外报告 tracemalloc 峰值（显著拖慢计时）')
+    args = parser.parse_args(argv)
+
+    opts = {
+        'years': args.years,
+        'increment_days': args.increment_days,
+        'currencies': [c.strip().upper() for c in args.currencies.split(',') if c.strip()],
+        'gap_rate': args.gap_rate,
+        'seed': args.seed,
+        'trace': args.trace,
+    }
+    if args.command == 'run':
+        result = run_sizes([int(s) for s in args.sizes.split(',') if s.strip()], **opts)
+    else:
+        result = run_one(args.symbols, **opts)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时序存储布局基准：旧布局（AUTOINCREMENT id + TEXT 键 + UNIQUE 二级索引）与紧凑布局
+（字典 id + 整数日序号的 WITHOUT ROWID 主键）的库文件大小与范围扫描耗时对比。
+
+用法：
+- python tools/bench_storage.py meso [--symbols 200] [--days 10000] [--queries 200]
+    以旧布局生成 symbols × days 行的 index_prices/trend_scores，测量大小与按标的窗口读取耗时；
+    再用 MesoRepository 就地迁移（即生产迁移路径）并 VACUUM，测量迁移后大小与仓储读取耗时。
+- python tools/bench_storage.py macro [--economies 120] [--indicators 20] [--months 600] [--queries 100]
+    以旧布局生成 economies × indicators × months 行的 macro_series，测量按经济体读取与最新/上一期取值耗时；
+    再用 MacroRepository 就地迁移并 VACUUM 后重复测量。
+
+所有数据写入临时目录，不会触碰 database/ 下的产品库。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# 迁移前的中观时序表结构（与历史版本一致）
+_LEGACY_MESO_DDL = (
+    """
+    CREATE TABLE index_prices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        date TEXT NOT NULL,
+        close REAL,
+        close_tr REAL,
+        currency TEXT,
+        close_usd REAL,
+        close_usd_tr REAL,
+        adj_factor REAL,
+        UNIQUE(symbol, date)
+    )
+    """,
+    """
+    CREATE TABLE trend_scores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        date TEXT NOT NULL,
+        score REAL,
+        components_json TEXT,
+        UNIQUE(symbol, date)
+    )
+    """,
+)
+
+_LEGACY_MACRO_DDL = (
+    """
+    CREATE TABLE macro_series (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        economy TEXT NOT NULL,
+        indicator TEXT NOT NULL,
+        date TEXT NOT NULL,
+        value REAL,
+        provider TEXT,
+        revised_at TEXT,
+        UNIQUE(economy, indicator, date)
+    )
+    """,
+    "CREATE INDEX idx_macro_series_ind_eco_date ON macro_series(indicator, economy, date DESC, value)",
+)
+
+
+def _file_mb(path: str) -> float:
+    return round(os.path.getsize(path) / (1024 * 1024), 2)
+
+
+def _timed(fn: Callable[[], object], runs: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(max(1, runs)):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def _vacuum(path: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def _daily_dates(days: int) -> List[str]:
+    end = date(2024, 12, 31)
+    return [(end - timedelta(days=days - 1 - i)).isoformat() for i in range(days)]
+
+
+def build_legacy_meso(path: str, symbols: int, days: int) -> List[str]:
+    """按旧布局生成中观时序数据，返回 symbol 列表。"""
+    rng = random.Random(42)
+    syms = [f'^B{i:04d}' for i in range(symbols)]
+    dates = _daily_dates(days)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for ddl in _LEGACY_MESO_DDL:
+        conn.execute(ddl)
+    for sym in syms:
+        px = 100.0
+        price_rows = []
+        for d in dates:
+            px *= 1.0 + rng.gauss(0, 0.01)
+            price_rows.append((sym, d, px, px * 1.02, 'USD', px, px * 1.02, 1.0))
+        conn.executemany(
+            'INSERT INTO index_prices (symbol, date, close, close_tr, currency, close_usd, close_usd_tr, adj_factor) '
+            'VALUES (?,?,?,?,?,?,?,?)', price_rows)
+        conn.executemany('INSERT INTO trend_scores (symbol, date, score, components_json) VALUES (?,?,?,NULL)',
+                         [(sym, d, rng.uniform(0, 100)) for d in dates])
+    conn.commit()
+    conn.close()
+    _vacuum(path)
+    return syms
+
+
+def run_meso(symbols: int = 200, days: int = 10000, queries: int = 200) -> Dict[str, object]:
+    from services.compact_storage import to_day
+    from services.database_service import DatabaseService
+    from services.meso_repository import MesoRepository
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'meso_bench.db')
+        t0 = time.perf_counter()
+        syms = build_legacy_meso(path, symbols, days)
+        build_s = time.perf_counter() - t0
+        dates = _daily_dates(days)
+        start = dates[max(0, len(dates) - 3 * 365)]
+        rng = random.Random(7)
+        picks = [rng.choice(syms) for _ in range(queries)]
+        it = iter(picks * 3)
+
+        legacy = sqlite3.connect(path)
+
+        def legacy_scan():
+            legacy.execute(
+                'SELECT date, close, close_tr, currency, close_usd, close_usd_tr FROM index_prices '
+                'WHERE symbol=? AND date>=? ORDER BY date', (next(it), start)).fetchall()
+
+        before = {'db_mb': _file_mb(path), 'window_scan': _timed(legacy_scan, queries)}
+        legacy.close()
+
+        t0 = time.perf_counter()
+        repo = MesoRepository(DatabaseService(path, create_trading_schema=False))
+        migrate_s = time.perf_counter() - t0
+        _vacuum(path)
+
+        compact = sqlite3.connect(path)
+        start_day = to_day(start)
+
+        def compact_scan():
+            compact.execute(
+                'SELECT day, close, close_tr, currency, close_usd, close_usd_tr FROM index_prices_data '
+                'WHERE symbol_id=(SELECT symbol_id FROM meso_symbols WHERE symbol=?) AND day>=? ORDER BY day',
+                (next(it), start_day)).fetchall()
+
+        after = {
+            'db_mb': _file_mb(path),
+            'window_scan': _timed(compact_scan, queries),
+            # 仓储读取：含连接建立、日序号还原与逐行字典构造
+            'repository_fetch': _timed(lambda: repo.fetch_prices(next(it), start=start), queries),
+        }
+        compact.close()
+    return {
+        'rows': symbols * days * 2,
+        'build_s': round(build_s, 2),
+        'migrate_s': round(migrate_s, 2),
+        'legacy': before,
+        'compact': after,
+        'size_ratio': round(after['db_mb'] / before['db_mb'], 3) if before['db_mb'] else None,
+    }
+
+
+def build_legacy_macro(path: str, economies: int, indicators: int, months: int) -> List[str]:
+    """按旧布局生成月度宏观序列，返回经济体列表。"""
+    rng = random.Random(42)
+    ecos = [f'E{i:03d}' for i in range(economies)]
+    inds = [f'ind_{i:02d}' for i in range(indicators)]
+    dates = [f'{1975 + m // 12}-{m % 12 + 1:02d}-01' for m in range(months)]
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for ddl in _LEGACY_MACRO_DDL:
+        conn.execute(ddl)
+    for eco in ecos:
+        rows = [(eco, ind, d, rng.gauss(2.0, 1.5), 'bench', None) for ind in inds for d in dates]
+        conn.executemany(
+            'INSERT INTO macro_series (economy, indicator, date, value, provider, revised_at) VALUES (?,?,?,?,?,?)',
+            rows)
+    conn.commit()
+    conn.close()
+    _vacuum(path)
+    return ecos
+
+
+def run_macro(economies: int = 120, indicators: int = 20, months: int = 600, queries: int = 100) -> Dict[str, object]:
+    from services.compact_storage import to_day
+    from services.database_service import DatabaseService
+    from services.macro_repository import MacroRepository
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'macro_bench.db')
+        t0 = time.perf_counter()
+        ecos = build_legacy_macro(path, economies, indicators, months)
+        build_s = time.perf_counter() - t0
+        start = f'{1975 + max(0, months - 120) // 12}-01-01'
+        rng = random.Random(7)
+        it = iter([rng.choice(ecos) for _ in range(queries)] * 3)
+        latest_inds = [f'ind_{i:02d}' for i in range(min(5, indicators))]
+        latest_runs = max(1, queries // 10)
+
+        legacy = sqlite3.connect(path)
+
+        def legacy_country():
+            legacy.execute('SELECT indicator, date, value FROM macro_series WHERE economy = ? AND date >= ? '
+                           'ORDER BY indicator, date', (next(it), start)).fetchall()
+
+        def legacy_latest():
+            legacy.execute(
+                'SELECT indicator, economy, value FROM (SELECT indicator, economy, value, ROW_NUMBER() OVER '
+                '(PARTITION BY indicator, economy ORDER BY date DESC) AS rn FROM macro_series WHERE indicator IN '
+                f'({",".join("?" * len(latest_inds))})) WHERE rn <= 2', latest_inds).fetchall()
+
+        before = {
+            'db_mb': _file_mb(path),
+            'country_window': _timed(legacy_country, queries),
+            'latest_two': _timed(legacy_latest, latest_runs),
+        }
+        legacy.close()
+
+        t0 = time.perf_counter()
+        repo = MacroRepository(DatabaseService(path, create_trading_schema=False))
+        migrate_s = time.perf_counter() - t0
+        _vacuum(path)
+
+        compact = sqlite3.connect(path)
+        start_day = to_day(start)
+
+        def compact_country():
+            compact.execute(
+                "SELECT i.code, t.day, t.value FROM series_keys i JOIN macro_series_data t "
+                "ON t.indicator_id = i.key_id AND t.day >= ? AND t.economy_id = "
+                "(SELECT key_id FROM series_keys WHERE kind = 'economy' AND code = ?) "
+                "WHERE i.kind = 'indicator' ORDER BY i.code, t.day", (start_day, next(it))).fetchall()
+
+        after = {
+            'db_mb': _file_mb(path),
+            'country_window': _timed(compact_country, queries),
+            # 仓储读取：含连接建立、字典键解析与日序号还原
+            'repository_country': _timed(lambda: repo.fetch_macro_series_by_economy(next(it), start=start), queries),
+            'latest_two': _timed(lambda: repo.fetch_latest_values(latest_inds), latest_runs),
+        }
+        compact.close()
+    return {
+        'rows': economies * indicators * months,
+        'build_s': round(build_s, 2),
+        'migrate_s': round(migrate_s, 2),
+        'legacy': before,
+        'compact': after,
+        'size_ratio': round(after['db_mb'] / before['db_mb'], 3) if before['db_mb'] else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='时序存储布局基准')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_meso = sub.add_parser('meso', help='中观价格/分数表')
+    p_meso.add_argument('--symbols', type=int, default=200)
+    p_meso.add_argument('--days', type=int, default=10000)
+    p_meso.add_argument('--queries', type=int, default=200)
+    p_macro = sub.add_parser('macro', help='宏观指标序列表')
+    p_macro.add_argument('--economies', type=int, default=120)
+    p_macro.add_argument('--indicators', type=int, default=20)
+    p_macro.add_argument('--months', type=int, default=600)
+    p_macro.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == 'macro':
+        result = run_macro(args.economies, args.indicators, args.months, args.queries)
+    else:
+        result = run_meso(args.symbols, args.days, args.queries)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能剖析工具：导入耗时（-X importtime）与首个请求响应时间基准。
+
+用法：
+- python tools/profile_startup.py importtime [--top 20]
+    在子进程中执行 `python -X importtime -c "import app"`，按累计/自身耗时列出最慢的模块。
+- python tools/profile_startup.py first-response [--runs 3] [--warmup]
+    在全新子进程中测量：导入 app、创建应用、首个分析请求（触发高级指标计算）与第二次请求的耗时。
+    --warmup 表示在首个请求前等待后台预热线程完成（模拟服务空闲期已完成预热）。
+
+所有子进程使用临时数据库，不会触碰 database/ 下的产品库。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# 首个请求基准：在子进程内执行，输出一行 JSON
+_FIRST_RESPONSE_SCRIPT = r"""
+import json, sys, time
+from decimal import Decimal
+t0 = time.perf_counter()
+import app as app_module
+t_import = time.perf_counter()
+application = app_module.create_app('testing')
+t_create = time.perf_counter()
+svc = application.trading_service
+ok, _ = application.strategy_service.create_strategy('PROFILE', '')
+sid = next(s['id'] for s in application.strategy_service.get_all_strategies() if s['name'] == 'PROFILE')
+ok, tid = svc.add_buy_transaction(sid, 'PRF001', '剖析样本', Decimal('10'), 100, '2024-01-02')
+svc.add_sell_transaction(tid, Decimal('11'), 50, '2024-02-01')
+warmup_s = 0.0
+if WARMUP:
+    from utils.warmup import start_warmup
+    tw = time.perf_counter()
+    start_warmup(delay=0).join()
+    warmup_s = time.perf_counter() - tw
+client = application.test_client()
+t_req = time.perf_counter()
+r1 = client.get('/api/strategy_score?strategy_id=%d' % sid)
+t_first = time.perf_counter()
+r2 = client.get('/api/strategy_score?strategy_id=%d' % sid)
+t_second = time.perf_counter()
+print(json.dumps({
+    'import_s': t_import - t0,
+    'create_app_s': t_create - t_import,
+    'warmup_s': warmup_s,
+    'first_request_s': t_first - t_req,
+    'second_request_s': t_second - t_first,
+    'status': [r1.status_code, r2.status_code],
+}))
+"""
+
+
+def _child_env(tmpdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env['DB_PATH'] = os.path.join(tmpdir, 'trading.db')
+    env['MACRO_DB_PATH'] = os.path.join(tmpdir, 'macro.db')
+    env['MESO_DB_PATH'] = os.path.join(tmpdir, 'meso.db')
+    env['PYTHONPATH'] = str(ROOT_DIR) + os.pathsep + env.get('PYTHONPATH', '')
+    env.pop('APP_WARMUP', None)
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """解析 -X importtime 输出为 [(module, self_us, cumulative_us, depth)]。"""
+    entries: List[Tuple[str, int, int, int]] = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        depth = len(m.group(3)) // 2
+        entries.append((m.group(4), int(m.group(1)), int(m.group(2)), depth))
+    return entries
+
+
+def run_importtime(top: int = 20, depth: int = 2) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=str(ROOT_DIR), env=_child_env(tmpdir), capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    entries = parse_importtime(proc.stderr)
+    top_level = [e for e in entries if e[3] == 0]
+    # 仅按前几层排序累计耗时，避免深层子模块与父模块重复计入
+    shallow = [e for e in entries if 0 < e[3] <= depth or (e[3] == 0 and e[0] != 'app')]
+    by_cumulative = sorted(shallow, key=lambda e: e[2], reverse=True)[:top]
+    by_self = sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+    total_us = sum(e[2] for e in top_level)
+    return {
+        'total_ms': round(total_us / 1000.0, 1),
+        'app_ms': round(sum(e[2] for e in top_level if e[0] == 'app') / 1000.0, 1),
+        'top_cumulative': [{'module': m, 'cumulative_ms': round(c / 1000.0, 1)} for m, _, c, _ in by_cumulative],
+        'top_self': [{'module': m, 'self_ms': round(s / 1000.0, 1)} for m, s, _, _ in by_self],
+        'heavy_loaded': sorted({m for m, _, _, _ in entries if m in ('numpy', 'pandas', 'empyrical')}),
+    }
+
+
+def run_first_response(runs: int = 3, warmup: bool = False) -> Dict[str, object]:
+    script = f"WARMUP = {bool(warmup)!r}\n" + _FIRST_RESPONSE_SCRIPT
+    samples: List[Dict[str, float]] = []
+    for _ in range(max(1, runs)):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            proc = subprocess.run(
+                [sys.executable, '-c', script],
+                cwd=str(ROOT_DIR), env=_child_env(tmpdir), capture_output=True, text=True,
+            )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    keys = ('import_s', 'create_app_s', 'warmup_s', 'first_request_s', 'second_request_s')
+    summary = {k: round(statistics.median(s[k] for s in samples) * 1000.0, 1) for k in keys}
+    # 冷启动到首个响应：导入 + 创建应用 + 首个请求（不含造数与预热等待）
+    summary['total_s'] = round(statistics.median(
+        s['import_s'] + s['create_app_s'] + s['first_request_s'] for s in samples) * 1000.0, 1)
+    return {
+        'runs': len(samples),
+        'warmup': warmup,
+        'median_ms': {k.replace('_s', '_ms'): v for k, v in summary.items()},
+        'status': samples[-1]['status'],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='启动性能剖析')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_imp = sub.add_parser('importtime', help='导入耗时剖析')
+    p_imp.add_argument('--top', type=int, default=20)
+    p_imp.add_argument('--depth', type=int, default=2, help='累计耗时排行包含的最大嵌套层级')
+    p_first = sub.add_parser('first-response', help='首个请求响应时间基准')
+    p_first.add_argument('--runs', type=int, default=3)
+    p_first.add_argument('--warmup', action='store_true', help='首个请求前等待预热完成')
+    args = parser.parse_args(argv)
+
+    if args.command == 'importtime':
+        result = run_importtime(args.top, args.depth)
+    else:
+        result = run_first_response(args.runs, args.warmup)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间序列工具：分析窗口解析与服务端降采样。
+
+说明：
+- 窗口形如 6m/1y/3y/10y，以序列自身的最新日期为锚点回推（月末自动对齐）；all/max/空值表示不截取。
+- 降采样返回应保留的行下标（升序），调用方按下标挑选整行，保证同一行各字段一致：
+  - lttb：Largest-Triangle-Three-Buckets，保留视觉形态，首尾点必留
+  - minmax：按桶保留最小/最大值点（按时间先后），适合保留极值
+- 空值（None/NaN）不参与面积与极值比较；x 轴优先使用日期（不等间隔），无法解析时使用序号。
+- 序列输出格式：rows（[{date, ...}]，默认）/ columnar（{dates: [...], 列名: [...]}，直接由游标元组转置）/
+  arrow（Arrow IPC 流，依赖可选的 pyarrow）。
+"""
+
+from __future__ import annotations
+
+from datetime import date as _date
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from .exceptions import ValidationError
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+MAX_POINTS = 10000
+SERIES_FORMATS = ("rows", "columnar", "arrow")
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+class Downsampler(Protocol):
+    """downsample_rows / downsample_columns 的共同调用形式（见 downsampler）。"""
+
+    def __call__(self, series: Any, points: Optional[int], value_key: str, method: str = ..., /) -> Any:
+        ...
+
+
+def window_start(as_of: str, window: Optional[str]) -> Optional[str]:
+    """返回窗口起始日期（YYYY-MM-DD，含）；window 形如 6m/1y/3y/10y，无法识别时返回 None。"""
+    w = (window or "").strip().lower()
+    if len(w) < 2 or w[-1] not in ("m", "y") or not w[:-1].isdigit():
+        return None
+    n = int(w[:-1])
+    if n <= 0:
+        return None
+    end = _date.fromisoformat(str(as_of)[:10])
+    months = n * (12 if w[-1] == "y" else 1)
+    total = end.year * 12 + (end.month - 1) - months
+    year, month = divmod(total, 12)
+    month += 1
+    # 月末对齐（例如 3 月 31 日回退 1 个月为 2 月最后一天）
+    for day in (end.day, 30, 29, 28):
+        try:
+            return _date(year, month, day).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_sampling_args(points: Optional[str], method: Optional[str]) -> Tuple[Optional[int], str]:
+    """解析请求中的 points/downsample 参数，返回 (points 或 None, method)。"""
+    m = (method or "lttb").strip().lower()
+    if m not in DOWNSAMPLE_METHODS:
+        raise ValidationError(f"downsample 仅支持: {', '.join(DOWNSAMPLE_METHODS)}")
+    if points in (None, ""):
+        return None, m
+    try:
+        n = int(points)
+    except (TypeError, ValueError):
+        raise ValidationError("points 必须为正整数")
+    if n < 2 or n > MAX_POINTS:
+        raise ValidationError(f"points 取值范围为 2..{MAX_POINTS}")
+    return n, m
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def parse_series_format(fmt: Optional[str]) -> str:
+    """解析 format 参数（rows/columnar/arrow，默认 rows）；arrow 需要 pyarrow。"""
+    f = (fmt or "rows").strip().lower()
+    if f == "json":
+        f = "rows"
+    if f not in SERIES_FORMATS:
+        raise ValidationError(f"format 仅支持: {', '.join(SERIES_FORMATS)}")
+    if f == "arrow" and not arrow_available():
+        raise ValidationError("Arrow 格式需要安装 pyarrow")
+    return f
+
+
+def rows_to_columns(names: Sequence[str], rows: Sequence[Sequence[Any]], date_key: str = "date") -> Dict[str, List[Any]]:
+    """将游标元组按列转置为 {dates: [...], 列名: [...]}（不构造逐行字典）。"""
+    cols = list(zip(*rows)) if rows else [()] * len(names)
+    return {("dates" if n == date_key else n): list(c) for n, c in zip(names, cols)}
+
+
+def stack_columns(series: Dict[str, Dict[str, List[Any]]], key_name: str) -> Dict[str, List[Any]]:
+    """将 {key: 列式序列} 纵向拼接为长表列（首列为 key_name），用于二进制输出。"""
+    names = [key_name]
+    for cols in series.values():
+        names.extend(n for n in cols if n not in names)
+    out: Dict[str, List[Any]] = {name: [] for name in names}
+    for key, cols in series.items():
+        n = len(cols.get("dates", []))
+        out[key_name].extend([key] * n)
+        for name in names[1:]:
+            out[name].extend(cols.get(name) or [None] * n)
+    return out
+
+
+def columns_to_arrow_ipc(columns: Dict[str, List[Any]]) -> bytes:
+    """列式数据编码为 Arrow IPC 流（dates 列为字符串，其余按值推断类型）。"""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _x_axis(dates: Optional[Sequence[Any]], n: int) -> np.ndarray:
+    if dates is not None:
+        try:
+            return np.array([str(d)[:10] for d in dates], dtype="datetime64[D]").astype(np.float64)
+        except (ValueError, TypeError):
+            pass
+    return np.arange(n, dtype=np.float64)
+
+
+def _as_float(values: Sequence[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def lttb_indices(values: Sequence[Any], threshold: int, dates: Optional[Sequence[Any]] = None) -> np.ndarray:
+    """LTTB 降采样，返回保留点的下标（长度 ≤ threshold）。"""
+    y = _as_float(values)
+    n = len(y)
+    if threshold >= n or threshold <= 0:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold])
+    x = _x_axis(dates, n)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    # 中间 n-2 个点均分为 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        nhi = max(nhi, nlo + 1)
+        # 下一桶均值（最后一桶以末点为参照）
+        ny = y[nlo:nhi]
+        avg_x = float(np.mean(x[nlo:nhi]))
+        avg_y = float(np.nanmean(ny)) if np.any(~np.isnan(ny)) else (y[a] if not np.isnan(y[a]) else 0.0)
+        ay = y[a] if not np.isnan(y[a]) else avg_y
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - ay) - (x[a] - x[lo:hi]) * (avg_y - ay))
+        area = np.where(np.isnan(area), -1.0, area)
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(values: Sequence[Any], threshold: int) -> np.ndarray:
+    """按桶保留最小/最大值点，返回保留点的下标（长度 ≤ threshold，含首尾）。"""
+    y = _as_float(values)
+    n = len(y)
+    if threshold >= n or threshold <= 0:
+        return np.arange(n)
+    if threshold < 4:
+        return lttb_indices(values, threshold)
+    buckets = (threshold - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    keep = {0, n - 1}
+    for i in range(buckets):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        seg = y[lo:hi]
+        if not np.any(~np.isnan(seg)):
+            keep.add(int(lo))
+            continue
+        keep.add(int(lo + np.nanargmin(seg)))
+        keep.add(int(lo + np.nanargmax(seg)))
+    return np.array(sorted(keep), dtype=np.int64)
+
+
+def downsample_rows(rows: List[Dict[str, Any]], points: Optional[int], value_key: str,
+                    method: str = "lttb", date_key: str = "date") -> List[Dict[str, Any]]:
+    """按 value_key 对行列表降采样到不超过 points 行；points 为空或不超过原长度时原样返回。"""
+    if not points or len(rows) <= points:
+        return rows
+    values = [r.get(value_key) for r in rows]
+    if method == "minmax":
+        idx = minmax_indices(values, points)
+    else:
+        idx = lttb_indices(values, points, dates=[r.get(date_key) for r in rows])
+    return [rows[int(i)] for i in idx]
+
+
+def downsample_columns(columns: Dict[str, List[Any]], points: Optional[int], value_key: str,
+                       method: str = "lttb") -> Dict[str, List[Any]]:
+    """列式版本的 downsample_rows：按同一组下标挑选各列。"""
+    n = len(columns.get("dates", []))
+    if not points or n <= points:
+        return columns
+    values = columns.get(value_key) or [None] * n
+    if method == "minmax":
+        idx = minmax_indices(values, points)
+    else:
+        idx = lttb_indices(values, points, dates=columns.get("dates"))
+    return {name: [col[int(i)] for i in idx] for name, col in columns.items()}
+
+
+def downsampler(columnar: bool) -> Downsampler:
+    """按序列格式选择降采样函数：列式用 downsample_columns，行式用 downsample_rows。"""
+    if columnar:
+        return downsample_columns
+    return downsample_rows
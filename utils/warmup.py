@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台预热：在服务开始监听后，于守护线程中预先导入重量级科学计算模块。
+
+说明：
+- 分析路径（高级指标计算）首次请求时才导入 numpy 与指标内核，冷启动会有明显停顿；
+  预热线程在空闲期完成导入，首个请求即可直接命中 sys.modules。
+- 每个进程只启动一次；导入失败（例如未安装可选依赖）仅记录日志，不影响服务。
+- 与请求线程并发导入同一模块是安全的：Python 导入锁保证模块只初始化一次。
+"""
+
+import importlib
+import logging
+import socket
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+# 每项为模块名或候选模块名元组（按顺序尝试，导入成功一个即可）
+ModuleSpec = Union[str, Tuple[str, ...]]
+
+DEFAULT_WARMUP_MODULES: Tuple[ModuleSpec, ...] = (
+    'numpy',
+    'services.risk_metrics',
+)
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_logger = logging.getLogger(__name__)
+
+
+class WarmupThread(threading.Thread):
+    """预热线程：记录已导入与失败的模块，便于诊断。"""
+
+    def __init__(self, modules: Sequence[ModuleSpec], delay: float = 0.0,
+                 wait_for: Optional[Tuple[str, int]] = None, wait_timeout: float = 30.0):
+        super().__init__(name='mirror-warmup', daemon=True)
+        self.modules = list(modules)
+        self.delay = max(0.0, float(delay))
+        self.wait_for = wait_for
+        self.wait_timeout = wait_timeout
+        self.imported: List[str] = []
+        self.failed: List[str] = []
+        self.elapsed: float = 0.0
+
+    def run(self) -> None:
+        if self.wait_for is not None:
+            wait_until_listening(self.wait_for[0], self.wait_for[1], self.wait_timeout)
+        if self.delay:
+            time.sleep(self.delay)
+        started = time.perf_counter()
+        for spec in self.modules:
+            candidates = (spec,) if isinstance(spec, str) else tuple(spec)
+            name = _import_first(candidates)
+            if name:
+                self.imported.append(name)
+            else:
+                self.failed.append('/'.join(candidates))
+        self.elapsed = time.perf_counter() - started
+        _logger.info("预热完成：导入 %s，耗时 %.2fs；未导入 %s", self.imported, self.elapsed, self.failed)
+
+
+def _import_first(candidates: Iterable[str]) -> Optional[str]:
+    for name in candidates:
+        try:
+            importlib.import_module(name)
+            return name
+        except Exception:
+            continue
+    return None
+
+
+def wait_until_listening(host: str, port: int, timeout: float = 30.0, interval: float = 0.1) -> bool:
+    """轮询直到 host:port 可连接（服务已开始监听）或超时。"""
+    target = '127.0.0.1' if host in ('', '0.0.0.0') else ('::1' if host == '::' else host)
+    deadline = time.monotonic() + max(0.0, timeout)
+    while True:
+        try:
+            with socket.create_connection((target, int(port)), timeout=interval):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+
+def start_warmup(modules: Optional[Sequence[ModuleSpec]] = None, delay: float = 0.0,
+                 wait_for: Optional[Tuple[str, int]] = None, wait_timeout: float = 30.0) -> threading.Thread:
+    """启动预热线程（每进程一次）；重复调用返回已启动的线程。
+
+    wait_for=(host, port) 时先等待服务开始监听再导入，避免与启动阶段争抢 CPU。
+    """
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = WarmupThread(modules or DEFAULT_WARMUP_MODULES, delay, wait_for, wait_timeout)
+            _thread.start()
+        return _thread
+